@@ -5,6 +5,11 @@ from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from config.settings import config
 from app.models.image_models import db
+from app.models.hash_models import ImageHash, ImageDigest, IndexChange
+from app.models.cluster_models import ClusteringJob
+from app.models.job_models import AnalysisJob
+from app.models.blob_models import StoredBlob
+from app.services.hash_index import perceptual_hash_index
 
 def create_app(config_name='default'):
     """
@@ -22,6 +27,7 @@ def create_app(config_name='default'):
 
     # Charger la configuration
     app.config.from_object(config[config_name])
+    app.config['CONFIG_NAME'] = config_name  # Reprise par les processus workers
     config[config_name].init_app(app)
 
     # Initialiser les extensions
@@ -47,6 +53,13 @@ def create_app(config_name='default'):
         print(f"⚠️ Erreur lors de l'initialisation de la base de données: {e}")
         print("💡 L'application peut continuer sans base de données pour les tests")
 
+    # Charger l'index de similarité (snapshot + journal des changements)
+    try:
+        with app.app_context():
+            perceptual_hash_index.warm_up()
+    except Exception as e:
+        print(f"⚠️ Index de similarité non initialisé (chargé à la première recherche): {e}")
+
     return app
 
 def init_extensions(app):
@@ -66,9 +79,11 @@ def init_extensions(app):
 def register_blueprints(app):
     """Enregistre les blueprints de l'application."""
     from app.api.image_routes import image_bp, init_image_api
-    from app.api.image_routes_v2 import image_bp_v2, init_image_api as init_image_api_v2
+    from app.api.image_routes_v2 import image_bp_v2, init_image_api as init_image_api_v2, models_readiness
     from app.api.jpeg_routes import jpeg_bp
     from app.api.test_interface_routes import test_interface_bp
+    from app.api.admin_routes import admin_bp, init_admin_api
+    from app.api.job_routes import jobs_bp, init_jobs_api
 
     # Initialiser l'API d'images (version 1)
     init_image_api(app)
@@ -76,11 +91,19 @@ def register_blueprints(app):
     # Initialiser l'API d'images (version 2)
     init_image_api_v2(app)
 
+    # Initialiser les services d'administration
+    init_admin_api(app)
+
+    # Initialiser les analyses asynchrones
+    init_jobs_api(app)
+
     # Enregistrer les blueprints
     app.register_blueprint(image_bp)
     app.register_blueprint(image_bp_v2)
     app.register_blueprint(jpeg_bp)
     app.register_blueprint(test_interface_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(jobs_bp)
 
     # Routes pour les pages HTML
     @app.route('/')
@@ -135,7 +158,19 @@ def register_blueprints(app):
 
     @app.route('/health')
     def health():
-        return {"status": "healthy", "message": "API is running"}
+        ready, models = models_readiness()
+        return {"status": "healthy", "message": "API is running", "live": True, "ready": ready, "models": models}
+
+    @app.route('/health/live')
+    def health_live():
+        # Le processus répond: aucune dépendance vérifiée (sonde de vivacité)
+        return {"status": "live"}
+
+    @app.route('/health/ready')
+    def health_ready():
+        # Modèles IA chargés (ou indisponibles): l'application peut recevoir du trafic
+        ready, models = models_readiness()
+        return {"status": "ready" if ready else "starting", "models": models}, 200 if ready else 503
 
 def configure_logging(app):
     """Configure le système de logs."""
@@ -0,0 +1,151 @@
+"""
+Routes d'administration (tâches de maintenance de la base d'images).
+"""
+
+import hmac
+import threading
+import logging
+from functools import wraps
+
+from flask import Blueprint, request, jsonify, current_app
+
+from app.models.image_models import db
+from app.models.cluster_models import ClusteringJob
+from app.services.clustering_service import DuplicateClusteringService
+from app.services.result_cache import result_cache
+from app.services.model_registry import model_registry
+
+logger = logging.getLogger(__name__)
+
+# Créer le blueprint d'administration
+admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
+
+clustering_service = None
+
+
+def init_admin_api(app):
+    """Initialise les services d'administration."""
+    global clustering_service
+
+    clustering_service = DuplicateClusteringService(
+        checkpoint_dir=app.config.get('CLUSTERING_CHECKPOINT_DIR', 'instance/clustering'),
+        checkpoint_every=app.config.get('CLUSTERING_CHECKPOINT_EVERY', 5000)
+    )
+    logger.info("✅ Services d'administration initialisés")
+
+
+def admin_required(view):
+    """Exige l'en-tête X-Admin-Token égal à ADMIN_TOKEN (routes refusées si non configuré)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = current_app.config.get('ADMIN_TOKEN')
+        if not token:
+            return jsonify({"error": "Routes d'administration désactivées (ADMIN_TOKEN non configuré)"}), 403
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', '').encode(), token.encode()):
+            return jsonify({"error": "Accès administrateur refusé"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _run_clustering_job(app, job_id):
+    """Exécute une tâche de regroupement dans un thread d'arrière-plan."""
+    with app.app_context():
+        try:
+            clustering_service.run(job_id)
+        except Exception as e:
+            logger.error(f"❌ Tâche de regroupement {job_id} échouée: {str(e)}")
+        finally:
+            db.session.remove()
+
+
+@admin_bp.route('/clustering', methods=['POST'])
+@admin_required
+def start_clustering():
+    """
+    Lance (ou reprend) le regroupement des quasi-doublons en arrière-plan.
+
+    Paramètres: `radius` (distance de Hamming moyenne maximale, en bits),
+    `resume=true` pour reprendre la dernière tâche interrompue.
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        resume = str(payload.get('resume', request.values.get('resume', 'false'))).lower() == 'true'
+        radius = float(payload.get('radius', request.values.get(
+            'radius', current_app.config.get('CLUSTERING_RADIUS', 6)
+        )))
+
+        # Une reprise ne doit pas lancer un second thread sur la tâche en cours et son checkpoint
+        running = clustering_service.active_job(current_app.config.get('CLUSTERING_STALE_AFTER', 600))
+        if running is not None:
+            return jsonify({"error": "Une tâche de regroupement est déjà en cours", "job": running.to_dict()}), 409
+
+        job = clustering_service.resumable_job() if resume else None
+        if job is None:
+            if not 0 <= radius <= 64:
+                return jsonify({"error": "Le rayon doit être compris entre 0 et 64"}), 400
+            job = clustering_service.create_job(radius)
+
+        thread = threading.Thread(
+            target=_run_clustering_job,
+            args=(current_app._get_current_object(), job.id),
+            name=f"clustering-{job.id}",
+            daemon=True
+        )
+        thread.start()
+
+        return jsonify({"job": job.to_dict()}), 202
+
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Paramètre invalide: {str(e)}"}), 400
+    except Exception as e:
+        logger.error(f"Erreur lancement regroupement: {str(e)}")
+        return jsonify({"error": f"Erreur lors du lancement: {str(e)}"}), 500
+
+
+@admin_bp.route('/clustering/<int:job_id>', methods=['GET'])
+@admin_required
+def get_clustering_job(job_id):
+    """État et débit d'une tâche de regroupement."""
+    job = db.session.get(ClusteringJob, job_id)
+    if job is None:
+        return jsonify({"error": "Tâche introuvable"}), 404
+    return jsonify({"job": job.to_dict()})
+
+
+@admin_bp.route('/clusters', methods=['GET'])
+@admin_required
+def list_clusters():
+    """Liste les plus grands groupes de quasi-doublons."""
+    try:
+        min_size = max(2, request.args.get('min_size', 2, type=int))
+        limit = min(max(1, request.args.get('limit', 50, type=int)), 500)
+        return jsonify({"clusters": clustering_service.list_clusters(min_size=min_size, limit=limit)})
+    except Exception as e:
+        logger.error(f"Erreur listing groupes: {str(e)}")
+        return jsonify({"error": f"Erreur lors du listing: {str(e)}"}), 500
+
+
+@admin_bp.route('/cache', methods=['GET'])
+@admin_required
+def cache_stats():
+    """Taux de succès du cache de résultats, par étape d'analyse."""
+    return jsonify({"cache": result_cache.stats()})
+
+
+@admin_bp.route('/cache', methods=['DELETE'])
+@admin_required
+def clear_cache():
+    """Vide le cache de résultats (mémoire et disque)."""
+    result_cache.clear()
+    return jsonify({"message": "Cache de résultats vidé"})
+
+
+@admin_bp.route('/models', methods=['GET'])
+@admin_required
+def models_stats():
+    """Modèles chargés dans ce processus: empreinte mémoire, durée de chargement, prédictions."""
+    return jsonify(model_registry.stats())
+
+
+# Export du blueprint
+__all__ = ['admin_bp']
@@ -1,9 +1,12 @@
 from flask import Blueprint, request, jsonify, send_from_directory, current_app
 from werkzeug.exceptions import BadRequest
+from werkzeug.utils import secure_filename
 import logging
 from app.services.image_service import ImageService
 from app.services.ai_detection_service_v2 import AIDetectionService
+from app.services.model_registry import model_registry
 from app.utils.validators import ImageValidator, validate_steganography_message
+from app.utils.image_context import ImageContext
 from app.utils.exceptions import ValidationError, ImageProcessingError, AIDetectionError, SteganographyError
 
 logger = logging.getLogger(__name__)
@@ -19,8 +22,8 @@ def init_image_api(app):
     """Initialise l'API d'images avec les services."""
     global image_service, image_validator
 
-    # Initialiser le service de détection IA
-    ai_service = AIDetectionService()
+    # Initialiser le service de détection IA (modèles partagés avec l'API v2)
+    ai_service = AIDetectionService(registry=model_registry)
 
     # Initialiser le service d'images
     image_service = ImageService(app.config['UPLOAD_FOLDER'], ai_service)
@@ -50,7 +53,8 @@ def upload_and_analyze():
         image_validator.validate_image_file(file)
 
         # Traiter l'image
-        result = image_service.process_uploaded_image(file)
+        k = max(1, min(request.args.get('k', 5, type=int), current_app.config.get('SIMILARITY_MAX_K', 100)))
+        result = image_service.process_uploaded_image(file, k=k)
 
         return jsonify({
             "success": True,
@@ -116,16 +120,15 @@ def detect_steganography():
 
         file = request.files['file']
 
-        # Valider le fichier
-        image_validator.validate_image_file(file)
-
-        # Sauvegarder temporairement le fichier
-        filename, filepath = image_service._save_uploaded_file(file)
+        # Valider le fichier (analyse en mémoire, rien n'est écrit sur disque)
+        context = ImageContext.from_file_storage(file)
+        image_validator.validate_image_file(file, context=context)
+        filename = secure_filename(file.filename)
 
         # Détecter la stéganographie
         from app.services.steganography_service import SteganographyService
         steg_service = SteganographyService()
-        result = steg_service.detect_hidden_message(filepath)
+        result = steg_service.detect_hidden_message(context)
 
         # Format pour l'interface web (compatibilité avec steganography.html)
         if result.get('signature_detected'):
@@ -167,14 +170,13 @@ def detect_ai_generated():
 
         file = request.files['file']
 
-        # Valider le fichier
-        image_validator.validate_image_file(file)
-
-        # Sauvegarder temporairement le fichier
-        filename, filepath = image_service._save_uploaded_file(file)
+        # Valider le fichier (analyse en mémoire, rien n'est écrit sur disque)
+        context = ImageContext.from_file_storage(file)
+        image_validator.validate_image_file(file, context=context)
+        filename = secure_filename(file.filename)
 
         # Détecter si l'image est générée par IA
-        result = image_service.ai_service.detect_ai_image(filepath)
+        result = image_service.ai_service.detect_ai_image(context)
 
         return jsonify({
             "success": True,
@@ -223,10 +225,13 @@ def get_analysis_history():
 @image_bp.route('/uploads/<filename>')
 def get_uploaded_file(filename):
     """
-    Endpoint pour servir les fichiers téléchargés.
+    Endpoint pour servir les fichiers téléchargés (stockage adressé par le contenu).
     """
     try:
-        return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+        relative_path = image_service.blob_store.resolve(filename)
+        if relative_path is None:
+            return jsonify({"error": "Fichier introuvable"}), 404
+        return send_from_directory(image_service.blob_store.root, relative_path)
     except FileNotFoundError:
         return jsonify({"error": "Fichier introuvable"}), 404
     except Exception as e:
@@ -239,8 +244,12 @@ def health_check():
     Endpoint de vérification de l'état de santé de l'API.
     """
     try:
-        # Vérifier l'état des services
-        ai_status = "OK" if image_service.ai_service.is_model_loaded() else "Modèle non chargé"
+        # Vérifier l'état des services (sans attendre le chargement des modèles)
+        ai_service = image_service.ai_service
+        if not ai_service.is_ready():
+            ai_status = "Chargement en cours"
+        else:
+            ai_status = "OK" if ai_service.is_model_loaded() else "Modèle non chargé"
 
         return jsonify({
             "success": True,
@@ -350,3 +359,97 @@ def compare_similarity():
         import traceback
         logger.error(f"Traceback complet: {traceback.format_exc()}")
         return jsonify({"error": f"Erreur interne du serveur: {str(e)}"}), 500
+
+def _parse_image_ids(values):
+    """
+    Convertit les identifiants demandés (entiers JSON ou chaînes du formulaire).
+
+    Returns:
+        Liste d'entiers, ou None si la valeur n'est pas une liste d'entiers
+    """
+    if not isinstance(values, list):
+        return None
+    image_ids = []
+    for value in values:
+        if isinstance(value, str) and value.strip().isdigit():
+            value = int(value)
+        if not isinstance(value, int) or isinstance(value, bool):
+            return None
+        image_ids.append(value)
+    return image_ids
+
+@image_bp.route('/similarity/matrix', methods=['POST'])
+def similarity_matrix():
+    """
+    Endpoint de comparaison d'un lot d'images entre elles (matrice N x N pHash/dHash).
+
+    Accepte soit plusieurs fichiers `files`, soit une liste `image_ids` d'images
+    déjà analysées (liste JSON, ou formulaire séparé par des virgules).
+    Paramètres optionnels: `threshold` (0-1) pour lister les paires similaires,
+    `output=pairs` pour ne pas renvoyer la matrice.
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        if not isinstance(payload, dict):
+            return jsonify({"error": "Le corps JSON doit être un objet"}), 400
+        files = [file for file in request.files.getlist('files') if file.filename]
+        image_ids = payload.get('image_ids')
+        if image_ids is None:
+            # Formulaire ou paramètre d'URL: identifiants séparés par des virgules
+            image_ids = request.form.get('image_ids') or request.args.get('image_ids')
+            image_ids = [value for value in image_ids.split(',') if value.strip()] if image_ids else None
+        if image_ids is not None and not files:
+            image_ids = _parse_image_ids(image_ids)
+            if image_ids is None:
+                return jsonify({"error": "image_ids doit être une liste d'entiers"}), 400
+
+        threshold = payload.get('threshold', request.values.get('threshold'))
+        output = payload.get('output', request.values.get('output', 'matrix'))
+        pairs_only = output == 'pairs'
+        if pairs_only and threshold is None:
+            threshold = current_app.config.get('SIMILARITY_THRESHOLD', 0.85)
+        if threshold is not None:
+            try:
+                threshold = float(threshold)
+            except (TypeError, ValueError):
+                return jsonify({"error": "Le seuil doit être un nombre"}), 400
+
+        count = len(files) or len(image_ids or [])
+        max_images = current_app.config.get('SIMILARITY_MATRIX_MAX_IMAGES', 1000)
+        if count < 2:
+            return jsonify({"error": "Au moins deux images (files ou image_ids) sont requises"}), 400
+        if count > max_images:
+            return jsonify({"error": f"Trop d'images: {count} (maximum {max_images})"}), 400
+        if threshold is not None and not 0 <= threshold <= 1:
+            return jsonify({"error": "Le seuil doit être compris entre 0 et 1"}), 400
+
+        if files:
+            # Chaque fichier est lu une seule fois: validation et hachage partagent le contexte
+            contexts = [ImageContext.from_file_storage(file) for file in files]
+            for file, context in zip(files, contexts):
+                image_validator.validate_image_file(file, context=context)
+            labels = [file.filename for file in files]
+            hashes_list = image_service.hash_uploaded_files(
+                contexts, max_workers=current_app.config.get('HASH_WORKERS') or None
+            )
+        else:
+            labels = image_ids
+            hashes_list = image_service.load_stored_hashes(image_ids)
+            unknown = [image_id for image_id, hashes in zip(image_ids, hashes_list) if hashes is None]
+            if unknown:
+                return jsonify({"error": "Images inconnues", "image_ids": unknown}), 404
+
+        result = image_service.compute_similarity_matrix(hashes_list, threshold=threshold, pairs_only=pairs_only)
+        result["labels"] = labels
+
+        logger.info(f"Matrice de similarité calculée pour {count} images")
+        return jsonify(result)
+
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    except ImageProcessingError as e:
+        logger.error(f"Erreur lors du calcul de la matrice: {str(e)}")
+        return jsonify({"error": str(e)}), 422
+    except Exception as e:
+        logger.error(f"Erreur inattendue: {str(e)}")
+        return jsonify({"error": "Erreur interne du serveur"}), 500
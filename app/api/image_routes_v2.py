@@ -1,16 +1,33 @@
-from flask import Blueprint, request, jsonify, send_from_directory, current_app
+from flask import Blueprint, Request, Response, request, jsonify, send_from_directory, current_app, stream_with_context
 from flask_cors import CORS, cross_origin
 from werkzeug.exceptions import BadRequest
+import json
 import logging
 import os
-import uuid
+import shutil
+import tempfile
+import zipfile
 from datetime import datetime
 from app.services.image_service import ImageService
-from app.services.ai_detection_service_v2 import AIDetectionService
+from app.services.ai_detection_service_v2 import AIDetectionService, configure_backend
 from app.services.steganography_service import SteganographyService
 from app.services.advanced_steganography_service import AdvancedSteganographyService
 from app.services.jpeg_steganography_service import JPEGSteganographyService
+from app.services.batch_ingest_service import BatchIngestService, iter_uploaded_files, iter_zip_members
+from app.services.exact_duplicates import find_exact_duplicate, build_duplicate_response
+from app.services.hash_index import perceptual_hash_index
+from app.services.embedding_store import embedding_store
+from app.services.ann_index import ann_index
+from app.services.result_cache import result_cache
+from app.services.model_registry import model_registry
+from app.services.inference_workers import connect_registry
+from app.services.blob_store import normalize_extension
 from app.models.image_models import ImageAnalysis, db
+from app.models.hash_models import ImageHash, ImageDigest, IndexChange
+from app.utils.hamming import HASH_BITS
+from app.utils.image_context import ImageContext, ImageSource
+from app.utils.pools import get_thread_pool
+from app.utils.stages import StageGraph
 from app.utils.validators import ImageValidator, validate_steganography_message
 from app.utils.exceptions import ValidationError, ImageProcessingError, AIDetectionError, SteganographyError
 
@@ -37,18 +54,89 @@ stego_service = None
 advanced_stego_service = None
 jpeg_stego_service = None
 image_validator = None
+batch_service = None
+blob_store = None
+
+# Archives ZIP envoyées directement dans le corps de la requête
+ZIP_MIMETYPES = ('application/zip', 'application/x-zip-compressed')
+ZIP_SPOOL_MEMORY = 8 * 1024 * 1024  # Au-delà, l'archive reçue est écrite dans un fichier temporaire
+
+class BatchAwareRequest(Request):
+    """Requête dont la taille maximale est relevée pour l'ingestion par lots."""
+
+    @property
+    def max_content_length(self):
+        if self.endpoint == 'images_v2.upload_batch':
+            return current_app.config.get('BATCH_MAX_CONTENT_LENGTH')
+        return super().max_content_length
 
 def init_image_api(app):
     """Initialise l'API d'images avec les services."""
     global image_service, ai_service, stego_service, advanced_stego_service, jpeg_stego_service, image_validator
+    global batch_service, blob_store
 
     # Initialiser les services
-    ai_service = AIDetectionService()
+    ai_service = AIDetectionService(registry=model_registry)  # Modèles partagés avec l'API v1
     stego_service = SteganographyService()
     advanced_stego_service = AdvancedSteganographyService()
     jpeg_stego_service = JPEGSteganographyService()
     image_service = ImageService(app.config['UPLOAD_FOLDER'], ai_service)
     image_validator = ImageValidator(app.config['MAX_CONTENT_LENGTH'])
+    blob_store = image_service.blob_store
+    batch_service = BatchIngestService(
+        stego_service, ai_service, image_validator, app.config['UPLOAD_FOLDER'],
+        chunk_size=app.config.get('BATCH_UPLOAD_CHUNK_SIZE', 32),
+        max_workers=app.config.get('HASH_WORKERS') or None
+    )
+    app.request_class = BatchAwareRequest
+
+    # Cache des résultats d'analyse (mémoire + SQLite partagé entre processus)
+    result_cache.configure(
+        max_entries=app.config.get('RESULT_CACHE_SIZE', 2048),
+        path=app.config.get('RESULT_CACHE_PATH'),
+        ttl=app.config.get('RESULT_CACHE_TTL', 7 * 24 * 3600)
+    )
+
+    # Index de similarité: chargé par create_app une fois les tables créées
+    perceptual_hash_index.snapshot_path = app.config.get('HASH_INDEX_PATH')
+    perceptual_hash_index.sync_interval = app.config.get('HASH_INDEX_SYNC_INTERVAL', 0.0)
+
+    # Ouvrir le stockage des embeddings profonds (projeté en mémoire)
+    try:
+        embedding_store.open(app.config.get('EMBEDDING_STORE_PATH'), app.config.get('EMBEDDING_DTYPE'))
+
+        # Index approché (construit hors ligne par scripts/migrate.py --build-ann-index),
+        # chargé avec le sous-dossier du ResNet50 une fois celui-ci chargé
+        ann_index.nprobe = app.config.get('ANN_NPROBE', ann_index.nprobe)
+        ann_index.snapshot_path = app.config.get('ANN_INDEX_PATH')
+    except Exception as e:
+        logger.warning(f"⚠️ Stockage d'embeddings non initialisé: {str(e)}")
+
+    # Moteur d'exécution des modèles (Keras ou exports TFLite quantifiés)
+    configure_backend(
+        model_registry, app.config.get('AI_BACKEND', 'keras'),
+        quantization=app.config.get('AI_TFLITE_QUANTIZATION', 'dynamic'),
+        threads=app.config.get('AI_TFLITE_THREADS', 0)
+    )
+
+    # Modèles servis par le serveur d'inférence dédié plutôt que chargés dans ce processus
+    if app.config.get('INFERENCE_SERVER_ADDRESS'):
+        connect_registry(
+            model_registry, app.config['INFERENCE_SERVER_ADDRESS'],
+            authkey=app.config['SECRET_KEY'].encode(),
+            slots=app.config.get('INFERENCE_RING_SLOTS', 64),
+            connect_timeout=app.config.get('INFERENCE_CONNECT_TIMEOUT', 120.0)
+        )
+
+    # Inférences concurrentes regroupées en lots (partagé par v1 et v2 via le registre)
+    model_registry.configure_batching(
+        app.config.get('AI_BATCH_MAX_SIZE', 32),
+        app.config.get('AI_BATCH_MAX_WAIT_MS', 5.0)
+    )
+
+    # Modèles IA chargés en arrière-plan: /health/ready passe à 200 une fois prêts
+    if app.config.get('AI_MODEL_WARMUP', True):
+        ai_service.start_warmup()
 
     logger.info("✅ Services d'images avancés initialisés")
 
@@ -68,71 +156,54 @@ def upload_and_analyze():
         if file.filename == '':
             return jsonify({"error": "Aucun fichier sélectionné"}), 400
 
-        # Valider le fichier
-        try:
-            image_validator.validate_image_file(file)
-        except ValidationError as e:
-            return jsonify({"error": str(e)}), 400
-
         # Paramètres optionnels
-        skip_analysis = request.args.get('skip_analysis') == 'true'
         only_check_similar = request.args.get('only_check_similar') == 'true'
+        k, max_distance = get_similarity_params()
 
-        # Créer un nom de fichier unique
-        filename = str(uuid.uuid4()) + os.path.splitext(file.filename)[1]
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        # Image lue une seule fois: chaque étape réutilise ses représentations décodées
+        context = ImageContext.from_file_storage(file)
 
-        # Sauvegarder le fichier
-        file.save(filepath)
+        # Doublon exact: empreinte du contenu avant tout décodage de l'image
+        digests = context.digests
+        duplicate = find_exact_duplicate(digests["sha256"])
+        if duplicate is not None:
+            return jsonify(build_duplicate_response(stego_service, *duplicate, digests, k, max_distance,
+                                                    only_check_similar))
 
-        # Générer les hashes pour la détection de similarité
-        hashes = stego_service.generate_image_hashes(filepath)
+        # Valider le fichier
+        try:
+            image_validator.validate_image_file(file, context=context)
+        except ValidationError as e:
+            return jsonify({"error": str(e)}), 400
 
-        # Rechercher des images similaires
-        similar_images = stego_service.find_similar_images_advanced(hashes)
+        # Étapes indépendantes exécutées en parallèle (hashes puis similarité, stéganographie,
+        # IA, métadonnées, signature contextuelle), toutes sur le contexte en mémoire
+        report = build_analysis_graph(context, k, max_distance, full=not only_check_similar).run()
+        logger.info(f"📊 Analyse {file.filename}: {report.to_dict()}")
 
-        # Si on ne veut que vérifier les similaires
+        # Hashes et similarité sont requis: leur échec fait échouer la requête
+        for required in ('hashes', 'similar_images'):
+            if required in report.errors:
+                raise report.errors[required]
+        hashes = report.results['hashes']
+        similar_images = report.results['similar_images']
+
+        # Si on ne veut que vérifier les similaires (rien n'est écrit sur disque)
         if only_check_similar:
-            os.remove(filepath)  # Supprimer le fichier temporaire
             return jsonify({
                 "similar_images": similar_images,
-                "similar_found": len(similar_images) > 0
+                "similar_found": len(similar_images) > 0,
+                "k": k,
+                "max_distance": max_distance,
+                "duplicate": {"hit": False, "sha256": digests["sha256"]}
             })
 
-        # Analyse complète
-        analysis_results = {}
-
-        # 1. Analyse de stéganographie
-        try:
-            stego_result = stego_service.detect_hidden_message(filepath)
-            analysis_results['steganography'] = stego_result
-        except Exception as e:
-            logger.error(f"Erreur analyse stéganographie: {str(e)}")
-            analysis_results['steganography'] = {"error": str(e)}
-
-        # 2. Détection IA
-        try:
-            ai_result = ai_service.detect_ai_image(filepath)
-            analysis_results['ai_detection'] = ai_result
-        except Exception as e:
-            logger.error(f"Erreur détection IA: {str(e)}")
-            analysis_results['ai_detection'] = {"error": str(e)}
-
-        # 3. Métadonnées
-        try:
-            metadata = get_image_metadata(filepath)
-            analysis_results['metadata'] = metadata
-        except Exception as e:
-            logger.error(f"Erreur métadonnées: {str(e)}")
-            analysis_results['metadata'] = {"error": str(e)}
+        # Stocker le fichier sous son empreinte (octets déjà en mémoire)
+        filename, filepath, _ = blob_store.put_bytes(context.data, normalize_extension(file.filename), digests)
+        context.path = filepath
 
-        # 4. Signature contextuelle
-        try:
-            context_signature = stego_service.generate_image_context_signature(filepath)
-            analysis_results['context_signature'] = context_signature
-        except Exception as e:
-            logger.error(f"Erreur signature contextuelle: {str(e)}")
-            analysis_results['context_signature'] = None
+        # Analyse complète (chaque étape isolée: {"error": ...} en cas d'échec)
+        analysis_results = {stage: report.results[stage] for stage in ANALYSIS_STAGES}
 
         # Sauvegarder en base de données
         try:
@@ -140,21 +211,20 @@ def upload_and_analyze():
                 filename=os.path.basename(file.filename),
                 image_path=filepath,
                 perceptual_hash=hashes.get("phash"),
-                md5_hash=stego_service.calculate_md5_hash(filepath),
+                md5_hash=digests["md5"],
                 ai_confidence=analysis_results.get('ai_detection', {}).get('confidence', 0),
                 has_steganography=analysis_results.get('steganography', {}).get('signature_detected', False),
                 metadata_json=str(analysis_results.get('metadata', {})),
                 upload_timestamp=datetime.utcnow()
             )
-
-            db.session.add(image_analysis)
-            db.session.commit()
-
-            image_id = image_analysis.id
+            image_id = save_analysis(image_analysis, digests, hashes, analysis_results)
+            ai_service.index_image_embedding(image_id, context)
 
         except Exception as e:
+            db.session.rollback()
             logger.error(f"Erreur sauvegarde DB: {str(e)}")
             image_id = None
+            blob_store.discard_if_unreferenced(digests["sha256"])
 
         # Réponse finale
         return jsonify({
@@ -165,6 +235,10 @@ def upload_and_analyze():
             "perceptual_hashes": hashes,
             "similar_images": similar_images,
             "similar_found": len(similar_images) > 0,
+            "k": k,
+            "max_distance": max_distance,
+            "duplicate": {"hit": False, "sha256": digests["sha256"]},
+            "timings": report.to_dict(),
             "upload_timestamp": datetime.utcnow().isoformat()
         })
 
@@ -172,6 +246,65 @@ def upload_and_analyze():
         logger.error(f"Erreur upload et analyse: {str(e)}")
         return jsonify({"error": f"Erreur lors de l'analyse: {str(e)}"}), 500
 
+@image_bp_v2.route('/upload/batch', methods=['POST'])
+@cross_origin()
+def upload_batch():
+    """
+    Endpoint d'ingestion par lots: plusieurs fichiers (`files`) ou une archive ZIP
+    (champ `archive`, ou corps de requête application/zip).
+
+    Les résultats sont renvoyés au fil de l'eau en NDJSON: une ligne par image
+    (même forme que /upload), puis une ligne {"summary": ...}.
+    """
+    archive = None
+    try:
+        if request.mimetype in ZIP_MIMETYPES:
+            spool = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MEMORY)
+            shutil.copyfileobj(request.stream, spool)
+            spool.seek(0)
+            archive = zipfile.ZipFile(spool)
+        elif 'archive' in request.files:
+            archive = zipfile.ZipFile(request.files['archive'].stream)
+
+        max_files = current_app.config.get('BATCH_UPLOAD_MAX_FILES', 10000)
+        if archive is not None:
+            count = sum(1 for info in archive.infolist() if not info.is_dir())
+            items = iter_zip_members(archive, current_app.config['MAX_CONTENT_LENGTH'])
+        else:
+            files = [file for file in request.files.getlist('files') if file.filename]
+            count = len(files)
+            items = iter_uploaded_files(files)
+
+        if count == 0 or count > max_files:
+            if archive is not None:
+                archive.close()
+            if count == 0:
+                return jsonify({"error": "Aucun fichier fourni"}), 400
+            return jsonify({"error": f"Trop de fichiers: {count} (maximum {max_files})"}), 400
+
+        k, max_distance = get_similarity_params()
+
+    except zipfile.BadZipFile:
+        return jsonify({"error": "Archive ZIP invalide"}), 400
+    except Exception as e:
+        if archive is not None:
+            archive.close()
+        logger.error(f"Erreur ingestion par lot: {str(e)}")
+        return jsonify({"error": f"Erreur lors de l'ingestion: {str(e)}"}), 500
+
+    def generate():
+        try:
+            for line in batch_service.ingest(items, k=k, max_distance=max_distance):
+                yield json.dumps(line, default=str) + "\n"
+        except Exception as e:
+            logger.error(f"Erreur ingestion par lot: {str(e)}")
+            yield json.dumps({"error": f"Erreur lors de l'ingestion: {str(e)}"}) + "\n"
+        finally:
+            if archive is not None:
+                archive.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @image_bp_v2.route('/add_steganography', methods=['POST'])
 @cross_origin()
 def add_steganography():
@@ -196,24 +329,28 @@ def add_steganography():
         except ValidationError as e:
             return jsonify({"error": str(e)}), 400
 
-        # Créer un nom de fichier unique
-        filename = str(uuid.uuid4()) + os.path.splitext(file.filename)[1]
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-
-        # Sauvegarder le fichier
+        # Fichier d'entrée temporaire: seule l'image signée est conservée
+        extension = normalize_extension(file.filename)
+        filepath = blob_store.temp_path(extension)
         file.save(filepath)
 
-        # Générer la signature contextuelle
-        context_signature = stego_service.generate_image_context_signature(filepath)
+        try:
+            # Générer la signature contextuelle
+            context_signature = stego_service.generate_image_context_signature(filepath)
+
+            # Combiner les signatures si nécessaire
+            if user_signature:
+                combined_signature = f"{user_signature}||{context_signature}"
+            else:
+                combined_signature = context_signature
 
-        # Combiner les signatures si nécessaire
-        if user_signature:
-            combined_signature = f"{user_signature}||{context_signature}"
-        else:
-            combined_signature = context_signature
+            # Embedder la signature
+            signed_path = stego_service.embed_message(filepath, combined_signature, blob_store.temp_path(extension))
+        finally:
+            os.remove(filepath)
 
-        # Embedder la signature
-        output_filepath = stego_service.embed_message(filepath, combined_signature)
+        # Stocker l'image signée sous son empreinte
+        output_filename, output_filepath, output_digests = blob_store.put_file(signed_path)
 
         # Générer les hashes pour l'image avec stéganographie
         output_hashes = stego_service.generate_image_hashes(output_filepath)
@@ -231,24 +368,25 @@ def add_steganography():
                 filename=os.path.basename(file.filename),
                 image_path=output_filepath,
                 perceptual_hash=output_hashes.get("phash"),
-                md5_hash=stego_service.calculate_md5_hash(output_filepath),
+                md5_hash=output_digests["md5"],
                 ai_confidence=ai_result.get('confidence', 0),
                 has_steganography=True,
                 metadata_json=str(metadata),
                 upload_timestamp=datetime.utcnow()
             )
 
-            db.session.add(image_analysis)
-            db.session.commit()
-
-            image_id = image_analysis.id
+            image_id = save_analysis(image_analysis, output_digests, output_hashes)
 
         except Exception as e:
+            # Sans analyse, l'image signée n'est référencée par rien: elle n'est pas conservée
+            db.session.rollback()
+            blob_store.discard_if_unreferenced(output_digests["sha256"])
             logger.error(f"Erreur sauvegarde DB: {str(e)}")
-            image_id = None
+            return jsonify({"error": f"Impossible d'enregistrer l'image signée: {str(e)}"}), 500
+
+        ai_service.index_image_embedding(image_id, output_filepath)
 
         # URL publique pour l'image
-        output_filename = os.path.basename(output_filepath)
         public_url = f"/api/uploads/{output_filename}"
 
         return jsonify({
@@ -282,59 +420,103 @@ def verify_integrity():
         if file.filename == '':
             return jsonify({"error": "Aucun fichier sélectionné"}), 400
 
-        # Créer un fichier temporaire
-        temp_filename = "temp_" + str(uuid.uuid4()) + os.path.splitext(file.filename)[1]
-        temp_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], temp_filename)
-        file.save(temp_filepath)
+        # Vérification en mémoire: le fichier n'est pas écrit sur disque
+        context = ImageContext.from_file_storage(file)
 
-        try:
-            # Analyser la stéganographie
-            steg_result = stego_service.detect_hidden_message(temp_filepath)
-
-            # Générer la signature contextuelle actuelle
-            current_context_signature = stego_service.generate_image_context_signature(temp_filepath)
-
-            # Analyser les signatures intégrées
-            embedded_signature = steg_result.get("signature", "")
-            embedded_context_signature = ""
-            user_signature = ""
-
-            if embedded_signature and "||" in embedded_signature:
-                # Format combiné: "user_sig||context_sig"
-                user_signature, embedded_context_signature = embedded_signature.split("||", 1)
-            elif embedded_signature and embedded_signature.startswith("CV:"):
-                # Seulement signature contextuelle
-                embedded_context_signature = embedded_signature
-
-            # Comparer les signatures
-            signatures_match = embedded_context_signature == current_context_signature
-
-            # Rechercher des images similaires
-            hashes = stego_service.generate_image_hashes(temp_filepath)
-            similar_images = stego_service.find_similar_images_advanced(hashes)
-
-            result = {
-                "steganography_detected": steg_result.get("signature_detected", False),
-                "current_context_signature": current_context_signature,
-                "embedded_context_signature": embedded_context_signature,
-                "user_signature": user_signature,
-                "signatures_match": signatures_match,
-                "tampered": bool(embedded_context_signature and not signatures_match),
-                "similar_images": similar_images,
-                "similar_found": len(similar_images) > 0
-            }
+        # Analyser la stéganographie
+        steg_result = stego_service.detect_hidden_message(context)
 
-            return jsonify(result)
+        # Générer la signature contextuelle actuelle
+        current_context_signature = stego_service.generate_image_context_signature(context)
 
-        finally:
-            # Nettoyer le fichier temporaire
-            if os.path.exists(temp_filepath):
-                os.remove(temp_filepath)
+        # Analyser les signatures intégrées
+        embedded_signature = steg_result.get("signature", "")
+        embedded_context_signature = ""
+        user_signature = ""
+
+        if embedded_signature and "||" in embedded_signature:
+            # Format combiné: "user_sig||context_sig"
+            user_signature, embedded_context_signature = embedded_signature.split("||", 1)
+        elif embedded_signature and embedded_signature.startswith("CV:"):
+            # Seulement signature contextuelle
+            embedded_context_signature = embedded_signature
+
+        # Comparer les signatures
+        signatures_match = embedded_context_signature == current_context_signature
+
+        # Rechercher des images similaires
+        hashes = stego_service.generate_image_hashes(context)
+        similar_images = stego_service.find_similar_images_advanced(hashes)
+
+        result = {
+            "steganography_detected": steg_result.get("signature_detected", False),
+            "current_context_signature": current_context_signature,
+            "embedded_context_signature": embedded_context_signature,
+            "user_signature": user_signature,
+            "signatures_match": signatures_match,
+            "tampered": bool(embedded_context_signature and not signatures_match),
+            "similar_images": similar_images,
+            "similar_found": len(similar_images) > 0
+        }
+
+        return jsonify(result)
 
     except Exception as e:
         logger.error(f"Erreur vérification intégrité: {str(e)}")
         return jsonify({"error": f"Erreur lors de la vérification: {str(e)}"}), 500
 
+@image_bp_v2.route('/similar', methods=['GET', 'POST'])
+@cross_origin()
+def find_similar():
+    """
+    Endpoint de recherche des k images les plus proches.
+
+    Accepte soit `image_id` (image déjà analysée), soit un fichier `file`.
+    Paramètres optionnels: `k` et `max_distance` (distance de Hamming moyenne en bits).
+    """
+    try:
+        k, max_distance = get_similarity_params()
+        image_id = request.values.get('image_id', type=int)
+
+        if image_id is not None:
+            hashes = perceptual_hash_index.get(image_id)
+            if hashes is None:
+                row = ImageHash.query.filter_by(image_id=image_id).first()
+                hashes = row.to_hashes() if row else None
+            if not hashes:
+                return jsonify({"error": "Image non indexée"}), 404
+
+            # Un résultat de plus pour exclure l'image elle-même
+            similar_images = stego_service.find_similar_images_advanced(
+                hashes, k=k + 1, max_distance=max_distance
+            )
+            similar_images = [img for img in similar_images if img["id"] != image_id][:k]
+
+        elif 'file' in request.files and request.files['file'].filename:
+            file = request.files['file']
+            context = ImageContext.from_file_storage(file)
+            try:
+                image_validator.validate_image_file(file, context=context)
+            except ValidationError as e:
+                return jsonify({"error": str(e)}), 400
+
+            hashes = stego_service.generate_image_hashes(context)
+            similar_images = stego_service.find_similar_images_advanced(hashes, k=k, max_distance=max_distance)
+
+        else:
+            return jsonify({"error": "Paramètre image_id ou fichier requis"}), 400
+
+        return jsonify({
+            "similar_images": similar_images,
+            "similar_found": len(similar_images) > 0,
+            "k": k,
+            "max_distance": max_distance
+        })
+
+    except Exception as e:
+        logger.error(f"Erreur recherche similarité: {str(e)}")
+        return jsonify({"error": f"Erreur lors de la recherche: {str(e)}"}), 500
+
 @image_bp_v2.route('/images', methods=['GET'])
 @cross_origin()
 def list_images():
@@ -370,12 +552,34 @@ def list_images():
         logger.error(f"Erreur listing images: {str(e)}")
         return jsonify({"error": f"Erreur lors du listing: {str(e)}"}), 500
 
+@image_bp_v2.route('/images/<int:image_id>', methods=['DELETE'])
+@cross_origin()
+def delete_image(image_id):
+    """
+    Endpoint pour supprimer une analyse (le fichier est supprimé avec sa dernière référence).
+    """
+    try:
+        image_analysis = db.session.get(ImageAnalysis, image_id)
+        if image_analysis is None:
+            return jsonify({"error": "Image non trouvée"}), 404
+
+        file_deleted = delete_analysis(image_analysis)
+        return jsonify({"message": "Image supprimée", "image_id": image_id, "file_deleted": file_deleted})
+
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Erreur suppression image: {str(e)}")
+        return jsonify({"error": f"Erreur lors de la suppression: {str(e)}"}), 500
+
 @image_bp_v2.route('/uploads/<filename>')
 @cross_origin()
 def get_uploaded_file(filename):
-    """Endpoint pour servir les fichiers uploadés."""
+    """Endpoint pour servir les fichiers uploadés (stockage adressé par le contenu)."""
     try:
-        return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+        relative_path = blob_store.resolve(filename)
+        if relative_path is None:
+            return jsonify({"error": "Fichier non trouvé"}), 404
+        return send_from_directory(blob_store.root, relative_path)
     except Exception as e:
         logger.error(f"Erreur récupération fichier: {str(e)}")
         return jsonify({"error": "Fichier non trouvé"}), 404
@@ -399,6 +603,7 @@ def test_api():
                 "/api/add_steganography",
                 "/api/verify_integrity",
                 "/api/images",
+                "/api/similar",
                 "/api/uploads/<filename>"
             ]
         })
@@ -411,22 +616,157 @@ def get_image_metadata(image_path):
     Extrait les métadonnées d'une image.
 
     Args:
-        image_path: Chemin vers l'image
+        image_path: Chemin vers l'image, contenu en mémoire ou ImageContext
 
     Returns:
         Dictionnaire avec les métadonnées
     """
     try:
-        from PIL import Image
-        img = Image.open(image_path)
-        return {
-            "dimensions": f"{img.width}x{img.height}",
-            "format": img.format,
-            "mode": img.mode,
-            "size": f"{os.path.getsize(image_path) / 1024:.2f} KB"
-        }
+        return ImageContext.of(image_path).metadata
     except Exception as e:
         return {"error": f"Impossible d'extraire les métadonnées: {str(e)}"}
 
+# Étapes d'analyse complète, indépendantes les unes des autres
+ANALYSIS_STAGES = ('steganography', 'ai_detection', 'metadata', 'context_signature')
+
+def build_analysis_graph(context, k, max_distance, full=True):
+    """
+    Construit le graphe des étapes d'analyse d'un téléchargement.
+
+    Les hashes précèdent la recherche de similarité ; les autres étapes ne
+    dépendent que du contexte et démarrent immédiatement.
+
+    Args:
+        context: ImageContext du fichier téléchargé
+        k: Nombre maximal d'images similaires
+        max_distance: Distance de Hamming moyenne maximale
+        full: False pour ne calculer que les hashes et la similarité
+
+    Returns:
+        StageGraph prêt à être exécuté
+    """
+    app = current_app._get_current_object()
+
+    def in_app_context(call):
+        with app.app_context():
+            return call()
+
+    graph = StageGraph(
+        timeout=app.config.get('ANALYSIS_STAGE_TIMEOUT') or None,
+        executor=get_thread_pool(app.config.get('ANALYSIS_THREADS') or None),
+        wrap=in_app_context
+    )
+    graph.add('hashes', lambda: stego_service.generate_image_hashes(context))
+    graph.add('similar_images',
+              lambda hashes: stego_service.find_similar_images_advanced(hashes, k=k, max_distance=max_distance),
+              after=('hashes',))
+    if full:
+        graph.add('steganography', lambda: stego_service.detect_hidden_message(context))
+        graph.add('ai_detection', lambda: ai_service.detect_ai_image(context))
+        graph.add('metadata', lambda: get_image_metadata(context))
+        graph.add('context_signature', lambda: stego_service.generate_image_context_signature(context),
+                  on_error=lambda e: None)
+    return graph
+
+def save_analysis(image_analysis, digests, hashes, analysis_results=None):
+    """
+    Enregistre une analyse et ses lignes d'index en une seule transaction.
+
+    L'analyse, la référence au fichier stocké, les hashes entiers, le journal
+    index_changes et (si analysis_results est fourni) l'empreinte exacte sont
+    validés ensemble: un échec n'en laisse aucun. L'index de hashes en mémoire
+    n'est mis à jour qu'après la validation.
+
+    Args:
+        image_analysis: Analyse à enregistrer (image_path renseigné)
+        digests: Empreintes du fichier stocké
+        hashes: Hashes perceptuels de l'image
+        analysis_results: Résultats conservés pour les futurs doublons exacts
+
+    Returns:
+        Identifiant de l'analyse
+
+    Raises:
+        Exception: Erreur de la base (la transaction est à annuler par l'appelant)
+    """
+    db.session.add(image_analysis)
+    db.session.flush()
+    image_id = image_analysis.id
+
+    blob_store.add_reference(image_analysis.image_path, digests)
+    db.session.add(ImageHash.from_hashes(image_id, hashes))
+    IndexChange.record(image_id)
+    if analysis_results is not None:
+        try:
+            # Téléchargement concurrent du même contenu: l'index unique garde la première analyse
+            with db.session.begin_nested():
+                db.session.add(ImageDigest.record(
+                    image_id, digests, {"analysis": analysis_results, "perceptual_hashes": hashes}
+                ))
+        except Exception as e:
+            logger.warning(f"⚠️ Empreinte non enregistrée pour l'image {image_id}: {str(e)}")
+    db.session.commit()
+
+    perceptual_hash_index.add(image_id, hashes)
+    return image_id
+
+def delete_analysis(image_analysis):
+    """
+    Supprime une analyse et ses lignes d'index en une seule transaction.
+
+    La référence au fichier stocké est retirée avec l'analyse ; le fichier
+    n'est supprimé qu'après la validation, s'il n'est plus référencé. Les index
+    en mémoire et l'embedding sont retirés ensuite.
+
+    Args:
+        image_analysis: Analyse à supprimer
+
+    Returns:
+        True si le fichier stocké a été supprimé
+
+    Raises:
+        Exception: Erreur de la base (la transaction est à annuler par l'appelant)
+    """
+    image_id = image_analysis.id
+    sha256 = blob_store.digest_of(image_analysis.image_path)
+
+    remaining = blob_store.release(sha256) if sha256 else None
+    ImageHash.query.filter_by(image_id=image_id).delete(synchronize_session=False)
+    ImageDigest.query.filter_by(image_id=image_id).delete(synchronize_session=False)
+    IndexChange.record(image_id)
+    db.session.delete(image_analysis)
+    db.session.commit()
+
+    perceptual_hash_index.remove(image_id)
+    ai_service.remove_image_embedding(image_id)
+    return remaining == 0 and blob_store.discard_if_unreferenced(sha256)
+
+def models_readiness():
+    """
+    État du chargement des modèles IA, pour les sondes de santé.
+
+    Returns:
+        Tuple (prêt, détail des modèles)
+    """
+    if ai_service is None:
+        return False, {"models_state": "uninitialized"}
+    return ai_service.is_ready(), ai_service.is_available()
+
+def get_similarity_params():
+    """
+    Lit les paramètres de recherche top-k de la requête.
+
+    Returns:
+        Tuple (k, max_distance) bornés par la configuration
+    """
+    max_k = current_app.config.get('SIMILARITY_MAX_K', 100)
+    k = request.values.get('k', current_app.config.get('SIMILARITY_TOP_K', 10), type=int)
+    k = max(1, min(k, max_k))
+
+    default_distance = (1 - current_app.config.get('SIMILARITY_THRESHOLD', 0.85)) * HASH_BITS
+    max_distance = request.values.get('max_distance', default_distance, type=float)
+    max_distance = max(0.0, min(max_distance, float(HASH_BITS)))
+    return k, max_distance
+
 # Export du blueprint
 __all__ = ['image_bp_v2']
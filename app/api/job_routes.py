@@ -0,0 +1,78 @@
+"""
+Routes des analyses asynchrones (soumission et suivi des tâches).
+"""
+
+import logging
+
+from flask import Blueprint, request, jsonify, current_app, url_for
+
+from app.models.image_models import db
+from app.models.job_models import AnalysisJob
+from app.services.job_service import JobService, JOB_ENDPOINTS, job_worker_pool
+
+logger = logging.getLogger(__name__)
+
+# Créer le blueprint des tâches
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/v2/jobs')
+
+job_service = None
+
+
+def init_jobs_api(app):
+    """Initialise le service de tâches asynchrones."""
+    global job_service
+
+    job_service = JobService(
+        spool_dir=app.config.get('JOB_SPOOL_DIR', 'instance/jobs'),
+        stale_after=app.config.get('JOB_STALE_AFTER', 600),
+        max_attempts=app.config.get('JOB_MAX_ATTEMPTS', 2)
+    )
+    logger.info("✅ Service de tâches asynchrones initialisé")
+
+
+@jobs_bp.route('', methods=['POST'])
+def submit_job():
+    """
+    Soumet une analyse asynchrone et répond 202 immédiatement.
+
+    Paramètres: `type` (upload, add_steganography, verify_integrity), `file`,
+    et les paramètres habituels de l'endpoint (champs de formulaire et d'URL).
+    """
+    try:
+        kind = request.values.get('type', 'upload')
+        if kind not in JOB_ENDPOINTS:
+            return jsonify({"error": f"Type de tâche inconnu: {kind}", "types": list(JOB_ENDPOINTS)}), 400
+
+        if 'file' not in request.files:
+            return jsonify({"error": "Aucun fichier fourni"}), 400
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({"error": "Aucun fichier sélectionné"}), 400
+
+        form = {key: value for key, value in request.form.items() if key != 'type'}
+        args = {key: value for key, value in request.args.items() if key != 'type'}
+        job = job_service.submit(kind, file, form=form, args=args)
+
+        # Workers de l'application démarrés à la première soumission
+        job_worker_pool.ensure_started(current_app.config['CONFIG_NAME'], current_app.config.get('JOB_WORKERS', 0))
+
+        response = jsonify({"job": job.to_dict(include_result=False)})
+        response.headers['Location'] = url_for('jobs.get_job', job_id=job.id)
+        return response, 202
+
+    except Exception as e:
+        logger.error(f"Erreur soumission tâche: {str(e)}")
+        return jsonify({"error": f"Erreur lors de la soumission: {str(e)}"}), 500
+
+
+@jobs_bp.route('/<int:job_id>', methods=['GET'])
+def get_job(job_id):
+    """État de la tâche et, une fois terminée, réponse de l'endpoint."""
+    job = db.session.get(AnalysisJob, job_id)
+    if job is None:
+        return jsonify({"error": "Tâche introuvable"}), 404
+    return jsonify({"job": job.to_dict()})
+
+
+# Export du blueprint
+__all__ = ['jobs_bp']
@@ -9,6 +9,7 @@ import logging
 from werkzeug.utils import secure_filename
 from app.services.jpeg_steganography_service import JPEGSteganographyService
 from app.utils.validators import ImageValidator
+from app.utils.image_context import ImageContext
 from app.utils.exceptions import ValidationError
 
 logger = logging.getLogger(__name__)
@@ -31,31 +32,24 @@ def analyze_jpeg_capacity():
         if file.filename == '':
             return jsonify({'error': 'Nom de fichier vide'}), 400
 
-        # Sauvegarder temporairement le fichier
+        # Analyse en mémoire: le fichier n'est pas écrit sur disque
         filename = secure_filename(file.filename)
-        temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"temp_{filename}")
-        file.save(temp_path)
+        context = ImageContext.from_file_storage(file)
 
-        try:
-            # Analyser la capacité
-            capacity_info = jpeg_service.analyze_jpeg_capacity(temp_path)
-
-            if 'error' in capacity_info:
-                return jsonify({
-                    'success': False,
-                    'error': capacity_info['error']
-                }), 400
+        # Analyser la capacité
+        capacity_info = jpeg_service.analyze_jpeg_capacity(context)
 
+        if 'error' in capacity_info:
             return jsonify({
-                'success': True,
-                'filename': filename,
-                'capacity_analysis': capacity_info
-            })
+                'success': False,
+                'error': capacity_info['error']
+            }), 400
 
-        finally:
-            # Nettoyer le fichier temporaire
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        return jsonify({
+            'success': True,
+            'filename': filename,
+            'capacity_analysis': capacity_info
+        })
 
     except Exception as e:
         logger.error(f"Erreur analyse capacité JPEG: {str(e)}")
@@ -145,40 +139,33 @@ def extract_message_from_jpeg():
         if method not in ['exif', 'lsb', 'dct']:
             return jsonify({'error': 'Méthode non supportée'}), 400
 
-        # Sauvegarder temporairement le fichier
+        # Extraction en mémoire: le fichier n'est pas écrit sur disque
         filename = secure_filename(file.filename)
-        temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"extract_{filename}")
-        file.save(temp_path)
-
-        try:
-            # Extraire le message
-            result = jpeg_service.extract_message_from_jpeg(temp_path, method=method)
-
-            if result['success']:
-                response_data = {
-                    'success': True,
-                    'filename': filename,
-                    'method': method,
-                    'message_found': result.get('message') is not None
-                }
+        context = ImageContext.from_file_storage(file)
+
+        # Extraire le message
+        result = jpeg_service.extract_message_from_jpeg(context, method=method)
 
-                if result.get('message'):
-                    response_data['message'] = result['message']
-                    response_data['message_length'] = len(result['message'])
-                else:
-                    response_data['info'] = result.get('info', 'Aucun message trouvé')
+        if result['success']:
+            response_data = {
+                'success': True,
+                'filename': filename,
+                'method': method,
+                'message_found': result.get('message') is not None
+            }
 
-                return jsonify(response_data)
+            if result.get('message'):
+                response_data['message'] = result['message']
+                response_data['message_length'] = len(result['message'])
             else:
-                return jsonify({
-                    'success': False,
-                    'error': result.get('error', 'Erreur inconnue')
-                }), 400
+                response_data['info'] = result.get('info', 'Aucun message trouvé')
 
-        finally:
-            # Nettoyer le fichier temporaire
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+            return jsonify(response_data)
+        else:
+            return jsonify({
+                'success': False,
+                'error': result.get('error', 'Erreur inconnue')
+            }), 400
 
     except Exception as e:
         logger.error(f"Erreur extraction JPEG: {str(e)}")
@@ -249,31 +236,24 @@ def verify_steganographic_signature():
         if file.filename == '':
             return jsonify({'error': 'Nom de fichier vide'}), 400
 
-        # Sauvegarder temporairement le fichier
+        # Vérification en mémoire: le fichier n'est pas écrit sur disque
         filename = secure_filename(file.filename)
-        temp_path = os.path.join(current_app.config['UPLOAD_FOLDER'], f"verify_{filename}")
-        file.save(temp_path)
+        context = ImageContext.from_file_storage(file)
 
-        try:
-            # Vérifier la signature
-            result = jpeg_service.verify_steganographic_signature(temp_path)
+        # Vérifier la signature
+        result = jpeg_service.verify_steganographic_signature(context)
 
-            return jsonify({
-                'success': True,
-                'filename': filename,
-                'verification_result': {
-                    'verified': result['verified'],
-                    'reason': result.get('reason'),
-                    'modification_detected': result.get('modification_detected', False),
-                    'signature_found': 'signature_data' in result
-                },
-                'details': result if result['verified'] else None
-            })
-
-        finally:
-            # Nettoyer le fichier temporaire
-            if os.path.exists(temp_path):
-                os.remove(temp_path)
+        return jsonify({
+            'success': True,
+            'filename': filename,
+            'verification_result': {
+                'verified': result['verified'],
+                'reason': result.get('reason'),
+                'modification_detected': result.get('modification_detected', False),
+                'signature_found': 'signature_data' in result
+            },
+            'details': result if result['verified'] else None
+        })
 
     except Exception as e:
         logger.error(f"Erreur vérification signature: {str(e)}")
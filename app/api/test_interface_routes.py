@@ -1,5 +1,10 @@
 from flask import Blueprint, render_template, request, jsonify, current_app
 import os
+from app.models.blob_models import StoredBlob
+from app.services.blob_store import BlobStore
+
+# Nombre maximal de fichiers stockés listés
+MAX_LISTED_UPLOADS = 200
 
 # Créer le blueprint pour l'interface de test
 test_interface_bp = Blueprint('test_interface', __name__)
@@ -39,19 +44,31 @@ def list_test_files():
                     'size_kb': round(file_size / 1024, 2)
                 })
 
-    # Fichiers uploadés
+    # Fichiers uploadés: les plus récents du stockage (requête indexée, sans parcourir les dossiers)
     upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+    blobs = StoredBlob.query.filter(
+        StoredBlob.extension.in_(['.jpg', '.jpeg'])
+    ).order_by(StoredBlob.created_at.desc()).limit(MAX_LISTED_UPLOADS).all()
+    for blob in blobs:
+        upload_files.append({
+            'name': blob.filename,
+            'path': f'{upload_folder}/{BlobStore.relative_path(blob.sha256, blob.extension)}',
+            'size': blob.size,
+            'size_kb': round((blob.size or 0) / 1024, 2)
+        })
+
+    # Anciens fichiers du dossier plat (avant le stockage adressé par le contenu)
     if os.path.exists(upload_folder):
-        for file in os.listdir(upload_folder):
-            if file.lower().endswith(('.jpg', '.jpeg')):
-                file_path = os.path.join(upload_folder, file)
-                file_size = os.path.getsize(file_path)
-                upload_files.append({
-                    'name': file,
-                    'path': f'{upload_folder}/{file}',
-                    'size': file_size,
-                    'size_kb': round(file_size / 1024, 2)
-                })
+        with os.scandir(upload_folder) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.lower().endswith(('.jpg', '.jpeg')):
+                    file_size = entry.stat().st_size
+                    upload_files.append({
+                        'name': entry.name,
+                        'path': f'{upload_folder}/{entry.name}',
+                        'size': file_size,
+                        'size_kb': round(file_size / 1024, 2)
+                    })
 
     return jsonify({
         'test_images': test_files,
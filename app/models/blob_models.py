@@ -0,0 +1,104 @@
+"""
+Fichiers du stockage adressé par le contenu (références des analyses).
+"""
+
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from app.models.image_models import db
+
+
+class StoredBlob(db.Model):
+    """Fichier stocké sous son SHA-256, compté par les analyses (ImageAnalysis) qui le référencent."""
+
+    __tablename__ = 'stored_blobs'
+
+    sha256 = db.Column(db.String(64), primary_key=True)
+    extension = db.Column(db.String(10), nullable=False, default='')  # Extension du fichier stocké (.png...)
+    size = db.Column(db.BigInteger)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    @property
+    def filename(self) -> str:
+        """Nom public du fichier (/uploads/<filename>)."""
+        return f"{self.sha256}{self.extension}"
+
+    @classmethod
+    def acquire(cls, sha256: str, extension: str = '', size: Optional[int] = None) -> 'StoredBlob':
+        """
+        Ajoute une référence au fichier (à valider avec la transaction courante).
+
+        L'incrément est une mise à jour SQL: deux analyses concurrentes du même
+        contenu ne perdent pas de référence.
+
+        Args:
+            sha256: Empreinte du contenu
+            extension: Extension du fichier stocké
+            size: Taille en octets
+
+        Returns:
+            Ligne du fichier
+        """
+        updated = cls.query.filter_by(sha256=sha256).update(
+            {cls.ref_count: cls.ref_count + 1}, synchronize_session=False
+        )
+        if not updated:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(cls(sha256=sha256, extension=extension, size=size, ref_count=1))
+            except Exception:
+                # Créée entre-temps par une autre requête
+                cls.query.filter_by(sha256=sha256).update(
+                    {cls.ref_count: cls.ref_count + 1}, synchronize_session=False
+                )
+        return db.session.get(cls, sha256, populate_existing=True)
+
+    @classmethod
+    def release(cls, sha256: str) -> int:
+        """
+        Retire une référence au fichier (à valider avec la transaction courante).
+
+        Returns:
+            Nombre de références restantes
+        """
+        cls.query.filter(cls.sha256 == sha256, cls.ref_count > 0).update(
+            {cls.ref_count: cls.ref_count - 1}, synchronize_session=False
+        )
+        blob = db.session.get(cls, sha256, populate_existing=True)
+        return blob.ref_count if blob is not None else 0
+
+    @classmethod
+    def lock(cls, sha256: str) -> 'StoredBlob':
+        """
+        Verrouille la ligne du fichier jusqu'à la fin de la transaction courante.
+
+        La ligne est créée sans référence si elle n'existe pas (fichier jamais
+        référencé): acquire attend alors la fin de la transaction qui la tient.
+
+        Returns:
+            Ligne du fichier, relue après verrouillage
+        """
+        # Mise à jour sans effet: verrou de la ligne (PostgreSQL) ou de la base (SQLite)
+        locked = cls.query.filter_by(sha256=sha256).update(
+            {cls.ref_count: cls.ref_count}, synchronize_session=False
+        )
+        if not locked:
+            try:
+                with db.session.begin_nested():
+                    db.session.add(cls(sha256=sha256, ref_count=0))
+            except Exception:
+                cls.query.filter_by(sha256=sha256).update(
+                    {cls.ref_count: cls.ref_count}, synchronize_session=False
+                )
+        return db.session.get(cls, sha256, populate_existing=True)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Représentation JSON du fichier."""
+        return {
+            "sha256": self.sha256,
+            "filename": self.filename,
+            "size": self.size,
+            "ref_count": self.ref_count,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
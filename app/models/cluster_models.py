@@ -0,0 +1,58 @@
+"""
+Suivi des tâches de regroupement des quasi-doublons.
+"""
+
+from datetime import datetime
+from typing import Dict, Any
+
+from app.models.image_models import db
+
+
+class ClusteringJob(db.Model):
+    """Exécution (reprenable) du regroupement des quasi-doublons de la base."""
+
+    __tablename__ = 'clustering_jobs'
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_WRITING = 'writing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING, index=True)
+    radius = db.Column(db.Float, nullable=False)  # Distance de Hamming moyenne maximale (bits)
+
+    cursor = db.Column(db.Integer, nullable=False, default=0)  # Dernier ImageAnalysis.id traité
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    pairs = db.Column(db.Integer, nullable=False, default=0)
+    clusters = db.Column(db.Integer)
+    clustered_images = db.Column(db.Integer)
+    images_per_second = db.Column(db.Float)
+    checkpoint_path = db.Column(db.String(500))
+    error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Représentation JSON de la tâche."""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "radius": self.radius,
+            "cursor": self.cursor,
+            "processed": self.processed,
+            "total": self.total,
+            "progress": round(100 * self.processed / self.total, 2) if self.total else None,
+            "pairs": self.pairs,
+            "clusters": self.clusters,
+            "clustered_images": self.clustered_images,
+            "images_per_second": self.images_per_second,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
@@ -0,0 +1,268 @@
+"""
+Modèle de stockage des hashes perceptuels sous forme d'entiers 64 bits.
+
+Chaque hash est stocké dans une colonne BIGINT (valeur signée, complément à deux)
+et découpé en quatre sous-chaînes de 16 bits indexées. Une recherche par rayon
+devient ainsi une requête SQL fondée sur le principe des tiroirs: seules les
+lignes partageant une sous-chaîne proche de celle de la requête sont lues.
+
+Les empreintes exactes (SHA-256/MD5) des fichiers sont conservées à part, avec
+un index unique, pour court-circuiter l'analyse des re-téléchargements.
+
+Le journal index_changes enregistre chaque image (ré)indexée: son identifiant
+auto-incrémenté sert de point de reprise (high-water mark) aux index en
+mémoire des différents workers, qui n'appliquent que les changements récents.
+"""
+
+import json
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import or_
+
+from app.models.image_models import db
+from app.utils.hamming import (
+    HashMatrix, HASH_BITS, CHUNK_BITS, HASH_TYPES, hash_to_int, hash_chunks,
+    chunk_neighbour_masks, to_signed64, to_unsigned64
+)
+
+NUM_CHUNKS = HASH_BITS // CHUNK_BITS
+
+# Au-delà de ce rayon par sous-chaîne, la requête IN devient trop large
+MAX_SQL_CHUNK_RADIUS = 3
+
+
+class ImageHash(db.Model):
+    """Hashes perceptuels entiers d'une analyse d'image (relation 1-1 avec ImageAnalysis)."""
+
+    __tablename__ = 'image_hashes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    image_id = db.Column(db.Integer, nullable=False, unique=True, index=True)  # ImageAnalysis.id
+
+    phash = db.Column(db.BigInteger)
+    dhash = db.Column(db.BigInteger)
+    ahash = db.Column(db.BigInteger)
+    whash = db.Column(db.BigInteger)
+
+    phash_b0 = db.Column(db.Integer, index=True)
+    phash_b1 = db.Column(db.Integer, index=True)
+    phash_b2 = db.Column(db.Integer, index=True)
+    phash_b3 = db.Column(db.Integer, index=True)
+    dhash_b0 = db.Column(db.Integer, index=True)
+    dhash_b1 = db.Column(db.Integer, index=True)
+    dhash_b2 = db.Column(db.Integer, index=True)
+    dhash_b3 = db.Column(db.Integer, index=True)
+    ahash_b0 = db.Column(db.Integer, index=True)
+    ahash_b1 = db.Column(db.Integer, index=True)
+    ahash_b2 = db.Column(db.Integer, index=True)
+    ahash_b3 = db.Column(db.Integer, index=True)
+    whash_b0 = db.Column(db.Integer, index=True)
+    whash_b1 = db.Column(db.Integer, index=True)
+    whash_b2 = db.Column(db.Integer, index=True)
+    whash_b3 = db.Column(db.Integer, index=True)
+
+    # Groupe de quasi-doublons (plus petit image_id du groupe), renseigné par le regroupement
+    cluster_id = db.Column(db.Integer, index=True)
+
+    def set_hashes(self, hashes: Dict[str, Any]):
+        """
+        Renseigne les colonnes entières et les sous-chaînes à partir d'un dict de hashes.
+
+        Args:
+            hashes: Dictionnaire {type_de_hash: hash hexadécimal ou entier}
+        """
+        for hash_type in HASH_TYPES:
+            value = hash_to_int(hashes.get(hash_type))
+            setattr(self, hash_type, to_signed64(value))
+            chunks = hash_chunks(value) if value is not None else [None] * NUM_CHUNKS
+            for position, chunk in enumerate(chunks):
+                setattr(self, f"{hash_type}_b{position}", chunk)
+
+    def to_hashes(self) -> Dict[str, int]:
+        """Renvoie les hashes non signés présents."""
+        return {
+            hash_type: to_unsigned64(getattr(self, hash_type))
+            for hash_type in HASH_TYPES
+            if getattr(self, hash_type) is not None
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Représentation JSON (hashes en hexadécimal)."""
+        return {
+            "image_id": self.image_id,
+            "cluster_id": self.cluster_id,
+            **{hash_type: format(value, '016x') for hash_type, value in self.to_hashes().items()}
+        }
+
+    @classmethod
+    def from_hashes(cls, image_id: int, hashes: Dict[str, Any]) -> 'ImageHash':
+        """
+        Crée une ligne à partir des hashes d'une image.
+
+        Args:
+            image_id: Identifiant ImageAnalysis
+            hashes: Dictionnaire {type_de_hash: hash}
+
+        Returns:
+            Instance ImageHash (non ajoutée à la session)
+        """
+        row = cls(image_id=image_id)
+        row.set_hashes(hashes)
+        return row
+
+    @classmethod
+    def candidate_filter(cls, hashes: Dict[str, Any], max_distance: float,
+                         hash_types: tuple = HASH_TYPES):
+        """
+        Construit le filtre SQL des candidats (principe des tiroirs).
+
+        Si la distance moyenne entre deux images est <= max_distance, au moins une
+        des sous-chaînes de 16 bits d'un type de hash commun est à une distance
+        <= max_distance / 4 : on ne lit que les lignes dont une sous-chaîne
+        indexée appartient à ce voisinage.
+
+        Args:
+            hashes: Hashes de la requête
+            max_distance: Distance de Hamming moyenne maximale (en bits)
+            hash_types: Types de hash à considérer
+
+        Returns:
+            Expression SQLAlchemy, ou None si le rayon est trop large pour un filtre indexé
+        """
+        chunk_radius = int(max_distance // NUM_CHUNKS)
+        if max_distance < 0 or chunk_radius > MAX_SQL_CHUNK_RADIUS:
+            return None
+
+        masks = chunk_neighbour_masks(chunk_radius)
+        clauses = []
+        for hash_type in hash_types:
+            value = hash_to_int(hashes.get(hash_type))
+            if value is None:
+                continue
+            for position, chunk in enumerate(hash_chunks(value)):
+                column = getattr(cls, f"{hash_type}_b{position}")
+                clauses.append(column.in_(sorted({chunk ^ mask for mask in masks})))
+
+        return or_(*clauses) if clauses else None
+
+    @classmethod
+    def find_candidates(cls, hashes: Dict[str, Any], max_distance: float,
+                        hash_types: tuple = HASH_TYPES) -> Optional[List['ImageHash']]:
+        """
+        Charge les lignes candidates pour une recherche par rayon.
+
+        Returns:
+            Liste des lignes candidates, ou None si aucun filtre indexé n'est applicable
+        """
+        condition = cls.candidate_filter(hashes, max_distance, hash_types)
+        if condition is None:
+            return None
+        return cls.query.filter(condition).all()
+
+    @classmethod
+    def search(cls, hashes: Dict[str, Any], max_distance: float,
+               hash_types: tuple = HASH_TYPES) -> List[Dict[str, Any]]:
+        """
+        Recherche par rayon directement en base: filtre SQL indexé puis
+        vérification vectorisée des candidats (XOR + popcount).
+
+        Args:
+            hashes: Hashes de la requête
+            max_distance: Distance de Hamming moyenne maximale (en bits)
+            hash_types: Types de hash comparés
+
+        Returns:
+            Liste de dicts {id, distance, distances, similarity} triée par distance,
+            où `id` est l'identifiant ImageAnalysis
+        """
+        rows = cls.find_candidates(hashes, max_distance, hash_types)
+        if rows is None:
+            rows = cls.query.yield_per(1000)
+
+        matrix = HashMatrix(HASH_TYPES)
+        for row in rows:
+            matrix.add(row.image_id, row.to_hashes())
+        if not len(matrix):
+            return []
+        return matrix.search(hashes, max_distance, hash_types=hash_types)
+
+
+class ImageDigest(db.Model):
+    """Empreinte exacte du contenu d'un fichier analysé (détection des re-téléchargements à l'identique)."""
+
+    __tablename__ = 'image_digests'
+
+    id = db.Column(db.Integer, primary_key=True)
+    image_id = db.Column(db.Integer, nullable=False, unique=True, index=True)  # ImageAnalysis.id
+    sha256 = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    md5 = db.Column(db.String(32), index=True)
+    size = db.Column(db.BigInteger)
+    analysis_json = db.Column(db.Text)  # Résultats d'analyse sérialisés (JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def get_analysis(self) -> Optional[Dict[str, Any]]:
+        """Renvoie les résultats d'analyse stockés, ou None."""
+        if not self.analysis_json:
+            return None
+        try:
+            return json.loads(self.analysis_json)
+        except ValueError:
+            return None
+
+    @classmethod
+    def find_by_sha256(cls, sha256: str) -> Optional['ImageDigest']:
+        """Recherche indexée d'un contenu déjà analysé."""
+        return cls.query.filter_by(sha256=sha256).first()
+
+    @classmethod
+    def record(cls, image_id: int, digests: Dict[str, Any],
+               analysis: Optional[Dict[str, Any]] = None) -> 'ImageDigest':
+        """
+        Crée la ligne d'empreinte d'une analyse.
+
+        Args:
+            image_id: Identifiant ImageAnalysis
+            digests: Dictionnaire {sha256, md5, size}
+            analysis: Résultats d'analyse à réutiliser pour les doublons exacts
+
+        Returns:
+            Instance ImageDigest (non ajoutée à la session)
+        """
+        return cls(
+            image_id=image_id,
+            sha256=digests["sha256"],
+            md5=digests.get("md5"),
+            size=digests.get("size"),
+            analysis_json=json.dumps(analysis, default=str) if analysis is not None else None
+        )
+
+
+class IndexChange(db.Model):
+    """Journal des images (ré)indexées, lu par les index en mémoire de chaque worker."""
+
+    __tablename__ = 'index_changes'
+
+    id = db.Column(db.Integer, primary_key=True)  # Croissant: point de reprise des workers
+    image_id = db.Column(db.Integer, nullable=False, index=True)  # ImageAnalysis.id
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def record(cls, image_id: int) -> 'IndexChange':
+        """
+        Signale un changement des hashes d'une image (à valider avec la transaction courante).
+
+        Args:
+            image_id: Identifiant ImageAnalysis ajouté, modifié ou supprimé
+
+        Returns:
+            Instance IndexChange ajoutée à la session
+        """
+        change = cls(image_id=image_id)
+        db.session.add(change)
+        return change
+
+    @classmethod
+    def latest_id(cls) -> int:
+        """Identifiant du dernier changement enregistré (0 si aucun)."""
+        return db.session.query(db.func.max(cls.id)).scalar() or 0
@@ -0,0 +1,68 @@
+"""
+Tâches d'analyse asynchrones (file persistante traitée par les workers).
+"""
+
+import json
+from datetime import datetime
+from typing import Dict, Any
+
+from app.models.image_models import db
+
+
+class AnalysisJob(db.Model):
+    """Analyse soumise via /api/v2/jobs et exécutée par un processus worker."""
+
+    __tablename__ = 'analysis_jobs'
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(40), nullable=False)  # upload, add_steganography, verify_integrity
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING, index=True)
+
+    filename = db.Column(db.String(255))  # Nom d'origine du fichier
+    input_path = db.Column(db.String(500))  # Copie du fichier en attente de traitement
+    params_json = db.Column(db.Text)  # {"form": {...}, "args": {...}} transmis à l'endpoint
+
+    worker = db.Column(db.String(100))  # hôte:pid du worker
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    http_status = db.Column(db.Integer)  # Code HTTP renvoyé par l'endpoint
+    result_json = db.Column(db.Text)
+    error = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    @property
+    def params(self) -> Dict[str, Any]:
+        """Paramètres de l'analyse."""
+        return json.loads(self.params_json) if self.params_json else {}
+
+    @property
+    def result(self) -> Any:
+        """Réponse JSON de l'endpoint (None tant que la tâche n'est pas terminée)."""
+        return json.loads(self.result_json) if self.result_json else None
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        """Représentation JSON de la tâche."""
+        data = {
+            "id": self.id,
+            "type": self.kind,
+            "status": self.status,
+            "filename": self.filename,
+            "attempts": self.attempts,
+            "http_status": self.http_status,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "duration_seconds": round((self.finished_at - self.started_at).total_seconds(), 3)
+            if self.started_at and self.finished_at else None
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
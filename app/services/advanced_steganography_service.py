@@ -3,11 +3,13 @@ import uuid
 import numpy as np
 import cv2
 from typing import Optional, Dict, Any, List, Tuple
-from PIL import Image
 import imagehash
-from scipy.spatial.distance import hamming
 from app.models.image_models import ImageAnalysis, db
+from app.models.hash_models import ImageHash
 from app.utils.exceptions import SteganographyError
+from app.utils.hamming import HASH_BITS
+from app.utils.image_context import ImageContext, ImageSource
+from app.services.hash_index import perceptual_hash_index
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,6 +19,7 @@ class AdvancedSteganographyService:
 
     def __init__(self):
         self.similarity_threshold = 0.85  # 85% de similarité
+        self.similarity_hash_types = ('phash', 'dhash', 'ahash')
 
     def embed_lsb_custom(self, image_path: str, message: str, output_path: str = None) -> Dict[str, Any]:
         """
@@ -134,21 +137,22 @@ class AdvancedSteganographyService:
                 "error": str(e)
             }
 
-    def generate_image_hashes(self, image_path: str) -> Dict[str, Any]:
+    def generate_image_hashes(self, image_path: ImageSource) -> Dict[str, Any]:
         """
         Génère les hashes perceptuels d'une image.
 
         Args:
-            image_path: Chemin vers l'image
+            image_path: Chemin vers l'image, contenu en mémoire ou ImageContext
 
         Returns:
             Dict avec les différents hashes
         """
         try:
-            img = Image.open(image_path)
+            context = ImageContext.of(image_path)
+            img = context.decoded
 
             # Générer les hashes perceptuels
-            phash = str(imagehash.phash(img))
+            phash = context.memoize('phash', lambda: str(imagehash.phash(img)))
             dhash = str(imagehash.dhash(img))
             ahash = str(imagehash.average_hash(img))
             whash = str(imagehash.whash(img))
@@ -168,12 +172,12 @@ class AdvancedSteganographyService:
                 "error": str(e)
             }
 
-    def find_similar_images(self, image_path: str) -> List[Dict[str, Any]]:
+    def find_similar_images(self, image_path: ImageSource) -> List[Dict[str, Any]]:
         """
         Trouve des images similaires dans la base de données.
 
         Args:
-            image_path: Chemin vers l'image de référence
+            image_path: Chemin vers l'image de référence, contenu en mémoire ou ImageContext
 
         Returns:
             Liste des images similaires avec scores
@@ -184,38 +188,41 @@ class AdvancedSteganographyService:
             if not ref_hashes["success"]:
                 return []
 
-            # Rechercher dans la base de données
+            max_distance = (1 - self.similarity_threshold) * HASH_BITS
+            perceptual_hash_index.refresh()  # Changements des autres workers
+            if perceptual_hash_index.ready:
+                # Index en mémoire à jour: sondage des sous-chaînes (multi-index hashing)
+                matches = perceptual_hash_index.query_radius(
+                    ref_hashes, max_distance, hash_types=self.similarity_hash_types
+                )
+            else:
+                # Rechercher dans la base: filtre SQL sur les sous-chaînes indexées,
+                # puis vérification vectorisée (XOR + popcount) des seuls candidats
+                matches = ImageHash.search(ref_hashes, max_distance, hash_types=self.similarity_hash_types)
+            if not matches:
+                return []
+
+            analyses = {
+                analysis.id: analysis for analysis in ImageAnalysis.query.filter(
+                    ImageAnalysis.id.in_([match["id"] for match in matches])
+                ).all()
+            }
+
             similar_images = []
-            analyses = ImageAnalysis.query.all()
-
-            for analysis in analyses:
-                if analysis.metadata and 'hashes' in analysis.metadata:
-                    db_hashes = analysis.metadata['hashes']
-
-                    # Calculer la similarité pour chaque type de hash
-                    similarities = {}
-
-                    for hash_type in ['phash', 'dhash', 'ahash']:
-                        if hash_type in ref_hashes and hash_type in db_hashes:
-                            ref_hash_bits = [int(bit) for bit in ref_hashes[hash_type]]
-                            db_hash_bits = [int(bit) for bit in db_hashes[hash_type]]
-
-                            if len(ref_hash_bits) == len(db_hash_bits):
-                                similarity = 1 - hamming(ref_hash_bits, db_hash_bits)
-                                similarities[hash_type] = similarity
-
-                    # Moyenne des similarités
-                    if similarities:
-                        avg_similarity = sum(similarities.values()) / len(similarities)
-
-                        if avg_similarity >= self.similarity_threshold:
-                            similar_images.append({
-                                "id": analysis.id,
-                                "filename": analysis.metadata.get('filename', 'Inconnu'),
-                                "similarity_score": avg_similarity,
-                                "similarities": similarities,
-                                "timestamp": analysis.created_at.isoformat() if analysis.created_at else None
-                            })
+            for match in matches:
+                analysis = analyses.get(match["id"])
+                if analysis is None:
+                    continue
+                similar_images.append({
+                    "id": analysis.id,
+                    "filename": analysis.filename or 'Inconnu',
+                    "similarity_score": match["similarity"],
+                    "similarities": {
+                        hash_type: 1 - distance / HASH_BITS
+                        for hash_type, distance in match["distances"].items()
+                    },
+                    "timestamp": analysis.created_at.isoformat() if analysis.created_at else None
+                })
 
             # Trier par score de similarité décroissant
             similar_images.sort(key=lambda x: x["similarity_score"], reverse=True)
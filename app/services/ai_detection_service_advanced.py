@@ -11,6 +11,8 @@ from typing import Dict, Any, Optional
 import tensorflow as tf
 from tensorflow import keras
 
+from app.services.compiled_model import CompiledModel, compiled_function
+
 logger = logging.getLogger(__name__)
 
 class AIDetectionServiceAdvanced:
@@ -27,6 +29,7 @@ class AIDetectionServiceAdvanced:
         self.model = None
         self.model_type = None
         self.is_loaded = False
+        self._features = None  # Caractéristiques MobileNetV2 du modèle de fallback (compilées)
 
         # Tenter de charger le modèle
         self._load_model()
@@ -35,7 +38,7 @@ class AIDetectionServiceAdvanced:
         """Charge le modèle IA."""
         try:
             if os.path.exists(self.model_path):
-                self.model = keras.models.load_model(self.model_path)
+                self.model = CompiledModel(keras.models.load_model(self.model_path), (128, 128, 3))
                 self.model_type = "custom"
                 self.is_loaded = True
                 logger.info(f"✅ Modèle personnalisé chargé: {self.model_path}")
@@ -75,6 +78,13 @@ class AIDetectionServiceAdvanced:
                 metrics=['accuracy']
             )
 
+            # Extraction des caractéristiques en graphe compilé, préchauffé ici
+            pooling = self.model.layers[1]
+            self._features = compiled_function(
+                lambda batch: pooling(base_model(batch, training=False)), (128, 128, 3)
+            )
+            self._features(np.zeros((1, 128, 128, 3), dtype=np.float32))
+
             self.model_type = "fallback_mobilenet"
             self.is_loaded = True
             logger.info("✅ Modèle de fallback MobileNetV2 chargé")
@@ -150,9 +160,8 @@ class AIDetectionServiceAdvanced:
             Prédiction sous forme de tableau numpy
         """
         try:
-            # Extraire des caractéristiques avec le modèle de base
-            features = self.model.layers[0](img_array)  # MobileNetV2 base
-            features = self.model.layers[1](features)   # GlobalAveragePooling2D
+            # Extraire des caractéristiques avec le modèle de base (MobileNetV2 + GlobalAveragePooling2D)
+            features = self._features(img_array.astype(np.float32))
 
             # Analyse heuristique basée sur les caractéristiques
             feature_mean = np.mean(features.numpy())
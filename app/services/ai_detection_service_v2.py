@@ -1,75 +1,328 @@
 import os
-from typing import Dict, Any, Optional
+import time
 import logging
-from app.utils.exceptions import AIDetectionError
+import functools
+import threading
+import importlib.util
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from PIL import Image
 
-# Import conditionnel de TensorFlow et des dépendances
-try:
-    import tensorflow as tf
-    import numpy as np
-    from tensorflow.keras.applications import ResNet50
-    from tensorflow.keras.applications.resnet50 import preprocess_input
-    from tensorflow.keras.preprocessing import image
-    from sklearn.metrics.pairwise import cosine_similarity
-    from PIL import Image
-    TENSORFLOW_AVAILABLE = True
-except ImportError:
-    TENSORFLOW_AVAILABLE = False
-    tf = None
-    np = None
-    Image = None
+from app.utils.exceptions import AIDetectionError
+from app.utils.image_context import ImageContext, ImageSource
+from app.utils.preprocessing import model_input
+from app.services.result_cache import result_cache
+from app.services.model_registry import ModelRegistry, model_registry as default_model_registry
+from app.services.embedding_store import EmbeddingStore, embedding_store as default_embedding_store
+from app.services.ann_index import IVFIndex, ann_index as default_ann_index
+from app.services.tflite_backend import load_tflite_model
+from app.services.compiled_model import CompiledModel
+
+# TensorFlow (plusieurs secondes d'import) n'est importé qu'au chargement des modèles:
+# l'application démarre et sert les routes sans IA sans l'attendre.
+TENSORFLOW_AVAILABLE = importlib.util.find_spec('tensorflow') is not None
+tf = None
+ResNet50 = None
+preprocess_input = None
+
+_import_lock = threading.Lock()
 
 logger = logging.getLogger(__name__)
 
+
+def _import_tensorflow() -> bool:
+    """
+    Importe TensorFlow et Keras au premier besoin.
+
+    Returns:
+        True si TensorFlow est utilisable
+    """
+    global TENSORFLOW_AVAILABLE, tf, ResNet50, preprocess_input
+
+    with _import_lock:
+        if tf is not None or not TENSORFLOW_AVAILABLE:
+            return TENSORFLOW_AVAILABLE
+        try:
+            import tensorflow
+            from tensorflow.keras.applications import ResNet50 as resnet50
+            from tensorflow.keras.applications.resnet50 import preprocess_input as resnet_preprocess
+        except ImportError as e:
+            logger.warning(f"⚠️ Import de TensorFlow impossible: {str(e)}")
+            TENSORFLOW_AVAILABLE = False
+            return False
+
+        tf, ResNet50, preprocess_input = tensorflow, resnet50, resnet_preprocess
+        return True
+
+
+def _resnet_preprocess(array: np.ndarray) -> np.ndarray:
+    """Prétraitement ResNet50 ("caffe": RGB vers BGR, moyenne ImageNet soustraite)."""
+    if preprocess_input is not None:
+        return preprocess_input(array)
+    # Sans TensorFlow local (modèles servis par le serveur d'inférence): même calcul en numpy
+    return array[..., ::-1] - np.array([103.939, 116.779, 123.68], dtype=np.float32)
+
+# Version du prétraitement et de l'interprétation de la détection IA (clé du cache de résultats)
+AI_DETECTION_VERSION = "ai-2"  # ai-2: décodage JPEG à échelle réduite
+
+# Version du prétraitement des embeddings ResNet50 (sous-dossier du stockage des embeddings)
+RESNET_EMBEDDING_VERSION = "resnet-2"  # resnet-2: décodage JPEG à échelle réduite
+
+# Tailles d'entrée des réseaux (largeur, hauteur)
+AI_INPUT_SIZE = (128, 128)
+RESNET_INPUT_SIZE = (224, 224)
+
+# Modèle de détection IA personnalisé
+AI_MODEL_PATH = "model.h5"
+
+# Nom de base des exports TFLite de ResNet50 (resnet50.int8.tflite...)
+RESNET_TFLITE_BASE = "resnet50"
+
+# Moteurs d'exécution des modèles
+BACKENDS = ('keras', 'tflite')
+
+
+def _load_resnet50(backend: str = 'keras', quantization: str = 'dynamic', threads: int = 0):
+    """Chargement de ResNet50 (ImageNet) pour l'extraction de caractéristiques."""
+    if backend == 'tflite':
+        # Repli sur Keras si le modèle n'a pas été exporté
+        model = load_tflite_model(RESNET_TFLITE_BASE, quantization, threads)
+        if model is not None:
+            return model
+    if not _import_tensorflow():
+        return None
+    resnet = ResNet50(weights="imagenet", include_top=False, pooling="avg")
+    return CompiledModel(resnet, RESNET_INPUT_SIZE[::-1] + (3,))
+
+
+def _load_ai_model(backend: str = 'keras', quantization: str = 'dynamic', threads: int = 0):
+    """Chargement du modèle de détection IA personnalisé (None = mode fallback)."""
+    if backend == 'tflite':
+        model = load_tflite_model(AI_MODEL_PATH, quantization, threads)
+        if model is not None:
+            return model
+    if not _import_tensorflow():
+        return None
+    if not os.path.exists(AI_MODEL_PATH):
+        logger.info("ℹ️ Modèle personnalisé non trouvé, mode fallback activé")
+        return None
+    try:
+        # Tentative de chargement avec compile=False pour éviter les erreurs de compatibilité
+        model = tf.keras.models.load_model(AI_MODEL_PATH, compile=False)
+        return CompiledModel(model, AI_INPUT_SIZE[::-1] + (3,), source_path=AI_MODEL_PATH)
+    except Exception as e:
+        logger.warning(f"⚠️ Impossible de charger le modèle {AI_MODEL_PATH}: {e}")
+        logger.info("🔄 Mode fallback activé - détection IA désactivée")
+        return None
+
+
+def _model_key(model: Any) -> str:
+    """
+    Moteur d'exécution d'un modèle chargé, avec sa quantification et l'empreinte de son fichier.
+
+    Pour un modèle distant, la description vient du worker qui l'a chargé:
+    aucun fichier local n'est lu. Exemple: "tflite-int8/3f9c0a1b2d4e5f60".
+    """
+    description = model.describe() if hasattr(model, 'describe') else {}
+    backend = description.get("backend") or "keras"
+    if description.get("quantization"):
+        backend = f"{backend}-{description['quantization']}"
+    return f"{backend}/{description['fingerprint']}" if description.get("fingerprint") else backend
+
+
+# Modèles chargés une fois par processus, partagés par tous les services
+default_model_registry.register('resnet50', _load_resnet50)
+default_model_registry.register('ai_detection', _load_ai_model)
+
+
+def inference_models(backend: str = 'keras', quantization: str = 'dynamic', threads: int = 0) -> Dict[str, tuple]:
+    """
+    Modèles IA avec leur moteur d'exécution: (chargement, forme d'une entrée prétraitée) par nom.
+
+    Les fonctions de chargement sont picklables (serveur d'inférence).
+
+    Args:
+        backend: keras ou tflite (repli sur Keras pour un modèle non exporté)
+        quantization: Export TFLite utilisé (dynamic ou int8)
+        threads: Threads de l'interpréteur TFLite (0 = tous les cœurs)
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Moteur d'exécution inconnu: {backend}")
+    options = dict(backend=backend, quantization=quantization, threads=threads)
+    return {
+        'resnet50': (functools.partial(_load_resnet50, **options), RESNET_INPUT_SIZE[::-1] + (3,)),
+        'ai_detection': (functools.partial(_load_ai_model, **options), AI_INPUT_SIZE[::-1] + (3,))
+    }
+
+
+def configure_backend(registry: ModelRegistry, backend: str = 'keras', quantization: str = 'dynamic',
+                      threads: int = 0):
+    """Sélectionne le moteur d'exécution des modèles du registre (avant leur chargement)."""
+    for name, (loader, _) in inference_models(backend, quantization, threads).items():
+        registry.register(name, loader, replace=True)
+
 class AIDetectionService:
     """Service pour la détection d'images générées par IA et la similarité d'images."""
 
-    def __init__(self):
-        self.ai_model = None
-        self.resnet_model = None
+    # Candidats demandés à l'index approché par résultat, avant re-classement exact
+    ANN_RERANK_FACTOR = 4
+
+    # États du chargement des modèles
+    MODELS_PENDING = 'pending'
+    MODELS_LOADING = 'loading'
+    MODELS_READY = 'ready'
+    MODELS_FAILED = 'failed'
+    MODELS_UNAVAILABLE = 'unavailable'
+
+    def __init__(self, embedding_store: Optional[EmbeddingStore] = None, ann_index: Optional[IVFIndex] = None,
+                 registry: Optional[ModelRegistry] = None):
+        """
+        Initialise le service sans charger les modèles.
 
-        if not TENSORFLOW_AVAILABLE:
+        Les modèles sont chargés au premier usage (ensure_models) ou en arrière-plan
+        (start_warmup): la construction du service ne bloque pas le démarrage. Ils
+        proviennent du registre du processus: plusieurs services partagent la même
+        instance de chaque modèle.
+        """
+        self.registry = registry if registry is not None else default_model_registry
+        self._ai_model = None
+        self._resnet_model = None
+        self.model_version = None  # Version + moteur + empreinte du modèle de détection chargé
+        self.embedding_version = None  # Version + moteur du ResNet50 chargé
+        self.embedding_store = embedding_store if embedding_store is not None else default_embedding_store
+        self.ann_index = ann_index if ann_index is not None else default_ann_index
+
+        self._models_lock = threading.Lock()
+        self._models_state = self.MODELS_PENDING
+        self.models_load_seconds = None
+        self._warmup_thread = None
+
+        if not self._inference_available():
             logger.warning("⚠️ TensorFlow n'est pas disponible. Fonctionnalités IA limitées.")
-            return
 
-        self._initialize_models()
+    def _inference_available(self) -> bool:
+        """
+        Modèles utilisables: TensorFlow installé, ou serveur d'inférence distant.
+
+        Évalué à chaque appel: le registre peut être connecté au serveur
+        d'inférence après la construction du service.
+        """
+        return self.registry.remote or TENSORFLOW_AVAILABLE
+
+    @property
+    def ai_model(self):
+        """Modèle de détection IA (chargé au premier accès)."""
+        self.ensure_models()
+        return self._ai_model
+
+    @ai_model.setter
+    def ai_model(self, model):
+        self._ai_model = model
+
+    @property
+    def resnet_model(self):
+        """Modèle ResNet50 d'extraction de caractéristiques (chargé au premier accès)."""
+        self.ensure_models()
+        return self._resnet_model
+
+    @resnet_model.setter
+    def resnet_model(self, model):
+        self._resnet_model = model
+
+    @property
+    def models_state(self) -> str:
+        """État du chargement: pending, loading, ready, failed ou unavailable."""
+        if self._models_state == self.MODELS_PENDING and not self._inference_available():
+            return self.MODELS_UNAVAILABLE
+        return self._models_state
+
+    def is_ready(self) -> bool:
+        """Chargement des modèles terminé (réussi, en mode fallback ou sans TensorFlow)."""
+        return self.models_state not in (self.MODELS_PENDING, self.MODELS_LOADING)
+
+    def ensure_models(self) -> bool:
+        """
+        Charge les modèles s'ils ne le sont pas encore (bloquant, une seule fois).
+
+        Les appels concurrents attendent la fin du chargement en cours.
+
+        Returns:
+            True si le chargement est terminé
+        """
+        if self._models_state in (self.MODELS_PENDING, self.MODELS_LOADING):
+            with self._models_lock:
+                if self._models_state == self.MODELS_PENDING:
+                    self._initialize_models()
+        return self.is_ready()
+
+    def start_warmup(self) -> Optional[threading.Thread]:
+        """
+        Charge les modèles dans un thread d'arrière-plan.
+
+        Returns:
+            Thread de chargement, ou None si rien n'est à charger
+        """
+        if self.is_ready():
+            return None
+        if self._warmup_thread is None:
+            self._warmup_thread = threading.Thread(target=self.ensure_models, name='model-warmup', daemon=True)
+            self._warmup_thread.start()
+        return self._warmup_thread
 
     def _initialize_models(self):
-        """Initialise les modèles AI et ResNet50."""
-        if not TENSORFLOW_AVAILABLE:
+        """Initialise les modèles AI et ResNet50 (verrou tenu)."""
+        self._models_state = self.MODELS_LOADING
+        start = time.perf_counter()
+        if not self.registry.remote and not _import_tensorflow():
+            self._models_state = self.MODELS_UNAVAILABLE
             return
 
         try:
-            # Charger ResNet50 pour l'extraction de caractéristiques
-            self.resnet_model = ResNet50(weights="imagenet", include_top=False, pooling="avg")
-            logger.info("✅ Modèle ResNet50 chargé avec succès")
-
-            # Charger le modèle de détection IA personnalisé
-            model_path = "model.h5"
-            if os.path.exists(model_path):
-                try:
-                    # Tentative de chargement avec compile=False pour éviter les erreurs de compatibilité
-                    self.ai_model = tf.keras.models.load_model(model_path, compile=False)
-                    logger.info(f"✅ Modèle de détection IA chargé: {model_path}")
-                except Exception as e:
-                    logger.warning(f"⚠️ Impossible de charger le modèle {model_path}: {e}")
-                    logger.info("🔄 Mode fallback activé - détection IA désactivée")
-                    self.ai_model = None
-            else:
-                logger.info("ℹ️ Modèle personnalisé non trouvé, mode fallback activé")
-                self.ai_model = None
+            # ResNet50 pour l'extraction de caractéristiques, puis le modèle de détection IA
+            self._resnet_model = self.registry.get('resnet50')
+            self._ai_model = self.registry.get('ai_detection')
+            if self._resnet_model is not None:
+                self.embedding_version = f"{RESNET_EMBEDDING_VERSION}/{_model_key(self._resnet_model)}"
+                self._use_embedding_version()
+            if self._ai_model is not None:
+                # Moteur et quantification distinguent les résultats en cache (Keras, TFLite int8...)
+                self.model_version = f"{AI_DETECTION_VERSION}/{_model_key(self._ai_model)}"
+                logger.info(f"✅ Modèle de détection IA disponible ({self.model_version})")
+            self._models_state = self.MODELS_READY if self._resnet_model is not None else self.MODELS_FAILED
 
         except Exception as e:
             logger.error(f"❌ Erreur lors du chargement des modèles: {str(e)}")
-            self.ai_model = None
-            self.resnet_model = None
+            self._ai_model = None
+            self._resnet_model = None
+            self._models_state = self.MODELS_FAILED
 
-    def detect_ai_image(self, image_path: str) -> Dict[str, Any]:
+        self.models_load_seconds = round(time.perf_counter() - start, 3)
+        logger.info(f"📊 Modèles initialisés en {self.models_load_seconds}s ({self._models_state})")
+
+    def _use_embedding_version(self):
+        """
+        Range les embeddings par version du ResNet50 chargé.
+
+        Les vecteurs d'un autre moteur (ou d'un autre prétraitement) ne sont pas
+        comparables: le stockage passe au sous-dossier de cette version et l'index
+        approché est rechargé depuis sa sauvegarde s'il a été construit pour elle.
+        """
+        if not self.embedding_store.use_model(self.embedding_version):
+            return
+        self.ann_index.clear()
+        snapshot_path = self.ann_index.snapshot_path
+        if self.embedding_store.ready and snapshot_path and self.ann_index.load(snapshot_path, self.embedding_version):
+            self.ann_index.sync_from_store(self.embedding_store)
+
+    def detect_ai_image(self, image_path: ImageSource) -> Dict[str, Any]:
         """
         Détecte si une image a été générée par IA (implémentation exacte de steganoV2.py).
 
+        Le résultat est mis en cache par contenu et par version du modèle.
+
         Args:
-            image_path: Chemin vers l'image à analyser
+            image_path: Chemin vers l'image à analyser, contenu en mémoire ou ImageContext
 
         Returns:
             Dictionnaire avec les résultats de détection
@@ -77,61 +330,140 @@ class AIDetectionService:
         try:
             if not self.ai_model:
                 # Mode fallback - retourner une réponse indicative
-                return {
-                    "is_ai_generated": False,
-                    "confidence": 0.0,
-                    "confidence_percentage": 0.0,
-                    "status": "model_unavailable",
-                    "message": "Modèle de détection IA non disponible - mode fallback actif"
-                }
-
-            img = Image.open(image_path).convert("RGB")  # 🔹 Convertir en RGB pour éviter les erreurs de format
-            img = img.resize((128, 128), Image.Resampling.LANCZOS)  # 🔹 Redimensionner correctement
+                return self._model_unavailable_result()
+
+            context = ImageContext.of(image_path)
+            return result_cache.get_or_compute(
+                context.digests["sha256"], 'ai_detection', self.model_version,
+                lambda: self._predict_ai(context)
+            )
+        except Exception as e:
+            logger.error(f"Erreur lors de la détection IA: {str(e)}")
+            return {"error": str(e)}
+
+    def _predict_ai(self, context: ImageContext) -> Dict[str, Any]:
+        """Inférence du modèle de détection IA (sans cache)."""
+        try:
+            # 🔹 Converti en RGB et redimensionné (JPEG décodé à échelle réduite)
+            img = model_input(context, AI_INPUT_SIZE, Image.Resampling.LANCZOS)
             img_array = np.array(img, dtype=np.float32) / 255.0  # 🔹 Normalisation correcte
-            img_array = np.expand_dims(img_array, axis=0)  # 🔹 Ajouter une dimension batch
 
-            logger.debug(f"DEBUG - Image shape before prediction: {img_array.shape}")  # Devrait être (1, 128, 128, 3)
+            logger.debug(f"DEBUG - Image shape before prediction: {img_array.shape}")  # Devrait être (128, 128, 3)
 
-            prediction = self.ai_model.predict(img_array)
-            is_ai_generated = prediction[0][0] > 0.5
+            # 🔹 Regroupée avec les requêtes concurrentes des autres threads (micro-batching)
+            prediction = self._predict_one(self.ai_model, img_array)
+            is_ai_generated = prediction[0] > 0.5
 
             return {
                 "is_ai_generated": bool(is_ai_generated),
-                "confidence": float(prediction[0][0] * 100)
+                "confidence": float(prediction[0] * 100)
             }
         except Exception as e:
             logger.error(f"Erreur lors de la détection IA: {str(e)}")
             return {"error": str(e)}
 
-    def extract_features(self, image_path: str) -> Any:
+    def detect_ai_images_batch(self, arrays: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Détection IA d'un lot d'images en une seule inférence.
+
+        Args:
+            arrays: Images RGB uint8 (128, 128, 3), redimensionnées comme dans detect_ai_image
+
+        Returns:
+            Résultats alignés sur arrays (même forme que detect_ai_image)
+        """
+        if not arrays:
+            return []
+        if not self.ai_model:
+            return [self._model_unavailable_result() for _ in arrays]
+
+        try:
+            batch = np.stack(arrays).astype(np.float32) / 255.0
+            predictions = self.ai_model.predict(batch)
+            return [
+                {"is_ai_generated": bool(prediction[0] > 0.5), "confidence": float(prediction[0] * 100)}
+                for prediction in predictions
+            ]
+        except Exception as e:
+            logger.error(f"Erreur lors de la détection IA par lot: {str(e)}")
+            return [{"error": str(e)} for _ in arrays]
+
+    @staticmethod
+    def _predict_one(model: Any, item: Any) -> Any:
+        """Prédiction d'une entrée unitaire, via le regroupement du modèle partagé s'il existe."""
+        if hasattr(model, 'predict_one'):
+            return model.predict_one(item)
+        return model.predict(np.expand_dims(item, axis=0))[0]
+
+    @staticmethod
+    def _model_unavailable_result() -> Dict[str, Any]:
+        """Réponse indicative lorsque le modèle de détection n'est pas chargé."""
+        return {
+            "is_ai_generated": False,
+            "confidence": 0.0,
+            "confidence_percentage": 0.0,
+            "status": "model_unavailable",
+            "message": "Modèle de détection IA non disponible - mode fallback actif"
+        }
+
+    def extract_features(self, image_path: ImageSource) -> Any:
         """
         Extrait les caractéristiques d'une image avec ResNet50.
 
+        Pour un ImageContext partagé, le vecteur est mémorisé: l'indexation après
+        l'analyse ne relance pas l'inférence.
+
         Args:
-            image_path: Chemin vers l'image
+            image_path: Chemin vers l'image, contenu en mémoire ou ImageContext
 
         Returns:
             Vecteur de caractéristiques ou None si non disponible
         """
-        if not TENSORFLOW_AVAILABLE or not self.resnet_model:
+        if not self._inference_available() or not self.resnet_model:
             logger.warning("ResNet50 non disponible pour l'extraction de caractéristiques")
             return None
 
         try:
-            # Charger l'image avec la taille requise pour ResNet50
-            img = image.load_img(image_path, target_size=(224, 224))
-            img_array = image.img_to_array(img)
-            img_array = np.expand_dims(img_array, axis=0)
-            img_array = preprocess_input(img_array)
-
-            # Extraire les caractéristiques
-            features = self.resnet_model.predict(img_array)
-            return features.flatten()
+            context = ImageContext.of(image_path)
+            return context.memoize('resnet50', lambda: self._resnet_features(
+                # Même conversion que image.load_img: RGB puis redimensionnement NEAREST
+                model_input(context, RESNET_INPUT_SIZE, Image.Resampling.NEAREST)
+            ))
 
         except Exception as e:
             logger.error(f"Erreur lors de l'extraction de caractéristiques: {str(e)}")
             return None
 
+    def _resnet_features(self, img: Any) -> Any:
+        """Passe une image PIL 224x224 RGB dans ResNet50."""
+        img_array = _resnet_preprocess(np.asarray(img, dtype=np.float32))
+
+        # Extraire les caractéristiques
+        features = self._predict_one(self.resnet_model, img_array)
+        return features.flatten()
+
+    def extract_features_batch(self, arrays: List[Any]) -> List[Any]:
+        """
+        Extrait les caractéristiques ResNet50 d'un lot d'images en une seule inférence.
+
+        Args:
+            arrays: Images RGB uint8 (224, 224, 3), redimensionnées comme dans extract_features
+
+        Returns:
+            Vecteurs alignés sur arrays (None si ResNet50 n'est pas disponible)
+        """
+        if not arrays:
+            return []
+        if not self._inference_available() or not self.resnet_model:
+            return [None for _ in arrays]
+
+        try:
+            batch = _resnet_preprocess(np.stack(arrays).astype(np.float32))
+            return [features.flatten() for features in self.resnet_model.predict(batch)]
+        except Exception as e:
+            logger.error(f"Erreur lors de l'extraction de caractéristiques par lot: {str(e)}")
+            return [None for _ in arrays]
+
     def compute_similarity(self, img1_path: str, img2_path: str) -> float:
         """
         Calcule la similarité cosinus entre deux images.
@@ -143,7 +475,7 @@ class AIDetectionService:
         Returns:
             Score de similarité (0-1)
         """
-        if not TENSORFLOW_AVAILABLE:
+        if not self._inference_available():
             return 0.5  # Valeur par défaut
 
         try:
@@ -153,7 +485,10 @@ class AIDetectionService:
             if feat1 is None or feat2 is None:
                 return 0.5
 
-            similarity = cosine_similarity([feat1], [feat2])[0][0]
+            feat1 = np.asarray(feat1, dtype=np.float64)
+            feat2 = np.asarray(feat2, dtype=np.float64)
+            norms = np.linalg.norm(feat1) * np.linalg.norm(feat2)
+            similarity = float(feat1 @ feat2 / norms) if norms else 0.0
             logger.info(f"Similarité cosinus calculée: {similarity:.4f}")
 
             return float(similarity)
@@ -162,19 +497,88 @@ class AIDetectionService:
             logger.error(f"Erreur lors du calcul de similarité: {str(e)}")
             return 0.5
 
-    def find_similar_images_deep(self, image_path: str, image_list: list, threshold: float = 0.8) -> list:
+    def index_image_embedding(self, image_id: int, image_path: ImageSource) -> bool:
+        """
+        Calcule l'embedding ResNet50 d'une image et l'enregistre dans le stockage.
+
+        Appelé une seule fois à l'ingestion: les recherches ultérieures n'ont plus
+        besoin d'inférence sur les images de la base.
+
+        Args:
+            image_id: Identifiant ImageAnalysis
+            image_path: Chemin vers l'image, contenu en mémoire ou ImageContext
+
+        Returns:
+            True si l'embedding a été enregistré
+        """
+        features = self.extract_features(image_path)
+        if features is None:
+            return False
+
+        try:
+            stored = self.embedding_store.add(image_id, features)
+            if stored and self.ann_index.is_trained:
+                self.ann_index.add([image_id], [features])
+            return stored
+        except Exception as e:
+            logger.error(f"Erreur lors de l'enregistrement de l'embedding: {str(e)}")
+            return False
+
+    def remove_image_embedding(self, image_id: int) -> bool:
+        """
+        Retire l'embedding d'une image supprimée du stockage et de l'index ANN.
+
+        Returns:
+            True si l'embedding était enregistré
+        """
+        try:
+            self.ann_index.remove(image_id)
+            return self.embedding_store.remove(image_id)
+        except Exception as e:
+            logger.error(f"Erreur lors de la suppression de l'embedding: {str(e)}")
+            return False
+
+    def index_image_embeddings_batch(self, image_ids: List[int], features_list: List[Any]) -> int:
+        """
+        Enregistre les embeddings déjà calculés d'un lot d'images (extract_features_batch).
+
+        Args:
+            image_ids: Identifiants ImageAnalysis
+            features_list: Vecteurs alignés sur image_ids (None ignorés)
+
+        Returns:
+            Nombre d'embeddings enregistrés
+        """
+        stored_ids, stored_features = [], []
+        try:
+            for image_id, features in zip(image_ids, features_list):
+                if features is not None and self.embedding_store.add(image_id, features):
+                    stored_ids.append(image_id)
+                    stored_features.append(features)
+            if stored_ids and self.ann_index.is_trained:
+                self.ann_index.add(stored_ids, np.stack(stored_features))
+        except Exception as e:
+            logger.error(f"Erreur lors de l'enregistrement des embeddings par lot: {str(e)}")
+        return len(stored_ids)
+
+    def find_similar_images_deep(self, image_path: ImageSource, image_list: Optional[list] = None,
+                                 threshold: float = 0.8, k: Optional[int] = None) -> list:
         """
         Trouve des images similaires en utilisant les caractéristiques profondes.
 
+        L'image de référence passe une seule fois dans ResNet50 ; la similarité
+        cosinus avec les embeddings stockés est un produit matrice-vecteur.
+
         Args:
-            image_path: Chemin vers l'image de référence
-            image_list: Liste des images à comparer
+            image_path: Chemin vers l'image de référence, contenu en mémoire ou ImageContext
+            image_list: Liste des images à comparer (toute la base indexée si None)
             threshold: Seuil de similarité
+            k: Nombre maximal de résultats (tous si None)
 
         Returns:
             Liste des images similaires triée par similarité
         """
-        if not TENSORFLOW_AVAILABLE:
+        if not self._inference_available():
             return []
 
         try:
@@ -182,33 +586,85 @@ class AIDetectionService:
             if ref_features is None:
                 return []
 
-            similar_images = []
+            if image_list is None:
+                return [
+                    {
+                        'id': match['id'],
+                        'similarity': match['similarity'] * 100,  # Convertir en pourcentage
+                        'similarity_type': 'deep_features'
+                    }
+                    for match in self._search_embeddings(ref_features, threshold, k)
+                ]
+
+            # Les images sans embedding stocké sont extraites une seule fois (et mémorisées si possible)
+            extra_features = {}
+            for position, img_info in enumerate(image_list):
+                image_id = img_info.get('id')
+                if image_id is not None and image_id in self.embedding_store:
+                    continue
 
-            for img_info in image_list:
                 img_path = img_info.get('path') or img_info.get('image_path')
                 if not img_path or not os.path.exists(img_path):
                     continue
 
-                try:
-                    similarity = self.compute_similarity(image_path, img_path)
-
-                    if similarity >= threshold:
-                        similar_images.append({
-                            **img_info,
-                            'similarity': similarity * 100,  # Convertir en pourcentage
-                            'similarity_type': 'deep_features'
-                        })
-
-                except Exception as e:
-                    logger.warning(f"Erreur lors de la comparaison avec {img_path}: {str(e)}")
+                features = self.extract_features(img_path)
+                if features is None:
                     continue
+                if image_id is None or not self.embedding_store.add(image_id, features):
+                    extra_features[position] = features
+
+            stored_ids, stored_scores = self.embedding_store.similarities(
+                ref_features, [img.get('id') for img in image_list if img.get('id') is not None]
+            )
+            scores = dict(zip(stored_ids.tolist(), stored_scores.tolist()))
+
+            if extra_features:
+                ref = ref_features / np.linalg.norm(ref_features)
+                matrix = np.stack(list(extra_features.values())).astype(np.float32)
+                matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+                extra_scores = dict(zip(extra_features.keys(), (matrix @ ref).tolist()))
+            else:
+                extra_scores = {}
 
-            return sorted(similar_images, key=lambda x: x['similarity'], reverse=True)
+            similar_images = []
+            for position, img_info in enumerate(image_list):
+                similarity = scores.get(img_info.get('id'), extra_scores.get(position))
+                if similarity is not None and similarity >= threshold:
+                    similar_images.append({
+                        **img_info,
+                        'similarity': similarity * 100,  # Convertir en pourcentage
+                        'similarity_type': 'deep_features'
+                    })
+
+            similar_images.sort(key=lambda x: x['similarity'], reverse=True)
+            return similar_images[:k] if k else similar_images
 
         except Exception as e:
             logger.error(f"Erreur lors de la recherche d'images similaires: {str(e)}")
             return []
 
+    def _search_embeddings(self, features: Any, threshold: float, k: Optional[int]) -> list:
+        """
+        Recherche dans toute la base d'embeddings.
+
+        Pour un top-k, si l'index IVF est entraîné, seuls ses candidats sont
+        re-classés avec les vecteurs exacts du stockage (index d'abord complété
+        par les embeddings ajoutés par les autres processus). Sans k, toutes
+        les images au-dessus du seuil sont demandées: produit matrice-vecteur
+        complet.
+        """
+        if k is None or not self.ann_index.is_trained:
+            return self.embedding_store.search(features, threshold=threshold, k=k)
+
+        self.ann_index.sync_from_store(self.embedding_store)
+        if not len(self.ann_index):
+            return self.embedding_store.search(features, threshold=threshold, k=k)
+
+        candidates = self.ann_index.search(features, k=k * self.ANN_RERANK_FACTOR)
+        return self.embedding_store.search(
+            features, threshold=threshold, k=k, image_ids=[match['id'] for match in candidates]
+        )
+
     def _simulate_ai_detection(self, image_path: str) -> Dict[str, Any]:
         """
         Simulation de détection IA quand TensorFlow n'est pas disponible.
@@ -237,16 +693,19 @@ class AIDetectionService:
 
     def is_available(self) -> Dict[str, Any]:
         """
-        Vérifie la disponibilité des modèles.
+        Vérifie la disponibilité des modèles (sans déclencher leur chargement).
 
         Returns:
             Dictionnaire indiquant quels modèles sont disponibles
         """
         return {
             "tensorflow_available": TENSORFLOW_AVAILABLE,
-            "ai_detection": self.ai_model is not None,
-            "resnet50": self.resnet_model is not None,
-            "tensorflow_version": tf.__version__ if TENSORFLOW_AVAILABLE else None
+            "remote_inference": self.registry.remote,
+            "models_state": self.models_state,
+            "models_load_seconds": self.models_load_seconds,
+            "ai_detection": self._ai_model is not None,
+            "resnet50": self._resnet_model is not None,
+            "tensorflow_version": tf.__version__ if tf is not None else None
         }
 
     def is_model_loaded(self) -> bool:
@@ -256,4 +715,5 @@ class AIDetectionService:
         Returns:
             True si le modèle est disponible, False sinon
         """
-        return TENSORFLOW_AVAILABLE and (self.ai_model is not None or self.resnet_model is not None)
+        self.ensure_models()
+        return self._inference_available() and (self._ai_model is not None or self._resnet_model is not None)
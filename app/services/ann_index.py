@@ -0,0 +1,483 @@
+"""
+Index de plus proches voisins approché (IVF, quantification produit optionnelle)
+pour les embeddings profonds.
+
+Les vecteurs (normalisés) sont répartis dans `nlist` listes inversées par un
+quantificateur grossier k-means. Une requête ne parcourt que les `nprobe` listes
+dont le centroïde est le plus proche. Avec `pq_m > 0`, les résidus (vecteur -
+centroïde) sont compressés en `pq_m` octets par quantification produit et le
+produit scalaire est estimé par tables de correspondance (ADC):
+
+    q.x ~= q.c + somme_m q_m . codebook_m[code_m]
+
+L'index est propre au modèle qui a calculé les embeddings (EmbeddingStore.model_key):
+sa sauvegarde enregistre ce modèle et n'est rechargée que pour lui.
+"""
+
+import os
+import tempfile
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Iterable
+
+import numpy as np
+
+from app.services.embedding_store import EmbeddingStore, EMBEDDING_DIM
+
+logger = logging.getLogger(__name__)
+
+# Nombre de points d'entraînement par centroïde (au-delà, échantillonnage)
+TRAINING_POINTS_PER_CENTROID = 64
+MAX_TRAINING_POINTS = 200_000
+
+# Nombre de lignes traitées à la fois lors des affectations
+ASSIGN_BLOCK_ROWS = 16384
+
+
+def kmeans(data: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    K-means de Lloyd (distance euclidienne), initialisé sur des points tirés au hasard.
+
+    Args:
+        data: Matrice (n, d) float32
+        k: Nombre de centroïdes
+        iterations: Nombre d'itérations
+        seed: Graine aléatoire
+
+    Returns:
+        Centroïdes (k, d) float32
+    """
+    rng = np.random.default_rng(seed)
+    data = np.ascontiguousarray(data, dtype=np.float32)
+    if len(data) < k:
+        raise ValueError(f"k-means: {len(data)} points pour {k} centroïdes")
+
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(data, centroids)
+
+        order = np.argsort(labels, kind='stable')
+        sorted_labels = labels[order]
+        clusters, starts, counts = np.unique(sorted_labels, return_index=True, return_counts=True)
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        centroids[clusters] = sums / counts[:, None]
+
+        # Les centroïdes vides sont réinitialisés sur des points aléatoires
+        empty = np.setdiff1d(np.arange(k), clusters)
+        if len(empty):
+            centroids[empty] = data[rng.choice(len(data), size=len(empty), replace=False)]
+
+    return centroids
+
+
+def assign(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Renvoie l'indice du centroïde le plus proche de chaque ligne (distance euclidienne).
+
+    Args:
+        data: Matrice (n, d)
+        centroids: Centroïdes (k, d)
+
+    Returns:
+        Tableau (n,) d'indices int64
+    """
+    norms = np.einsum('ij,ij->i', centroids, centroids)
+    labels = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), ASSIGN_BLOCK_ROWS):
+        block = data[start:start + ASSIGN_BLOCK_ROWS]
+        labels[start:start + len(block)] = np.argmin(norms - 2 * block @ centroids.T, axis=1)
+    return labels
+
+
+class _InvertedList:
+    """Liste inversée extensible: identifiants + vecteurs (ou codes PQ)."""
+
+    def __init__(self, width: int, dtype, capacity: int = 16):
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.data = np.empty((capacity, width), dtype=dtype)
+        self.size = 0
+
+    def append(self, ids: np.ndarray, data: np.ndarray):
+        needed = self.size + len(ids)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids))
+            self.ids = np.resize(self.ids, capacity)
+            grown = np.empty((capacity, self.data.shape[1]), dtype=self.data.dtype)
+            grown[:self.size] = self.data[:self.size]
+            self.data = grown
+        self.ids[self.size:needed] = ids
+        self.data[self.size:needed] = data
+        self.size = needed
+
+    def remove(self, image_id: int) -> bool:
+        positions = np.flatnonzero(self.ids[:self.size] == image_id)
+        if not len(positions):
+            return False
+        position, last = positions[0], self.size - 1
+        self.ids[position] = self.ids[last]
+        self.data[position] = self.data[last]
+        self.size = last
+        return True
+
+
+class IVFIndex:
+    """Index IVF (listes inversées) avec quantification produit optionnelle des résidus."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM, nlist: int = 256, nprobe: int = 16,
+                 pq_m: int = 0, pq_bits: int = 8, seed: int = 0,
+                 snapshot_path: Optional[str] = None, snapshot_interval: int = 1000):
+        """
+        Initialise l'index (non entraîné).
+
+        Args:
+            dim: Dimension des vecteurs
+            nlist: Nombre de listes inversées (centroïdes grossiers)
+            nprobe: Nombre de listes parcourues par requête
+            pq_m: Nombre de sous-quantificateurs (0 = vecteurs complets, sans PQ)
+            pq_bits: Bits par code PQ (8 au maximum)
+            seed: Graine aléatoire de l'entraînement
+            snapshot_path: Fichier de sauvegarde de l'index (optionnel)
+            snapshot_interval: Nombre d'insertions entre deux sauvegardes
+        """
+        if pq_m and dim % pq_m:
+            raise ValueError(f"La dimension {dim} n'est pas divisible par pq_m={pq_m}")
+        if not 1 <= pq_bits <= 8:
+            raise ValueError("pq_bits doit être compris entre 1 et 8")
+
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.pq_m = pq_m
+        self.pq_bits = pq_bits
+        self.seed = seed
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.model_key: Optional[str] = None  # Modèle des embeddings indexés
+
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None  # (pq_m, 2**pq_bits, dim // pq_m)
+        self._lists: List[_InvertedList] = []
+        self._locations: Dict[int, int] = {}
+        self._pending_writes = 0
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._store_version = None  # Version du stockage déjà indexée (EmbeddingStore.version)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+    def clear(self):
+        """Oublie l'entraînement et les vecteurs (embeddings d'un autre modèle)."""
+        with self._lock:
+            self.centroids = None
+            self.codebooks = None
+            self.model_key = None
+            self._reset_lists()
+
+    def __contains__(self, image_id: int) -> bool:
+        return int(image_id) in self._locations
+
+    def train(self, vectors: np.ndarray):
+        """
+        Entraîne le quantificateur grossier (et les codebooks PQ) et vide l'index.
+
+        Args:
+            vectors: Échantillon représentatif (n, dim), non nécessairement normalisé
+        """
+        data = self._normalize(vectors)
+        limit = min(MAX_TRAINING_POINTS, TRAINING_POINTS_PER_CENTROID * max(self.nlist, 2 ** self.pq_bits))
+        if len(data) > limit:
+            rng = np.random.default_rng(self.seed)
+            data = data[rng.choice(len(data), size=limit, replace=False)]
+
+        centroids = kmeans(data, self.nlist, seed=self.seed)
+        codebooks = None
+        if self.pq_m:
+            residuals = data - centroids[assign(data, centroids)]
+            sub_dim = self.dim // self.pq_m
+            codebooks = np.stack([
+                kmeans(residuals[:, m * sub_dim:(m + 1) * sub_dim], 2 ** self.pq_bits, seed=self.seed + m)
+                for m in range(self.pq_m)
+            ])
+
+        with self._lock:
+            self.centroids = centroids
+            self.codebooks = codebooks
+            self._reset_lists()
+
+        logger.info(f"✅ Index IVF entraîné: {self.nlist} listes, PQ={self.pq_m or 'non'} ({len(data)} points)")
+
+    def add(self, image_ids: Iterable[int], vectors: np.ndarray) -> int:
+        """
+        Ajoute (ou remplace) des vecteurs dans l'index entraîné.
+
+        Args:
+            image_ids: Identifiants ImageAnalysis
+            vectors: Matrice (n, dim) alignée sur image_ids
+
+        Returns:
+            Nombre de vecteurs ajoutés
+        """
+        if not self.is_trained:
+            raise RuntimeError("Index IVF non entraîné")
+
+        ids = np.asarray(list(image_ids), dtype=np.int64)
+        if not len(ids):
+            return 0
+        data = self._normalize(vectors)
+        labels = assign(data, self.centroids)
+        encoded = self._encode(data, labels)
+
+        with self._lock:
+            for image_id in ids.tolist():
+                self._remove_unlocked(image_id)
+            for label in np.unique(labels):
+                mask = labels == label
+                self._lists[label].append(ids[mask], encoded[mask])
+            self._locations.update(zip(ids.tolist(), labels.tolist()))
+
+            self._pending_writes += len(ids)
+            if self.snapshot_path and self._pending_writes >= self.snapshot_interval:
+                self.save(self.snapshot_path)
+
+        return len(ids)
+
+    def remove(self, image_id: int) -> bool:
+        """Retire un vecteur de l'index."""
+        with self._lock:
+            return self._remove_unlocked(int(image_id))
+
+    def search(self, vector: Any, k: int = 10, nprobe: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Recherche approchée des k vecteurs de plus grand produit scalaire (cosinus).
+
+        Args:
+            vector: Vecteur de la requête (non normalisé)
+            k: Nombre de résultats
+            nprobe: Nombre de listes parcourues (self.nprobe par défaut)
+
+        Returns:
+            Liste de dicts {id, similarity} triée par similarité décroissante
+        """
+        if not self.is_trained or not self._locations:
+            return []
+
+        query = self._normalize(vector)[0]
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+
+        with self._lock:
+            centroid_scores = self.centroids @ query
+            norms = np.einsum('ij,ij->i', self.centroids, self.centroids)
+            probes = np.argpartition(norms - 2 * centroid_scores, nprobe - 1)[:nprobe]
+
+            lut = None
+            if self.pq_m:
+                sub_queries = query.reshape(self.pq_m, -1)
+                lut = np.einsum('mkd,md->mk', self.codebooks, sub_queries)
+
+            all_ids, all_scores = [], []
+            for label in probes:
+                inverted = self._lists[label]
+                if not inverted.size:
+                    continue
+                data = inverted.data[:inverted.size]
+                if lut is None:
+                    scores = data @ query
+                else:
+                    scores = centroid_scores[label] + lut[np.arange(self.pq_m), data].sum(axis=1)
+                all_ids.append(inverted.ids[:inverted.size].copy())
+                all_scores.append(scores)
+
+        if not all_ids:
+            return []
+        ids = np.concatenate(all_ids)
+        scores = np.concatenate(all_scores).astype(np.float32)
+
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.lexsort((ids, -scores))
+        return [{"id": int(ids[i]), "similarity": float(scores[i])} for i in order]
+
+    def build_from_store(self, store: EmbeddingStore) -> int:
+        """
+        Entraîne l'index sur les embeddings stockés puis les y ajoute tous.
+
+        Args:
+            store: Stockage des embeddings
+
+        Returns:
+            Nombre de vecteurs indexés
+        """
+        limit = min(MAX_TRAINING_POINTS, TRAINING_POINTS_PER_CENTROID * max(self.nlist, 2 ** self.pq_bits))
+        self.train(store.sample(limit, seed=self.seed))
+        self.model_key = store.model_key
+        self.sync_from_store(store)
+        if self.snapshot_path:
+            self.save(self.snapshot_path)
+        return len(self)
+
+    def sync_from_store(self, store: EmbeddingStore) -> int:
+        """
+        Reprend les embeddings ajoutés au stockage, y compris par d'autres processus.
+
+        Seules les lignes ajoutées depuis la dernière synchronisation sont lues ;
+        après une suppression (ou au premier appel), tout le stockage est
+        parcouru et les images qui n'y sont plus sont retirées de l'index.
+
+        Returns:
+            Nombre de vecteurs ajoutés
+        """
+        if not self.is_trained or self.model_key != store.model_key:
+            return 0
+
+        with self._sync_lock:
+            version = store.version()
+            if version == self._store_version:
+                return 0
+
+            previous = self._store_version
+            start = previous[1] if previous and previous[0] == version[0] and previous[1] <= version[1] else 0
+            added = 0
+            seen = set()
+            for ids, vectors in store.iter_blocks(start=start):
+                if not start:
+                    seen.update(ids.tolist())
+                missing = np.array([image_id not in self._locations for image_id in ids.tolist()], dtype=bool)
+                if missing.any():
+                    added += self.add(ids[missing], vectors[missing])
+
+            if not start:
+                with self._lock:
+                    for image_id in [i for i in self._locations if i not in seen]:
+                        self._remove_unlocked(image_id)
+            self._store_version = version
+
+        if added:
+            logger.info(f"✅ Index IVF synchronisé: {added} vecteurs ajoutés")
+        return added
+
+    def save(self, path: str):
+        """
+        Sauvegarde l'index sur disque (format .npz).
+
+        Args:
+            path: Chemin du fichier de sauvegarde
+        """
+        with self._lock:
+            if not self.is_trained:
+                raise RuntimeError("Index IVF non entraîné")
+
+            sizes = np.array([inverted.size for inverted in self._lists], dtype=np.int64)
+            arrays = {
+                "params": np.array([self.dim, self.nlist, self.pq_m, self.pq_bits, self.seed], dtype=np.int64),
+                "centroids": self.centroids,
+                "codebooks": self.codebooks if self.codebooks is not None else np.empty(0, dtype=np.float32),
+                "sizes": sizes,
+                "ids": np.concatenate([inverted.ids[:inverted.size] for inverted in self._lists]),
+                "data": np.concatenate([inverted.data[:inverted.size] for inverted in self._lists]),
+                "model_key": np.array(self.model_key or ''),
+            }
+
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Fichier temporaire unique: plusieurs processus peuvent sauvegarder en même temps
+            fd, tmp_path = tempfile.mkstemp(dir=directory or None, prefix=os.path.basename(path), suffix='.tmp.npz')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez(f, **arrays)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._pending_writes = 0
+
+    def load(self, path: str, model_key: Optional[str] = None) -> bool:
+        """
+        Charge un index sauvegardé avec save().
+
+        Args:
+            path: Chemin du fichier de sauvegarde
+            model_key: Modèle des embeddings attendu (EmbeddingStore.model_key)
+
+        Returns:
+            True si le chargement a réussi
+        """
+        if not os.path.exists(path):
+            return False
+
+        try:
+            with np.load(path) as data:
+                dim, nlist, pq_m, pq_bits, seed = (int(v) for v in data["params"])
+                centroids = data["centroids"]
+                codebooks = data["codebooks"] if pq_m else None
+                sizes = data["sizes"]
+                ids = data["ids"]
+                vectors = data["data"]
+                saved_key = str(data["model_key"]) if "model_key" in data else ''
+        except Exception as e:
+            logger.warning(f"⚠️ Index IVF illisible ({path}): {e}")
+            return False
+
+        if saved_key != (model_key or ''):
+            logger.warning(f"⚠️ Index IVF construit pour un autre modèle ({path}: {saved_key or 'inconnu'}), ignoré")
+            return False
+
+        with self._lock:
+            self.dim, self.nlist, self.pq_m, self.pq_bits, self.seed = dim, nlist, pq_m, pq_bits, seed
+            self.centroids = centroids
+            self.codebooks = codebooks
+            self.model_key = model_key
+            self._reset_lists()
+
+            offsets = np.concatenate([[0], np.cumsum(sizes)])
+            for label in range(nlist):
+                start, stop = offsets[label], offsets[label + 1]
+                if stop > start:
+                    self._lists[label].append(ids[start:stop], vectors[start:stop])
+                    self._locations.update((int(i), label) for i in ids[start:stop])
+            self._pending_writes = 0
+
+        logger.info(f"✅ Index IVF chargé depuis {path}: {len(self)} vecteurs")
+        return True
+
+    def _reset_lists(self):
+        width = self.pq_m or self.dim
+        dtype = np.uint8 if self.pq_m else np.float32
+        self._lists = [_InvertedList(width, dtype) for _ in range(self.nlist)]
+        self._locations = {}
+        self._pending_writes = 0
+        self._store_version = None
+
+    def _remove_unlocked(self, image_id: int) -> bool:
+        label = self._locations.pop(image_id, None)
+        if label is None:
+            return False
+        return self._lists[label].remove(image_id)
+
+    def _encode(self, data: np.ndarray, labels: np.ndarray) -> np.ndarray:
+        """Vecteurs complets (IVF-Flat) ou codes PQ des résidus."""
+        if not self.pq_m:
+            return data
+        residuals = data - self.centroids[labels]
+        sub_dim = self.dim // self.pq_m
+        codes = np.empty((len(data), self.pq_m), dtype=np.uint8)
+        for m in range(self.pq_m):
+            codes[:, m] = assign(residuals[:, m * sub_dim:(m + 1) * sub_dim], self.codebooks[m])
+        return codes
+
+    def _normalize(self, vectors: Any) -> np.ndarray:
+        """Convertit en matrice float32 (n, dim) de lignes normalisées."""
+        data = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        norms = np.linalg.norm(data, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return data / norms
+
+
+# Instance partagée par les services et les routes
+ann_index = IVFIndex()
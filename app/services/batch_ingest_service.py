@@ -0,0 +1,352 @@
+"""
+Ingestion par lots (POST /api/v2/upload/batch).
+
+Les images arrivent une à une (fichiers multipart ou membres d'une archive ZIP)
+et sont traitées par paquets de taille fixe, ce qui garde la mémoire constante
+quel que soit le nombre d'images:
+
+1. validation et empreintes exactes (doublons: une requête pour tout le paquet) ;
+2. décodage, hashes, stéganographie, métadonnées et entrées des réseaux sur le
+   pool de processus partagé ;
+3. détection IA et embeddings ResNet50 en une inférence par paquet ;
+4. lignes ImageAnalysis, hashes, journal d'index et empreintes en un seul commit ;
+5. recherche de similarité sur l'index pour tout le paquet.
+
+Chaque image produit une ligne de résultat dès que son paquet est terminé.
+"""
+
+import io
+import os
+import time
+import zipfile
+import logging
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app.models.image_models import ImageAnalysis, db
+from app.models.hash_models import ImageHash, ImageDigest, IndexChange
+from app.services.hash_index import perceptual_hash_index
+from app.services.blob_store import BlobStore, normalize_extension
+from app.services.exact_duplicates import build_duplicate_response, find_exact_duplicate, find_exact_duplicates
+from app.services.steganography_service import SteganographyService
+from app.utils.digests import compute_stream_digests
+from app.utils.exceptions import ValidationError
+from app.utils.image_context import ImageContext
+from app.utils.image_hashing import PARALLEL_MIN_IMAGES
+from app.utils.preprocessing import model_input_array
+from app.utils.pools import get_process_pool, process_pool_size, default_workers
+
+logger = logging.getLogger(__name__)
+
+# Tailles d'entrée des réseaux (mêmes redimensionnements que les analyses unitaires)
+AI_INPUT_SIZE = (128, 128)
+RESNET_INPUT_SIZE = (224, 224)
+
+# Membres d'archive ignorés (métadonnées macOS)
+ZIP_SKIPPED_PREFIXES = ('__MACOSX/',)
+
+
+def analyze_image_bytes(data: bytes, ai_input: bool = True, resnet_input: bool = True) -> Dict[str, Any]:
+    """
+    Analyses CPU d'une image (exécutée dans le pool de processus).
+
+    Args:
+        data: Contenu du fichier image
+        ai_input: Préparer l'entrée 128x128 du modèle de détection IA
+        resnet_input: Préparer l'entrée 224x224 de ResNet50
+
+    Returns:
+        Dictionnaire {hashes, steganography, metadata, context_signature[, ai_input, resnet_input]}
+        ou {"error": message}
+    """
+    try:
+        context = ImageContext(data=data)
+        result = {
+            "hashes": SteganographyService.generate_image_hashes(context),
+            "steganography": SteganographyService.detect_hidden_message(context),
+            "metadata": context.metadata
+        }
+        try:
+            result["context_signature"] = SteganographyService.generate_image_context_signature(context)
+        except Exception:
+            result["context_signature"] = None
+
+        if ai_input:
+            result["ai_input"] = model_input_array(context, AI_INPUT_SIZE, Image.Resampling.LANCZOS)
+        if resnet_input:
+            result["resnet_input"] = model_input_array(context, RESNET_INPUT_SIZE, Image.Resampling.NEAREST)
+        return result
+    except Exception as e:
+        return {"error": f"Analyse impossible: {str(e)}"}
+
+
+def iter_uploaded_files(files: Iterable[FileStorage]) -> Iterator[Dict[str, Any]]:
+    """Images d'une requête multipart, lues une à une."""
+    for file in files:
+        yield {"filename": file.filename, "data": file.read()}
+
+
+def iter_zip_members(archive: zipfile.ZipFile, max_size: int) -> Iterator[Dict[str, Any]]:
+    """
+    Images d'une archive ZIP, décompressées une à une.
+
+    Args:
+        archive: Archive ouverte
+        max_size: Taille maximale d'une image décompressée (protection contre les bombes ZIP)
+    """
+    for info in archive.infolist():
+        basename = os.path.basename(info.filename)
+        if info.is_dir() or info.filename.startswith(ZIP_SKIPPED_PREFIXES) or basename.startswith('.'):
+            continue
+
+        too_large = {"filename": info.filename,
+                     "error": f"Fichier trop volumineux. Taille maximale: {max_size / (1024*1024):.1f} MB"}
+        if info.file_size > max_size:
+            yield too_large
+            continue
+        with archive.open(info) as member:
+            data = member.read(max_size + 1)
+        yield too_large if len(data) > max_size else {"filename": info.filename, "data": data}
+
+
+class BatchIngestService:
+    """Service d'ingestion par lots (analyse, enregistrement et similarité par paquets)."""
+
+    def __init__(self, stego_service, ai_service, validator, upload_folder: str,
+                 chunk_size: int = 32, max_workers: Optional[int] = None):
+        """
+        Initialise le service.
+
+        Args:
+            stego_service: Service de stéganographie (recherche de similarité)
+            ai_service: Service de détection IA (inférences par lot)
+            validator: Validateur d'images
+            upload_folder: Dossier des images enregistrées
+            chunk_size: Nombre d'images par paquet
+            max_workers: Nombre de processus du pool partagé
+        """
+        self.stego_service = stego_service
+        self.ai_service = ai_service
+        self.validator = validator
+        self.upload_folder = upload_folder
+        self.blob_store = BlobStore(upload_folder)
+        self.chunk_size = max(1, chunk_size)
+        self.max_workers = max_workers
+
+    def ingest(self, items: Iterable[Dict[str, Any]], k: Optional[int] = None,
+               max_distance: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Analyse et enregistre un lot d'images.
+
+        Args:
+            items: Images {filename, data} (ou {filename, error}), consommées paquet par paquet
+            k: Nombre maximal d'images similaires par image
+            max_distance: Distance de Hamming moyenne maximale
+
+        Yields:
+            Une ligne de résultat par image, puis {"summary": {...}}
+        """
+        started = time.perf_counter()
+        summary = {"total": 0, "analysed": 0, "duplicates": 0, "errors": 0}
+        seen: Dict[str, int] = {}  # sha256 -> image_id des images de la requête
+        iterator = iter(items)
+
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                break
+            for line in self._ingest_chunk(chunk, summary["total"], k, max_distance, seen):
+                if "error" in line:
+                    summary["errors"] += 1
+                elif line["duplicate"]["hit"]:
+                    summary["duplicates"] += 1
+                else:
+                    summary["analysed"] += 1
+                yield line
+            summary["total"] += len(chunk)
+
+        elapsed = time.perf_counter() - started
+        summary["elapsed_seconds"] = round(elapsed, 3)
+        summary["images_per_second"] = round(summary["total"] / elapsed, 1) if elapsed > 0 else None
+        logger.info(f"📊 Ingestion par lot: {summary}")
+        yield {"summary": summary}
+
+    def _ingest_chunk(self, chunk: List[Dict[str, Any]], offset: int, k: Optional[int],
+                      max_distance: Optional[float], seen: Dict[str, int]) -> List[Dict[str, Any]]:
+        """Traite un paquet d'images ; renvoie les lignes de résultat dans l'ordre du paquet."""
+        lines = [{"index": offset + position, "original_filename": item["filename"]}
+                 for position, item in enumerate(chunk)]
+
+        # 1. Validation et empreintes exactes
+        candidates = []  # (position, data, digests)
+        for position, item in enumerate(chunk):
+            if "error" in item:
+                lines[position]["error"] = item["error"]
+                continue
+            data = item["data"]
+            try:
+                self.validator.validate_image_file(
+                    FileStorage(io.BytesIO(data), filename=item["filename"]),
+                    context=ImageContext(data=data, filename=item["filename"])
+                )
+            except ValidationError as e:
+                lines[position]["error"] = str(e)
+                continue
+            candidates.append((position, data, compute_stream_digests(io.BytesIO(data))))
+
+        # Doublons exacts: base, requête en cours et paquet lui-même
+        known = find_exact_duplicates([digests["sha256"] for _, _, digests in candidates])
+        to_analyse, copies = [], {}  # copies: position -> (position du premier exemplaire du paquet, empreintes)
+        first_in_chunk: Dict[str, int] = {}
+        for position, data, digests in candidates:
+            sha256 = digests["sha256"]
+            if sha256 in known:
+                self._mark_duplicate(lines[position], known[sha256], digests, k, max_distance)
+            elif sha256 in seen:
+                self._mark_duplicate(lines[position], self._original(sha256, seen[sha256]), digests, k, max_distance)
+            elif sha256 in first_in_chunk:
+                copies[position] = (first_in_chunk[sha256], digests)
+            else:
+                first_in_chunk[sha256] = position
+                to_analyse.append((position, data, digests))
+
+        # 2. Analyses CPU sur le pool de processus
+        analyses = self._analyze([data for _, data, _ in to_analyse])
+        ready = []
+        for (position, data, digests), analysis in zip(to_analyse, analyses):
+            if "error" in analysis:
+                lines[position]["error"] = analysis["error"]
+            else:
+                ready.append((position, data, digests, analysis))
+
+        # 3. Inférences par paquet
+        ai_results = self.ai_service.detect_ai_images_batch([analysis.get("ai_input") for *_, analysis in ready])
+        features = self.ai_service.extract_features_batch([analysis.get("resnet_input") for *_, analysis in ready])
+
+        # 4. Enregistrement en une seule transaction
+        stored = self._store(ready, ai_results, lines)
+        if stored:
+            image_ids = [image_id for _, image_id, _ in stored]
+            for position, image_id, hashes in stored:
+                perceptual_hash_index.add(image_id, hashes)
+                seen[lines[position]["duplicate"]["sha256"]] = image_id
+            self.ai_service.index_image_embeddings_batch(image_ids, features)
+
+            # 5. Similarité pour tout le paquet (l'image elle-même exclue)
+            similar_lists = self.stego_service.find_similar_images_batch(
+                [hashes for _, _, hashes in stored], k=k, max_distance=max_distance, exclude_ids=image_ids
+            )
+            for (position, _, _), similar_images in zip(stored, similar_lists):
+                lines[position]["similar_images"] = similar_images
+                lines[position]["similar_found"] = len(similar_images) > 0
+
+        for position, (first, digests) in copies.items():
+            if "image_id" in lines[first]:
+                original = self._original(digests["sha256"], lines[first]["image_id"])
+                self._mark_duplicate(lines[position], original, digests, k, max_distance)
+            else:
+                lines[position]["error"] = lines[first].get("error", "Analyse impossible")
+        return lines
+
+    def _analyze(self, blobs: List[bytes]) -> List[Dict[str, Any]]:
+        """Analyses CPU des images, réparties sur le pool de processus partagé."""
+        analyze = partial(
+            analyze_image_bytes,
+            ai_input=getattr(self.ai_service, 'ai_model', None) is not None,
+            resnet_input=getattr(self.ai_service, 'resnet_model', None) is not None
+        )
+        if len(blobs) < PARALLEL_MIN_IMAGES:
+            return [analyze(data) for data in blobs]
+
+        pool = get_process_pool(self.max_workers)
+        workers = process_pool_size() or default_workers()
+        return list(pool.map(analyze, blobs, chunksize=max(1, len(blobs) // (2 * workers))))
+
+    def _store(self, ready: List[tuple], ai_results: List[Dict[str, Any]],
+               lines: List[Dict[str, Any]]) -> List[tuple]:
+        """
+        Enregistre les fichiers puis toutes les lignes du paquet en un seul commit.
+
+        Returns:
+            Liste (position, image_id, hashes) des images enregistrées
+        """
+        if not ready:
+            return []
+
+        written, rows = [], []
+        try:
+            for (position, data, digests, analysis), ai_result in zip(ready, ai_results):
+                _, filepath, _ = self.blob_store.put_bytes(
+                    data, normalize_extension(lines[position]["original_filename"]), digests
+                )
+                written.append(digests["sha256"])
+
+                analysis_results = {
+                    "steganography": analysis["steganography"],
+                    "ai_detection": ai_result,
+                    "metadata": analysis["metadata"],
+                    "context_signature": analysis["context_signature"]
+                }
+                rows.append((position, digests, analysis, analysis_results, ImageAnalysis(
+                    filename=os.path.basename(lines[position]["original_filename"]),
+                    image_path=filepath,
+                    perceptual_hash=analysis["hashes"].get("phash"),
+                    md5_hash=digests["md5"],
+                    ai_confidence=ai_result.get('confidence', 0),
+                    has_steganography=analysis["steganography"].get('signature_detected', False),
+                    metadata_json=str(analysis["metadata"]),
+                    upload_timestamp=datetime.utcnow()
+                )))
+
+            db.session.add_all([row for *_, row in rows])
+            db.session.flush()
+            for position, digests, analysis, analysis_results, row in rows:
+                self.blob_store.add_reference(row.image_path, digests)
+                db.session.add(ImageHash.from_hashes(row.id, analysis["hashes"]))
+                IndexChange.record(row.id)
+                try:
+                    # Téléchargement concurrent du même contenu: l'index unique garde la première analyse
+                    with db.session.begin_nested():
+                        db.session.add(ImageDigest.record(
+                            row.id, digests, {"analysis": analysis_results, "perceptual_hashes": analysis["hashes"]}
+                        ))
+                except Exception as e:
+                    logger.warning(f"⚠️ Empreinte non enregistrée pour l'image {row.id}: {str(e)}")
+            db.session.commit()
+
+        except Exception as e:
+            db.session.rollback()
+            for sha256 in written:
+                self.blob_store.discard_if_unreferenced(sha256)
+            logger.error(f"❌ Enregistrement du paquet impossible: {str(e)}")
+            for position, *_ in ready:
+                lines[position]["error"] = f"Erreur lors de l'enregistrement: {str(e)}"
+            return []
+
+        stored = []
+        for position, digests, analysis, analysis_results, row in rows:
+            lines[position].update({
+                "image_id": row.id,
+                "filename": os.path.basename(row.image_path),
+                "image_path": row.image_path,
+                "analysis": analysis_results,
+                "perceptual_hashes": analysis["hashes"],
+                "duplicate": {"hit": False, "sha256": digests["sha256"]}
+            })
+            stored.append((position, row.id, analysis["hashes"]))
+        return stored
+
+    @staticmethod
+    def _original(sha256: str, image_id: int) -> tuple:
+        """Analyse d'origine d'un contenu enregistré plus tôt dans la requête: (ImageDigest, ImageAnalysis)."""
+        return find_exact_duplicate(sha256) or (None, db.session.get(ImageAnalysis, image_id))
+
+    def _mark_duplicate(self, line: Dict[str, Any], original: tuple, digests: Dict[str, Any],
+                        k: Optional[int], max_distance: Optional[float]):
+        """Ligne d'un doublon exact: même réponse que /api/v2/upload pour ce doublon."""
+        line.update(build_duplicate_response(self.stego_service, *original, digests, k, max_distance))
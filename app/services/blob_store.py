@@ -0,0 +1,231 @@
+"""
+Stockage des fichiers téléchargés adressé par le contenu.
+
+Chaque fichier est nommé par son SHA-256 et rangé dans deux niveaux de
+sous-dossiers (ab/cd/abcd...ef.png): un contenu identique n'est stocké qu'une
+fois et aucun dossier ne grossit indéfiniment. L'écriture passe par un fichier
+temporaire renommé atomiquement: un fichier visible est toujours complet.
+
+Les analyses (ImageAnalysis) et les fichiers publiés référencent les fichiers
+via la table stored_blobs (compteur de références); un fichier n'est supprimé
+qu'une fois sa dernière référence retirée. La vérification du compteur et la
+suppression du fichier se font sous le verrou de la ligne stored_blobs, que
+prend aussi chaque nouvelle référence: une référence ajoutée pendant une
+suppression la voit et échoue au lieu de pointer vers un fichier disparu.
+Les fichiers de l'ancien dossier plat restent servis tels quels.
+"""
+
+import io
+import os
+import re
+import uuid
+import logging
+from typing import Dict, Any, Optional, Tuple, BinaryIO
+
+from werkzeug.utils import secure_filename
+
+from app.models.image_models import db
+from app.models.blob_models import StoredBlob
+from app.utils.digests import compute_stream_digests, save_stream_with_digests
+
+logger = logging.getLogger(__name__)
+
+# Nom public d'un fichier stocké: <sha256><extension>
+BLOB_FILENAME = re.compile(r'^([0-9a-f]{64})(\.[a-z0-9]{1,9})?$')
+
+# Dossier des écritures en cours (même système de fichiers: renommage atomique)
+TEMP_DIR = '.tmp'
+
+
+def normalize_extension(filename: Optional[str]) -> str:
+    """Extension (en minuscules) d'un nom de fichier téléchargé, ou '' si absente ou invalide."""
+    extension = os.path.splitext(secure_filename(filename or ''))[1].lower()
+    return extension if re.fullmatch(r'\.[a-z0-9]{1,9}', extension) else ''
+
+
+class BlobStore:
+    """Fichiers nommés par leur SHA-256, répartis en sous-dossiers ab/cd/."""
+
+    def __init__(self, root: str):
+        """
+        Initialise le stockage.
+
+        Args:
+            root: Dossier racine (UPLOAD_FOLDER)
+        """
+        self.root = root
+        self.temp_dir = os.path.join(root, TEMP_DIR)
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    @staticmethod
+    def relative_path(sha256: str, extension: str = '') -> str:
+        """Chemin d'un fichier relatif à la racine (ab/cd/<sha256><extension>)."""
+        return os.path.join(sha256[:2], sha256[2:4], f"{sha256}{extension}")
+
+    def path(self, sha256: str, extension: str = '') -> str:
+        """Chemin complet d'un fichier."""
+        return os.path.join(self.root, self.relative_path(sha256, extension))
+
+    @staticmethod
+    def digest_of(filepath: Optional[str]) -> Optional[str]:
+        """SHA-256 d'un fichier du stockage d'après son nom, ou None (ancien dossier plat)."""
+        match = BLOB_FILENAME.match(os.path.basename(filepath or ''))
+        return match.group(1) if match is not None else None
+
+    def find(self, sha256: str) -> Optional[str]:
+        """Chemin du fichier déjà stocké pour ce contenu (quelle que soit son extension), ou None."""
+        shard = os.path.join(self.root, sha256[:2], sha256[2:4])
+        try:
+            with os.scandir(shard) as entries:
+                for entry in entries:
+                    if entry.name.startswith(sha256) and BLOB_FILENAME.match(entry.name):
+                        return entry.path
+        except FileNotFoundError:
+            pass
+        return None
+
+    def temp_path(self, extension: str = '') -> str:
+        """Chemin temporaire dans le stockage (à passer ensuite à put_file)."""
+        return os.path.join(self.temp_dir, f"{uuid.uuid4().hex}{extension}")
+
+    def put_bytes(self, data: bytes, extension: str = '',
+                  digests: Optional[Dict[str, Any]] = None) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Stocke un contenu en mémoire (rien n'est écrit s'il est déjà présent).
+
+        Args:
+            data: Contenu du fichier
+            extension: Extension du fichier (par exemple '.png')
+            digests: Empreintes déjà calculées {sha256, md5, size} (optionnel)
+
+        Returns:
+            Tuple (nom_fichier, chemin_complet, empreintes)
+        """
+        digests = digests or compute_stream_digests(io.BytesIO(data))
+        existing = self.find(digests["sha256"])
+        if existing is not None:
+            return os.path.basename(existing), existing, digests
+
+        temp = self.temp_path(extension)
+        with open(temp, 'wb') as f:
+            f.write(data)
+        return self._commit(temp, digests, extension)
+
+    def put_stream(self, stream: BinaryIO, extension: str = '') -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Stocke un flux (FileStorage) en calculant ses empreintes pendant l'écriture.
+
+        Args:
+            stream: Flux binaire ou FileStorage de werkzeug
+            extension: Extension du fichier
+
+        Returns:
+            Tuple (nom_fichier, chemin_complet, empreintes)
+        """
+        temp, digests = save_stream_with_digests(stream, self.temp_path(extension))
+        return self._commit(temp, digests, extension)
+
+    def put_file(self, path: str, extension: Optional[str] = None) -> Tuple[str, str, Dict[str, Any]]:
+        """
+        Déplace un fichier dans le stockage (le fichier source est consommé).
+
+        Args:
+            path: Fichier sur le même système de fichiers (par exemple issu de temp_path)
+            extension: Extension du fichier (par défaut celle de path)
+
+        Returns:
+            Tuple (nom_fichier, chemin_complet, empreintes)
+        """
+        with open(path, 'rb') as f:
+            digests = compute_stream_digests(f)
+        return self._commit(path, digests, normalize_extension(path) if extension is None else extension)
+
+    def _commit(self, temp: str, digests: Dict[str, Any], extension: str) -> Tuple[str, str, Dict[str, Any]]:
+        """Publie un fichier temporaire sous son nom définitif (ou l'écarte s'il est déjà stocké)."""
+        existing = self.find(digests["sha256"])
+        if existing is None:
+            target = self.path(digests["sha256"], extension)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(temp, target)  # Atomique: le fichier n'apparaît que complet
+            existing = target
+        else:
+            os.remove(temp)
+        return os.path.basename(existing), existing, digests
+
+    def resolve(self, filename: str) -> Optional[str]:
+        """
+        Chemin (relatif à la racine) d'un fichier servi par /uploads/<filename>.
+
+        Args:
+            filename: Nom public <sha256><extension>, ou nom d'un fichier de l'ancien dossier plat
+
+        Returns:
+            Chemin relatif, ou None si le fichier n'existe pas
+        """
+        match = BLOB_FILENAME.match(filename or '')
+        if match is not None:
+            relative = self.relative_path(match.group(1), match.group(2) or '')
+            if os.path.isfile(os.path.join(self.root, relative)):
+                return relative
+
+        legacy = secure_filename(filename or '')
+        if legacy and legacy == filename and os.path.isfile(os.path.join(self.root, legacy)):
+            return legacy
+        return None
+
+    def add_reference(self, filepath: str, digests: Dict[str, Any]) -> StoredBlob:
+        """
+        Référence un fichier stocké depuis une analyse (à valider avec la transaction courante).
+
+        Args:
+            filepath: Chemin renvoyé par put_*
+            digests: Empreintes du fichier
+
+        Raises:
+            FileNotFoundError: Fichier supprimé entre son écriture et la référence
+                               (dernière référence retirée en même temps)
+        """
+        blob = StoredBlob.acquire(digests["sha256"], os.path.splitext(filepath)[1], digests.get("size"))
+        # Ligne verrouillée par acquire: aucune suppression ne peut plus passer avant le commit
+        if self.find(digests["sha256"]) is None:
+            raise FileNotFoundError(f"Fichier {digests['sha256'][:12]} supprimé avant d'être référencé")
+        return blob
+
+    def release(self, sha256: str) -> int:
+        """
+        Retire une référence (à valider avec la transaction courante) ; après le commit,
+        discard_if_unreferenced supprime le fichier si c'était la dernière.
+
+        Returns:
+            Nombre de références restantes
+        """
+        return StoredBlob.release(sha256)
+
+    def discard_if_unreferenced(self, sha256: str) -> bool:
+        """
+        Supprime un fichier qu'aucune analyse ne référence (rollback, dernière référence retirée).
+
+        Le compteur est relu et le fichier supprimé sous le verrou de sa ligne
+        stored_blobs, libéré au commit.
+
+        Returns:
+            True si le fichier a été supprimé
+        """
+        try:
+            blob = StoredBlob.lock(sha256)
+            if blob is not None and blob.ref_count > 0:
+                db.session.rollback()
+                return False
+            if blob is not None:
+                db.session.delete(blob)
+                db.session.flush()
+
+            path = self.find(sha256)
+            if path is not None:
+                os.remove(path)
+            db.session.commit()
+            return path is not None
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"⚠️ Suppression du fichier {sha256[:12]} impossible: {str(e)}")
+            return False
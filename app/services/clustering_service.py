@@ -0,0 +1,323 @@
+"""
+Regroupement hors ligne des quasi-doublons de toute la base.
+
+Chaque image est interrogée une seule fois dans l'index multi-hash (rayon r) ;
+les paires trouvées alimentent une structure union-find dont les composantes
+connexes deviennent les groupes. Le résultat est écrit dans
+image_hashes.cluster_id (plus petit identifiant du groupe, NULL pour une image
+isolée).
+
+La tâche est reprenable: l'état union-find est sauvegardé périodiquement avec
+le curseur (dernier identifiant traité) dans la table clustering_jobs.
+"""
+
+import os
+import time
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Any, Callable, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import inspect, text
+
+from app.models.image_models import db
+from app.models.hash_models import ImageHash
+from app.models.cluster_models import ClusteringJob
+from app.services.hash_index import PerceptualHashIndex, perceptual_hash_index
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'identifiants par requête UPDATE lors de l'écriture des groupes
+WRITE_BATCH_SIZE = 500
+
+
+class UnionFind:
+    """Union-find sur des identifiants entiers ; la racine est le plus petit identifiant."""
+
+    def __init__(self):
+        self.parent: Dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        root = parent.setdefault(item, item)
+        while root != parent[root]:
+            parent[root] = parent[parent[root]]  # Compression de chemin par moitié
+            root = parent[root]
+        return root
+
+    def union(self, first: int, second: int) -> bool:
+        """Fusionne deux ensembles ; renvoie True s'ils étaient distincts."""
+        root1, root2 = self.find(first), self.find(second)
+        if root1 == root2:
+            return False
+        if root2 < root1:
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        self.parent[first] = self.parent[second] = root1
+        return True
+
+    def groups(self) -> Dict[int, List[int]]:
+        """Composantes connexes {racine: membres triés}."""
+        groups: Dict[int, List[int]] = {}
+        for item in sorted(self.parent):
+            groups.setdefault(self.find(item), []).append(item)
+        return groups
+
+    def save(self, path: str):
+        """Sauvegarde atomique de l'état (.npz)."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            items=np.fromiter(self.parent.keys(), dtype=np.int64, count=len(self.parent)),
+            parents=np.fromiter(self.parent.values(), dtype=np.int64, count=len(self.parent))
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'UnionFind':
+        """Recharge un état sauvegardé par save()."""
+        union_find = cls()
+        with np.load(path) as data:
+            union_find.parent = dict(zip(data["items"].tolist(), data["parents"].tolist()))
+        return union_find
+
+
+def ensure_cluster_column():
+    """Ajoute la colonne image_hashes.cluster_id aux bases créées avant son introduction."""
+    columns = {column["name"] for column in inspect(db.engine).get_columns(ImageHash.__tablename__)}
+    if 'cluster_id' not in columns:
+        with db.engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {ImageHash.__tablename__} ADD COLUMN cluster_id INTEGER"))
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_{ImageHash.__tablename__}_cluster_id "
+                f"ON {ImageHash.__tablename__} (cluster_id)"
+            ))
+        logger.info("✅ Colonne image_hashes.cluster_id ajoutée")
+
+
+class DuplicateClusteringService:
+    """Service de regroupement des quasi-doublons (union-find sur les paires à distance <= r)."""
+
+    def __init__(self, index: Optional[PerceptualHashIndex] = None,
+                 checkpoint_dir: str = 'instance/clustering', checkpoint_every: int = 5000):
+        """
+        Initialise le service.
+
+        Args:
+            index: Index multi-hash utilisé pour trouver les paires
+            checkpoint_dir: Dossier des sauvegardes union-find
+            checkpoint_every: Nombre d'images traitées entre deux sauvegardes
+        """
+        self.index = index if index is not None else perceptual_hash_index
+        self.checkpoint_dir = checkpoint_dir
+        self.checkpoint_every = checkpoint_every
+
+    def create_job(self, radius: float) -> ClusteringJob:
+        """
+        Crée une tâche de regroupement.
+
+        Args:
+            radius: Distance de Hamming moyenne maximale entre deux images d'un groupe
+
+        Returns:
+            Tâche enregistrée (statut pending)
+        """
+        job = ClusteringJob(radius=float(radius), status=ClusteringJob.STATUS_PENDING)
+        db.session.add(job)
+        db.session.commit()
+        job.checkpoint_path = os.path.join(self.checkpoint_dir, f"job_{job.id}.npz")
+        db.session.commit()
+        return job
+
+    def active_job(self, stale_after: float) -> Optional[ClusteringJob]:
+        """
+        Tâche en attente ou en cours, mise à jour depuis moins de stale_after secondes.
+
+        Une tâche plus ancienne est considérée comme interrompue (processus
+        arrêté) et peut être reprise.
+
+        Args:
+            stale_after: Délai sans sauvegarde intermédiaire (secondes)
+        """
+        limit = datetime.utcnow() - timedelta(seconds=stale_after)
+        return ClusteringJob.query.filter(
+            ClusteringJob.status.in_([
+                ClusteringJob.STATUS_PENDING, ClusteringJob.STATUS_RUNNING, ClusteringJob.STATUS_WRITING
+            ]),
+            ClusteringJob.updated_at >= limit
+        ).order_by(ClusteringJob.id.desc()).first()
+
+    def resumable_job(self) -> Optional[ClusteringJob]:
+        """Dernière tâche interrompue (ou échouée) pouvant être reprise."""
+        return ClusteringJob.query.filter(
+            ClusteringJob.status.in_([
+                ClusteringJob.STATUS_PENDING, ClusteringJob.STATUS_RUNNING,
+                ClusteringJob.STATUS_WRITING, ClusteringJob.STATUS_FAILED
+            ])
+        ).order_by(ClusteringJob.id.desc()).first()
+
+    def run(self, job_id: int, progress: Optional[Callable[[ClusteringJob], None]] = None) -> ClusteringJob:
+        """
+        Exécute (ou reprend) une tâche de regroupement.
+
+        Args:
+            job_id: Identifiant de la tâche
+            progress: Fonction appelée à chaque sauvegarde intermédiaire
+
+        Returns:
+            Tâche terminée
+        """
+        job = db.session.get(ClusteringJob, job_id)
+        if job is None:
+            raise ValueError(f"Tâche de regroupement introuvable: {job_id}")
+
+        try:
+            ensure_cluster_column()
+            if not self.index.ready:
+                self.index.rebuild_from_db()
+            else:
+                self.index.refresh()
+
+            pairs_done = job.status == ClusteringJob.STATUS_WRITING
+            union_find = self._restore(job)
+            if not pairs_done:
+                job.status = ClusteringJob.STATUS_RUNNING
+                job.error = None
+                db.session.commit()
+                self._find_pairs(job, union_find, progress)
+
+            job.status = ClusteringJob.STATUS_WRITING
+            db.session.commit()
+            self._write_clusters(job, union_find)
+
+            job.status = ClusteringJob.STATUS_DONE
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            if job.checkpoint_path and os.path.exists(job.checkpoint_path):
+                os.remove(job.checkpoint_path)
+
+            logger.info(f"✅ Regroupement {job.id} terminé: {job.clusters} groupes, "
+                        f"{job.clustered_images} images, {job.images_per_second} images/s")
+            return job
+
+        except Exception as e:
+            db.session.rollback()
+            job = db.session.get(ClusteringJob, job_id)
+            job.status = ClusteringJob.STATUS_FAILED
+            job.error = str(e)
+            db.session.commit()
+            logger.error(f"❌ Regroupement {job_id} interrompu: {str(e)}")
+            raise
+
+    def _restore(self, job: ClusteringJob) -> UnionFind:
+        """Recharge l'état union-find sauvegardé, ou repart de zéro."""
+        if job.cursor and job.checkpoint_path and os.path.exists(job.checkpoint_path):
+            logger.info(f"🔄 Reprise du regroupement {job.id} après l'image {job.cursor}")
+            return UnionFind.load(job.checkpoint_path)
+        job.cursor = job.processed = job.pairs = 0
+        return UnionFind()
+
+    def _find_pairs(self, job: ClusteringJob, union_find: UnionFind,
+                    progress: Optional[Callable[[ClusteringJob], None]]):
+        """Interroge l'index pour chaque image restante et fusionne les paires trouvées."""
+        ids = np.sort(self.index.matrix.ids)
+        job.total = int(len(ids))
+        remaining = ids[ids > job.cursor].tolist()
+
+        started = time.perf_counter()
+        done_since_start = 0
+        for image_id in remaining:
+            hashes = self.index.get(image_id)
+            if hashes:
+                for match in self.index.query_radius(hashes, job.radius):
+                    # Chaque paire n'est comptée qu'une fois (vers les identifiants supérieurs)
+                    if match["id"] > image_id:
+                        job.pairs += 1
+                        union_find.union(image_id, match["id"])
+
+            job.cursor = image_id
+            job.processed += 1
+            done_since_start += 1
+            if done_since_start % self.checkpoint_every == 0:
+                self._checkpoint(job, union_find, done_since_start / (time.perf_counter() - started))
+                if progress:
+                    progress(job)
+
+        elapsed = time.perf_counter() - started
+        self._checkpoint(job, union_find, done_since_start / elapsed if elapsed > 0 else None)
+        if progress:
+            progress(job)
+
+    def _checkpoint(self, job: ClusteringJob, union_find: UnionFind, rate: Optional[float]):
+        """Sauvegarde l'état union-find puis le curseur (dans cet ordre, pour une reprise cohérente)."""
+        if job.checkpoint_path:
+            union_find.save(job.checkpoint_path)
+        job.images_per_second = round(rate, 1) if rate else job.images_per_second
+        db.session.commit()
+        logger.info(f"📊 Regroupement {job.id}: {job.processed}/{job.total} images, "
+                    f"{job.pairs} paires, {job.images_per_second} images/s")
+
+    def _write_clusters(self, job: ClusteringJob, union_find: UnionFind):
+        """Écrit cluster_id dans image_hashes (NULL pour les images isolées)."""
+        groups = union_find.groups()
+        ImageHash.query.filter(ImageHash.cluster_id.isnot(None)).update(
+            {ImageHash.cluster_id: None}, synchronize_session=False
+        )
+
+        for root, members in groups.items():
+            for batch in _batches(members, WRITE_BATCH_SIZE):
+                existing = {
+                    image_id for (image_id,) in
+                    db.session.query(ImageHash.image_id).filter(ImageHash.image_id.in_(batch))
+                }
+                for image_id in batch:
+                    if image_id not in existing:
+                        # Image non migrée: ligne créée à partir des hashes indexés
+                        db.session.add(ImageHash.from_hashes(image_id, self.index.get(image_id) or {}))
+                db.session.flush()
+                ImageHash.query.filter(ImageHash.image_id.in_(batch)).update(
+                    {ImageHash.cluster_id: root}, synchronize_session=False
+                )
+        db.session.commit()
+
+        job.clusters = len(groups)
+        job.clustered_images = sum(len(members) for members in groups.values())
+        db.session.commit()
+
+    def list_clusters(self, min_size: int = 2, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Liste les plus grands groupes de quasi-doublons.
+
+        Args:
+            min_size: Taille minimale d'un groupe
+            limit: Nombre maximal de groupes
+
+        Returns:
+            Liste de dicts {cluster_id, size, image_ids} par taille décroissante
+        """
+        size = db.func.count(ImageHash.id)
+        rows = db.session.query(ImageHash.cluster_id, size).filter(
+            ImageHash.cluster_id.isnot(None)
+        ).group_by(ImageHash.cluster_id).having(size >= min_size).order_by(
+            size.desc(), ImageHash.cluster_id
+        ).limit(limit).all()
+
+        members: Dict[int, List[int]] = {cluster_id: [] for cluster_id, _ in rows}
+        if members:
+            for cluster_id, image_id in db.session.query(ImageHash.cluster_id, ImageHash.image_id).filter(
+                ImageHash.cluster_id.in_(list(members))
+            ).order_by(ImageHash.image_id):
+                members[cluster_id].append(image_id)
+
+        return [
+            {"cluster_id": cluster_id, "size": count, "image_ids": members[cluster_id]}
+            for cluster_id, count in rows
+        ]
+
+
+def _batches(items: List[int], size: int) -> Iterable[List[int]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
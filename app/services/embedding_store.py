@@ -0,0 +1,489 @@
+"""
+Stockage persistant des embeddings ResNet50 des images analysées.
+
+Les vecteurs sont normalisés (norme L2 = 1) à l'insertion et conservés dans une
+matrice projetée en mémoire (np.memmap) indexée par ImageAnalysis.id. La
+similarité cosinus avec toute la base se réduit alors à un seul produit
+matrice-vecteur, sans aucune inférence CNN sur le corpus.
+
+Le stockage float16 divise la taille par deux mais impose une conversion en
+float32 à chaque recherche (environ 8 fois plus lente que le float32 natif).
+
+Les workers HTTP, les workers de tâches et l'ingestion par lot ouvrent les
+mêmes fichiers: chaque opération prend un verrou de fichier (exclusif pour
+les écritures, partagé pour les lectures) puis relit l'en-tête meta.npy
+(nombre de lignes, génération des fichiers, nombre de suppressions). Un
+agrandissement remplace les fichiers et incrémente la génération: les autres
+processus les reprojettent avant leur prochaine opération au lieu d'écrire
+dans l'ancien fichier.
+
+Les embeddings dépendent du modèle qui les a calculés (moteur Keras ou TFLite,
+quantification, prétraitement): chaque modèle a son propre sous-dossier
+(use_model), des vecteurs de modèles différents ne sont jamais comparés.
+"""
+
+import os
+import re
+import threading
+import contextlib
+import logging
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from app.utils.file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 2048  # Sortie de ResNet50 (pooling="avg")
+
+# Nombre de lignes converties en float32 à la fois lors d'une recherche
+SEARCH_BLOCK_ROWS = 8192
+
+VECTORS_FILE = 'vectors.npy'
+IDS_FILE = 'ids.npy'
+META_FILE = 'meta.npy'
+LOCK_FILE = 'store.lock'
+
+# Positions dans l'en-tête partagé
+META_COUNT, META_GENERATION, META_REMOVALS = range(3)
+
+
+class EmbeddingStore:
+    """Matrice d'embeddings normalisés, projetée en mémoire et indexée par identifiant d'image."""
+
+    def __init__(self, path: Optional[str] = None, dim: int = EMBEDDING_DIM,
+                 dtype: str = 'float32', capacity: int = 1024):
+        """
+        Initialise le stockage.
+
+        Args:
+            path: Dossier de stockage (None pour un stockage en mémoire uniquement)
+            dim: Dimension des embeddings
+            dtype: Type de stockage des vecteurs ('float16' ou 'float32')
+            capacity: Nombre de lignes réservées initialement
+        """
+        self.root = path
+        self.path = path
+        self.model_key = None
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.ready = False
+
+        self._lock = threading.RLock()
+        self._initial_capacity = max(int(capacity), 1)
+        self._vectors = None
+        self._ids = None
+        self._rows: Dict[int, int] = {}
+        self._count = 0
+
+        # État partagé entre processus (stockage sur disque uniquement)
+        self._meta = None
+        self._file_lock: Optional[FileLock] = None
+        self._locked = False
+        self._generation = None
+        self._removals = 0
+
+    def __len__(self) -> int:
+        with self._synchronized():
+            return self._count
+
+    def __contains__(self, image_id: int) -> bool:
+        with self._synchronized():
+            return int(image_id) in self._rows
+
+    @contextlib.contextmanager
+    def _synchronized(self, exclusive: bool = False):
+        """
+        Verrouille le stockage pour une opération et relit l'en-tête partagé.
+
+        Les appels imbriqués réutilisent le verrou déjà détenu.
+
+        Args:
+            exclusive: Verrou d'écriture (partagé pour une lecture)
+        """
+        with self._lock:
+            if self._file_lock is None or self._locked:
+                yield
+                return
+            with self._file_lock.acquire(shared=not exclusive):
+                self._locked = True
+                try:
+                    self._reload()
+                    yield
+                finally:
+                    self._locked = False
+
+    def _reload(self):
+        """Reprend les changements des autres processus (verrou de fichier détenu)."""
+        count, generation, removals = (int(value) for value in self._meta)
+        if generation != self._generation:
+            # Fichiers remplacés par un agrandissement: reprojeter
+            self._vectors = np.load(self._paths()[0], mmap_mode='r+')
+            self._ids = np.load(self._paths()[1], mmap_mode='r+')
+        if generation != self._generation or removals != self._removals or count < self._count:
+            self._rows = {int(image_id): row for row, image_id in enumerate(self._ids[:count])}
+        else:
+            for row in range(self._count, count):
+                self._rows[int(self._ids[row])] = row
+        self._count, self._generation, self._removals = count, generation, removals
+
+    def _publish(self):
+        """Écrit l'en-tête partagé après une modification."""
+        if self._meta is not None:
+            self._meta[META_COUNT] = self._count
+            self._meta[META_GENERATION] = self._generation
+            self._meta[META_REMOVALS] = self._removals
+
+    def open(self, path: Optional[str] = None, dtype: Optional[str] = None) -> int:
+        """
+        Ouvre (ou crée) le stockage sur disque.
+
+        Args:
+            path: Dossier de stockage (par défaut self.root), sous-dossier du modèle inclus
+            dtype: Type de stockage des vecteurs pour une création
+
+        Returns:
+            Nombre d'embeddings chargés
+        """
+        with self._lock:
+            if path is not None:
+                self.root = path
+            self.path = model_directory(self.root, self.model_key)
+            if dtype is not None:
+                self.dtype = np.dtype(dtype)
+
+            self._vectors = self._ids = self._meta = None
+            self._rows = {}
+            self._count = 0
+            self._generation = None
+            self._removals = 0
+
+            vectors_path, ids_path = self._paths()
+            if not vectors_path:
+                self._file_lock = None
+                self._install(*self._allocate(self._initial_capacity))
+            else:
+                os.makedirs(self.path, exist_ok=True)
+                self._file_lock = FileLock(os.path.join(self.path, LOCK_FILE))
+                with self._file_lock.acquire():
+                    self._open_files(vectors_path, ids_path)
+                    self._reload()
+
+            self.ready = True
+
+        logger.info(f"✅ Stockage d'embeddings ouvert: {self._count} vecteurs ({self.dtype})")
+        return self._count
+
+    def use_model(self, model_key: Optional[str]) -> bool:
+        """
+        Range les embeddings dans le sous-dossier du modèle qui les calcule.
+
+        Un stockage déjà ouvert est rouvert dans ce sous-dossier (un stockage
+        en mémoire est vidé).
+
+        Args:
+            model_key: Version du modèle d'extraction (None = dossier racine)
+
+        Returns:
+            True si le modèle a changé
+        """
+        with self._lock:
+            if model_key == self.model_key:
+                return False
+            self.model_key = model_key
+            if self.ready:
+                self.open()
+            else:
+                self.path = model_directory(self.root, model_key)
+        logger.info(f"🔄 Embeddings du modèle {model_key}")
+        return True
+
+    def _open_files(self, vectors_path: str, ids_path: str):
+        """Ouvre ou crée les fichiers et l'en-tête partagé (verrou exclusif détenu)."""
+        meta_path = os.path.join(self.path, META_FILE)
+        if os.path.exists(vectors_path) and os.path.exists(ids_path):
+            vectors = np.load(vectors_path, mmap_mode='r')
+            self.dim = vectors.shape[1]
+            self.dtype = vectors.dtype
+            del vectors
+            if not os.path.exists(meta_path):
+                # Stockage antérieur à l'en-tête: les lignes occupées sont
+                # contiguës, la première ligne libre vaut -1
+                ids = np.load(ids_path, mmap_mode='r')
+                free = np.flatnonzero(ids < 0)
+                count = int(free[0]) if len(free) else len(ids)
+                del ids
+                meta = np.lib.format.open_memmap(meta_path, mode='w+', dtype=np.int64, shape=(3,))
+                meta[:] = (count, 0, 0)
+                meta.flush()
+                del meta
+        else:
+            meta = np.lib.format.open_memmap(meta_path, mode='w+', dtype=np.int64, shape=(3,))
+            meta[:] = 0
+            meta.flush()
+            del meta
+            self._meta = None
+            self._install(*self._allocate(self._initial_capacity))
+        self._meta = np.load(meta_path, mmap_mode='r+')
+
+    def add(self, image_id: int, vector: Any) -> bool:
+        """
+        Ajoute ou remplace l'embedding d'une image.
+
+        Args:
+            image_id: Identifiant ImageAnalysis
+            vector: Vecteur de caractéristiques (non normalisé)
+
+        Returns:
+            True si l'embedding a été enregistré
+        """
+        vector = self._normalize(vector)
+        if vector is None:
+            return False
+
+        with self._lock:
+            if self._vectors is None:
+                self.open()
+
+        with self._synchronized(exclusive=True):
+            image_id = int(image_id)
+            row = self._rows.get(image_id)
+            if row is None:
+                if self._count == len(self._ids):
+                    self._grow(2 * len(self._ids))
+                row = self._count
+                self._vectors[row] = vector
+                self._ids[row] = image_id
+                self._rows[image_id] = row
+                self._count += 1
+                self._publish()
+            else:
+                self._vectors[row] = vector
+            return True
+
+    def get(self, image_id: int) -> Optional[np.ndarray]:
+        """Renvoie l'embedding normalisé (float32) d'une image, ou None."""
+        with self._synchronized():
+            row = self._rows.get(int(image_id))
+            if row is None:
+                return None
+            return np.asarray(self._vectors[row], dtype=np.float32)
+
+    def remove(self, image_id: int) -> bool:
+        """
+        Supprime l'embedding d'une image (la dernière ligne prend sa place).
+
+        Returns:
+            True si l'image était présente
+        """
+        with self._synchronized(exclusive=True):
+            row = self._rows.pop(int(image_id), None)
+            if row is None:
+                return False
+
+            last = self._count - 1
+            if row != last:
+                moved_id = int(self._ids[last])
+                self._vectors[row] = self._vectors[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+            self._ids[last] = -1
+            self._count = last
+            self._removals += 1
+            self._publish()
+            return True
+
+    def similarities(self, vector: Any, image_ids: Optional[list] = None) -> tuple:
+        """
+        Calcule la similarité cosinus entre un vecteur et les embeddings stockés.
+
+        Args:
+            vector: Vecteur de la requête (non normalisé)
+            image_ids: Restreindre le calcul à ces images (toutes par défaut)
+
+        Returns:
+            Tuple (ids, similarités) de tableaux numpy alignés
+        """
+        query = self._normalize(vector)
+        if query is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        with self._synchronized():
+            if not self._count:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+            if image_ids is not None:
+                rows = np.array(
+                    [self._rows[int(i)] for i in image_ids if int(i) in self._rows], dtype=np.int64
+                )
+                ids = np.asarray(self._ids[rows], dtype=np.int64)
+                scores = np.asarray(self._vectors[rows], dtype=np.float32) @ query
+                return ids, scores
+
+            ids = np.array(self._ids[:self._count], dtype=np.int64)
+            scores = np.empty(self._count, dtype=np.float32)
+            for start in range(0, self._count, SEARCH_BLOCK_ROWS):
+                stop = min(start + SEARCH_BLOCK_ROWS, self._count)
+                scores[start:stop] = np.asarray(self._vectors[start:stop], dtype=np.float32) @ query
+            return ids, scores
+
+    def search(self, vector: Any, threshold: Optional[float] = None, k: Optional[int] = None,
+               image_ids: Optional[list] = None) -> List[Dict[str, Any]]:
+        """
+        Recherche les images les plus proches au sens du cosinus.
+
+        Args:
+            vector: Vecteur de la requête (non normalisé)
+            threshold: Similarité minimale (0-1), None pour aucune
+            k: Nombre maximal de résultats, None pour tous
+            image_ids: Restreindre la recherche à ces images
+
+        Returns:
+            Liste de dicts {id, similarity} triée par similarité décroissante
+        """
+        ids, scores = self.similarities(vector, image_ids)
+
+        if threshold is not None:
+            keep = scores >= threshold
+            ids, scores = ids[keep], scores[keep]
+
+        if k is not None and len(scores) > k:
+            # Conserver les ex aequo à la k-ième valeur avant de départager par identifiant
+            kth = np.partition(-scores, k - 1)[k - 1]
+            keep = -scores <= kth
+            ids, scores = ids[keep], scores[keep]
+
+        order = np.lexsort((ids, -scores))
+        if k is not None:
+            order = order[:k]
+
+        return [{"id": int(ids[i]), "similarity": float(scores[i])} for i in order]
+
+    def version(self) -> tuple:
+        """
+        État du stockage, pour les index dérivés (index approché).
+
+        Tant que le nombre de suppressions ne change pas, les lignes existantes
+        restent en place: seules les lignes au-delà de l'ancien nombre sont nouvelles.
+
+        Returns:
+            Tuple (nombre de suppressions, nombre de lignes)
+        """
+        with self._synchronized():
+            return self._removals, self._count
+
+    def iter_blocks(self, block_rows: int = SEARCH_BLOCK_ROWS, start: int = 0):
+        """
+        Parcourt les embeddings stockés par blocs.
+
+        Args:
+            block_rows: Nombre de lignes par bloc
+            start: Première ligne parcourue
+
+        Yields:
+            Tuples (ids, vecteurs float32) de tableaux numpy alignés
+        """
+        while True:
+            with self._synchronized():
+                stop = min(start + block_rows, self._count)
+                if start >= stop:
+                    break
+                ids = np.array(self._ids[start:stop], dtype=np.int64)
+                vectors = np.array(self._vectors[start:stop], dtype=np.float32)
+            yield ids, vectors
+            start = stop
+
+    def sample(self, size: int, seed: int = 0) -> np.ndarray:
+        """
+        Tire un échantillon aléatoire d'embeddings (par exemple pour entraîner un index).
+
+        Args:
+            size: Taille maximale de l'échantillon
+            seed: Graine aléatoire
+
+        Returns:
+            Matrice (n, dim) float32
+        """
+        with self._synchronized():
+            if self._count <= size:
+                return np.array(self._vectors[:self._count], dtype=np.float32)
+            rows = np.sort(np.random.default_rng(seed).choice(self._count, size=size, replace=False))
+            return np.asarray(self._vectors[rows], dtype=np.float32)
+
+    def flush(self):
+        """Écrit les modifications sur disque."""
+        with self._synchronized():
+            if isinstance(self._vectors, np.memmap):
+                self._vectors.flush()
+                self._ids.flush()
+                self._meta.flush()
+
+    def _paths(self) -> tuple:
+        if not self.path:
+            return None, None
+        return os.path.join(self.path, VECTORS_FILE), os.path.join(self.path, IDS_FILE)
+
+    def _allocate(self, capacity: int) -> tuple:
+        """Réserve une matrice de vecteurs et un tableau d'identifiants (-1 = ligne libre)."""
+        vectors_path, ids_path = self._paths()
+        if not vectors_path:
+            return np.zeros((capacity, self.dim), dtype=self.dtype), np.full(capacity, -1, dtype=np.int64)
+
+        os.makedirs(self.path, exist_ok=True)
+        vectors = np.lib.format.open_memmap(
+            f"{vectors_path}.tmp", mode='w+', dtype=self.dtype, shape=(capacity, self.dim)
+        )
+        ids = np.lib.format.open_memmap(f"{ids_path}.tmp", mode='w+', dtype=np.int64, shape=(capacity,))
+        ids[:] = -1
+        return vectors, ids
+
+    def _grow(self, capacity: int):
+        """Agrandit la matrice en recopiant les lignes occupées (verrou exclusif détenu)."""
+        vectors, ids = self._allocate(capacity)
+        vectors[:self._count] = self._vectors[:self._count]
+        ids[:self._count] = self._ids[:self._count]
+        self._install(vectors, ids)
+        if self._meta is not None:
+            # Les autres processus reprojetteront les nouveaux fichiers
+            self._generation += 1
+            self._publish()
+
+    def _install(self, vectors, ids):
+        """Remplace les tableaux courants (renommage atomique des fichiers sur disque)."""
+        vectors_path, ids_path = self._paths()
+        if vectors_path:
+            vectors.flush()
+            ids.flush()
+            del vectors, ids
+            self._vectors = self._ids = None
+            os.replace(f"{vectors_path}.tmp", vectors_path)
+            os.replace(f"{ids_path}.tmp", ids_path)
+            vectors = np.load(vectors_path, mmap_mode='r+')
+            ids = np.load(ids_path, mmap_mode='r+')
+
+        self._vectors, self._ids = vectors, ids
+
+    def _normalize(self, vector: Any) -> Optional[np.ndarray]:
+        """Convertit un vecteur en float32 de norme 1 (None si invalide)."""
+        if vector is None:
+            return None
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        if vector.shape[0] != self.dim:
+            logger.warning(f"⚠️ Dimension d'embedding inattendue: {vector.shape[0]} (attendu {self.dim})")
+            return None
+        norm = float(np.linalg.norm(vector))
+        if not np.isfinite(norm) or norm == 0:
+            return None
+        return vector / norm
+
+
+def model_directory(root: Optional[str], model_key: Optional[str]) -> Optional[str]:
+    """Sous-dossier des embeddings d'un modèle (caractères hors [A-Za-z0-9_.-] remplacés)."""
+    if not root or not model_key:
+        return root
+    return os.path.join(root, re.sub(r'[^\w.-]+', '_', model_key))
+
+
+# Instance partagée par les services et les routes
+embedding_store = EmbeddingStore()
@@ -0,0 +1,146 @@
+"""
+Doublons exacts: contenus déjà analysés, retrouvés par leur empreinte SHA-256.
+
+Le téléchargement unitaire (/api/v2/upload) et l'ingestion par lot réutilisent
+l'analyse stockée (ImageDigest) sans décoder l'image, et renvoient pour un
+doublon la même réponse (build_duplicate_response).
+"""
+
+import os
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.models.image_models import ImageAnalysis, db
+from app.models.hash_models import ImageDigest
+from app.services.hash_index import perceptual_hash_index
+
+logger = logging.getLogger(__name__)
+
+
+def _usable(analysis: Optional[ImageAnalysis]) -> bool:
+    """Analyse encore présente, avec son fichier stocké."""
+    return analysis is not None and bool(analysis.image_path) and os.path.exists(analysis.image_path)
+
+
+def find_exact_duplicate(sha256: str) -> Optional[Tuple[ImageDigest, ImageAnalysis]]:
+    """
+    Recherche une analyse existante d'un contenu identique (index unique sur le SHA-256).
+
+    Les empreintes orphelines (analyse supprimée ou fichier absent) sont purgées.
+
+    Args:
+        sha256: Empreinte SHA-256 du fichier téléchargé
+
+    Returns:
+        Tuple (ImageDigest, ImageAnalysis) ou None
+    """
+    try:
+        digest = ImageDigest.find_by_sha256(sha256)
+        if digest is None:
+            return None
+
+        analysis = db.session.get(ImageAnalysis, digest.image_id)
+        if _usable(analysis):
+            return digest, analysis
+
+        db.session.delete(digest)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"⚠️ Recherche de doublon exact impossible: {str(e)}")
+    return None
+
+
+def find_exact_duplicates(sha256_list: List[str]) -> Dict[str, Tuple[ImageDigest, ImageAnalysis]]:
+    """
+    Recherche groupée de find_exact_duplicate (une requête pour tout un paquet).
+
+    Args:
+        sha256_list: Empreintes SHA-256 des fichiers
+
+    Returns:
+        Dictionnaire {sha256: (ImageDigest, ImageAnalysis)} des contenus déjà analysés
+    """
+    if not sha256_list:
+        return {}
+    try:
+        digests = ImageDigest.query.filter(ImageDigest.sha256.in_(sha256_list)).all()
+        if not digests:
+            return {}
+        analyses = {
+            analysis.id: analysis for analysis in ImageAnalysis.query.filter(
+                ImageAnalysis.id.in_([digest.image_id for digest in digests])
+            ).all()
+        }
+        known = {}
+        for digest in digests:
+            analysis = analyses.get(digest.image_id)
+            if _usable(analysis):
+                known[digest.sha256] = (digest, analysis)
+            else:
+                db.session.delete(digest)
+        db.session.commit()
+        return known
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"⚠️ Recherche de doublons exacts impossible: {str(e)}")
+        return {}
+
+
+def build_duplicate_response(stego_service, digest: Optional[ImageDigest], analysis: ImageAnalysis,
+                             digests: Dict[str, Any], k: Optional[int], max_distance: Optional[float],
+                             only_check_similar: bool = False) -> Dict[str, Any]:
+    """
+    Construit la réponse d'un doublon exact à partir de l'analyse stockée, sans décoder l'image.
+
+    Args:
+        stego_service: Service de stéganographie (recherche de similarité)
+        digest: Empreinte stockée avec les résultats d'analyse (None si absente)
+        analysis: Analyse d'origine
+        digests: Empreintes du fichier reçu
+        k: Nombre maximal d'images similaires (None pour toutes)
+        max_distance: Distance de Hamming moyenne maximale
+        only_check_similar: Ne renvoyer que la similarité
+
+    Returns:
+        Dictionnaire de réponse (même forme qu'un téléchargement analysé)
+    """
+    stored = (digest.get_analysis() if digest is not None else None) or {}
+    hashes = stored.get("perceptual_hashes") or {}
+    if not hashes:
+        indexed = perceptual_hash_index.get(analysis.id)
+        hashes = {t: format(v, '016x') for t, v in (indexed or {}).items()} or {"phash": analysis.perceptual_hash}
+
+    similar_images = stego_service.find_similar_images_advanced(
+        hashes, k=k + 1 if k else None, max_distance=max_distance
+    )
+    similar_images = [img for img in similar_images if img["id"] != analysis.id][:k]
+
+    duplicate = {"hit": True, "sha256": digests["sha256"], "original_image_id": analysis.id}
+    logger.info(f"♻️ Doublon exact de l'image {analysis.id}: analyse réutilisée")
+
+    if only_check_similar:
+        return {
+            "similar_images": similar_images,
+            "similar_found": len(similar_images) > 0,
+            "k": k,
+            "max_distance": max_distance,
+            "duplicate": duplicate
+        }
+
+    return {
+        "image_id": analysis.id,
+        "filename": os.path.basename(analysis.image_path),
+        "image_path": analysis.image_path,
+        "analysis": stored.get("analysis") or {
+            "steganography": {"signature_detected": bool(analysis.has_steganography)},
+            "ai_detection": {"confidence": analysis.ai_confidence}
+        },
+        "perceptual_hashes": hashes,
+        "similar_images": similar_images,
+        "similar_found": len(similar_images) > 0,
+        "k": k,
+        "max_distance": max_distance,
+        "duplicate": duplicate,
+        "upload_timestamp": analysis.upload_timestamp.isoformat() if analysis.upload_timestamp else None
+    }
@@ -0,0 +1,560 @@
+"""
+Index de similarité perceptuelle basé sur le multi-index hashing (MIH).
+
+Chaque hash 64 bits (pHash, dHash, ...) est découpé en sous-chaînes de 16 bits.
+D'après le principe des tiroirs, si deux hashes sont à une distance de Hamming
+<= d, au moins une de leurs sous-chaînes est à une distance <= d // 4. Une
+requête par rayon ne sonde donc que quelques centaines de clés dans des tables
+de hachage au lieu de parcourir toute la base.
+
+Les hashes eux-mêmes sont conservés dans une HashMatrix (uint64 contigu): la
+vérification des candidats se fait en un seul appel XOR + popcount vectorisé.
+
+Chaque worker garde son propre index: avant de répondre à une requête, il
+applique uniquement les changements du journal index_changes postérieurs à
+son dernier point de reprise (high-water mark), sans relire toute la table.
+Le snapshot enregistre ce point de reprise: au démarrage, seul le journal
+postérieur est rejoué.
+"""
+
+import os
+import time
+import tempfile
+import heapq
+import threading
+import logging
+from math import comb
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from sqlalchemy import or_
+
+from app.utils.hamming import (
+    HashMatrix, HASH_BITS, CHUNK_BITS, HASH_TYPES as MATRIX_HASH_TYPES,
+    hash_to_int, hash_chunks, chunk_neighbour_masks
+)
+
+logger = logging.getLogger(__name__)
+
+HASH_TYPES = ('phash', 'dhash')
+
+# Types indexés par sous-chaînes (l'aHash est aussi comparé par la recherche avancée)
+INDEXED_HASH_TYPES = ('phash', 'dhash', 'ahash')
+
+# Au-delà de cette fraction de candidats, un parcours complet vectorisé est plus rapide
+SCAN_FALLBACK_RATIO = 0.25
+
+# Nombre de changements lus par requête de synchronisation
+SYNC_BATCH_SIZE = 1000
+
+# Durée (s) pendant laquelle un identifiant manquant du journal est encore attendu:
+# une transaction plus ancienne peut valider après une plus récente
+SYNC_GAP_TIMEOUT = 60.0
+
+# Délai (s) avant une nouvelle tentative de chargement après un échec (tables absentes...)
+WARM_UP_RETRY_INTERVAL = 30.0
+
+
+class PerceptualHashIndex:
+    """Index en mémoire pour les requêtes par rayon dans l'espace de Hamming."""
+
+    def __init__(self, hash_types: tuple = HASH_TYPES, chunk_bits: int = CHUNK_BITS,
+                 snapshot_path: Optional[str] = None, snapshot_interval: int = 100,
+                 sync_interval: float = 0.0, indexed_types: tuple = INDEXED_HASH_TYPES):
+        """
+        Initialise l'index.
+
+        Args:
+            hash_types: Types de hash comparés par défaut par les requêtes
+            chunk_bits: Taille des sous-chaînes en bits
+            snapshot_path: Fichier de sauvegarde de l'index (optionnel)
+            snapshot_interval: Nombre d'insertions entre deux sauvegardes
+            sync_interval: Délai minimal (s) entre deux synchronisations avec la base
+            indexed_types: Types de hash indexés par sous-chaînes (en plus de hash_types)
+        """
+        self.hash_types = hash_types
+        self.indexed_types = tuple(dict.fromkeys(hash_types + tuple(indexed_types)))
+        self.chunk_bits = chunk_bits
+        self.num_chunks = HASH_BITS // chunk_bits
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.sync_interval = sync_interval
+
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._warm_up_lock = threading.Lock()
+        self.matrix = HashMatrix(MATRIX_HASH_TYPES)
+        self._tables: Dict[str, List[Dict[int, set]]] = {}
+        self._pending_writes = 0
+        self.ready = False  # True une fois synchronisé avec la base
+        self.high_water = 0  # Dernier IndexChange.id appliqué
+        self._gaps: Dict[int, float] = {}  # Identifiants du journal sautés -> date de détection
+        self._last_sync = 0.0
+        self._last_warm_up = None  # Date de la dernière tentative de chargement
+        self._reset_tables()
+
+    def _reset_tables(self):
+        """Vide les tables de sous-chaînes."""
+        self._tables = {
+            hash_type: [{} for _ in range(self.num_chunks)]
+            for hash_type in self.indexed_types
+        }
+
+    def __len__(self) -> int:
+        return len(self.matrix)
+
+    def _chunks(self, value: int) -> List[int]:
+        """Découpe un hash en sous-chaînes de `chunk_bits` bits."""
+        return hash_chunks(value, self.chunk_bits)
+
+    def _probe_count(self, chunk_radius: int, query_types: int) -> int:
+        """Nombre de clés sondées pour un rayon de sous-chaîne donné."""
+        masks = sum(comb(self.chunk_bits, weight) for weight in range(min(chunk_radius, self.chunk_bits) + 1))
+        return masks * query_types * self.num_chunks
+
+    def add(self, image_id: int, hashes: Dict[str, Any]) -> bool:
+        """
+        Ajoute (ou remplace) les hashes d'une image dans l'index.
+
+        Args:
+            image_id: Identifiant ImageAnalysis
+            hashes: Dictionnaire {type_de_hash: hash}
+
+        Returns:
+            True si au moins un hash a été indexé
+        """
+        with self._lock:
+            if not self._insert_unlocked(image_id, hashes):
+                return False
+
+            self._pending_writes += 1
+            if self.snapshot_path and self._pending_writes >= self.snapshot_interval:
+                self.save(self.snapshot_path)
+
+        return True
+
+    def _insert_unlocked(self, image_id: int, hashes: Dict[str, Any]) -> bool:
+        if image_id in self.matrix:
+            self._remove_unlocked(image_id)
+
+        if not self.matrix.add(image_id, hashes):
+            return False
+
+        for hash_type in self.indexed_types:
+            value = hash_to_int(hashes.get(hash_type))
+            if value is None:
+                continue
+            tables = self._tables[hash_type]
+            for position, chunk in enumerate(self._chunks(value)):
+                tables[position].setdefault(chunk, set()).add(image_id)
+        return True
+
+    def remove(self, image_id: int):
+        """Retire une image de l'index."""
+        with self._lock:
+            self._remove_unlocked(image_id)
+
+    def _remove_unlocked(self, image_id: int):
+        values = self.matrix.get(image_id)
+        if not values:
+            return
+        self.matrix.remove(image_id)
+        for hash_type in self.indexed_types:
+            if hash_type not in values:
+                continue
+            tables = self._tables[hash_type]
+            for position, chunk in enumerate(self._chunks(values[hash_type])):
+                bucket = tables[position].get(chunk)
+                if bucket is not None:
+                    bucket.discard(image_id)
+                    if not bucket:
+                        del tables[position][chunk]
+
+    def get(self, image_id: int) -> Optional[Dict[str, int]]:
+        """Renvoie les hashes indexés d'une image, ou None."""
+        return self.matrix.get(image_id)
+
+    def _query(self, hashes: Dict[str, Any], hash_types: Optional[tuple]) -> tuple:
+        """Types comparés et hashes entiers de la requête présents parmi eux."""
+        hash_types = tuple(hash_types or self.hash_types)
+        query = {}
+        for hash_type in hash_types:
+            value = hash_to_int(hashes.get(hash_type))
+            if value is not None:
+                query[hash_type] = value
+        return hash_types, query
+
+    def query_radius(self, hashes: Dict[str, Any], max_distance: float,
+                     hash_types: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """
+        Recherche les images dont la distance de Hamming moyenne est <= max_distance.
+
+        La distance moyenne est calculée sur les types de hash comparés présents à
+        la fois dans la requête et dans l'image indexée.
+
+        Args:
+            hashes: Hashes de l'image de référence
+            max_distance: Distance de Hamming moyenne maximale (en bits)
+            hash_types: Types de hash comparés (self.hash_types par défaut)
+
+        Returns:
+            Liste de dicts {id, distance, distances, similarity} triée par distance
+        """
+        hash_types, query = self._query(hashes, hash_types)
+        if not query or max_distance < 0:
+            return []
+
+        # Principe des tiroirs: une sous-chaîne est à distance <= max_distance / num_chunks
+        chunk_radius = int(max_distance // self.num_chunks)
+
+        with self._lock:
+            if (any(hash_type not in self._tables for hash_type in query)
+                    or self._probe_count(chunk_radius, len(query)) >= len(self.matrix) * SCAN_FALLBACK_RATIO):
+                return self.scan(query, max_distance, hash_types)
+
+            masks = chunk_neighbour_masks(chunk_radius, self.chunk_bits)
+
+            candidates = set()
+            for hash_type, value in query.items():
+                tables = self._tables[hash_type]
+                for position, chunk in enumerate(self._chunks(value)):
+                    table = tables[position]
+                    for mask in masks:
+                        bucket = table.get(chunk ^ mask)
+                        if bucket:
+                            candidates.update(bucket)
+
+            if not candidates:
+                return []
+            if len(candidates) >= len(self.matrix) * SCAN_FALLBACK_RATIO:
+                return self.scan(query, max_distance, hash_types)
+
+            rows = self.matrix.rows_for(candidates)
+            return self.matrix.search(query, max_distance, rows=rows, hash_types=hash_types)
+
+    def query_topk(self, hashes: Dict[str, Any], k: int, max_distance: float = HASH_BITS,
+                   hash_types: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """
+        Renvoie les k images les plus proches, avec arrêt anticipé.
+
+        Le rayon de sondage des sous-chaînes augmente progressivement (0, 1, 2...).
+        Après le rayon t, toute image non encore vue a une distance moyenne
+        >= num_chunks * (t + 1): dès que la k-ième meilleure distance du tas
+        est inférieure à cette borne, le résultat ne peut plus s'améliorer.
+
+        Args:
+            hashes: Hashes de l'image de référence
+            k: Nombre maximal de résultats
+            max_distance: Distance de Hamming moyenne maximale (en bits)
+            hash_types: Types de hash comparés (self.hash_types par défaut)
+
+        Returns:
+            Liste d'au plus k dicts {id, distance, distances, similarity} triée par distance
+        """
+        hash_types, query = self._query(hashes, hash_types)
+        if not query or k <= 0 or max_distance < 0:
+            return []
+
+        max_chunk_radius = min(int(max_distance // self.num_chunks), self.chunk_bits)
+
+        with self._lock:
+            chunks = {hash_type: self._chunks(value) for hash_type, value in query.items()}
+            seen = set()
+            heap = []  # tas max (distances négées) des k meilleurs résultats
+            probed_masks = 0
+
+            for radius in range(max_chunk_radius + 1):
+                if (any(hash_type not in self._tables for hash_type in query)
+                        or self._probe_count(radius, len(query)) >= len(self.matrix) * SCAN_FALLBACK_RATIO):
+                    # Type non indexé, ou sondage plus coûteux qu'un parcours complet vectorisé
+                    return self.matrix.topk(query, k, max_distance, hash_types=hash_types)
+
+                masks = chunk_neighbour_masks(radius, self.chunk_bits)
+                new_masks = masks[probed_masks:]
+                probed_masks = len(masks)
+
+                candidates = set()
+                for hash_type, query_chunks in chunks.items():
+                    tables = self._tables[hash_type]
+                    for position, chunk in enumerate(query_chunks):
+                        table = tables[position]
+                        for mask in new_masks:
+                            bucket = table.get(chunk ^ mask)
+                            if bucket:
+                                candidates.update(bucket)
+                candidates -= seen
+                seen |= candidates
+
+                if candidates:
+                    rows = self.matrix.rows_for(candidates)
+                    for match in self.matrix.topk(query, k, max_distance, rows=rows, hash_types=hash_types):
+                        entry = (-match["distance"], -match["id"], match)
+                        if len(heap) < k:
+                            heapq.heappush(heap, entry)
+                        elif entry[:2] > heap[0][:2]:
+                            heapq.heapreplace(heap, entry)
+
+                # Borne inférieure des distances des images non encore vues
+                lower_bound = self.num_chunks * (radius + 1)
+                if len(heap) == k and -heap[0][0] < lower_bound:
+                    break
+
+        return [entry[2] for entry in sorted(heap, key=lambda e: (-e[0], -e[1]))]
+
+    def scan(self, hashes: Dict[str, Any], max_distance: float,
+             hash_types: Optional[tuple] = None) -> List[Dict[str, Any]]:
+        """
+        Parcours exhaustif vectorisé de toute la matrice de hashes.
+
+        Args:
+            hashes: Hashes de l'image de référence
+            max_distance: Distance de Hamming moyenne maximale (en bits)
+            hash_types: Types de hash comparés (types indexés par défaut)
+
+        Returns:
+            Liste de dicts {id, distance, distances, similarity} triée par distance
+        """
+        return self.matrix.search(hashes, max_distance, hash_types=hash_types or self.hash_types)
+
+    def rebuild_from_db(self) -> int:
+        """
+        Reconstruit l'index à partir de la base.
+
+        Les hashes entiers de la table image_hashes sont utilisés en priorité ;
+        pour les analyses sans ligne ImageHash (non migrées), on retombe sur le
+        pHash hexadécimal de ImageAnalysis, complété par les hashes déjà indexés
+        (par exemple chargés depuis un snapshot).
+
+        Returns:
+            Nombre d'images indexées
+        """
+        from app.models.image_models import ImageAnalysis, db
+        from app.models.hash_models import ImageHash, IndexChange
+
+        # Lu avant les lignes: un changement concurrent sera rejoué (opération idempotente)
+        high_water = IndexChange.latest_id()
+        rows = db.session.query(ImageAnalysis.id, ImageAnalysis.perceptual_hash, ImageHash).outerjoin(
+            ImageHash, ImageHash.image_id == ImageAnalysis.id
+        ).yield_per(1000)
+
+        with self._lock:
+            previous = self.matrix
+            self.matrix = HashMatrix(MATRIX_HASH_TYPES, capacity=max(len(previous), 1024))
+            self._reset_tables()
+
+            for image_id, perceptual_hash, image_hash in rows:
+                if image_hash is not None:
+                    hashes = image_hash.to_hashes()
+                else:
+                    hashes = previous.get(image_id) or {}
+                    if perceptual_hash:
+                        hashes.setdefault('phash', perceptual_hash)
+                self._insert_unlocked(image_id, hashes)
+
+            self._pending_writes = 0
+            self.high_water = high_water
+            self._gaps = {}
+            self._last_sync = time.monotonic()
+            self.ready = True
+            if self.snapshot_path:
+                self.save(self.snapshot_path)
+
+        logger.info(f"✅ Index de hashes perceptuels reconstruit: {len(self.matrix)} images")
+        return len(self.matrix)
+
+    def sync_from_db(self) -> int:
+        """
+        Applique les changements du journal postérieurs au point de reprise.
+
+        Les hashes des images modifiées sont relus dans image_hashes ; une image
+        sans ligne ImageHash est retirée de l'index. Les identifiants sautés du
+        journal (transactions validées dans le désordre) sont redemandés pendant
+        SYNC_GAP_TIMEOUT secondes.
+
+        Returns:
+            Nombre d'images mises à jour
+        """
+        from app.models.image_models import db
+        from app.models.hash_models import ImageHash, IndexChange
+
+        with self._sync_lock:
+            now = time.monotonic()
+            self._gaps = {
+                change_id: seen for change_id, seen in self._gaps.items()
+                if now - seen < SYNC_GAP_TIMEOUT
+            }
+
+            updated = 0
+            gaps = list(self._gaps)
+            while True:
+                condition = IndexChange.id > self.high_water
+                if gaps:
+                    condition = or_(condition, IndexChange.id.in_(gaps))
+                changes = db.session.query(IndexChange.id, IndexChange.image_id).filter(
+                    condition
+                ).order_by(IndexChange.id).limit(SYNC_BATCH_SIZE).all()
+                if not changes:
+                    break
+
+                for change_id, _ in changes:
+                    self._gaps.pop(change_id, None)
+                    if change_id > self.high_water + 1:
+                        for missing in range(self.high_water + 1, change_id):
+                            self._gaps[missing] = now
+                    self.high_water = max(self.high_water, change_id)
+
+                image_ids = list({image_id for _, image_id in changes})
+                rows = {
+                    row.image_id: row.to_hashes()
+                    for row in ImageHash.query.filter(ImageHash.image_id.in_(image_ids))
+                }
+                with self._lock:
+                    for image_id in image_ids:
+                        if image_id in rows:
+                            self._insert_unlocked(image_id, rows[image_id])
+                        else:
+                            self._remove_unlocked(image_id)
+                updated += len(image_ids)
+
+                gaps = []
+                if len(changes) < SYNC_BATCH_SIZE:
+                    break
+
+            self._last_sync = now
+
+        if updated:
+            logger.info(f"🔄 Index de hashes synchronisé: {updated} images (journal #{self.high_water})")
+        return updated
+
+    def refresh(self):
+        """
+        Synchronise l'index avec la base avant une requête (erreurs journalisées).
+
+        Un index non chargé (base indisponible au démarrage) est chargé à la
+        première requête, puis au plus une fois par WARM_UP_RETRY_INTERVAL.
+        """
+        if not self.ready:
+            self._retry_warm_up()
+            return
+        if time.monotonic() - self._last_sync < self.sync_interval:
+            return
+        try:
+            self.sync_from_db()
+        except Exception as e:
+            logger.warning(f"⚠️ Synchronisation de l'index de hashes impossible: {str(e)}")
+
+    def save(self, path: str):
+        """
+        Sauvegarde l'index sur disque (format .npz).
+
+        Args:
+            path: Chemin du fichier de sauvegarde
+        """
+        with self._lock:
+            # Un changement sauté du journal peut encore valider: reprendre avant lui
+            high_water = min(self._gaps) - 1 if self._gaps else self.high_water
+            arrays = {
+                "ids": self.matrix.ids.copy(),
+                "values": self.matrix.values.copy(),
+                "present": self.matrix.present.copy(),
+                "hash_types": np.array(self.matrix.hash_types),
+                "high_water": np.array(high_water)
+            }
+
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Fichier temporaire unique: plusieurs processus peuvent sauvegarder en même temps
+            fd, tmp_path = tempfile.mkstemp(dir=directory or None, prefix=os.path.basename(path), suffix='.tmp.npz')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.savez(f, **arrays)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._pending_writes = 0
+
+    def load(self, path: str) -> bool:
+        """
+        Charge un index sauvegardé avec save().
+
+        Args:
+            path: Chemin du fichier de sauvegarde
+
+        Le point de reprise du snapshot (0 pour un ancien snapshot) est repris
+        dans high_water.
+
+        Returns:
+            True si le chargement a réussi
+        """
+        if not os.path.exists(path):
+            return False
+
+        try:
+            with np.load(path) as data:
+                ids = data["ids"].tolist()
+                values = data["values"]
+                present = data["present"]
+                hash_types = [str(t) for t in data["hash_types"]]
+                high_water = int(data["high_water"]) if "high_water" in data.files else 0
+        except Exception as e:
+            logger.warning(f"⚠️ Snapshot d'index illisible ({path}): {e}")
+            return False
+
+        with self._lock:
+            self.matrix = HashMatrix(MATRIX_HASH_TYPES, capacity=max(len(ids), 1024))
+            self._reset_tables()
+            for row, image_id in enumerate(ids):
+                hashes = {
+                    hash_type: int(values[row, column])
+                    for column, hash_type in enumerate(hash_types)
+                    if present[row, column]
+                }
+                self._insert_unlocked(image_id, hashes)
+            self._pending_writes = 0
+            self.high_water = high_water
+            self._gaps = {}
+
+        logger.info(f"✅ Index de hashes chargé depuis {path}: {len(ids)} images (journal #{high_water})")
+        return True
+
+    def warm_up(self) -> int:
+        """
+        Charge l'index: snapshot puis rejeu du journal postérieur à son point de
+        reprise, ou reconstruction complète depuis la base à défaut.
+
+        Returns:
+            Nombre d'images indexées
+        """
+        from app.models.hash_models import IndexChange
+
+        self._last_warm_up = time.monotonic()
+        if self.snapshot_path and self.load(self.snapshot_path):
+            # Un journal plus court que le point de reprise signale une base réinitialisée
+            if 0 < self.high_water <= IndexChange.latest_id():
+                self.sync_from_db()
+                with self._lock:
+                    self._last_sync = time.monotonic()
+                    self.ready = True
+                logger.info(f"✅ Index de hashes prêt: {len(self.matrix)} images")
+                return len(self.matrix)
+        return self.rebuild_from_db()
+
+    def _retry_warm_up(self):
+        """Charge l'index à la demande (un seul thread, au plus une fois par WARM_UP_RETRY_INTERVAL)."""
+        if self._last_warm_up is not None and time.monotonic() - self._last_warm_up < WARM_UP_RETRY_INTERVAL:
+            return
+        if not self._warm_up_lock.acquire(blocking=False):
+            return  # Chargement en cours dans un autre thread: recherche en base en attendant
+        try:
+            if not self.ready:
+                self.warm_up()
+        except Exception as e:
+            logger.warning(f"⚠️ Chargement de l'index de hashes impossible: {str(e)}")
+        finally:
+            self._warm_up_lock.release()
+
+
+# Instance partagée par les services et les routes
+perceptual_hash_index = PerceptualHashIndex()
@@ -1,16 +1,21 @@
 import os
-import uuid
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
 from PIL import Image
-from werkzeug.utils import secure_filename
 from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
 import logging
 import imagehash
-from scipy.spatial.distance import hamming
 from app.models.image_models import ImageAnalysis, db
 from app.services.steganography_service import SteganographyService
 from app.services.ai_detection_service_v2 import AIDetectionService
 from app.utils.exceptions import ImageProcessingError
+from app.utils.hamming import hash_similarity, pack_hashes, pairwise_distances, HASH_BITS
+from app.utils.image_hashing import compute_image_hashes_batch
+from app.utils.image_context import ImageContext, ImageSource
+from app.models.hash_models import ImageHash, IndexChange
+from app.services.hash_index import perceptual_hash_index
+from app.services.blob_store import BlobStore, normalize_extension
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -32,41 +37,46 @@ class ImageService:
 
         # Créer le dossier s'il n'existe pas
         os.makedirs(upload_folder, exist_ok=True)
+        self.blob_store = BlobStore(upload_folder)
 
-    def process_uploaded_image(self, file: FileStorage, user_id: Optional[int] = None) -> Dict[str, Any]:
+    def process_uploaded_image(self, file: FileStorage, user_id: Optional[int] = None,
+                               k: int = 5) -> Dict[str, Any]:
         """
         Traite une image téléchargée complètement.
 
         Args:
             file: Fichier téléchargé
             user_id: ID de l'utilisateur (optionnel)
+            k: Nombre maximal d'images similaires renvoyées
 
         Returns:
             Dictionnaire avec tous les résultats d'analyse
         """
         try:
-            # Sauvegarder le fichier
-            filename, filepath = self._save_uploaded_file(file)
+            # Sauvegarder le fichier (lu une seule fois, décodé une seule fois)
+            context = ImageContext.from_file_storage(file)
+            filename, filepath, digests = self._save_uploaded_file(file, context)
 
             # Extraire les métadonnées
-            metadata = self._extract_metadata(filepath)
+            metadata = self._extract_metadata(context)
 
             # Analyser la stéganographie
-            steg_result = self.steganography_service.detect_hidden_message(filepath)
+            steg_result = self.steganography_service.detect_hidden_message(context)
 
             # Détecter si l'image est générée par IA
             ai_result = {}
             if self.ai_service.is_model_loaded():
-                ai_result = self.ai_service.detect_ai_image(filepath)
+                ai_result = self.ai_service.detect_ai_image(context)
             else:
                 ai_result = {"error": "Modèle IA non disponible"}
 
-            # Calculer les hashs
-            perceptual_hash = self.steganography_service.calculate_perceptual_hash(filepath)
-            md5_hash = self.steganography_service.calculate_md5_hash(filepath)
+            # Calculer les hashs (pHash, dHash...: une seule fois, indexés comme en v2)
+            hashes = self.steganography_service.generate_image_hashes(context)
+            perceptual_hash = hashes["phash"]
+            md5_hash = digests["md5"]
 
             # Chercher des images similaires
-            similar_images = self.steganography_service.find_similar_images(filepath)
+            similar_images = self.steganography_service.find_similar_images(context, k=k)
 
             # Créer l'enregistrement en base
             image_analysis = self._create_image_record(
@@ -78,8 +88,11 @@ class ImageService:
                 ai_result=ai_result,
                 perceptual_hash=perceptual_hash,
                 md5_hash=md5_hash,
+                digests=digests,
+                hashes=hashes,
                 user_id=user_id
             )
+            self.ai_service.index_image_embedding(image_analysis.id, context)
 
             # Résultat complet
             result = {
@@ -94,7 +107,7 @@ class ImageService:
                         "id": sim["image"].id,
                         "filename": sim["image"].filename,
                         "similarity": sim["similarity"]
-                    } for sim in similar_images[:5]  # Limiter à 5 résultats
+                    } for sim in similar_images
                 ],
                 "hashes": {
                     "perceptual": perceptual_hash,
@@ -120,13 +133,23 @@ class ImageService:
         Returns:
             Informations sur l'image avec le message caché
         """
+        stored = []
         try:
             # Sauvegarder le fichier original
-            filename, filepath = self._save_uploaded_file(file)
+            filename, filepath, digests = self._save_uploaded_file(file)
+            stored.append(digests["sha256"])
 
-            # Créer l'image avec le message caché
-            steg_filepath = self.steganography_service.embed_message(filepath, message)
-            steg_filename = os.path.basename(steg_filepath)
+            # Créer l'image avec le message caché, puis la stocker sous son empreinte
+            steg_temp = self.steganography_service.embed_message(
+                filepath, message, self.blob_store.temp_path(os.path.splitext(filepath)[1])
+            )
+            steg_filename, steg_filepath, steg_digests = self.blob_store.put_file(steg_temp)
+            stored.append(steg_digests["sha256"])
+
+            # Les deux fichiers sont publiés: référencés pour ne jamais être supprimés
+            self.blob_store.add_reference(filepath, digests)
+            self.blob_store.add_reference(steg_filepath, steg_digests)
+            db.session.commit()
 
             # URL publique pour l'image avec stéganographie
             public_url = f"/uploads/{steg_filename}"
@@ -143,51 +166,59 @@ class ImageService:
             return result
 
         except Exception as e:
+            db.session.rollback()
+            for sha256 in stored:
+                self.blob_store.discard_if_unreferenced(sha256)
             logger.error(f"Erreur lors de l'ajout de stéganographie: {str(e)}")
             raise ImageProcessingError(f"Impossible d'ajouter le message caché: {str(e)}")
 
-    def _save_uploaded_file(self, file: FileStorage) -> Tuple[str, str]:
+    def _save_uploaded_file(self, file: FileStorage,
+                            context: Optional[ImageContext] = None) -> Tuple[str, str, Dict[str, Any]]:
         """
-        Sauvegarde un fichier téléchargé de manière sécurisée.
+        Sauvegarde un fichier téléchargé dans le stockage adressé par le contenu.
+
+        Les empreintes MD5/SHA-256 sont calculées pendant l'écriture; un contenu
+        déjà stocké n'est pas réécrit.
 
         Args:
             file: Fichier à sauvegarder
+            context: Contexte de l'image déjà lue (ses octets sont écrits directement)
 
         Returns:
-            Tuple (nom_fichier, chemin_complet)
+            Tuple (nom_fichier, chemin_complet, empreintes {sha256, md5, size})
         """
-        # Générer un nom unique
-        filename = str(uuid.uuid4()) + os.path.splitext(secure_filename(file.filename or ''))[1]
-        filepath = os.path.join(self.upload_folder, filename)
-
-        # Sauvegarder le fichier
-        file.save(filepath)
+        extension = normalize_extension(file.filename)
+        if context is None:
+            return self.blob_store.put_stream(file, extension)
 
-        return filename, filepath
+        filename, filepath, digests = self.blob_store.put_bytes(context.data, extension, context.digests)
+        context.path = filepath
+        return filename, filepath, digests
 
-    def _extract_metadata(self, image_path: str) -> Dict[str, Any]:
+    def _extract_metadata(self, image_path: ImageSource) -> Dict[str, Any]:
         """
         Extrait les métadonnées d'une image.
 
         Args:
-            image_path: Chemin vers l'image
+            image_path: Chemin vers l'image, contenu en mémoire ou ImageContext
 
         Returns:
             Dictionnaire des métadonnées
         """
         try:
-            with Image.open(image_path) as img:
-                file_size = os.path.getsize(image_path)
-
-                return {
-                    "dimensions": f"{img.width}x{img.height}",
-                    "width": img.width,
-                    "height": img.height,
-                    "format": img.format,
-                    "mode": img.mode,
-                    "size": f"{file_size / 1024:.2f} KB",
-                    "size_bytes": file_size
-                }
+            context = ImageContext.of(image_path)
+            info = context.info
+            file_size = context.size
+
+            return {
+                "dimensions": f"{info['width']}x{info['height']}",
+                "width": info["width"],
+                "height": info["height"],
+                "format": info["format"],
+                "mode": info["mode"],
+                "size": f"{file_size / 1024:.2f} KB",
+                "size_bytes": file_size
+            }
         except Exception as e:
             logger.error(f"Erreur lors de l'extraction des métadonnées: {str(e)}")
             return {"error": str(e)}
@@ -196,6 +227,10 @@ class ImageService:
         """
         Crée un enregistrement d'analyse d'image en base.
 
+        L'analyse, la référence au fichier stocké, les hashes entiers et le
+        journal index_changes sont validés en une seule transaction ; l'index
+        de hashes en mémoire n'est mis à jour qu'après la validation.
+
         Returns:
             Instance ImageAnalysis créée
         """
@@ -219,12 +254,22 @@ class ImageService:
             )
 
             db.session.add(analysis)
+            db.session.flush()
+            if kwargs.get('digests'):
+                self.blob_store.add_reference(kwargs['filepath'], kwargs['digests'])
+            if kwargs.get('hashes'):
+                db.session.add(ImageHash.from_hashes(analysis.id, kwargs['hashes']))
+                IndexChange.record(analysis.id)
             db.session.commit()
 
+            if kwargs.get('hashes'):
+                perceptual_hash_index.add(analysis.id, kwargs['hashes'])
             return analysis
 
         except Exception as e:
             db.session.rollback()
+            if kwargs.get('digests'):
+                self.blob_store.discard_if_unreferenced(kwargs['digests']["sha256"])
             logger.error(f"Erreur lors de la création de l'enregistrement: {str(e)}")
             raise ImageProcessingError(f"Impossible de sauvegarder l'analyse: {str(e)}")
 
@@ -259,12 +304,14 @@ class ImageService:
         Returns:
             Dictionnaire avec les résultats de comparaison
         """
+        temp_paths = []
         try:
-            from scipy.spatial.distance import hamming
-
-            # Sauvegarder temporairement les fichiers
-            filename1, filepath1 = self._save_uploaded_file(file1)
-            filename2, filepath2 = self._save_uploaded_file(file2)
+            # Sauvegarder temporairement les fichiers (hors du stockage: rien n'est conservé)
+            for file in (file1, file2):
+                temp_paths.append(self.blob_store.temp_path(normalize_extension(file.filename)))
+                file.save(temp_paths[-1])
+            filepath1, filepath2 = temp_paths
+            filename1, filename2 = (secure_filename(file.filename or '') for file in (file1, file2))
 
             # Générer les hashes comme dans steganoV2.py
             def generate_image_hashes_local(image_path):
@@ -285,28 +332,9 @@ class ImageService:
             if "error" in hashes1 or "error" in hashes2:
                 raise ImageProcessingError("Erreur lors de la génération des hashes")
 
-            # Calculer la similarité comme dans steganoV2.py
-            # Convertir les hashes hexadécimaux en chaînes binaires
-            def hex_to_binary(hex_string):
-                """Convertit un hash hexadécimal en chaîne binaire."""
-                return bin(int(hex_string, 16))[2:].zfill(len(hex_string) * 4)
-
-            # Convertir en binaire pour le calcul de Hamming
-            phash1_binary = hex_to_binary(hashes1["phash"])
-            phash2_binary = hex_to_binary(hashes2["phash"])
-            dhash1_binary = hex_to_binary(hashes1["dhash"])
-            dhash2_binary = hex_to_binary(hashes2["dhash"])
-
-            # Calculer la distance de Hamming
-            phash_similarity = 1 - hamming(
-                [int(bit) for bit in phash1_binary],
-                [int(bit) for bit in phash2_binary]
-            )
-
-            dhash_similarity = 1 - hamming(
-                [int(bit) for bit in dhash1_binary],
-                [int(bit) for bit in dhash2_binary]
-            )
+            # Distance de Hamming sur les hashes 64 bits (XOR + popcount)
+            phash_similarity = hash_similarity(hashes1["phash"], hashes2["phash"])
+            dhash_similarity = hash_similarity(hashes1["dhash"], hashes2["dhash"])
 
             # Convertir en types Python natifs pour éviter les erreurs JSON
             phash_similarity = float(phash_similarity)
@@ -343,3 +371,98 @@ class ImageService:
         except Exception as e:
             logger.error(f"Erreur lors de la comparaison de similarité: {str(e)}")
             raise ImageProcessingError(f"Erreur lors de la comparaison: {str(e)}")
+        finally:
+            for path in temp_paths:
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def hash_uploaded_files(self, contexts: List[ImageContext], max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Calcule les hashes pHash/dHash d'un lot de fichiers, sans les écrire sur disque.
+
+        Args:
+            contexts: Contextes des fichiers téléchargés (contenu déjà lu)
+            max_workers: Nombre de processus de calcul
+
+        Returns:
+            Liste de dictionnaires de hashes alignée sur contexts
+        """
+        blobs = [context.data for context in contexts]
+        hashes_list = compute_image_hashes_batch(blobs, ('phash', 'dhash'), max_workers=max_workers)
+        failed = [context.name for context, hashes in zip(contexts, hashes_list) if "error" in hashes]
+        if failed:
+            raise ImageProcessingError(f"Hashes impossibles à calculer pour: {', '.join(failed)}")
+        return hashes_list
+
+    def load_stored_hashes(self, image_ids: List[int]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Récupère les hashes stockés d'images déjà analysées (index en mémoire, sinon base).
+
+        Args:
+            image_ids: Identifiants ImageAnalysis
+
+        Returns:
+            Liste alignée sur image_ids (None pour les images inconnues)
+        """
+        perceptual_hash_index.refresh()
+        found = {image_id: perceptual_hash_index.get(image_id) for image_id in image_ids}
+        missing = [image_id for image_id, hashes in found.items() if not hashes]
+        if missing:
+            for row in ImageHash.query.filter(ImageHash.image_id.in_(missing)).all():
+                found[row.image_id] = row.to_hashes()
+        return [found.get(image_id) or None for image_id in image_ids]
+
+    def compute_similarity_matrix(self, hashes_list: List[Dict[str, Any]], threshold: Optional[float] = None,
+                                  pairs_only: bool = False) -> Dict[str, Any]:
+        """
+        Similarité pHash/dHash de toutes les paires d'un lot d'images.
+
+        Args:
+            hashes_list: Hashes des N images
+            threshold: Similarité moyenne minimale (0-1) pour la liste des paires
+            pairs_only: Ne renvoyer que les paires au-dessus du seuil (pas de matrice)
+
+        Returns:
+            Dictionnaire avec les matrices N x N (pourcentages) et/ou les paires similaires
+        """
+        hash_types = ('phash', 'dhash')
+        values, present = pack_hashes(hashes_list, hash_types)
+        distances, mean = pairwise_distances(values, present)
+
+        similarity = (1 - mean / HASH_BITS) * 100  # -inf pour les paires sans hash commun
+        result = {"size": len(hashes_list), "hash_types": list(hash_types)}
+
+        if threshold is not None:
+            rows, columns = np.nonzero(np.triu(similarity >= threshold * 100, k=1))
+            order = np.lexsort((columns, rows, -similarity[rows, columns]))
+            result["threshold"] = threshold
+            result["pairs"] = [
+                {
+                    "i": int(rows[p]),
+                    "j": int(columns[p]),
+                    "similarity": round(float(similarity[rows[p], columns[p]]), 2),
+                    **{
+                        hash_type: round((1 - float(distances[t, rows[p], columns[p]]) / HASH_BITS) * 100, 2)
+                        for t, hash_type in enumerate(hash_types)
+                    }
+                }
+                for p in order
+            ]
+
+        if not pairs_only:
+            def to_percentages(matrix, mask):
+                rounded = np.round(matrix, 2)
+                return [
+                    [value if ok else None for value, ok in zip(row, mask_row)]
+                    for row, mask_row in zip(rounded.tolist(), mask.tolist())
+                ]
+
+            result["matrix"] = {
+                hash_type: to_percentages(
+                    (1 - distances[t] / HASH_BITS) * 100, present[:, t][:, None] & present[:, t][None, :]
+                )
+                for t, hash_type in enumerate(hash_types)
+            }
+            result["matrix"]["average"] = to_percentages(similarity, np.isfinite(similarity))
+
+        return result
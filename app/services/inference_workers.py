@@ -0,0 +1,554 @@
+"""
+Serveur d'inférence dédié (sidecar) et son client.
+
+Un pool fixe de processus workers possède les modèles Keras: la mémoire des
+modèles dépend du nombre de workers d'inférence, plus du nombre de processus
+HTTP. Chaque processus HTTP crée un anneau de mémoire partagée par modèle
+(multiprocessing.shared_memory); les tenseurs prétraités y sont écrits, seuls
+les indices des emplacements transitent par la socket, et le worker écrit la
+sortie du modèle à la place de l'entrée.
+
+Un worker arrêté (plantage, mémoire insuffisante) est relancé par le serveur
+et ses requêtes en cours sont signalées en échec au lieu d'expirer.
+
+Lancement: python scripts/inference_server.py, puis INFERENCE_SERVER_ADDRESS
+dans la configuration de l'application.
+"""
+
+import os
+import time
+import uuid
+import queue
+import logging
+import threading
+import itertools
+import multiprocessing
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from multiprocessing import resource_tracker
+from multiprocessing.connection import Client, Listener
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Emplacements par anneau (taille maximale d'un lot envoyé en une fois)
+DEFAULT_RING_SLOTS = 64
+
+# Attente maximale d'un résultat ou d'emplacements libres (s); les emplacements d'une requête
+# expirée ne sont rendus qu'à l'arrivée de son résultat (le worker peut encore y écrire)
+REQUEST_TIMEOUT = 120.0
+
+# Intervalle de vérification des workers (s): un worker arrêté est relancé, ses requêtes échouent
+WORKER_CHECK_INTERVAL = 1.0
+
+
+class SharedTensorRing:
+    """Tableau float32 (slots, *shape) en mémoire partagée, emplacements alloués par le créateur."""
+
+    def __init__(self, shape: Tuple[int, ...], slots: int = DEFAULT_RING_SLOTS, name: Optional[str] = None):
+        """
+        Crée l'anneau, ou s'y attache si name est fourni.
+
+        Args:
+            shape: Forme d'une entrée (par exemple (224, 224, 3))
+            slots: Nombre d'emplacements
+            name: Nom du segment existant (attachement côté worker)
+        """
+        self.shape = tuple(int(dim) for dim in shape)
+        self.slots = int(slots)
+        size = self.slots * int(np.prod(self.shape)) * np.dtype(np.float32).itemsize
+        self.owner = name is None
+
+        if self.owner:
+            self.shm = SharedMemory(create=True, size=size)
+        else:
+            self.shm = _attach_untracked(name)
+        self.name = self.shm.name
+        self.array = np.ndarray((self.slots,) + self.shape, dtype=np.float32, buffer=self.shm.buf)
+
+        self._free = list(range(self.slots))
+        self._available = threading.Condition()
+
+    @property
+    def flat(self) -> np.ndarray:
+        """Vue (slots, taille d'une entrée), pour écrire des sorties de forme quelconque."""
+        return self.array.reshape(self.slots, -1)
+
+    def acquire(self, count: int, timeout: Optional[float] = None) -> List[int]:
+        """
+        Réserve count emplacements (attend qu'ils se libèrent).
+
+        Args:
+            count: Nombre d'emplacements
+            timeout: Attente maximale en secondes (None = illimitée)
+
+        Raises:
+            TimeoutError: Emplacements toujours occupés après timeout secondes
+        """
+        if count > self.slots:
+            raise ValueError(f"Lot de {count} entrées pour un anneau de {self.slots} emplacements")
+        with self._available:
+            if not self._available.wait_for(lambda: len(self._free) >= count, timeout=timeout):
+                raise TimeoutError(f"Aucun emplacement libre après {timeout}s")
+            indices, self._free = self._free[:count], self._free[count:]
+        return indices
+
+    def release(self, indices: List[int]):
+        """Rend des emplacements."""
+        with self._available:
+            self._free.extend(indices)
+            self._available.notify_all()
+
+    def close(self):
+        """Détache l'anneau (et le supprime s'il a été créé ici)."""
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+_attach_lock = threading.Lock()
+
+
+def _attach_untracked(name: str) -> SharedMemory:
+    """Attache un segment sans l'inscrire au resource_tracker (qui le supprimerait à la sortie)."""
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13: inscription systématique, neutralisée le temps de l'attachement
+        with _attach_lock:
+            register = resource_tracker.register
+            resource_tracker.register = lambda name, rtype: None
+            try:
+                return SharedMemory(name=name)
+            finally:
+                resource_tracker.register = register
+
+
+def _worker_main(worker_id: int, loaders: Dict[str, Callable[[], Any]], requests, results):
+    """Processus worker: charge les modèles puis traite les lots qui lui sont confiés."""
+    models, info = {}, {}
+    for name, loader in loaders.items():
+        start = time.perf_counter()
+        try:
+            models[name] = loader()
+            error = None
+        except Exception as e:
+            models[name], error = None, str(e)
+        model = models[name]
+        info[name] = {
+            "loaded": model is not None,
+            "error": error,
+            "load_seconds": round(time.perf_counter() - start, 3),
+            "parameters": model.count_params() if hasattr(model, 'count_params') else None,
+            "description": model.describe() if hasattr(model, 'describe') else None
+        }
+    results.put(('ready', worker_id, info))
+
+    rings: Dict[str, SharedTensorRing] = {}
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        if message[0] == 'detach':
+            ring = rings.pop(message[1], None)
+            if ring is not None:
+                ring.close()
+            continue
+
+        _, conn_id, request_id, name, ring_name, shape, slots, indices = message
+        try:
+            ring = rings.get(ring_name)
+            if ring is None:
+                ring = rings[ring_name] = SharedTensorRing(shape, slots, name=ring_name)
+            if models.get(name) is None:
+                raise RuntimeError(f"Modèle {name} non chargé")
+
+            outputs = np.asarray(models[name].predict(ring.array[indices], verbose=0), dtype=np.float32)
+            width = outputs[0].size
+            if width > ring.flat.shape[1]:
+                raise ValueError(f"Sortie de {width} valeurs, emplacement de {ring.flat.shape[1]}")
+            ring.flat[indices, :width] = outputs.reshape(len(indices), width)
+            results.put(('result', worker_id, conn_id, request_id, outputs.shape[1:], None))
+        except Exception as e:
+            results.put(('result', worker_id, conn_id, request_id, None, str(e)))
+
+    for ring in rings.values():
+        ring.close()
+
+
+class InferenceServer:
+    """Pool fixe de processus workers servant les modèles aux processus HTTP locaux."""
+
+    def __init__(self, address: str, models: Dict[str, Tuple[Callable[[], Any], Tuple[int, ...]]],
+                 workers: int = 2, authkey: Optional[bytes] = None):
+        """
+        Initialise le serveur (sans le démarrer).
+
+        Args:
+            address: Chemin de la socket Unix
+            models: (fonction de chargement importable par les workers, forme d'entrée) par nom de modèle
+            workers: Nombre de processus workers
+            authkey: Clé d'authentification des connexions
+        """
+        self.address = address
+        self.input_shapes = {name: tuple(shape) for name, (_, shape) in models.items()}
+        self._loaders = {name: loader for name, (loader, _) in models.items()}
+        self.workers = max(1, int(workers))
+        self.authkey = authkey
+        self.models: Dict[str, Dict[str, Any]] = {}
+
+        self._context = multiprocessing.get_context('spawn')  # TensorFlow ne supporte pas fork
+        self._results = self._context.Queue()
+        self._queues: List[Any] = [None] * self.workers
+        self._processes: List[Any] = [None] * self.workers
+        for index in range(self.workers):
+            self._create_worker(index)
+        # Requêtes (conn_id, request_id) confiées à chaque worker et pas encore résolues
+        self._assigned: List[set] = [set() for _ in range(self.workers)]
+        self._closed = False
+        self._connections: Dict[int, Any] = {}
+        self._send_locks: Dict[int, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._conn_ids = itertools.count()
+        self._listener: Optional[Listener] = None
+
+    def _create_worker(self, index: int):
+        """Crée le processus worker index et sa file de requêtes (sans le démarrer)."""
+        self._queues[index] = self._context.Queue()
+        self._processes[index] = self._context.Process(
+            target=_worker_main, args=(index, self._loaders, self._queues[index], self._results),
+            name=f"inference-worker-{index}", daemon=True
+        )
+
+    def start(self):
+        """Démarre les workers et attend le chargement des modèles."""
+        for process in self._processes:
+            process.start()
+        for _ in self._processes:
+            _, worker_id, info = self._next_ready()
+            if not self.models:
+                self.models = {
+                    name: dict(model_info, input_shape=self.input_shapes[name]) for name, model_info in info.items()
+                }
+            logger.info(f"✅ Worker d'inférence {worker_id} prêt")
+        threading.Thread(target=self._route_results, name='inference-results', daemon=True).start()
+
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+
+    def _next_ready(self):
+        """Message de disponibilité suivant (erreur si un worker s'est arrêté pendant le chargement)."""
+        while True:
+            try:
+                return self._results.get(timeout=1)
+            except queue.Empty:
+                dead = [process.name for process in self._processes if not process.is_alive()]
+                if dead:
+                    raise RuntimeError(f"Workers d'inférence arrêtés au démarrage: {', '.join(dead)}")
+
+    def serve_forever(self):
+        """Accepte les connexions des processus HTTP jusqu'à l'arrêt."""
+        while True:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                break
+            conn_id = next(self._conn_ids)
+            threading.Thread(target=self._serve_connection, args=(conn_id, connection),
+                             name=f"inference-conn-{conn_id}", daemon=True).start()
+
+    def _serve_connection(self, conn_id: int, connection):
+        """Échange initial (modèles, anneaux) puis transmission des requêtes aux workers."""
+        with self._lock:
+            self._connections[conn_id] = connection
+            self._send_locks[conn_id] = threading.Lock()
+        rings: Dict[str, Tuple[str, tuple, int]] = {}
+        try:
+            connection.send(('models', self.models))
+            while True:
+                message = connection.recv()
+                if message[0] == 'rings':
+                    rings.update(message[1])
+                elif message[0] == 'predict':
+                    _, request_id, name, indices = message
+                    ring_name, shape, slots = rings[name]
+                    with self._lock:
+                        worker = min(range(self.workers), key=lambda index: len(self._assigned[index]))
+                        self._assigned[worker].add((conn_id, request_id))
+                        self._queues[worker].put(
+                            ('predict', conn_id, request_id, name, ring_name, shape, slots, indices)
+                        )
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self._connections.pop(conn_id, None)
+                self._send_locks.pop(conn_id, None)
+            with self._lock:
+                queues = list(self._queues)
+            for ring_name, _, _ in rings.values():
+                for requests in queues:
+                    requests.put(('detach', ring_name))
+            connection.close()
+
+    def _route_results(self):
+        """Renvoie chaque résultat à la connexion qui l'a demandé, et surveille les workers."""
+        last_check = time.monotonic()
+        while not self._closed:
+            try:
+                message = self._results.get(timeout=WORKER_CHECK_INTERVAL)
+            except queue.Empty:
+                message = None
+            if time.monotonic() - last_check >= WORKER_CHECK_INTERVAL:
+                self._check_workers()
+                last_check = time.monotonic()
+            if message is None:
+                continue
+            if message[0] == 'ready':
+                logger.info(f"✅ Worker d'inférence {message[1]} relancé et prêt")
+                continue
+
+            _, worker_id, conn_id, request_id, shape, error = message
+            with self._lock:
+                if (conn_id, request_id) not in self._assigned[worker_id]:
+                    continue  # Déjà signalée en échec (worker considéré comme arrêté)
+                self._assigned[worker_id].discard((conn_id, request_id))
+            self._send_result(conn_id, request_id, shape, error)
+
+    def _check_workers(self):
+        """Relance les workers arrêtés ; leurs requêtes en cours sont signalées en échec."""
+        for index in range(self.workers):
+            with self._lock:
+                process = self._processes[index]
+                if self._closed or process.is_alive():
+                    continue
+                lost, self._assigned[index] = self._assigned[index], set()
+                self._create_worker(index)
+                self._processes[index].start()
+            logger.error(f"❌ Worker d'inférence {index} arrêté (code {process.exitcode}): relancé, "
+                         f"{len(lost)} requête(s) en échec")
+            for conn_id, request_id in lost:
+                self._send_result(conn_id, request_id, None, f"Worker d'inférence {index} arrêté")
+
+    def _send_result(self, conn_id: int, request_id: str, shape, error: Optional[str]):
+        """Envoie un résultat à sa connexion (ignoré si elle est fermée)."""
+        with self._lock:
+            connection = self._connections.get(conn_id)
+            send_lock = self._send_locks.get(conn_id)
+        if connection is None:
+            return
+        try:
+            with send_lock:
+                connection.send((request_id, shape, error))
+        except OSError:
+            pass
+
+    def close(self):
+        """Arrête le serveur et les workers."""
+        self._closed = True
+        if self._listener is not None:
+            self._listener.close()
+        for requests in self._queues:
+            requests.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+
+class RemoteModel:
+    """Modèle servi par le serveur d'inférence (interface predict de Keras)."""
+
+    # Plusieurs lots peuvent être en cours: les workers se les répartissent
+    thread_safe = True
+
+    def __init__(self, client: 'InferenceClient', name: str, info: Dict[str, Any]):
+        self.client = client
+        self.name = name
+        self.info = info
+
+    def predict(self, batch: Any, verbose: int = 0) -> np.ndarray:
+        """Inférence d'un lot par les workers."""
+        return self.client.predict(self.name, batch)
+
+    def count_params(self) -> Optional[int]:
+        return self.info.get("parameters")
+
+    def describe(self) -> Dict[str, Any]:
+        """Moteur et quantification du modèle chargé par les workers (pas de fichier local)."""
+        return self.info.get("description") or {}
+
+
+class InferenceClient:
+    """Connexion d'un processus HTTP au serveur d'inférence (établie au premier usage)."""
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None, slots: int = DEFAULT_RING_SLOTS,
+                 connect_timeout: float = 120.0):
+        """
+        Initialise le client (sans se connecter).
+
+        Args:
+            address: Chemin de la socket Unix du serveur
+            authkey: Clé d'authentification
+            slots: Emplacements par anneau de mémoire partagée
+            connect_timeout: Attente maximale du serveur (s), qui n'écoute qu'une fois les modèles chargés
+        """
+        self.address = address
+        self.authkey = authkey
+        self.slots = slots
+        self.connect_timeout = connect_timeout
+
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self.rings: Dict[str, SharedTensorRing] = {}
+        self._connection = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._pid = None
+
+    def _ensure_connected(self):
+        """Connexion et échange initial (de nouveau après une coupure ou un fork)."""
+        if self._connection is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                # Processus hérité par fork: ne pas réutiliser les anneaux du parent
+                self.rings = {}
+            deadline = time.monotonic() + self.connect_timeout
+            while True:
+                try:
+                    connection = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    if time.monotonic() > deadline:
+                        raise ConnectionError(f"Serveur d'inférence injoignable: {self.address}")
+                    time.sleep(0.5)
+
+            _, self.models = connection.recv()
+            for name, info in self.models.items():
+                if info.get("loaded") and name not in self.rings:
+                    shape = tuple(info["input_shape"])
+                    self.rings[name] = SharedTensorRing(shape, self.slots)
+            connection.send(('rings', {
+                name: (ring.name, ring.shape, ring.slots) for name, ring in self.rings.items()
+            }))
+            self._connection, self._pid = connection, os.getpid()
+            threading.Thread(target=self._read_results, args=(connection,),
+                             name='inference-client', daemon=True).start()
+            logger.info(f"✅ Connecté au serveur d'inférence {self.address}")
+
+    def _read_results(self, connection):
+        """Résout les requêtes en attente à mesure que les résultats arrivent."""
+        try:
+            while True:
+                request_id, shape, error = connection.recv()
+                with self._lock:
+                    future = self._pending.pop(request_id, None)
+                if future is None:
+                    continue
+                if error is not None:
+                    future.set_exception(RuntimeError(error))
+                else:
+                    future.set_result(shape)
+        except (EOFError, OSError):
+            logger.error("❌ Connexion au serveur d'inférence perdue")
+            with self._lock:
+                if self._connection is connection:
+                    self._connection = None
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(ConnectionError("Connexion au serveur d'inférence perdue"))
+
+    def model(self, name: str) -> Optional[RemoteModel]:
+        """Modèle servi sous ce nom, ou None s'il est indisponible côté serveur."""
+        self._ensure_connected()
+        info = self.models.get(name)
+        if not info or not info.get("loaded"):
+            return None
+        return RemoteModel(self, name, info)
+
+    def predict(self, name: str, batch: Any) -> np.ndarray:
+        """
+        Inférence d'un lot, découpé selon la taille de l'anneau.
+
+        Args:
+            name: Nom du modèle
+            batch: Entrées prétraitées (n, *forme d'entrée)
+
+        Returns:
+            Sorties du modèle (n, ...)
+        """
+        self._ensure_connected()
+        ring = self.rings[name]
+        batch = np.asarray(batch, dtype=np.float32)
+        outputs = [
+            self._predict_chunk(name, ring, batch[start:start + ring.slots])
+            for start in range(0, len(batch), ring.slots)
+        ]
+        return np.concatenate(outputs) if len(outputs) > 1 else outputs[0]
+
+    def _predict_chunk(self, name: str, ring: SharedTensorRing, chunk: np.ndarray) -> np.ndarray:
+        """Écrit un lot dans l'anneau, attend la sortie écrite par le worker et la copie."""
+        indices = ring.acquire(len(chunk), timeout=REQUEST_TIMEOUT)
+        reusable = True
+        try:
+            ring.array[indices] = chunk
+            request_id = uuid.uuid4().hex
+            future: Future = Future()
+            with self._lock:
+                connection = self._connection
+                self._pending[request_id] = future
+            with self._send_lock:
+                connection.send(('predict', request_id, name, indices))
+            try:
+                shape = tuple(future.result(timeout=REQUEST_TIMEOUT))
+            except FutureTimeoutError:
+                # Le worker peut encore écrire dans ces emplacements: rendus à l'arrivée du résultat
+                # (ou à l'échec signalé si le worker s'arrête ou si la connexion est perdue)
+                reusable = False
+                future.add_done_callback(lambda _: ring.release(indices))
+                raise
+            width = int(np.prod(shape))
+            return ring.flat[indices, :width].reshape((len(indices),) + shape).copy()
+        finally:
+            if reusable:
+                ring.release(indices)
+
+    def close(self):
+        """Ferme la connexion et supprime les anneaux."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
+
+
+def connect_registry(registry, address: str, authkey: Optional[bytes] = None,
+                     slots: int = DEFAULT_RING_SLOTS, connect_timeout: float = 120.0) -> InferenceClient:
+    """
+    Fait servir les modèles du registre par le serveur d'inférence.
+
+    Les modèles déjà déclarés sont remplacés par leur équivalent distant; la
+    connexion n'est établie qu'au premier chargement.
+
+    Args:
+        registry: Registre des modèles du processus
+        address: Chemin de la socket Unix du serveur
+
+    Returns:
+        Client d'inférence
+    """
+    client = InferenceClient(address, authkey, slots, connect_timeout)
+    for name in registry.names():
+        registry.register(name, lambda name=name: client.model(name), replace=True)
+    registry.remote = True
+    return client
@@ -0,0 +1,323 @@
+"""
+File d'analyses asynchrones et pool de processus workers.
+
+POST /api/v2/jobs enregistre la tâche (table analysis_jobs) et une copie du
+fichier dans le dossier de file d'attente, puis répond 202. Les workers sont des
+processus séparés (chacun avec sa propre application et ses propres modèles) qui
+réservent les tâches en attente par une mise à jour conditionnelle, exécutent
+l'endpoint synchrone correspondant sur le fichier, puis enregistrent sa réponse.
+
+Le nombre de workers est indépendant de la concurrence HTTP: JOB_WORKERS
+processus démarrés par l'application à la première soumission, et/ou des workers
+dédiés lancés avec scripts/job_worker.py (éventuellement sur d'autres machines
+partageant la base et le dossier de file d'attente).
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+
+from werkzeug.utils import secure_filename
+
+from app.models.image_models import db
+from app.models.job_models import AnalysisJob
+
+logger = logging.getLogger(__name__)
+
+# Endpoints synchrones exécutés par les workers, par type de tâche
+JOB_ENDPOINTS = {
+    'upload': '/api/v2/upload',
+    'add_steganography': '/api/v2/add_steganography',
+    'verify_integrity': '/api/v2/verify_integrity'
+}
+
+
+class JobService:
+    """Soumission, réservation et exécution des tâches d'analyse."""
+
+    def __init__(self, spool_dir: str = 'instance/jobs', stale_after: float = 600, max_attempts: int = 2):
+        """
+        Initialise le service.
+
+        Args:
+            spool_dir: Dossier des fichiers en attente de traitement
+            stale_after: Durée (s) après laquelle une tâche en cours est considérée abandonnée
+            max_attempts: Nombre maximal d'exécutions d'une tâche
+        """
+        self.spool_dir = spool_dir
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+
+    def submit(self, kind: str, file, form: Optional[Dict[str, str]] = None,
+               args: Optional[Dict[str, str]] = None) -> AnalysisJob:
+        """
+        Enregistre une tâche et la copie de son fichier.
+
+        Args:
+            kind: Type de tâche (clé de JOB_ENDPOINTS)
+            file: Fichier téléchargé (FileStorage)
+            form: Champs de formulaire transmis à l'endpoint
+            args: Paramètres d'URL transmis à l'endpoint
+
+        Returns:
+            Tâche en attente
+        """
+        if kind not in JOB_ENDPOINTS:
+            raise ValueError(f"Type de tâche inconnu: {kind} (attendu: {', '.join(JOB_ENDPOINTS)})")
+
+        os.makedirs(self.spool_dir, exist_ok=True)
+        filename = secure_filename(file.filename) or 'image'
+        input_path = os.path.join(self.spool_dir, f"{uuid.uuid4().hex}_{filename}")
+        file.save(input_path)
+
+        try:
+            job = AnalysisJob(
+                kind=kind,
+                status=AnalysisJob.STATUS_PENDING,
+                filename=file.filename,
+                input_path=input_path,
+                params_json=json.dumps({"form": form or {}, "args": args or {}})
+            )
+            db.session.add(job)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            os.remove(input_path)
+            raise
+
+        logger.info(f"📥 Tâche {job.id} ({kind}) en attente")
+        return job
+
+    def claim_next(self, worker: str) -> Optional[AnalysisJob]:
+        """
+        Réserve la plus ancienne tâche en attente.
+
+        La réservation est une mise à jour conditionnelle sur le statut: deux
+        workers ne peuvent pas obtenir la même tâche.
+
+        Args:
+            worker: Identifiant du worker
+
+        Returns:
+            Tâche réservée, ou None si la file est vide
+        """
+        while True:
+            candidate = db.session.query(AnalysisJob.id).filter(
+                AnalysisJob.status == AnalysisJob.STATUS_PENDING
+            ).order_by(AnalysisJob.id).first()
+            if candidate is None:
+                db.session.rollback()
+                return None
+
+            claimed = AnalysisJob.query.filter(
+                AnalysisJob.id == candidate.id,
+                AnalysisJob.status == AnalysisJob.STATUS_PENDING
+            ).update({
+                AnalysisJob.status: AnalysisJob.STATUS_RUNNING,
+                AnalysisJob.worker: worker,
+                AnalysisJob.started_at: datetime.utcnow(),
+                AnalysisJob.attempts: AnalysisJob.attempts + 1
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return db.session.get(AnalysisJob, candidate.id)
+            # Réservée entre-temps par un autre worker: essayer la suivante
+
+    def execute(self, app, job: AnalysisJob) -> AnalysisJob:
+        """
+        Exécute une tâche réservée via l'endpoint synchrone correspondant.
+
+        Args:
+            app: Application Flask du worker
+            job: Tâche réservée par claim_next
+
+        Returns:
+            Tâche terminée (done, ou failed si l'endpoint a échoué)
+        """
+        try:
+            params = job.params
+            with open(job.input_path, 'rb') as f:
+                data = dict(params.get("form", {}))
+                data['file'] = (f, job.filename or os.path.basename(job.input_path))
+                with app.test_client() as client:
+                    response = client.post(
+                        JOB_ENDPOINTS[job.kind],
+                        data=data,
+                        query_string=params.get("args", {}),
+                        content_type='multipart/form-data'
+                    )
+
+            job.http_status = response.status_code
+            job.result_json = response.get_data(as_text=True)
+            if response.status_code < 400:
+                job.status = AnalysisJob.STATUS_DONE
+            else:
+                job.status = AnalysisJob.STATUS_FAILED
+                job.error = (response.get_json(silent=True) or {}).get("error")
+        except Exception as e:
+            db.session.rollback()
+            job.status = AnalysisJob.STATUS_FAILED
+            job.error = str(e)
+            logger.error(f"❌ Tâche {job.id} échouée: {str(e)}")
+
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        self._discard_input(job)
+        logger.info(f"✅ Tâche {job.id} ({job.kind}) terminée: {job.status}")
+        return job
+
+    def requeue_stale(self) -> int:
+        """
+        Remet en attente les tâches abandonnées par un worker arrêté.
+
+        Au-delà de max_attempts exécutions, la tâche passe en échec.
+
+        Returns:
+            Nombre de tâches traitées
+        """
+        limit = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        stale: List[AnalysisJob] = AnalysisJob.query.filter(
+            AnalysisJob.status == AnalysisJob.STATUS_RUNNING,
+            AnalysisJob.started_at < limit
+        ).all()
+        for job in stale:
+            if job.attempts >= self.max_attempts:
+                job.status = AnalysisJob.STATUS_FAILED
+                job.error = f"Tâche abandonnée après {job.attempts} tentatives"
+                job.finished_at = datetime.utcnow()
+                self._discard_input(job)
+            else:
+                job.status = AnalysisJob.STATUS_PENDING
+                job.worker = None
+        db.session.commit()
+        if stale:
+            logger.warning(f"⚠️ {len(stale)} tâches abandonnées (reprises ou en échec)")
+        return len(stale)
+
+    @staticmethod
+    def _discard_input(job: AnalysisJob):
+        """Supprime la copie du fichier une fois la tâche terminée."""
+        if job.input_path and os.path.exists(job.input_path):
+            os.remove(job.input_path)
+
+
+def worker_id() -> str:
+    """Identifiant du worker courant (hôte:pid)."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_worker(app, service: JobService, poll_interval: float = 0.5,
+               stop_event: Optional[threading.Event] = None, max_jobs: Optional[int] = None) -> int:
+    """
+    Boucle d'un worker: réserve et exécute les tâches jusqu'à l'arrêt.
+
+    Args:
+        app: Application Flask du worker
+        service: Service de tâches
+        poll_interval: Attente (s) lorsque la file est vide
+        stop_event: Événement d'arrêt (None = jusqu'à interruption)
+        max_jobs: Nombre de tâches avant de s'arrêter (None = illimité)
+
+    Returns:
+        Nombre de tâches exécutées
+    """
+    stop_event = stop_event or threading.Event()
+    name = worker_id()
+    done = 0
+    last_requeue = 0.0
+    with app.app_context():
+        while not stop_event.is_set() and (max_jobs is None or done < max_jobs):
+            try:
+                if time.monotonic() - last_requeue > min(60.0, service.stale_after):
+                    service.requeue_stale()
+                    last_requeue = time.monotonic()
+
+                job = service.claim_next(name)
+                if job is None:
+                    stop_event.wait(poll_interval)
+                    continue
+                service.execute(app, job)
+                done += 1
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"❌ Erreur du worker {name}: {str(e)}")
+                stop_event.wait(poll_interval)
+            finally:
+                db.session.remove()
+    return done
+
+
+def _worker_main(config_name: str, stop_event):
+    """Point d'entrée d'un processus worker (application et modèles propres)."""
+    from app import create_app
+
+    app = create_app(config_name)
+    service = JobService(
+        spool_dir=app.config['JOB_SPOOL_DIR'],
+        stale_after=app.config['JOB_STALE_AFTER'],
+        max_attempts=app.config['JOB_MAX_ATTEMPTS']
+    )
+    logger.info(f"✅ Worker {worker_id()} démarré")
+    run_worker(app, service, app.config['JOB_POLL_INTERVAL'], stop_event)
+
+
+class JobWorkerPool:
+    """Processus workers démarrés par l'application web."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._processes: List[multiprocessing.Process] = []
+        self._stop_event = None
+
+    @property
+    def size(self) -> int:
+        """Nombre de workers vivants."""
+        return sum(1 for process in self._processes if process.is_alive())
+
+    def ensure_started(self, config_name: str, workers: int):
+        """
+        Démarre (ou redémarre) les workers manquants.
+
+        Args:
+            config_name: Configuration de l'application des workers
+            workers: Nombre de processus souhaité (0 = workers externes uniquement)
+        """
+        if workers <= 0:
+            return
+        with self._lock:
+            # Processus « spawn »: aucun état TensorFlow hérité du processus web
+            context = multiprocessing.get_context('spawn')
+            if self._stop_event is None:
+                self._stop_event = context.Event()
+            self._processes = [process for process in self._processes if process.is_alive()]
+            for _ in range(workers - len(self._processes)):
+                process = context.Process(
+                    target=_worker_main, args=(config_name, self._stop_event),
+                    name='analysis-worker', daemon=True
+                )
+                process.start()
+                self._processes.append(process)
+                logger.info(f"🔄 Worker d'analyse démarré (pid {process.pid})")
+
+    def stop(self, timeout: float = 5.0):
+        """Arrête les workers après leur tâche en cours."""
+        with self._lock:
+            if self._stop_event is not None:
+                self._stop_event.set()
+            for process in self._processes:
+                process.join(timeout)
+                if process.is_alive():
+                    process.terminate()
+            self._processes = []
+            self._stop_event = None
+
+
+# Pool partagé par l'application web
+job_worker_pool = JobWorkerPool()
@@ -17,6 +17,7 @@ import struct
 import logging
 from typing import Dict, Any, Optional, Tuple, Union
 import json
+from app.utils.image_context import ImageContext, ImageSource
 
 logger = logging.getLogger(__name__)
 
@@ -86,42 +87,43 @@ class JPEGSteganographyService:
                 'method': method
             }
 
-    def extract_message_from_jpeg(self, image_path: str, method: str = 'exif') -> Dict[str, Any]:
+    def extract_message_from_jpeg(self, image_path: ImageSource, method: str = 'exif') -> Dict[str, Any]:
         """
         Extrait un message caché d'une image JPEG.
 
         Args:
-            image_path: Chemin vers l'image JPEG
+            image_path: Chemin vers l'image JPEG, contenu en mémoire ou ImageContext
             method: Méthode d'extraction ('exif', 'dct', 'lsb')
 
         Returns:
             Dictionnaire avec le message extrait et les informations
         """
+        context = ImageContext.of(image_path)
         try:
             # Vérifier que le fichier est un JPEG
-            if not self._is_jpeg(image_path):
+            if not self._is_jpeg(context):
                 raise ValueError("Le fichier n'est pas une image JPEG valide")
 
             # Appliquer la méthode d'extraction choisie
             if method == 'exif':
-                result = self._extract_from_exif(image_path)
+                result = self._extract_from_exif(context)
             elif method == 'lsb':
-                result = self._extract_from_lsb_jpeg(image_path)
+                result = self._extract_from_lsb_jpeg(context)
             elif method == 'dct':
-                result = self._extract_from_dct(image_path)
+                result = self._extract_from_dct(context)
             else:
                 raise ValueError(f"Méthode non supportée: {method}")
 
             result.update({
-                'image_path': image_path,
+                'image_path': context.name,
                 'method': method,
                 'success': True
             })
 
             if result.get('message'):
-                logger.info(f"Message extrait avec succès de {image_path} (méthode: {method})")
+                logger.info(f"Message extrait avec succès de {context.name} (méthode: {method})")
             else:
-                logger.info(f"Aucun message trouvé dans {image_path} (méthode: {method})")
+                logger.info(f"Aucun message trouvé dans {context.name} (méthode: {method})")
 
             return result
 
@@ -130,7 +132,7 @@ class JPEGSteganographyService:
             return {
                 'success': False,
                 'error': str(e),
-                'image_path': image_path,
+                'image_path': context.name,
                 'method': method
             }
 
@@ -173,14 +175,14 @@ class JPEGSteganographyService:
         except Exception as e:
             raise Exception(f"Erreur EXIF: {str(e)}")
 
-    def _extract_from_exif(self, image_path: str) -> Dict[str, Any]:
+    def _extract_from_exif(self, context: ImageContext) -> Dict[str, Any]:
         """Extrait un message des données EXIF."""
         try:
             import piexif
             
-            # Charger les données EXIF
+            # Charger les données EXIF (piexif lit directement le contenu JPEG en mémoire)
             try:
-                exif_dict = piexif.load(image_path)
+                exif_dict = piexif.load(context.data)
             except:
                 return {'message': None, 'info': 'Aucune donnée EXIF trouvée'}
 
@@ -251,13 +253,11 @@ class JPEGSteganographyService:
         except Exception as e:
             raise Exception(f"Erreur LSB JPEG: {str(e)}")
 
-    def _extract_from_lsb_jpeg(self, image_path: str) -> Dict[str, Any]:
+    def _extract_from_lsb_jpeg(self, context: ImageContext) -> Dict[str, Any]:
         """Extrait un message en utilisant LSB sur l'image JPEG."""
         try:
-            # Charger l'image
-            img = Image.open(image_path)
-            img = img.convert('RGB')
-            img_array = np.array(img)
+            # Image décodée en RGB
+            img_array = context.rgb
 
             # Extraire les LSB
             flat_array = img_array.flatten()
@@ -309,31 +309,34 @@ class JPEGSteganographyService:
         except Exception as e:
             raise Exception(f"Erreur DCT: {str(e)}")
 
-    def _extract_from_dct(self, image_path: str) -> Dict[str, Any]:
+    def _extract_from_dct(self, context: ImageContext) -> Dict[str, Any]:
         """Extrait un message des coefficients DCT."""
         try:
             # Fallback vers LSB pour cette implémentation simplifiée
             logger.warning("Méthode DCT simplifiée - utilisation de LSB comme fallback")
-            return self._extract_from_lsb_jpeg(image_path)
+            return self._extract_from_lsb_jpeg(context)
 
         except Exception as e:
             raise Exception(f"Erreur extraction DCT: {str(e)}")
 
-    def _is_jpeg(self, image_path: str) -> bool:
+    def _is_jpeg(self, image_path: ImageSource) -> bool:
         """Vérifie si le fichier est une image JPEG valide."""
         try:
+            if not isinstance(image_path, str):
+                return ImageContext.of(image_path).info['format'] in ['JPEG', 'JPG']
             with Image.open(image_path) as img:
                 return img.format in ['JPEG', 'JPG']
         except:
             return False
 
-    def analyze_jpeg_capacity(self, image_path: str) -> Dict[str, Any]:
-        """Analyse la capacité de dissimulation d'une image JPEG."""
+    def analyze_jpeg_capacity(self, image_path: ImageSource) -> Dict[str, Any]:
+        """Analyse la capacité de dissimulation d'une image JPEG (chemin ou contenu en mémoire)."""
         try:
-            if not self._is_jpeg(image_path):
+            context = ImageContext.of(image_path)
+            if not self._is_jpeg(context):
                 raise ValueError("Le fichier n'est pas une image JPEG valide")
 
-            img = Image.open(image_path)
+            img = context.image
             width, height = img.size
 
             # Calculer les capacités pour chaque méthode
@@ -356,27 +359,27 @@ class JPEGSteganographyService:
                     'height': height,
                     'dimensions': f"{width}x{height}"
                 },
-                'file_size': os.path.getsize(image_path),
+                'file_size': context.size,
                 'lsb_capacity': lsb_capacity,
                 'exif_capacity': exif_capacity,
                 'capacity_lsb_bytes': lsb_capacity,
                 'capacity_exif_bytes': exif_capacity,
                 'recommended_method': 'exif' if lsb_capacity > 10000 else 'lsb',
                 'exif_analysis': exif_info,
-                'quality_estimate': self._estimate_jpeg_quality(image_path)
+                'quality_estimate': self._estimate_jpeg_quality(context)
             }
 
         except Exception as e:
             logger.error(f"Erreur analyse capacité: {str(e)}")
             return {'error': str(e)}
 
-    def _estimate_jpeg_quality(self, image_path: str) -> int:
+    def _estimate_jpeg_quality(self, image_path: ImageSource) -> int:
         """Estime la qualité JPEG (approximation)."""
         try:
-            # Méthode approximative basée sur la taille du fichier
-            img = Image.open(image_path)
-            width, height = img.size
-            file_size = os.path.getsize(image_path)
+            # Méthode approximative basée sur la taille du fichier (en-tête seulement)
+            context = ImageContext.of(image_path)
+            width, height = context.image.size
+            file_size = context.size
 
             # Calcul approximatif de la qualité
             pixels = width * height
@@ -401,8 +404,8 @@ class JPEGSteganographyService:
             img = Image.open(image_path)
             img_array = np.array(img)
 
-            # Créer un hash du contenu
-            content_hash = hashlib.md5(img_array.tobytes()).hexdigest()
+            # Créer un hash du contenu (tampon du tableau haché sans copie)
+            content_hash = hashlib.md5(np.ascontiguousarray(img_array)).hexdigest()
 
             # Créer une signature avec timestamp
             signature_data = {
@@ -433,11 +436,12 @@ class JPEGSteganographyService:
             logger.error(f"Erreur création signature: {str(e)}")
             return {'success': False, 'error': str(e)}
 
-    def verify_steganographic_signature(self, image_path: str) -> Dict[str, Any]:
-        """Vérifie l'intégrité d'une signature stéganographique."""
+    def verify_steganographic_signature(self, image_path: ImageSource) -> Dict[str, Any]:
+        """Vérifie l'intégrité d'une signature stéganographique (chemin ou contenu en mémoire)."""
         try:
             # Extraire la signature
-            extraction_result = self.extract_message_from_jpeg(image_path, method='exif')
+            context = ImageContext.of(image_path)
+            extraction_result = self.extract_message_from_jpeg(context, method='exif')
 
             if not extraction_result.get('message'):
                 return {
@@ -454,9 +458,8 @@ class JPEGSteganographyService:
                 }
 
             # Recalculer le hash du contenu actuel
-            img = Image.open(image_path)
-            img_array = np.array(img)
-            current_hash = hashlib.md5(img_array.tobytes()).hexdigest()
+            img_array = np.asarray(context.decoded)
+            current_hash = hashlib.md5(np.ascontiguousarray(img_array)).hexdigest()
 
             # Comparer avec la signature
             original_hash = signature_data.get('content_hash')
@@ -0,0 +1,221 @@
+"""
+Registre des modèles Keras partagés par le processus.
+
+Chaque modèle (ResNet50, model.h5...) est déclaré avec sa fonction de chargement
+et n'est chargé qu'une fois par processus, quel que soit le nombre de services
+qui l'utilisent (API v1, API v2, scripts). Les prédictions d'un même modèle sont
+sérialisées: predict() de Keras n'est pas garanti thread-safe, en particulier
+lors du premier appel qui construit le graphe.
+"""
+
+import time
+import logging
+import threading
+import contextlib
+from typing import Dict, Any, Callable, Optional
+
+import numpy as np
+
+from app.utils.micro_batcher import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+
+def model_weights_bytes(model: Any) -> Optional[int]:
+    """Taille des poids d'un modèle Keras en octets (None si inconnue)."""
+    if hasattr(model, 'size_bytes'):
+        return model.size_bytes  # Export TFLite: taille du fichier
+    try:
+        total = 0
+        for weight in model.weights:
+            count = 1
+            for dim in weight.shape:
+                count *= int(dim)
+            total += count * weight.dtype.size
+        return total
+    except Exception:
+        return None
+
+
+def process_rss_bytes() -> Optional[int]:
+    """Mémoire résidente du processus en octets (Linux), ou None."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class SharedModel:
+    """Modèle partagé: prédictions sérialisées, autres attributs délégués au modèle Keras."""
+
+    def __init__(self, name: str, model: Any):
+        self.name = name
+        self.model = model
+        self.predictions = 0
+        self.batcher: Optional[MicroBatcher] = None
+        # Modèle servi par des workers: pas de sérialisation locale des prédictions
+        self._lock = contextlib.nullcontext() if getattr(model, 'thread_safe', False) else threading.Lock()
+
+    def predict(self, *args, **kwargs):
+        """Prédiction (une seule à la fois pour ce modèle)."""
+        with self._lock:
+            self.predictions += 1
+            return self.model.predict(*args, **kwargs)
+
+    def enable_batching(self, max_batch_size: int, max_wait_ms: float):
+        """Regroupe les prédictions unitaires (predict_one) en lots; max_batch_size <= 1 désactive."""
+        previous, self.batcher = self.batcher, None
+        if max_batch_size > 1:
+            self.batcher = MicroBatcher(
+                self._predict_batch, max_batch_size, max_wait_ms, name=f"batcher-{self.name}"
+            )
+        if previous is not None:
+            previous.close()
+
+    def _predict_batch(self, items):
+        """Une passe du modèle sur un lot d'entrées unitaires."""
+        return list(self.predict(np.stack(items), verbose=0))
+
+    def predict_one(self, item: Any) -> Any:
+        """
+        Prédiction d'une seule entrée (sans dimension de lot).
+
+        Avec le regroupement activé, l'entrée rejoint le prochain lot partagé
+        par tous les threads; sinon, passe unitaire.
+
+        Args:
+            item: Entrée prétraitée (par exemple tableau (128, 128, 3))
+
+        Returns:
+            Sortie du modèle pour cette entrée
+        """
+        batcher = self.batcher
+        if batcher is None:
+            return self.predict(np.expand_dims(item, axis=0), verbose=0)[0]
+        return batcher(item)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class ModelRegistry:
+    """Modèles chargés une fois par processus, à la première demande."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._models: Dict[str, Optional[SharedModel]] = {}
+        self._info: Dict[str, Dict[str, Any]] = {}
+        self._batching = (0, 0.0)  # (taille maximale des lots, attente maximale en ms)
+        self.remote = False  # Modèles servis par le serveur d'inférence (pas de TensorFlow local)
+
+    def configure_batching(self, max_batch_size: int, max_wait_ms: float):
+        """
+        Configure le regroupement des prédictions unitaires de tous les modèles.
+
+        Args:
+            max_batch_size: Nombre maximal d'entrées par lot (<= 1 = désactivé)
+            max_wait_ms: Attente maximale (ms) pour compléter un lot
+        """
+        with self._lock:
+            self._batching = (int(max_batch_size), float(max_wait_ms))
+            loaded = [shared for shared in self._models.values() if shared is not None]
+        for shared in loaded:
+            shared.enable_batching(*self._batching)
+
+    def register(self, name: str, loader: Callable[[], Any], replace: bool = False):
+        """
+        Déclare un modèle (sans le charger).
+
+        Args:
+            name: Nom du modèle (resnet50, ai_detection...)
+            loader: Fonction de chargement; renvoie le modèle ou None s'il est indisponible
+            replace: Remplacer la fonction de chargement déjà déclarée (sans effet si le modèle est chargé)
+        """
+        with self._lock:
+            if replace and name in self._models:
+                logger.warning(f"⚠️ Modèle {name} déjà chargé, chargement inchangé")
+            elif replace:
+                self._loaders[name] = loader
+            self._loaders.setdefault(name, loader)
+            self._load_locks.setdefault(name, threading.Lock())
+
+    def names(self):
+        """Noms des modèles déclarés."""
+        return sorted(self._loaders)
+
+    def get(self, name: str) -> Optional[SharedModel]:
+        """
+        Renvoie le modèle, chargé au premier appel (les appels concurrents attendent).
+
+        Un échec de chargement est mémorisé: le modèle vaut alors None.
+
+        Args:
+            name: Nom du modèle déclaré
+
+        Returns:
+            Modèle partagé, ou None s'il est indisponible
+        """
+        if name in self._models:
+            return self._models[name]
+        if name not in self._loaders:
+            raise KeyError(f"Modèle non déclaré: {name}")
+
+        with self._load_locks[name]:
+            if name not in self._models:
+                self._load(name)
+        return self._models[name]
+
+    def _load(self, name: str):
+        """Charge un modèle (verrou du modèle tenu)."""
+        rss_before = process_rss_bytes()
+        start = time.perf_counter()
+        info: Dict[str, Any] = {"error": None}
+        try:
+            model = self._loaders[name]()
+        except Exception as e:
+            logger.error(f"❌ Chargement du modèle {name} impossible: {str(e)}")
+            model, info["error"] = None, str(e)
+
+        info["load_seconds"] = round(time.perf_counter() - start, 3)
+        if model is not None:
+            rss_after = process_rss_bytes()
+            info.update({
+                "parameters": model.count_params() if hasattr(model, 'count_params') else None,
+                "weights_bytes": model_weights_bytes(model),
+                "rss_delta_bytes": rss_after - rss_before if rss_before and rss_after else None
+            })
+            logger.info(f"✅ Modèle {name} chargé en {info['load_seconds']}s")
+
+        self._info[name] = info
+        shared = None
+        if model is not None:
+            shared = SharedModel(name, model)
+            shared.enable_batching(*self._batching)
+        self._models[name] = shared
+
+    def is_loaded(self, name: str) -> bool:
+        """Indique si le chargement du modèle a déjà eu lieu (réussi ou non)."""
+        return name in self._models
+
+    def stats(self) -> Dict[str, Any]:
+        """Empreinte mémoire et utilisation de chaque modèle déclaré."""
+        models = {}
+        for name in sorted(self._loaders):
+            shared = self._models.get(name)
+            models[name] = {
+                "loaded": shared is not None,
+                "predictions": shared.predictions if shared is not None else 0,
+                "batching": shared.batcher.stats() if shared is not None and shared.batcher else None,
+                **self._info.get(name, {})
+            }
+        return {"models": models, "process_rss_bytes": process_rss_bytes()}
+
+
+# Registre partagé par les services du processus
+model_registry = ModelRegistry()
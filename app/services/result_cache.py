@@ -0,0 +1,266 @@
+"""
+Cache des résultats d'analyse adressé par le contenu.
+
+Une entrée est identifiée par (SHA-256 du fichier, étape, version de l'étape).
+La version combine la version de l'algorithme et l'empreinte du modèle utilisé
+(par exemple le SHA-256 de model.h5): changer de modèle ou d'algorithme change
+la clé, les anciennes entrées ne sont plus jamais lues et expirent d'elles-mêmes.
+
+Deux niveaux:
+- LRU en mémoire, borné en nombre d'entrées (par processus) ;
+- SQLite sur disque (optionnel), partagé entre les processus, avec durée de vie.
+
+Le verrou ne protège que le niveau mémoire. Le niveau disque utilise une
+connexion SQLite par thread et par processus: une connexion n'est jamais
+partagée entre threads, ni héritée par un processus enfant (fork), ce que
+SQLite interdit ; les lectures concurrentes ne s'attendent pas entre elles.
+
+Les résultats en erreur ne sont pas mis en cache, sauf pour les étapes dont
+l'échec est une réponse déterministe du contenu (cache_errors). Une exception
+levée par le calcul n'est jamais mise en cache.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import weakref
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Fréquence (en écritures) de la purge des entrées expirées sur disque
+PURGE_EVERY = 1000
+
+_MISSING = object()
+
+# Caches du processus, réinitialisés dans les processus enfants (fork)
+_instances = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for cache in list(_instances):
+        cache._after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def is_cacheable(value: Any) -> bool:
+    """Les résultats en erreur (dict avec une clé "error") ne sont pas mis en cache."""
+    return value is not None and not (isinstance(value, dict) and "error" in value)
+
+
+class ResultCache:
+    """Cache LRU en mémoire, doublé d'un cache SQLite optionnel avec durée de vie."""
+
+    def __init__(self, max_entries: int = 2048, path: Optional[str] = None, ttl: float = 7 * 24 * 3600):
+        """
+        Initialise le cache.
+
+        Args:
+            max_entries: Nombre maximal d'entrées en mémoire (0 = désactivé)
+            path: Fichier SQLite du niveau disque (None = mémoire uniquement)
+            ttl: Durée de vie des entrées sur disque, en secondes
+        """
+        self._lock = threading.Lock()
+        self._entries: OrderedDict = OrderedDict()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._local = threading.local()  # Connexion SQLite de chaque thread
+        self._generation = 0  # Incrémentée à chaque changement de fichier
+        self._writes = 0
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = None
+        self.configure(max_entries, path, ttl)
+        _instances.add(self)
+
+    def _after_fork(self):
+        """
+        Processus enfant: le verrou a pu être copié alors qu'un autre thread le tenait,
+        et les connexions du parent ne doivent être ni utilisées ni fermées.
+        """
+        self._lock = threading.Lock()
+        self._inherited_local = self._local  # Gardée en vie: jamais fermée dans l'enfant
+        self._local = threading.local()
+
+    def configure(self, max_entries: int = 2048, path: Optional[str] = None, ttl: float = 7 * 24 * 3600):
+        """(Re)configure les niveaux du cache ; le contenu en mémoire est conservé dans la limite."""
+        with self._lock:
+            self.max_entries = max(0, int(max_entries))
+            self.ttl = ttl
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+            if path != self.path:
+                # Les threads rouvrent leur connexion ; les anciennes sont libérées avec elles
+                self._generation += 1
+                self.path = path
+                if path:
+                    try:
+                        self._open(path).close()  # Crée la base et vérifie qu'elle est accessible
+                    except Exception as e:
+                        logger.warning(f"⚠️ Cache de résultats sur disque indisponible ({path}): {str(e)}")
+                        self.path = None
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Connexion SQLite du thread courant (ouverte au premier usage), None sans niveau disque."""
+        path = self.path
+        if not path:
+            return None
+        local = self._local
+        if getattr(local, 'key', None) == (os.getpid(), self._generation):
+            return local.connection
+        try:
+            connection = self._open(path)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache de résultats sur disque indisponible ({path}): {str(e)}")
+            return None
+        local.connection = connection
+        local.key = (os.getpid(), self._generation)
+        return connection
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        """Ouvre (et crée si besoin) la base SQLite du niveau disque."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(path, timeout=5, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")  # Lectures concurrentes entre processus
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " digest TEXT NOT NULL, stage TEXT NOT NULL, version TEXT NOT NULL,"
+            " value TEXT NOT NULL, expires_at REAL NOT NULL,"
+            " PRIMARY KEY (digest, stage, version))"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_results_expires_at ON results (expires_at)")
+        return connection
+
+    def get_or_compute(self, digest: Optional[str], stage: str, version: str,
+                       compute: Callable[[], Any], cache_errors: bool = False) -> Any:
+        """
+        Renvoie le résultat en cache, ou le calcule et le met en cache.
+
+        Args:
+            digest: SHA-256 du contenu (None = pas de cache)
+            stage: Nom de l'étape (steganography, ai_detection...)
+            version: Version de l'étape (algorithme et modèle)
+            compute: Calcul du résultat (valeur sérialisable en JSON)
+            cache_errors: Mettre aussi en cache les résultats {"error": ...} renvoyés par compute
+                          (les exceptions levées par compute ne sont jamais mises en cache)
+
+        Returns:
+            Résultat de l'étape
+        """
+        if not digest:
+            return compute()
+
+        key = (digest, stage, version)
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+
+        value = compute()
+        if value is not None and (cache_errors or is_cacheable(value)):
+            self.put(key, value)
+        return value
+
+    def _lookup(self, key: Tuple[str, str, str]) -> Any:
+        """Lit une entrée (mémoire puis disque) ; renvoie _MISSING si absente."""
+        stage = key[1]
+        with self._lock:
+            stats = self._stats.setdefault(stage, {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+            serialized = self._entries.get(key)
+            if serialized is not None:
+                self._entries.move_to_end(key)
+                stats["memory_hits"] += 1
+        if serialized is not None:
+            return json.loads(serialized)
+
+        row = None
+        connection = self._connection()
+        if connection is not None:
+            try:
+                row = connection.execute(
+                    "SELECT value FROM results WHERE digest = ? AND stage = ? AND version = ? AND expires_at > ?",
+                    (*key, time.time())
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ Lecture du cache de résultats impossible: {str(e)}")
+
+        with self._lock:
+            if row is None:
+                stats["misses"] += 1
+                return _MISSING
+            stats["disk_hits"] += 1
+            self._remember(key, row[0])
+        return json.loads(row[0])
+
+    def put(self, key: Tuple[str, str, str], value: Any):
+        """Enregistre une entrée dans les deux niveaux."""
+        try:
+            serialized = json.dumps(value)
+        except (TypeError, ValueError):
+            return
+
+        with self._lock:
+            self._remember(key, serialized)
+            self._writes += 1
+            purge = self._writes % PURGE_EVERY == 0
+
+        connection = self._connection()
+        if connection is None:
+            return
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO results (digest, stage, version, value, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (*key, serialized, time.time() + self.ttl)
+            )
+            if purge:
+                connection.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ Écriture du cache de résultats impossible: {str(e)}")
+
+    def _remember(self, key: Tuple[str, str, str], serialized: str):
+        """Ajoute une entrée au niveau mémoire (verrou tenu)."""
+        if not self.max_entries:
+            return
+        self._entries[key] = serialized
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Vide les deux niveaux et remet les statistiques à zéro."""
+        with self._lock:
+            self._entries.clear()
+            self._stats.clear()
+        connection = self._connection()
+        if connection is not None:
+            connection.execute("DELETE FROM results")
+
+    def stats(self) -> Dict[str, Any]:
+        """Taux de succès par étape et taille des niveaux."""
+        with self._lock:
+            stages = {}
+            for stage, counts in self._stats.items():
+                lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+                hits = counts["memory_hits"] + counts["disk_hits"]
+                stages[stage] = {**counts, "lookups": lookups,
+                                 "hit_ratio": round(hits / lookups, 4) if lookups else None}
+            return {
+                "memory_entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_path": self.path,
+                "ttl_seconds": self.ttl,
+                "stages": stages
+            }
+
+
+# Cache partagé par les services (configuré au démarrage de l'application)
+result_cache = ResultCache(path=None)
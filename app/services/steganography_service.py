@@ -1,37 +1,83 @@
 import os
 import hashlib
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Sequence
 from stegano import lsb
-from PIL import Image
 import imagehash
 import cv2
 import numpy as np
-from scipy.spatial.distance import hamming
 from app.models.image_models import ImageAnalysis, db
+from app.models.hash_models import ImageHash, IndexChange
+from app.services.hash_index import perceptual_hash_index, HASH_BITS
+from app.services.result_cache import result_cache
 from app.utils.exceptions import SteganographyError
+from app.utils.digests import compute_stream_digests
+from app.utils.image_context import ImageContext, ImageSource
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _package_version(name: str) -> str:
+    """Version installée d'une bibliothèque d'analyse (partie de la clé du cache de résultats)."""
+    try:
+        from importlib.metadata import version
+        return version(name)
+    except Exception:
+        return "unknown"
+
+# Versions des étapes mises en cache: à incrémenter à chaque changement d'algorithme
+STEGANOGRAPHY_VERSION = f"lsb-1/stegano-{_package_version('stegano')}"
+HASHES_VERSION = f"hashes-1/imagehash-{_package_version('ImageHash')}"
+
 class SteganographyService:
     """Service pour gérer les opérations de stéganographie."""
 
     @staticmethod
-    def detect_hidden_message(image_path: str) -> Dict[str, Any]:
+    def detect_hidden_message(image_path: ImageSource) -> Dict[str, Any]:
         """
         Détecte si une image contient un message caché (implémentation exacte de steganoV2.py).
 
         Args:
-            image_path: Chemin vers l'image à analyser
+            image_path: Chemin vers l'image à analyser, contenu en mémoire ou ImageContext
 
         Returns:
             Dict contenant les résultats de l'analyse
         """
         try:
-            hidden_message = lsb.reveal(image_path)
-            return {"signature_detected": True, "signature": hidden_message} if hidden_message else {"signature_detected": False}
+            context = ImageContext.of(image_path)
+            digest = context.digests["sha256"]
+        except Exception:
+            return {"error": "Impossible to detect message."}
+
+        # L'absence de message est signalée par une erreur de stegano: réponse mise en cache aussi ;
+        # un autre échec (lecture, mémoire...) lève une exception et n'est pas mis en cache
+        try:
+            return result_cache.get_or_compute(
+                digest, 'steganography', STEGANOGRAPHY_VERSION,
+                lambda: SteganographyService._reveal(image_path, context), cache_errors=True
+            )
         except Exception as e:
+            logger.warning(f"⚠️ Recherche de message caché impossible: {str(e)}")
+            return {"error": "Impossible to detect message."}
+
+    @staticmethod
+    def _reveal(image_path: ImageSource, context: ImageContext) -> Dict[str, Any]:
+        """
+        Recherche LSB du message caché (sans cache).
+
+        Raises:
+            Exception: Échec de la lecture de l'image (résultat non déterministe)
+        """
+        if not isinstance(image_path, str):
+            # lsb.reveal ferme l'image qu'on lui passe: copie de l'image déjà décodée
+            image = context.copy_image()
+        else:
+            image = image_path
+        try:
+            hidden_message = lsb.reveal(image)
+        except IndexError:
+            # stegano n'a trouvé aucun message: réponse déterministe du contenu
             return {"error": "Impossible to detect message."}
+        return {"signature_detected": True, "signature": hidden_message} if hidden_message else {"signature_detected": False}
 
     @staticmethod
     def embed_message(image_path: str, message: str, output_path: Optional[str] = None) -> str:
@@ -66,24 +112,28 @@ class SteganographyService:
             raise SteganographyError(f"Impossible de cacher le message: {str(e)}")
 
     @staticmethod
-    def generate_image_context_signature(image_path: str) -> str:
+    def generate_image_context_signature(image_path: ImageSource) -> str:
         """
         Génère une signature contextuelle pour une image basée sur ses caractéristiques visuelles.
 
         Args:
-            image_path: Chemin vers l'image
+            image_path: Chemin vers l'image, contenu en mémoire ou ImageContext
 
         Returns:
             Signature contextuelle de l'image
         """
         try:
-            # Charger l'image avec OpenCV
-            img = cv2.imread(image_path)
-            if img is None:
-                raise SteganographyError(f"Impossible de charger l'image: {image_path}")
-
-            # Convertir en niveaux de gris pour simplifier
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            if not isinstance(image_path, str):
+                # Niveaux de gris issus du décodage partagé
+                gray = ImageContext.of(image_path).gray
+            else:
+                # Charger l'image avec OpenCV
+                img = cv2.imread(image_path)
+                if img is None:
+                    raise SteganographyError(f"Impossible de charger l'image: {image_path}")
+
+                # Convertir en niveaux de gris pour simplifier
+                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
             # Calculer des caractéristiques visuelles
             # 1. Histogramme des niveaux de gris
@@ -115,163 +165,281 @@ class SteganographyService:
             raise SteganographyError(f"Erreur lors de la génération de signature contextuelle: {str(e)}")
 
     @staticmethod
-    def generate_image_hashes(image_path: str) -> Dict[str, str]:
+    def generate_image_hashes(image_path: ImageSource) -> Dict[str, str]:
         """
         Génère plusieurs types de hashes pour une image.
 
         Args:
-            image_path: Chemin vers l'image
+            image_path: Chemin vers l'image, contenu en mémoire ou ImageContext
 
         Returns:
             Dictionnaire contenant les différents hashes
         """
         try:
-            img = Image.open(image_path)
-
-            # Générer perceptual hash (pHash)
-            phash = str(imagehash.phash(img))
-
-            # Générer difference hash (dHash)
-            dhash = str(imagehash.dhash(img))
-
-            return {
-                "phash": phash,
-                "dhash": dhash
-            }
+            context = ImageContext.of(image_path)
+            return result_cache.get_or_compute(
+                context.digests["sha256"], 'hashes', HASHES_VERSION,
+                lambda: SteganographyService._compute_hashes(context)
+            )
         except Exception as e:
             logger.error(f"Erreur lors de la génération des hashes: {str(e)}")
             raise SteganographyError(f"Erreur lors de la génération des hashes: {str(e)}")
 
     @staticmethod
-    def find_similar_images_advanced(hashes: Dict[str, str], threshold: float = 0.85) -> list:
+    def _compute_hashes(context: ImageContext) -> Dict[str, str]:
+        """Calcule les quatre hashes perceptuels (sans cache)."""
+        img = context.decoded
+
+        # Générer perceptual hash (pHash), partagé avec calculate_perceptual_hash
+        phash = context.memoize('phash', lambda: str(imagehash.phash(img)))
+
+        # Générer difference hash (dHash)
+        dhash = str(imagehash.dhash(img))
+
+        return {
+            "phash": phash,
+            "dhash": dhash,
+            "ahash": str(imagehash.average_hash(img)),
+            "whash": str(imagehash.whash(img))
+        }
+
+    @staticmethod
+    def find_similar_images_advanced(hashes: Dict[str, str], threshold: float = 0.85,
+                                     k: Optional[int] = None, max_distance: Optional[float] = None) -> list:
         """
         Trouve des images similaires en utilisant plusieurs méthodes de hash.
 
+        La recherche passe par l'index multi-hash (pHash/dHash) en mémoire: seules
+        les images candidates sont ensuite chargées depuis la base.
+
         Args:
             hashes: Dictionnaire contenant les hashes de l'image
             threshold: Seuil de similitude (0-1)
+            k: Nombre maximal de résultats (top-k), None pour tous
+            max_distance: Distance de Hamming moyenne maximale en bits (prioritaire sur threshold)
 
         Returns:
             Liste des images similaires
         """
         try:
-            similar_images = []
-
-            # Récupérer toutes les images de la base de données
-            all_images = ImageAnalysis.query.filter(
-                ImageAnalysis.perceptual_hash.isnot(None)
-            ).all()
-
-            for img in all_images:
-                try:
-                    # Calculer la distance de Hamming pour pHash
-                    phash_similarity = 1 - hamming(
-                        [int(bit) for bit in hashes["phash"]],
-                        [int(bit) for bit in img.perceptual_hash]
-                    )
-
-                    # Calculer la distance de Hamming pour dHash si disponible
-                    dhash_similarity = 0.5  # Valeur par défaut
-                    if hasattr(img, 'dhash') and img.dhash:
-                        dhash_similarity = 1 - hamming(
-                            [int(bit) for bit in hashes["dhash"]],
-                            [int(bit) for bit in img.dhash]
-                        )
-
-                    # Moyenne des similitudes
-                    avg_similarity = (phash_similarity + dhash_similarity) / 2
-
-                    if avg_similarity >= threshold:
-                        similar_images.append({
-                            "id": img.id,
-                            "filename": img.filename,
-                            "image_path": img.image_path,
-                            "similarity": avg_similarity * 100  # Convertir en pourcentage
-                        })
-                except Exception as e:
-                    logger.warning(f"Erreur lors de la comparaison avec l'image {img.id}: {str(e)}")
-                    continue
-
-            return sorted(similar_images, key=lambda x: x['similarity'], reverse=True)
+            if max_distance is None:
+                max_distance = (1 - threshold) * HASH_BITS
+            matches = SteganographyService._search_hashes(hashes, max_distance, ('phash', 'dhash'), k)
+            if not matches:
+                return []
+
+            images = {
+                img.id: img for img in ImageAnalysis.query.filter(
+                    ImageAnalysis.id.in_([match["id"] for match in matches])
+                ).all()
+            }
+            return SteganographyService._describe_matches(matches, images)
 
         except Exception as e:
             logger.error(f"Erreur lors de la recherche d'images similaires: {str(e)}")
             return []
 
     @staticmethod
-    def calculate_perceptual_hash(image_path: str) -> str:
+    def find_similar_images_batch(hashes_list: Sequence[Dict[str, str]], k: Optional[int] = None,
+                                  max_distance: Optional[float] = None, threshold: float = 0.85,
+                                  exclude_ids: Optional[Sequence[Optional[int]]] = None) -> List[list]:
+        """
+        Recherche de similarité pour un lot d'images.
+
+        L'index n'est synchronisé qu'une fois et les images trouvées sont chargées
+        en une seule requête pour tout le lot.
+
+        Args:
+            hashes_list: Hashes de chaque image du lot
+            k: Nombre maximal de résultats par image, None pour tous
+            max_distance: Distance de Hamming moyenne maximale en bits (prioritaire sur threshold)
+            threshold: Seuil de similitude (0-1)
+            exclude_ids: Identifiant à exclure des résultats de chaque image (l'image elle-même)
+
+        Returns:
+            Listes d'images similaires alignées sur hashes_list (même forme que
+            find_similar_images_advanced)
+        """
+        if max_distance is None:
+            max_distance = (1 - threshold) * HASH_BITS
+        exclude_ids = list(exclude_ids) if exclude_ids is not None else [None] * len(hashes_list)
+
+        try:
+            perceptual_hash_index.refresh()
+            all_matches = []
+            for hashes, exclude_id in zip(hashes_list, exclude_ids):
+                limit = k + 1 if k and exclude_id is not None else k
+                matches = SteganographyService._search_hashes(
+                    hashes, max_distance, ('phash', 'dhash'), limit, refresh=False
+                )
+                all_matches.append([match for match in matches if match["id"] != exclude_id][:k or None])
+
+            ids = {match["id"] for matches in all_matches for match in matches}
+            images = {
+                img.id: img for img in ImageAnalysis.query.filter(ImageAnalysis.id.in_(ids)).all()
+            } if ids else {}
+            return [SteganographyService._describe_matches(matches, images) for matches in all_matches]
+
+        except Exception as e:
+            logger.error(f"Erreur lors de la recherche d'images similaires par lot: {str(e)}")
+            return [[] for _ in hashes_list]
+
+    @staticmethod
+    def _describe_matches(matches: list, images: Dict[int, Any]) -> list:
+        """Réponse des images trouvées, par similarité décroissante (images supprimées retirées de l'index)."""
+        similar_images = []
+        for match in matches:
+            img = images.get(match["id"])
+            if img is None:
+                # Image supprimée depuis son indexation
+                perceptual_hash_index.remove(match["id"])
+                continue
+
+            similar_images.append({
+                "id": img.id,
+                "filename": img.filename,
+                "image_path": img.image_path,
+                "similarity": match["similarity"] * 100  # Convertir en pourcentage
+            })
+
+        return sorted(similar_images, key=lambda x: x['similarity'], reverse=True)
+
+    @staticmethod
+    def _search_hashes(hashes: Dict[str, Any], max_distance: float, hash_types: tuple,
+                       k: Optional[int] = None, refresh: bool = True) -> list:
+        """
+        Recherche par rayon (ou top-k) via l'index en mémoire, ou en base s'il n'est pas chargé.
+
+        Args:
+            hashes: Hashes de la requête
+            max_distance: Distance de Hamming moyenne maximale (en bits)
+            hash_types: Types de hash comparés
+            k: Nombre maximal de résultats, None pour tous
+            refresh: Synchroniser l'index avant la recherche (False si déjà fait pour un lot)
+
+        Returns:
+            Liste de dicts {id, distance, distances, similarity} triée par distance
+        """
+        query = {hash_type: hashes.get(hash_type) for hash_type in hash_types}
+        if refresh:
+            perceptual_hash_index.refresh()  # Changements des autres workers
+        if perceptual_hash_index.ready:
+            if k:
+                return perceptual_hash_index.query_topk(query, k, max_distance)
+            return perceptual_hash_index.query_radius(query, max_distance)
+
+        # Index non chargé: requête indexée sur les sous-chaînes en base
+        matches = ImageHash.search(query, max_distance, hash_types=hash_types)
+        return matches[:k] if k else matches
+
+    @staticmethod
+    def index_image_hashes(image_id: int, hashes: Dict[str, str]) -> bool:
+        """
+        Enregistre les hashes entiers d'une image (table image_hashes) et
+        l'ajoute à l'index de similarité en mémoire.
+
+        Args:
+            image_id: Identifiant de l'analyse en base
+            hashes: Dictionnaire contenant les hashes de l'image
+
+        Returns:
+            True si l'image a été indexée
+        """
+        if image_id is None:
+            return False
+        try:
+            image_hash = ImageHash.query.filter_by(image_id=image_id).first()
+            if image_hash is None:
+                image_hash = ImageHash(image_id=image_id)
+                db.session.add(image_hash)
+            image_hash.set_hashes(hashes)
+            IndexChange.record(image_id)
+            db.session.commit()
+
+            return perceptual_hash_index.add(image_id, hashes)
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Impossible d'indexer l'image {image_id}: {str(e)}")
+            return False
+
+    @staticmethod
+    def calculate_perceptual_hash(image_path: ImageSource) -> str:
         """
         Calcule le hash perceptuel d'une image pour la détection de similitude.
 
         Args:
-            image_path: Chemin vers l'image
+            image_path: Chemin vers l'image, contenu en mémoire ou ImageContext
 
         Returns:
             Hash perceptuel sous forme de string
         """
         try:
-            with Image.open(image_path) as img:
-                # Utiliser pHash pour la détection de similitude
-                phash = imagehash.phash(img)
-                return str(phash)
+            # pHash issu des hashes en cache (calculés une fois par contenu)
+            return SteganographyService.generate_image_hashes(image_path)["phash"]
 
         except Exception as e:
             logger.error(f"Erreur lors du calcul du hash perceptuel: {str(e)}")
             raise SteganographyError(f"Impossible de calculer le hash: {str(e)}")
 
     @staticmethod
-    def calculate_md5_hash(image_path: str) -> str:
+    def calculate_md5_hash(image_path: ImageSource) -> str:
         """
         Calcule le hash MD5 d'une image pour la détection de duplicatas exacts.
 
         Args:
-            image_path: Chemin vers l'image
+            image_path: Chemin vers l'image, contenu en mémoire ou ImageContext
 
         Returns:
             Hash MD5 sous forme de string
         """
         try:
+            if not isinstance(image_path, str):
+                return ImageContext.of(image_path).digests["md5"]
+
+            # Lecture par blocs: le fichier n'est jamais chargé en entier
             with open(image_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
+                return compute_stream_digests(f)["md5"]
 
         except Exception as e:
             logger.error(f"Erreur lors du calcul du hash MD5: {str(e)}")
             raise SteganographyError(f"Impossible de calculer le hash MD5: {str(e)}")
 
     @staticmethod
-    def find_similar_images(image_path: str, threshold: float = 0.85) -> list:
+    def find_similar_images(image_path: ImageSource, threshold: float = 0.85,
+                            k: Optional[int] = None) -> list:
         """
         Trouve des images similaires dans la base de données.
 
         Args:
-            image_path: Chemin vers l'image à comparer
+            image_path: Chemin vers l'image à comparer, contenu en mémoire ou ImageContext
             threshold: Seuil de similitude (0-1)
+            k: Nombre maximal de résultats (top-k), None pour tous
 
         Returns:
             Liste des images similaires
         """
         try:
             current_hash = SteganographyService.calculate_perceptual_hash(image_path)
-            current_hash_bin = bin(int(current_hash, 16))[2:].zfill(64)
-
-            similar_images = []
-            all_images = ImageAnalysis.query.filter(
-                ImageAnalysis.perceptual_hash.isnot(None)
-            ).all()
-
-            for img in all_images:
-                if img.perceptual_hash:
-                    stored_hash_bin = bin(int(img.perceptual_hash, 16))[2:].zfill(64)
-
-                    # Calculer la distance de Hamming
-                    hamming_distance = sum(c1 != c2 for c1, c2 in zip(current_hash_bin, stored_hash_bin))
-                    similarity = 1 - (hamming_distance / 64)
-
-                    if similarity >= threshold:
-                        similar_images.append({
-                            'image': img,
-                            'similarity': similarity
-                        })
+
+            # Recherche sur le seul pHash via l'index partagé (XOR + popcount vectorisé)
+            max_distance = (1 - threshold) * HASH_BITS
+            matches = SteganographyService._search_hashes({"phash": current_hash}, max_distance, ('phash',), k)
+            if not matches:
+                return []
+
+            images = {
+                img.id: img for img in ImageAnalysis.query.filter(
+                    ImageAnalysis.id.in_([match["id"] for match in matches])
+                ).all()
+            }
+
+            similar_images = [
+                {
+                    'image': images[match["id"]],
+                    'similarity': match["similarity"]
+                }
+                for match in matches if match["id"] in images
+            ]
 
             return sorted(similar_images, key=lambda x: x['similarity'], reverse=True)
 
@@ -0,0 +1,209 @@
+"""
+Exécution des modèles IA par l'interpréteur TensorFlow Lite.
+
+Les modèles Keras (model.h5, ResNet50) sont exportés hors ligne par
+scripts/create_ai_model.py --export-tflite, en quantification dynamique (poids
+int8) ou entière (int8, calibrée sur des images représentatives). À
+l'exécution, TFLiteModel expose la même interface predict que Keras: le
+registre des modèles, le regroupement des inférences et le serveur
+d'inférence l'utilisent sans changement.
+"""
+
+import os
+import logging
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.digests import file_fingerprint
+from app.utils.image_context import ImageContext
+from app.utils.preprocessing import model_input_array
+
+logger = logging.getLogger(__name__)
+
+# Modes de quantification de l'export
+QUANTIZATIONS = ('dynamic', 'int8')
+
+CALIBRATION_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+
+def tflite_path(source: str, quantization: str) -> str:
+    """
+    Chemin du modèle exporté: model.h5 -> model.int8.tflite.
+
+    Args:
+        source: Chemin du modèle Keras (ou nom de base, par exemple resnet50)
+        quantization: Mode de quantification (dynamic ou int8)
+    """
+    root, _ = os.path.splitext(source)
+    return f"{root}.{quantization}.tflite"
+
+
+def _interpreter_class():
+    """Interpréteur de tflite_runtime (léger) si installé, sinon celui de TensorFlow."""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def quantize(array: np.ndarray, detail: dict) -> np.ndarray:
+    """Convertit une entrée float32 au type du tenseur (échelle et zéro du tenseur si entier)."""
+    dtype = detail['dtype']
+    if not np.issubdtype(dtype, np.integer):
+        return array.astype(dtype, copy=False)
+    scale, zero_point = detail['quantization']
+    info = np.iinfo(dtype)
+    return np.clip(np.round(array / scale + zero_point), info.min, info.max).astype(dtype)
+
+
+def dequantize(array: np.ndarray, detail: dict) -> np.ndarray:
+    """Convertit une sortie du tenseur en float32."""
+    if not np.issubdtype(detail['dtype'], np.integer):
+        return array.astype(np.float32, copy=False)
+    scale, zero_point = detail['quantization']
+    return (array.astype(np.float32) - zero_point) * scale
+
+
+class TFLiteModel:
+    """Modèle TFLite avec l'interface predict de Keras (non thread-safe: sérialisé par le registre)."""
+
+    def __init__(self, path: str, num_threads: Optional[int] = None, quantization: Optional[str] = None):
+        """
+        Charge le modèle.
+
+        Args:
+            path: Fichier .tflite
+            num_threads: Threads de l'interpréteur (tous les cœurs si None ou 0)
+            quantization: Mode de quantification de l'export (dynamic ou int8)
+        """
+        self.tflite_path = path
+        self.quantization = quantization
+        self.num_threads = num_threads or os.cpu_count() or 1
+        self.interpreter = _interpreter_class()(model_path=path, num_threads=self.num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+
+    def predict(self, batch: Any, verbose: int = 0) -> np.ndarray:
+        """
+        Inférence d'un lot (le tenseur d'entrée est redimensionné si la taille du lot change).
+
+        Args:
+            batch: Entrées prétraitées float32 (n, *forme d'entrée)
+
+        Returns:
+            Sorties float32 (n, ...)
+        """
+        batch = np.asarray(batch, dtype=np.float32)
+        if len(batch) != self._batch_size:
+            self.interpreter.resize_tensor_input(self._input['index'], batch.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = len(batch)
+
+        self.interpreter.set_tensor(self._input['index'], quantize(batch, self._input))
+        self.interpreter.invoke()
+        return dequantize(self.interpreter.get_tensor(self._output['index']), self._output)
+
+    @property
+    def size_bytes(self) -> int:
+        """Taille du fichier exporté."""
+        return os.path.getsize(self.tflite_path)
+
+    def describe(self) -> Dict[str, Any]:
+        """Moteur, quantification et empreinte de l'export (versions des résultats en cache)."""
+        return {
+            "backend": "tflite",
+            "quantization": self.quantization,
+            "fingerprint": file_fingerprint(self.tflite_path)
+        }
+
+
+def load_tflite_model(source: str, quantization: str, num_threads: Optional[int] = None) -> Optional[TFLiteModel]:
+    """
+    Charge l'export TFLite d'un modèle, ou None s'il n'a pas été exporté.
+
+    Args:
+        source: Chemin du modèle Keras (ou nom de base)
+        quantization: Mode de quantification
+        num_threads: Threads de l'interpréteur
+    """
+    path = tflite_path(source, quantization)
+    if not os.path.exists(path):
+        logger.warning(f"⚠️ Export TFLite absent ({path}): scripts/create_ai_model.py --export-tflite")
+        return None
+    model = TFLiteModel(path, num_threads, quantization)
+    logger.info(f"✅ Modèle TFLite chargé: {path} ({model.num_threads} threads)")
+    return model
+
+
+def load_calibration_images(directory: Optional[str], size: Tuple[int, int], resample: int,
+                            limit: int = 100, seed: int = 0) -> List[np.ndarray]:
+    """
+    Images RGB uint8 redimensionnées pour la calibration et les comparaisons.
+
+    Les images du dossier sont utilisées en priorité; à défaut, des images
+    aléatoires (calibration moins représentative).
+
+    Args:
+        directory: Dossier parcouru récursivement (uploads par exemple)
+        size: Taille (largeur, hauteur)
+        resample: Filtre de redimensionnement (celui du prétraitement du modèle)
+        limit: Nombre maximal d'images
+        seed: Graine des images aléatoires
+    """
+    arrays = []
+    if directory and os.path.isdir(directory):
+        for root, _, files in sorted(os.walk(directory)):
+            for filename in sorted(files):
+                if not filename.lower().endswith(CALIBRATION_EXTENSIONS):
+                    continue
+                try:
+                    # Même prétraitement qu'à l'exécution (décodage JPEG réduit compris)
+                    context = ImageContext.from_path(os.path.join(root, filename))
+                    arrays.append(model_input_array(context, size, resample))
+                except (OSError, ValueError):
+                    continue
+                if len(arrays) >= limit:
+                    return arrays
+    if not arrays:
+        logger.warning("⚠️ Aucune image de calibration trouvée, images aléatoires utilisées")
+        rng = np.random.default_rng(seed)
+        arrays = list(rng.integers(0, 256, (limit, size[1], size[0], 3), dtype=np.uint8))
+    return arrays
+
+
+def export_tflite(model: Any, path: str, quantization: str,
+                  representative: Optional[Callable[[], Iterator[List[np.ndarray]]]] = None) -> int:
+    """
+    Exporte un modèle Keras en TFLite quantifié.
+
+    Args:
+        model: Modèle Keras
+        path: Fichier .tflite produit
+        quantization: dynamic (poids int8, activations float) ou int8 (entièrement entier)
+        representative: Générateur de lots de calibration (obligatoire pour int8)
+
+    Returns:
+        Taille du fichier produit en octets
+    """
+    import tensorflow as tf
+
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Quantification inconnue: {quantization}")
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'int8':
+        if representative is None:
+            raise ValueError("La quantification int8 nécessite des données représentatives")
+        converter.representative_dataset = representative
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    content = converter.convert()
+    with open(path, 'wb') as f:
+        f.write(content)
+    return len(content)
@@ -0,0 +1,123 @@
+"""
+Empreintes cryptographiques (SHA-256, MD5) du contenu des fichiers téléchargés.
+
+Le flux est lu par blocs, sans décoder l'image ni charger le fichier entier en
+mémoire, puis remis à sa position initiale pour la suite du traitement. À
+l'enregistrement d'un fichier téléchargé, les empreintes sont calculées pendant
+l'écriture (DigestWriter): aucune relecture du fichier n'est nécessaire.
+"""
+
+import os
+import shutil
+import hashlib
+import functools
+from typing import Dict, Any, BinaryIO, Optional, Tuple
+
+# Taille des blocs lus dans le flux
+DIGEST_CHUNK_SIZE = 1024 * 1024
+
+
+class DigestWriter:
+    """Flux d'écriture qui calcule les empreintes des octets qui le traversent."""
+
+    def __init__(self, target: Optional[BinaryIO] = None):
+        """
+        Initialise l'écrivain.
+
+        Args:
+            target: Flux de destination (None = calcul des empreintes uniquement)
+        """
+        self.target = target
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._md5 = hashlib.md5()
+
+    def write(self, chunk: bytes) -> int:
+        """Met à jour les empreintes puis transmet le bloc à la destination."""
+        self._sha256.update(chunk)
+        self._md5.update(chunk)
+        self.size += len(chunk)
+        if self.target is not None:
+            self.target.write(chunk)
+        return len(chunk)
+
+    @property
+    def digests(self) -> Dict[str, Any]:
+        """Empreintes des octets écrits {sha256, md5, size}."""
+        return {"sha256": self._sha256.hexdigest(), "md5": self._md5.hexdigest(), "size": self.size}
+
+
+def compute_stream_digests(stream: BinaryIO, chunk_size: int = DIGEST_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Calcule les empreintes SHA-256 et MD5 d'un flux binaire.
+
+    Args:
+        stream: Flux positionnable (par exemple FileStorage.stream)
+        chunk_size: Taille des blocs lus
+
+    Returns:
+        Dictionnaire {sha256, md5, size}
+    """
+    writer = DigestWriter()
+
+    position = stream.tell()
+    stream.seek(0)
+    try:
+        shutil.copyfileobj(stream, writer, chunk_size)
+    finally:
+        stream.seek(position)
+
+    return writer.digests
+
+
+def save_stream_with_digests(stream: BinaryIO, path: str,
+                             chunk_size: int = DIGEST_CHUNK_SIZE) -> Tuple[str, Dict[str, Any]]:
+    """
+    Enregistre un flux téléchargé en calculant ses empreintes au passage.
+
+    Le fichier est copié par blocs de taille fixe: un seul passage sur les
+    données, sans tampon de la taille du fichier.
+
+    Args:
+        stream: Flux binaire ou FileStorage de werkzeug
+        path: Chemin de destination
+        chunk_size: Taille des blocs copiés
+
+    Returns:
+        Tuple (chemin écrit, {sha256, md5, size})
+    """
+    stream = getattr(stream, 'stream', stream)  # FileStorage -> flux sous-jacent
+
+    position = stream.tell() if stream.seekable() else None
+    if position is not None:
+        stream.seek(0)
+    try:
+        with open(path, 'wb') as f:
+            writer = DigestWriter(f)
+            shutil.copyfileobj(stream, writer, chunk_size)
+    finally:
+        if position is not None:
+            stream.seek(position)
+
+    return path, writer.digests
+
+
+def file_fingerprint(path: str) -> str:
+    """
+    SHA-256 (préfixe) d'un fichier de modèle, recalculé seulement quand le fichier change.
+
+    Args:
+        path: Chemin du fichier
+
+    Returns:
+        16 premiers caractères hexadécimaux du SHA-256
+    """
+    stat = os.stat(path)
+    return _file_fingerprint(path, stat.st_mtime_ns, stat.st_size)
+
+
+@functools.lru_cache(maxsize=8)
+def _file_fingerprint(path: str, mtime_ns: int, size: int) -> str:
+    """SHA-256 (préfixe) d'un fichier, calculé une fois par version du fichier."""
+    with open(path, 'rb') as f:
+        return compute_stream_digests(f)["sha256"][:16]
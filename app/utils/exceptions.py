@@ -17,3 +17,7 @@ class ValidationError(Exception):
 class FileUploadError(Exception):
     """Exception pour les erreurs de téléchargement de fichiers."""
     pass
+
+class StageTimeoutError(Exception):
+    """Exception pour une étape d'analyse ayant dépassé son délai."""
+    pass
@@ -0,0 +1,65 @@
+"""
+Verrous consultatifs entre processus, posés sur un fichier.
+
+Les workers HTTP, les workers de tâches et l'ingestion par lot partagent des
+fichiers (stockage des embeddings, fichiers dédupliqués): un verrou
+threading.Lock ne protège que les threads d'un même processus. FileLock pose
+un verrou flock (partagé pour les lectures, exclusif pour les écritures),
+libéré automatiquement si le processus meurt. Sous Windows, msvcrt ne
+connaît que les verrous exclusifs.
+
+Un verrou flock appartient à la description de fichier ouverte: les threads
+d'un même processus doivent en plus se synchroniser entre eux (threading).
+"""
+
+import os
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """Verrou inter-processus sur un fichier (créé au besoin)."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Fichier de verrou (son contenu n'est pas utilisé)
+        """
+        self.path = path
+
+    @contextlib.contextmanager
+    def acquire(self, shared: bool = False):
+        """
+        Attend puis détient le verrou pendant le bloc with.
+
+        Args:
+            shared: Verrou partagé (lectures concurrentes) plutôt qu'exclusif
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(self.path, 'a+b') as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue  # LK_LOCK abandonne après 10 s: réessayer
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,467 @@
+"""
+Moteur de distance de Hamming vectorisé sur des hashes 64 bits.
+
+Les hashes perceptuels (pHash, dHash, aHash, wHash) sont stockés sous forme
+d'entiers uint64 dans une matrice NumPy contiguë (une colonne par type de hash).
+La distance à une requête est obtenue par XOR + popcount sur toute la matrice
+en un seul appel, sans boucle Python par image.
+"""
+
+import threading
+from functools import lru_cache
+from itertools import combinations
+from typing import Dict, Any, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+HASH_BITS = 64
+HASH_TYPES = ('phash', 'dhash', 'ahash', 'whash')
+CHUNK_BITS = 16
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+# Nombre de lignes traitées par bloc lors d'un parcours complet
+SCAN_BLOCK_ROWS = 16384
+
+
+def hash_to_int(value: Union[str, int, None]) -> Optional[int]:
+    """
+    Convertit un hash (chaîne hexadécimale ou entier) en entier non signé.
+
+    Args:
+        value: Hash hexadécimal tel que produit par imagehash, ou entier
+
+    Returns:
+        Entier 64 bits ou None si la valeur est absente/invalide
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, np.integer)):
+        return int(value) & ((1 << HASH_BITS) - 1)
+    try:
+        return int(str(value), 16) & ((1 << HASH_BITS) - 1)
+    except ValueError:
+        return None
+
+
+def to_signed64(value: Optional[int]) -> Optional[int]:
+    """
+    Convertit un entier non signé 64 bits en entier signé (stockage SQL BIGINT).
+    """
+    if value is None:
+        return None
+    return value - (1 << HASH_BITS) if value >= (1 << (HASH_BITS - 1)) else value
+
+
+def to_unsigned64(value: Optional[int]) -> Optional[int]:
+    """
+    Convertit un entier signé lu en base en hash non signé 64 bits.
+    """
+    if value is None:
+        return None
+    return value & ((1 << HASH_BITS) - 1)
+
+
+def hash_chunks(value: int, chunk_bits: int = CHUNK_BITS) -> List[int]:
+    """
+    Découpe un hash 64 bits en sous-chaînes de `chunk_bits` bits (poids faibles d'abord).
+    """
+    mask = (1 << chunk_bits) - 1
+    return [(value >> (i * chunk_bits)) & mask for i in range(HASH_BITS // chunk_bits)]
+
+
+@lru_cache(maxsize=None)
+def chunk_neighbour_masks(radius: int, chunk_bits: int = CHUNK_BITS) -> Tuple[int, ...]:
+    """
+    Masques XOR de poids <= radius sur une sous-chaîne de `chunk_bits` bits.
+
+    Args:
+        radius: Nombre maximal de bits différents
+        chunk_bits: Taille de la sous-chaîne
+
+    Returns:
+        Tuple des masques, par poids croissant
+    """
+    masks = [0]
+    for weight in range(1, min(radius, chunk_bits) + 1):
+        for bits in combinations(range(chunk_bits), weight):
+            mask = 0
+            for bit in bits:
+                mask |= 1 << bit
+            masks.append(mask)
+    return tuple(masks)
+
+
+def popcount64(values: np.ndarray) -> np.ndarray:
+    """
+    Compte les bits à 1 de chaque élément d'un tableau uint64 (SWAR).
+
+    Args:
+        values: Tableau d'entiers uint64
+
+    Returns:
+        Tableau d'entiers (uint8) de même forme
+    """
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+
+    # Opérations en place pour limiter les tableaux temporaires
+    x = np.array(values, dtype=np.uint64)
+    t = x >> np.uint64(1)
+    t &= _M1
+    x -= t
+    t = x >> np.uint64(2)
+    t &= _M2
+    x &= _M2
+    x += t
+    t = x >> np.uint64(4)
+    x += t
+    x &= _M4
+    x *= _H01
+    x >>= np.uint64(56)
+    return x.astype(np.uint8)
+
+
+def hamming_distance(hash1: Union[str, int], hash2: Union[str, int]) -> int:
+    """
+    Distance de Hamming entre deux hashes 64 bits.
+
+    Args:
+        hash1: Premier hash (hexadécimal ou entier)
+        hash2: Second hash (hexadécimal ou entier)
+
+    Returns:
+        Nombre de bits différents
+    """
+    return bin(hash_to_int(hash1) ^ hash_to_int(hash2)).count('1')
+
+
+def hash_similarity(hash1: Union[str, int], hash2: Union[str, int]) -> float:
+    """
+    Similarité (0-1) entre deux hashes 64 bits: 1 - distance / 64.
+    """
+    return 1 - hamming_distance(hash1, hash2) / HASH_BITS
+
+
+def pack_hashes(hashes_list: Iterable[Dict[str, Any]],
+                hash_types: Tuple[str, ...] = HASH_TYPES) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convertit une liste de dictionnaires de hashes en matrices NumPy.
+
+    Args:
+        hashes_list: Itérable de dictionnaires {type_de_hash: hash}
+        hash_types: Ordre des colonnes
+
+    Returns:
+        Tuple (valeurs uint64 [n, k], présence bool [n, k])
+    """
+    rows = list(hashes_list)
+    values = np.zeros((len(rows), len(hash_types)), dtype=np.uint64)
+    present = np.zeros((len(rows), len(hash_types)), dtype=bool)
+    for row, hashes in enumerate(rows):
+        for column, hash_type in enumerate(hash_types):
+            value = hash_to_int(hashes.get(hash_type))
+            if value is not None:
+                values[row, column] = value
+                present[row, column] = True
+    return values, present
+
+
+def mean_distances(values: np.ndarray, present: np.ndarray,
+                   query_values: np.ndarray, query_present: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Distances de Hamming d'une requête contre toute une matrice de hashes.
+
+    Le calcul est fait par blocs de lignes pour que les temporaires restent en cache.
+
+    Args:
+        values: Matrice uint64 [n, k]
+        present: Masque de présence [n, k]
+        query_values: Hashes de la requête uint64 [k]
+        query_present: Masque de présence de la requête [k]
+
+    Returns:
+        Tuple (distances par colonne [n, k], colonnes comparées [n, k],
+        distance moyenne [n]) ; la distance moyenne vaut +inf pour les lignes
+        sans aucun type de hash commun.
+    """
+    n = values.shape[0]
+    columns = np.nonzero(query_present)[0]
+    distances = np.zeros(values.shape, dtype=np.uint8, order='F')
+    shared = present & query_present
+    totals = np.zeros(n, dtype=np.uint16)
+
+    # Ne calculer que les colonnes présentes dans la requête
+    for column in columns.tolist():
+        query_value = query_values[column]
+        for start in range(0, n, SCAN_BLOCK_ROWS):
+            stop = min(start + SCAN_BLOCK_ROWS, n)
+            block = popcount64(values[start:stop, column] ^ query_value)
+            distances[start:stop, column] = block
+            block *= shared[start:stop, column]
+            totals[start:stop] += block
+
+    counts = shared.sum(axis=1, dtype=np.uint8)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(counts > 0, totals / np.maximum(counts, 1), np.inf)
+    return distances, shared, mean
+
+
+def pairwise_distances(values: np.ndarray, present: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Distances de Hamming de toutes les paires d'une matrice de hashes (N x N).
+
+    Chaque bloc de lignes est comparé à toute la matrice par diffusion
+    (XOR + popcount), sans boucle Python par paire.
+
+    Args:
+        values: Matrice uint64 [n, k]
+        present: Masque de présence [n, k]
+
+    Returns:
+        Tuple (distances par colonne [k, n, n] uint8, distance moyenne [n, n]) ;
+        la distance moyenne vaut +inf pour les paires sans type de hash commun.
+    """
+    n, k = values.shape
+    block_rows = max(1, SCAN_BLOCK_ROWS // max(n, 1))
+    distances = np.zeros((k, n, n), dtype=np.uint8)
+    totals = np.zeros((n, n), dtype=np.uint16)
+    counts = np.zeros((n, n), dtype=np.uint8)
+
+    for column in range(k):
+        column_values = np.ascontiguousarray(values[:, column])
+        column_present = present[:, column]
+        for start in range(0, n, block_rows):
+            stop = min(start + block_rows, n)
+            block = popcount64(column_values[start:stop, None] ^ column_values[None, :])
+            distances[column, start:stop] = block
+            shared = column_present[start:stop, None] & column_present[None, :]
+            totals[start:stop] += block * shared
+            counts[start:stop] += shared
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = np.where(counts > 0, totals / np.maximum(counts, 1), np.inf)
+    return distances, mean
+
+
+class HashMatrix:
+    """Matrice contiguë de hashes uint64 indexée par identifiant d'image."""
+
+    def __init__(self, hash_types: Tuple[str, ...] = HASH_TYPES, capacity: int = 1024):
+        """
+        Initialise la matrice.
+
+        Args:
+            hash_types: Types de hash (une colonne par type)
+            capacity: Capacité initiale (agrandie automatiquement)
+        """
+        self.hash_types = tuple(hash_types)
+        self._lock = threading.RLock()
+        self._size = 0
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._values = np.zeros((capacity, len(self.hash_types)), dtype=np.uint64, order='F')
+        self._present = np.zeros((capacity, len(self.hash_types)), dtype=bool, order='F')
+        self._rows: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, image_id: int) -> bool:
+        return image_id in self._rows
+
+    @property
+    def ids(self) -> np.ndarray:
+        """Identifiants des lignes occupées."""
+        return self._ids[:self._size]
+
+    @property
+    def values(self) -> np.ndarray:
+        """Vue sur les hashes des lignes occupées."""
+        return self._values[:self._size]
+
+    @property
+    def present(self) -> np.ndarray:
+        """Vue sur le masque de présence des lignes occupées."""
+        return self._present[:self._size]
+
+    def _grow(self, minimum: int):
+        capacity = max(minimum, 2 * len(self._ids))
+        for name in ('_ids', '_values', '_present'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype, order='F')
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def encode(self, hashes: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Encode un dictionnaire de hashes en vecteurs (valeurs, présence).
+        """
+        values, present = pack_hashes([hashes], self.hash_types)
+        return values[0], present[0]
+
+    def add(self, image_id: int, hashes: Dict[str, Any]) -> bool:
+        """
+        Ajoute ou remplace les hashes d'une image.
+
+        Args:
+            image_id: Identifiant de l'image
+            hashes: Dictionnaire {type_de_hash: hash}
+
+        Returns:
+            True si au moins un hash a été enregistré
+        """
+        values, present = self.encode(hashes)
+        if not present.any():
+            return False
+
+        with self._lock:
+            row = self._rows.get(image_id)
+            if row is None:
+                if self._size >= len(self._ids):
+                    self._grow(self._size + 1)
+                row = self._size
+                self._size += 1
+                self._rows[image_id] = row
+                self._ids[row] = image_id
+            self._values[row] = values
+            self._present[row] = present
+        return True
+
+    def get(self, image_id: int) -> Optional[Dict[str, int]]:
+        """Renvoie les hashes (entiers) d'une image, ou None."""
+        with self._lock:
+            row = self._rows.get(image_id)
+            if row is None:
+                return None
+            return {
+                hash_type: int(self._values[row, column])
+                for column, hash_type in enumerate(self.hash_types)
+                if self._present[row, column]
+            }
+
+    def remove(self, image_id: int) -> bool:
+        """Retire une image (la dernière ligne prend sa place)."""
+        with self._lock:
+            row = self._rows.pop(image_id, None)
+            if row is None:
+                return False
+            last = self._size - 1
+            if row != last:
+                moved_id = int(self._ids[last])
+                self._ids[row] = self._ids[last]
+                self._values[row] = self._values[last]
+                self._present[row] = self._present[last]
+                self._rows[moved_id] = row
+            self._present[last] = False
+            self._size = last
+            return True
+
+    def clear(self):
+        """Vide la matrice."""
+        with self._lock:
+            self._size = 0
+            self._rows = {}
+            self._present[:] = False
+
+    def rows_for(self, image_ids: Iterable[int]) -> np.ndarray:
+        """Positions des identifiants donnés (les identifiants inconnus sont ignorés)."""
+        with self._lock:
+            rows = [self._rows[i] for i in image_ids if i in self._rows]
+        return np.asarray(rows, dtype=np.int64)
+
+    def distances(self, hashes: Dict[str, Any], rows: Optional[np.ndarray] = None,
+                  hash_types: Optional[Tuple[str, ...]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Calcule en un appel vectorisé les distances d'une requête aux lignes de la matrice.
+
+        Args:
+            hashes: Hashes de la requête
+            rows: Sous-ensemble de lignes (toutes par défaut)
+            hash_types: Types de hash à prendre en compte (tous par défaut)
+
+        Returns:
+            Tuple (identifiants [n], distances par colonne [n, k],
+            colonnes comparées [n, k], distance moyenne [n])
+        """
+        query_values, query_present = self.encode(hashes)
+        if hash_types is not None:
+            query_present &= np.isin(np.array(self.hash_types), hash_types)
+
+        with self._lock:
+            if rows is None:
+                ids = self._ids[:self._size].copy()
+                values = self._values[:self._size]
+                present = self._present[:self._size]
+            else:
+                ids = self._ids[rows]
+                values = self._values[rows]
+                present = self._present[rows]
+            per_column, shared, mean = mean_distances(values, present, query_values, query_present)
+
+        return ids, per_column, shared, mean
+
+    def search(self, hashes: Dict[str, Any], max_distance: float,
+               rows: Optional[np.ndarray] = None,
+               hash_types: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+        """
+        Renvoie les images dont la distance moyenne est <= max_distance.
+
+        Args:
+            hashes: Hashes de la requête
+            max_distance: Distance de Hamming moyenne maximale (en bits)
+            rows: Sous-ensemble de lignes à examiner (toutes par défaut)
+            hash_types: Types de hash à prendre en compte (tous par défaut)
+
+        Returns:
+            Liste de dicts {id, distance, distances, similarity} triée par distance
+        """
+        ids, per_column, shared, mean = self.distances(hashes, rows, hash_types)
+        selected = np.nonzero(mean <= max_distance)[0]
+        selected = selected[np.lexsort((ids[selected], mean[selected]))]
+        return [self._match(ids, per_column, shared, mean, position) for position in selected.tolist()]
+
+    def topk(self, hashes: Dict[str, Any], k: int, max_distance: float = HASH_BITS,
+             rows: Optional[np.ndarray] = None,
+             hash_types: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+        """
+        Renvoie les k images les plus proches (distance moyenne <= max_distance).
+
+        Le calcul des distances et la sélection (np.partition) restent en O(n)
+        sur les lignes examinées; seul le tri final est limité à O(k log k),
+        quel que soit le nombre d'images sous le seuil.
+
+        Args:
+            hashes: Hashes de la requête
+            k: Nombre maximal de résultats
+            max_distance: Distance de Hamming moyenne maximale (en bits)
+            rows: Sous-ensemble de lignes à examiner (toutes par défaut)
+            hash_types: Types de hash à prendre en compte (tous par défaut)
+
+        Returns:
+            Liste d'au plus k dicts {id, distance, distances, similarity} triée par distance
+        """
+        if k <= 0:
+            return []
+        ids, per_column, shared, mean = self.distances(hashes, rows, hash_types)
+        selected = np.nonzero(mean <= max_distance)[0]
+        if len(selected) > k:
+            # k-ième distance, puis on garde les ex-aequo pour départager par identifiant
+            kth = np.partition(mean[selected], k - 1)[k - 1]
+            selected = selected[mean[selected] <= kth]
+        selected = selected[np.lexsort((ids[selected], mean[selected]))][:k]
+        return [self._match(ids, per_column, shared, mean, position) for position in selected.tolist()]
+
+    def _match(self, ids, per_column, shared, mean, position: int) -> Dict[str, Any]:
+        """Construit le résultat d'une ligne à partir des tableaux de distances."""
+        return {
+            "id": int(ids[position]),
+            "distance": float(mean[position]),
+            "distances": {
+                self.hash_types[column]: int(per_column[position, column])
+                for column in np.nonzero(shared[position])[0].tolist()
+            },
+            "similarity": 1 - float(mean[position]) / HASH_BITS
+        }
@@ -0,0 +1,233 @@
+"""
+Contexte d'image décodé une seule fois pour tout le pipeline d'analyse.
+
+Un téléchargement traverse la validation, les hashes perceptuels, la
+stéganographie LSB, la détection IA, les métadonnées, la signature contextuelle
+et les empreintes exactes. Chaque étape ouvrait et décodait le fichier de son
+côté ; ImageContext garde les octets bruts et mémorise paresseusement l'image
+PIL, les tableaux RGB / niveaux de gris, les variantes redimensionnées et les
+empreintes, calculés au premier accès puis partagés.
+
+Les services acceptent indifféremment un chemin, un contenu en mémoire
+(bytes, memoryview, io.BytesIO...) ou un ImageContext (voir ImageContext.of):
+les analyses en lecture seule n'écrivent rien sur disque.
+"""
+
+import io
+import os
+import threading
+from typing import Dict, Any, BinaryIO, Callable, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from app.utils.digests import DigestWriter, compute_stream_digests
+
+
+# Sources d'image acceptées par les services
+ImageSource = Union[str, bytes, bytearray, memoryview, BinaryIO, 'ImageContext']
+
+
+class ImageContext:
+    """Image d'une requête: octets bruts et représentations décodées mémorisées."""
+
+    def __init__(self, data: Optional[bytes] = None, path: Optional[str] = None,
+                 filename: Optional[str] = None):
+        """
+        Initialise le contexte.
+
+        Args:
+            data: Contenu du fichier (lu depuis `path` au premier accès si absent)
+            path: Chemin du fichier sur disque (optionnel)
+            filename: Nom d'origine du fichier (optionnel)
+        """
+        if data is None and path is None:
+            raise ValueError("ImageContext requiert des données ou un chemin")
+        self._data = data
+        self.path = path
+        self.filename = filename or (os.path.basename(path) if path else None)
+
+        self._lock = threading.RLock()  # Les étapes du pipeline peuvent partager le contexte
+        self._cache: Dict[Any, Any] = {}
+        self._key_locks: Dict[Any, threading.RLock] = {}
+
+    @classmethod
+    def from_path(cls, path: str) -> 'ImageContext':
+        """Contexte d'une image sur disque."""
+        return cls(path=path)
+
+    @classmethod
+    def from_file_storage(cls, file) -> 'ImageContext':
+        """
+        Contexte d'un fichier téléchargé (FileStorage), lu une seule fois.
+
+        Le flux est remis au début pour les éventuels traitements suivants.
+        """
+        file.stream.seek(0)
+        data = file.stream.read()
+        file.stream.seek(0)
+        return cls(data=data, filename=file.filename)
+
+    @classmethod
+    def of(cls, source: ImageSource) -> 'ImageContext':
+        """Renvoie le contexte tel quel, ou en crée un pour un chemin, un contenu ou un flux binaire."""
+        if isinstance(source, cls):
+            return source
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return cls(data=bytes(source))
+        if hasattr(source, 'read'):
+            position = source.tell()
+            data = source.read()
+            source.seek(position)
+            return cls(data=data)
+        return cls.from_path(source)
+
+    def memoize(self, key: Any, factory: Callable[[], Any]) -> Any:
+        """
+        Calcule une valeur dérivée de l'image au premier accès puis la réutilise.
+
+        Le verrou est propre à chaque clé: des étapes concurrentes ne s'attendent
+        que si elles demandent la même valeur.
+
+        Args:
+            key: Clé de mémorisation (par exemple 'phash')
+            factory: Fonction de calcul, appelée une seule fois
+
+        Returns:
+            Valeur mémorisée
+        """
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.RLock())
+        with key_lock:
+            if key not in self._cache:
+                self._cache[key] = factory()
+            return self._cache[key]
+
+    @property
+    def data(self) -> bytes:
+        """Contenu brut du fichier."""
+        if self._data is None:
+            with self._lock:
+                if self._data is None:
+                    with open(self.path, 'rb') as f:
+                        self._data = f.read()
+        return self._data
+
+    @property
+    def name(self) -> str:
+        """Chemin ou nom du fichier, pour les messages et les réponses."""
+        return self.path or self.filename or '<mémoire>'
+
+    @property
+    def size(self) -> int:
+        """Taille du fichier en octets."""
+        return len(self.data)
+
+    def save(self, path: str) -> str:
+        """
+        Écrit le contenu sur disque et retient le chemin.
+
+        Les empreintes, si elles n'ont pas encore été calculées, le sont pendant
+        l'écriture.
+
+        Args:
+            path: Chemin de destination
+
+        Returns:
+            Chemin écrit
+        """
+        with open(path, 'wb') as f:
+            if 'digests' in self._cache:
+                f.write(self.data)
+            else:
+                writer = DigestWriter(f)
+                writer.write(self.data)
+                self.memoize('digests', lambda: writer.digests)
+        self.path = path
+        return path
+
+    @property
+    def digests(self) -> Dict[str, Any]:
+        """Empreintes exactes {sha256, md5, size} (sans décoder l'image)."""
+        return self.memoize('digests', lambda: compute_stream_digests(io.BytesIO(self.data)))
+
+    @property
+    def image(self) -> Image.Image:
+        """
+        Image PIL dans son mode d'origine.
+
+        L'en-tête est lu à l'ouverture ; les pixels ne sont décodés qu'au premier
+        accès aux tableaux ou aux variantes. Partagée: ne pas la modifier ni la fermer.
+        """
+        return self.memoize('image', lambda: Image.open(io.BytesIO(self.data)))
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        """Dimensions, format et mode lus dans l'en-tête."""
+        image = self.image
+        return {"width": image.width, "height": image.height, "format": image.format, "mode": image.mode}
+
+    @property
+    def metadata(self) -> Dict[str, str]:
+        """Métadonnées affichées dans les réponses d'analyse."""
+        info = self.info
+        return {
+            "dimensions": f"{info['width']}x{info['height']}",
+            "format": info["format"],
+            "mode": info["mode"],
+            "size": f"{self.size / 1024:.2f} KB"
+        }
+
+    @property
+    def decoded(self) -> Image.Image:
+        """Image PIL d'origine, pixels décodés (une seule fois, même entre threads)."""
+        image = self.image
+        with self._lock:
+            image.load()
+        return image
+
+    @property
+    def rgb_image(self) -> Image.Image:
+        """Image PIL convertie en RGB."""
+        def convert():
+            image = self.decoded
+            return image if image.mode == 'RGB' else image.convert('RGB')
+        return self.memoize('rgb_image', convert)
+
+    @property
+    def rgb(self) -> np.ndarray:
+        """Tableau RGB uint8 (H, W, 3)."""
+        return self.memoize('rgb', lambda: np.asarray(self.rgb_image))
+
+    @property
+    def bgr(self) -> np.ndarray:
+        """Tableau BGR uint8 (H, W, 3), ordre des canaux d'OpenCV."""
+        return self.memoize('bgr', lambda: np.ascontiguousarray(self.rgb[:, :, ::-1]))
+
+    @property
+    def gray(self) -> np.ndarray:
+        """Niveaux de gris uint8 (H, W), mêmes coefficients que cv2.COLOR_BGR2GRAY."""
+        return self.memoize('gray', lambda: cv2.cvtColor(self.rgb, cv2.COLOR_RGB2GRAY))
+
+    def resized(self, size: Tuple[int, int],
+                resample: Image.Resampling = Image.Resampling.LANCZOS) -> Image.Image:
+        """
+        Variante RGB redimensionnée (mémorisée par taille et filtre).
+
+        Args:
+            size: Taille (largeur, hauteur)
+            resample: Filtre de rééchantillonnage
+
+        Returns:
+            Image PIL RGB
+        """
+        return self.memoize(('resized', tuple(size), resample), lambda: self.rgb_image.resize(tuple(size), resample))
+
+    def copy_image(self) -> Image.Image:
+        """Copie de l'image d'origine décodée, pour les bibliothèques qui la ferment ou la modifient."""
+        return self.decoded.copy()
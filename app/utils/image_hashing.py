@@ -0,0 +1,66 @@
+"""
+Calcul des hashes perceptuels à partir du contenu binaire des images.
+
+Le décodage et le hachage sont répartis sur le pool de processus partagé pour
+les lots d'images ; les petits lots sont traités dans le processus courant.
+"""
+
+import io
+from typing import Dict, Any, List, Optional, Sequence
+
+import imagehash
+from PIL import Image
+
+from app.utils.pools import get_process_pool, process_pool_size, default_workers
+
+# En dessous de cette taille de lot, le coût d'envoi aux processus dépasse le gain
+PARALLEL_MIN_IMAGES = 8
+
+_HASH_FUNCTIONS = {
+    'phash': imagehash.phash,
+    'dhash': imagehash.dhash,
+    'ahash': imagehash.average_hash,
+    'whash': imagehash.whash,
+}
+
+
+def compute_image_hashes(data: bytes, hash_types: Sequence[str] = ('phash', 'dhash')) -> Dict[str, Any]:
+    """
+    Calcule les hashes perceptuels d'une image fournie sous forme d'octets.
+
+    Args:
+        data: Contenu du fichier image
+        hash_types: Types de hash à calculer
+
+    Returns:
+        Dictionnaire {type_de_hash: hash hexadécimal}, ou {"error": message}
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+            return {hash_type: str(_HASH_FUNCTIONS[hash_type](img)) for hash_type in hash_types}
+    except Exception as e:
+        return {"error": f"Impossible de calculer les hashes: {str(e)}"}
+
+
+def compute_image_hashes_batch(blobs: List[bytes], hash_types: Sequence[str] = ('phash', 'dhash'),
+                               max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Calcule les hashes perceptuels d'un lot d'images en parallèle.
+
+    Args:
+        blobs: Contenus des fichiers images
+        hash_types: Types de hash à calculer
+        max_workers: Nombre de processus du pool partagé
+
+    Returns:
+        Liste de dictionnaires de hashes alignée sur blobs
+    """
+    hash_types = tuple(hash_types)
+    if len(blobs) < PARALLEL_MIN_IMAGES:
+        return [compute_image_hashes(data, hash_types) for data in blobs]
+
+    pool = get_process_pool(max_workers)
+    workers = process_pool_size() or default_workers()
+    chunksize = max(1, len(blobs) // (4 * workers))
+    return list(pool.map(compute_image_hashes, blobs, [hash_types] * len(blobs), chunksize=chunksize))
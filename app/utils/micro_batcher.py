@@ -0,0 +1,158 @@
+"""
+Regroupement dynamique des inférences (micro-batching).
+
+Les requêtes de tous les threads sont placées dans une file; un thread dédié
+attend la première, complète le lot pendant au plus max_wait_ms ou jusqu'à
+max_batch_size éléments, exécute une seule passe du modèle sur le lot puis
+renvoie à chaque appelant son résultat via un Future.
+"""
+
+import time
+import queue
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Nombre de requêtes récentes conservées pour les percentiles de délai
+DELAY_WINDOW = 1000
+
+
+class MicroBatcher:
+    """Regroupe les appels unitaires en lots pour une fonction vectorisée."""
+
+    def __init__(self, func: Callable[[List[Any]], Sequence[Any]], max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, name: str = 'batcher'):
+        """
+        Initialise le regroupement.
+
+        Args:
+            func: Fonction appliquée au lot; renvoie un résultat par élément, dans l'ordre
+            max_batch_size: Taille maximale d'un lot
+            max_wait_ms: Attente maximale (ms) après la première requête d'un lot
+            name: Nom du thread et des journaux
+        """
+        self.func = func
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        self._batches = 0
+        self._items = 0
+        self._forward_seconds = 0.0
+        self._delays: deque = deque(maxlen=DELAY_WINDOW)
+
+    def submit(self, item: Any) -> Future:
+        """
+        Place un élément dans la file du prochain lot.
+
+        Args:
+            item: Entrée unitaire (par exemple une image prétraitée)
+
+        Returns:
+            Future résolu avec le résultat de cet élément
+        """
+        if self._closed:
+            raise RuntimeError(f"Regroupement {self.name} arrêté")
+        future: Future = Future()
+        self._queue.put((item, future, time.perf_counter()))
+        self._ensure_started()
+        return future
+
+    def __call__(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """Soumet un élément et attend son résultat."""
+        return self.submit(item).result(timeout)
+
+    def _ensure_started(self):
+        """Démarre le thread de traitement au premier appel."""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        """Boucle du thread: constitue les lots et les exécute."""
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    self._queue.put(None)  # Arrêt après ce lot
+                    break
+                batch.append(entry)
+            self._execute(batch)
+
+    def _execute(self, batch: List[tuple]):
+        """Exécute un lot et distribue les résultats (ou l'erreur) aux appelants."""
+        started = time.perf_counter()
+        active = [(item, future) for item, future, _ in batch if future.set_running_or_notify_cancel()]
+        items = [item for item, _ in active]
+        try:
+            results = self.func(items) if items else []
+            if len(results) != len(items):
+                raise RuntimeError(f"{len(results)} résultats pour un lot de {len(items)}")
+            for (_, future), result in zip(active, results):
+                future.set_result(result)
+        except Exception as e:
+            logger.error(f"❌ Lot {self.name} échoué ({len(items)} éléments): {str(e)}")
+            for _, future in active:
+                future.set_exception(e)
+
+        with self._lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._forward_seconds += time.perf_counter() - started
+            self._delays.extend(started - enqueued for _, _, enqueued in batch)
+
+    def close(self):
+        """Arrête le thread après les lots en attente."""
+        self._closed = True
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """Taux de remplissage des lots et délais d'attente en file."""
+        with self._lock:
+            delays = sorted(self._delays)
+            batches, items = self._batches, self._items
+            forward = self._forward_seconds
+
+        def percentile(p: float) -> Optional[float]:
+            if not delays:
+                return None
+            return round(delays[min(len(delays) - 1, int(p * len(delays)))] * 1000, 3)
+
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": batches,
+            "items": items,
+            "mean_batch_size": round(items / batches, 2) if batches else None,
+            "fill_ratio": round(items / (batches * self.max_batch_size), 4) if batches else None,
+            "forward_ms_mean": round(forward / batches * 1000, 3) if batches else None,
+            "queue_delay_ms": {
+                "mean": round(sum(delays) / len(delays) * 1000, 3) if delays else None,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": round(delays[-1] * 1000, 3) if delays else None
+            }
+        }
@@ -0,0 +1,94 @@
+"""
+Pools d'exécution partagés pour les traitements CPU parallélisables.
+
+Le pool de processus est créé à la première utilisation puis réutilisé par
+toutes les requêtes, ce qui évite de relancer des processus à chaque appel.
+Le pool de threads sert aux étapes d'analyse indépendantes d'une même requête
+(OpenCV, NumPy et TensorFlow relâchent le GIL pendant leurs calculs).
+
+Les processus du pool sont démarrés par spawn et non par fork: un enfant issu
+d'un fork hériterait des connexions SQLite, des verrous tenus par d'autres
+threads et de l'état TensorFlow du processus web.
+"""
+
+import os
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+_lock = threading.Lock()
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_workers = 0
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_thread_workers = 0
+
+
+def default_workers() -> int:
+    """Nombre de processus par défaut (nombre de cœurs)."""
+    return os.cpu_count() or 1
+
+
+def get_process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    Renvoie le pool de processus partagé (créé au premier appel).
+
+    Args:
+        max_workers: Nombre de processus (par défaut default_workers())
+
+    Returns:
+        Instance ProcessPoolExecutor partagée
+    """
+    global _process_pool, _process_workers
+    with _lock:
+        if _process_pool is None:
+            _process_workers = max_workers or default_workers()
+            _process_pool = ProcessPoolExecutor(max_workers=_process_workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return _process_pool
+
+
+def process_pool_size() -> int:
+    """Nombre de processus du pool partagé (0 s'il n'est pas encore créé)."""
+    return _process_workers
+
+
+def get_thread_pool(max_workers: Optional[int] = None) -> ThreadPoolExecutor:
+    """
+    Renvoie le pool de threads partagé des étapes d'analyse (créé au premier appel).
+
+    Args:
+        max_workers: Nombre de threads (par défaut 2 × default_workers())
+
+    Returns:
+        Instance ThreadPoolExecutor partagée
+    """
+    global _thread_pool, _thread_workers
+    with _lock:
+        if _thread_pool is None:
+            _thread_workers = max_workers or 2 * default_workers()
+            _thread_pool = ThreadPoolExecutor(max_workers=_thread_workers, thread_name_prefix='analysis')
+        return _thread_pool
+
+
+def thread_pool_size() -> int:
+    """Nombre de threads du pool partagé (0 s'il n'est pas encore créé)."""
+    return _thread_workers
+
+
+def shutdown_pools():
+    """Arrête les pools partagés."""
+    global _process_pool, _process_workers, _thread_pool, _thread_workers
+    with _lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+            _process_workers = 0
+        if _thread_pool is not None:
+            _thread_pool.shutdown(wait=False, cancel_futures=True)
+            _thread_pool = None
+            _thread_workers = 0
+
+
+atexit.register(shutdown_pools)
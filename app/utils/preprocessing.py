@@ -0,0 +1,88 @@
+"""
+Entrées des réseaux (128x128 détection IA, 224x224 ResNet50) à décodage réduit.
+
+Une photo JPEG de 10000x10000 décodée entièrement occupe 300 Mo en RGB pour être
+ramenée à 128x128. libjpeg sait décoder directement à 1/2, 1/4 ou 1/8 de la
+taille en ne calculant qu'une partie des coefficients DCT (Image.draft de PIL):
+on choisit la plus forte réduction dont le résultat reste au moins aussi grand
+que l'entrée du réseau, puis le redimensionnement final habituel s'applique.
+
+Le choix ne dépend que de l'en-tête (format et dimensions): une même image
+donne toujours la même entrée, quel que soit l'ordre des étapes du pipeline.
+Les autres formats (et les JPEG trop petits pour être réduits) passent par le
+décodage complet partagé du contexte.
+"""
+
+import io
+from typing import Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.utils.image_context import ImageContext
+
+# Réductions proposées par libjpeg, de la plus forte à la plus faible
+DRAFT_SCALES = (8, 4, 2, 1)
+
+
+def draft_scale(image_size: Tuple[int, int], target: Tuple[int, int]) -> int:
+    """
+    Plus forte réduction du décodage JPEG gardant l'image au moins aussi grande que target.
+
+    Même règle que Image.draft de PIL.
+
+    Args:
+        image_size: Dimensions de l'image (largeur, hauteur)
+        target: Taille de l'entrée du réseau (largeur, hauteur)
+
+    Returns:
+        Facteur de réduction (1 = décodage complet)
+    """
+    ratio = min(image_size[0] // target[0], image_size[1] // target[1])
+    return next(scale for scale in DRAFT_SCALES if ratio >= scale)
+
+
+def decode_reduced(data: bytes, size: Tuple[int, int]) -> Image.Image:
+    """
+    Décode un JPEG à la plus petite échelle DCT suffisante pour size, en RGB.
+
+    Args:
+        data: Contenu du fichier JPEG
+        size: Taille minimale voulue (largeur, hauteur)
+
+    Returns:
+        Image PIL RGB (décodée)
+    """
+    image = Image.open(io.BytesIO(data))
+    image.draft('RGB', tuple(size))
+    image.load()
+    return image if image.mode == 'RGB' else image.convert('RGB')
+
+
+def model_input(context: ImageContext, size: Tuple[int, int],
+                resample: Image.Resampling = Image.Resampling.LANCZOS) -> Image.Image:
+    """
+    Image RGB redimensionnée à l'entrée d'un réseau (mémorisée dans le contexte).
+
+    Args:
+        context: Image de la requête
+        size: Taille de l'entrée (largeur, hauteur)
+        resample: Filtre du redimensionnement final
+
+    Returns:
+        Image PIL RGB de taille size
+    """
+    size = tuple(size)
+    info = context.info
+    if info["format"] != 'JPEG' or draft_scale((info["width"], info["height"]), size) == 1:
+        return context.resized(size, resample)
+    return context.memoize(
+        ('model_input', size, resample),
+        lambda: decode_reduced(context.data, size).resize(size, resample)
+    )
+
+
+def model_input_array(context: ImageContext, size: Tuple[int, int],
+                      resample: Image.Resampling = Image.Resampling.LANCZOS) -> np.ndarray:
+    """Entrée d'un réseau en tableau RGB uint8 (hauteur, largeur, 3)."""
+    return np.asarray(model_input(context, size, resample), dtype=np.uint8)
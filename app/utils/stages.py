@@ -0,0 +1,228 @@
+"""
+Exécution concurrente des étapes d'analyse indépendantes d'une requête.
+
+Les étapes forment un graphe acyclique: chacune déclare les étapes dont elle
+consomme le résultat et démarre dès qu'elles sont terminées, sur le pool de
+threads partagé. La latence d'un téléchargement devient celle de la plus longue
+chaîne d'étapes au lieu de leur somme.
+
+Chaque étape est isolée: une exception ou un dépassement de délai n'affecte
+que son propre résultat (et celui des étapes qui en dépendent). Le délai court
+à partir du démarrage de l'étape: une étape en file d'attente d'un pool saturé
+n'est pas comptée hors délai.
+
+Un thread ne pouvant être interrompu, une étape hors délai termine en
+arrière-plan et son résultat est ignoré: elle occupe un thread du pool jusqu'à
+sa fin. ANALYSIS_THREADS doit laisser de la marge pour ces étapes abandonnées
+(abandoned_stages() en donne le nombre courant).
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import Executor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Callable, Iterable, List, Optional
+
+from app.utils.exceptions import StageTimeoutError
+from app.utils.pools import get_thread_pool
+
+logger = logging.getLogger(__name__)
+
+# Intervalle de vérification du démarrage des étapes en file d'attente (secondes)
+QUEUE_POLL_INTERVAL = 0.05
+
+_abandoned_lock = threading.Lock()
+_abandoned = 0
+
+
+def abandoned_stages() -> int:
+    """Nombre d'étapes hors délai qui occupent encore un thread du pool."""
+    return _abandoned
+
+
+def _abandon(future):
+    """Compte le thread d'une étape hors délai jusqu'à la fin de son exécution."""
+    global _abandoned
+    with _abandoned_lock:
+        _abandoned += 1
+
+    def release(_):
+        global _abandoned
+        with _abandoned_lock:
+            _abandoned -= 1
+
+    future.add_done_callback(release)
+
+
+def error_result(error: Exception) -> Dict[str, str]:
+    """Résultat par défaut d'une étape en échec."""
+    return {"error": str(error)}
+
+
+class Stage:
+    """Étape d'analyse: fonction appelée avec les résultats de ses dépendances."""
+
+    def __init__(self, name: str, func: Callable[..., Any], after: Iterable[str] = (),
+                 timeout: Optional[float] = None,
+                 on_error: Callable[[Exception], Any] = error_result):
+        """
+        Initialise l'étape.
+
+        Args:
+            name: Nom de l'étape (clé de son résultat)
+            func: Fonction appelée avec les résultats des dépendances, dans l'ordre de `after`
+            after: Étapes dont le résultat est requis
+            timeout: Délai maximal en secondes depuis le démarrage (None = délai du graphe)
+            on_error: Résultat à renvoyer à partir de l'exception en cas d'échec
+        """
+        self.name = name
+        self.func = func
+        self.after = tuple(after)
+        self.timeout = timeout
+        self.on_error = on_error
+
+
+class StageReport:
+    """Résultats, erreurs et durées d'une exécution du graphe."""
+
+    def __init__(self):
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, Exception] = {}
+        self.durations: Dict[str, float] = {}
+        self.elapsed = 0.0
+
+    def succeeded(self, name: str) -> bool:
+        """Indique si l'étape s'est terminée sans erreur."""
+        return name in self.results and name not in self.errors
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Durées (ms) et erreurs, pour les réponses et les journaux."""
+        return {
+            "elapsed_ms": round(self.elapsed * 1000, 1),
+            "stages_ms": {name: round(duration * 1000, 1) for name, duration in self.durations.items()},
+            "errors": {name: str(error) for name, error in self.errors.items()}
+        }
+
+
+class StageGraph:
+    """Graphe d'étapes exécutées dès que leurs dépendances sont disponibles."""
+
+    def __init__(self, timeout: Optional[float] = None, executor: Optional[Executor] = None,
+                 wrap: Optional[Callable[[Callable[[], Any]], Any]] = None):
+        """
+        Initialise le graphe.
+
+        Args:
+            timeout: Délai par défaut des étapes en secondes (None = illimité)
+            executor: Pool d'exécution (par défaut le pool de threads partagé)
+            wrap: Fonction recevant l'appel de chaque étape et l'exécutant
+                  (par exemple dans un contexte d'application Flask)
+        """
+        self.timeout = timeout
+        self.executor = executor
+        self.wrap = wrap
+        self.stages: Dict[str, Stage] = {}
+
+    def add(self, name: str, func: Callable[..., Any], after: Iterable[str] = (),
+            timeout: Optional[float] = None,
+            on_error: Callable[[Exception], Any] = error_result) -> 'StageGraph':
+        """
+        Ajoute une étape ; ses dépendances doivent déjà être déclarées (graphe acyclique).
+
+        Returns:
+            Le graphe, pour chaîner les ajouts
+        """
+        if name in self.stages:
+            raise ValueError(f"Étape déjà déclarée: {name}")
+        unknown = [dependency for dependency in after if dependency not in self.stages]
+        if unknown:
+            raise ValueError(f"Dépendances inconnues pour l'étape {name}: {unknown}")
+        self.stages[name] = Stage(name, func, after, timeout, on_error)
+        return self
+
+    def run(self) -> StageReport:
+        """
+        Exécute toutes les étapes, en parallèle dès que possible.
+
+        Returns:
+            Rapport: résultat de chaque étape (on_error(exception) en cas d'échec),
+            erreurs et durées
+        """
+        executor = self.executor or get_thread_pool()
+        report = StageReport()
+        pending: List[Stage] = list(self.stages.values())
+        running: Dict[Any, Stage] = {}  # future -> étape
+        starts: Dict[str, float] = {}  # étape -> démarrage effectif dans le pool
+        started = time.perf_counter()
+
+        while pending or running:
+            for stage in list(pending):
+                failed = [dependency for dependency in stage.after if dependency in report.errors]
+                if failed:
+                    pending.remove(stage)
+                    self._fail(report, stage, RuntimeError(f"Dépendance en échec: {', '.join(failed)}"), 0.0)
+                elif all(dependency in report.results for dependency in stage.after):
+                    pending.remove(stage)
+                    args = [report.results[dependency] for dependency in stage.after]
+                    running[executor.submit(self._call, stage, args, starts)] = stage
+
+            if not running:
+                continue
+
+            # Échéances des étapes démarrées ; les étapes en file sont revérifiées périodiquement
+            deadlines = []
+            for stage in running.values():
+                timeout = self._timeout(stage)
+                if timeout is None:
+                    continue
+                start = starts.get(stage.name)
+                deadlines.append(start + timeout if start is not None
+                                 else time.perf_counter() + QUEUE_POLL_INTERVAL)
+            wait_timeout = max(0.0, min(deadlines) - time.perf_counter()) if deadlines else None
+            done, _ = wait(list(running), timeout=wait_timeout, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    value, duration = future.result()
+                    report.results[stage.name] = value
+                    report.durations[stage.name] = duration
+                except Exception as e:
+                    logger.error(f"❌ Étape {stage.name} en échec: {str(e)}")
+                    self._fail(report, stage, e, None)
+
+            now = time.perf_counter()
+            for future, stage in list(running.items()):
+                timeout = self._timeout(stage)
+                start = starts.get(stage.name)
+                if timeout is not None and start is not None and now >= start + timeout:
+                    running.pop(future)
+                    _abandon(future)
+                    logger.warning(f"⚠️ Étape {stage.name} interrompue après {timeout}s "
+                                   f"({abandoned_stages()} thread(s) occupé(s) par des étapes abandonnées)")
+                    self._fail(report, stage, StageTimeoutError(f"Délai dépassé ({timeout}s)"), timeout)
+
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    def _timeout(self, stage: Stage) -> Optional[float]:
+        """Délai de l'étape (à défaut celui du graphe)."""
+        return stage.timeout if stage.timeout is not None else self.timeout
+
+    def _call(self, stage: Stage, args: List[Any], starts: Dict[str, float]):
+        """Exécute une étape dans un thread du pool et mesure sa durée."""
+        started = time.perf_counter()
+        starts[stage.name] = started
+        if self.wrap is not None:
+            value = self.wrap(lambda: stage.func(*args))
+        else:
+            value = stage.func(*args)
+        return value, time.perf_counter() - started
+
+    @staticmethod
+    def _fail(report: StageReport, stage: Stage, error: Exception, duration: Optional[float]):
+        """Enregistre l'échec d'une étape et son résultat de repli."""
+        report.errors[stage.name] = error
+        report.results[stage.name] = stage.on_error(error)
+        if duration is not None:
+            report.durations[stage.name] = duration
@@ -1,7 +1,8 @@
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from werkzeug.datastructures import FileStorage
 from app.utils.exceptions import ValidationError, FileUploadError
+from app.utils.image_context import ImageContext
 
 class FileValidator:
     """Validateur pour les fichiers téléchargés."""
@@ -80,12 +81,13 @@ class ImageValidator(FileValidator):
         allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp'}
         super().__init__(allowed_extensions, max_size)
 
-    def validate_image_file(self, file: FileStorage) -> Dict[str, Any]:
+    def validate_image_file(self, file: FileStorage, context: Optional[ImageContext] = None) -> Dict[str, Any]:
         """
         Valide un fichier image avec des vérifications supplémentaires.
 
         Args:
             file: Fichier image à valider
+            context: Contexte de l'image déjà lue (l'en-tête ouvert ici est réutilisé ensuite)
 
         Returns:
             Dictionnaire avec les informations de validation
@@ -97,25 +99,23 @@ class ImageValidator(FileValidator):
         try:
             from PIL import Image
 
-            # Vérifier que c'est vraiment une image
-            file.seek(0)
-            with Image.open(file) as img:
-                result.update({
-                    "width": img.width,
-                    "height": img.height,
-                    "format": img.format,
-                    "mode": img.mode
-                })
-
-                # Vérifier les dimensions minimales
-                if img.width < 10 or img.height < 10:
-                    raise ValidationError("Image trop petite (minimum 10x10 pixels)")
-
-                # Vérifier les dimensions maximales
-                if img.width > 10000 or img.height > 10000:
-                    raise ValidationError("Image trop grande (maximum 10000x10000 pixels)")
-
-            file.seek(0)  # Remettre au début pour la suite
+            # Vérifier que c'est vraiment une image (en-tête seulement, sans décoder les pixels)
+            if context is not None:
+                info = context.info
+            else:
+                file.seek(0)
+                with Image.open(file) as img:
+                    info = {"width": img.width, "height": img.height, "format": img.format, "mode": img.mode}
+                file.seek(0)  # Remettre au début pour la suite
+            result.update(info)
+
+            # Vérifier les dimensions minimales
+            if info["width"] < 10 or info["height"] < 10:
+                raise ValidationError("Image trop petite (minimum 10x10 pixels)")
+
+            # Vérifier les dimensions maximales
+            if info["width"] > 10000 or info["height"] > 10000:
+                raise ValidationError("Image trop grande (maximum 10000x10000 pixels)")
 
         except Exception as e:
             raise ValidationError(f"Fichier image invalide: {str(e)}")
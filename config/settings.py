@@ -15,9 +15,63 @@ class Config:
 
     # Modèles AI
     AI_MODEL_PATH = os.environ.get('AI_MODEL_PATH') or 'modelFakeReal.h5'
+    # Chargement des modèles en arrière-plan au démarrage (sinon au premier usage)
+    AI_MODEL_WARMUP = os.environ.get('AI_MODEL_WARMUP', 'true').lower() == 'true'
+    # Regroupement des inférences concurrentes (micro-batching), 1 = désactivé
+    AI_BATCH_MAX_SIZE = int(os.environ.get('AI_BATCH_MAX_SIZE', 32))
+    AI_BATCH_MAX_WAIT_MS = float(os.environ.get('AI_BATCH_MAX_WAIT_MS', 5))
+    # Moteur d'exécution: keras ou tflite (exports de scripts/create_ai_model.py --export-tflite)
+    AI_BACKEND = os.environ.get('AI_BACKEND', 'keras')
+    AI_TFLITE_QUANTIZATION = os.environ.get('AI_TFLITE_QUANTIZATION', 'dynamic')  # dynamic ou int8
+    AI_TFLITE_THREADS = int(os.environ.get('AI_TFLITE_THREADS', 0))  # 0 = tous les cœurs
+    # Serveur d'inférence dédié (scripts/inference_server.py); vide = modèles dans chaque processus
+    INFERENCE_SERVER_ADDRESS = os.environ.get('INFERENCE_SERVER_ADDRESS') or None
+    INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 2))
+    INFERENCE_RING_SLOTS = int(os.environ.get('INFERENCE_RING_SLOTS', 64))  # Entrées en mémoire partagée par modèle
+    INFERENCE_CONNECT_TIMEOUT = float(os.environ.get('INFERENCE_CONNECT_TIMEOUT', 120))
 
     # Stéganographie
     SIMILARITY_THRESHOLD = float(os.environ.get('SIMILARITY_THRESHOLD', 0.85))
+    HASH_INDEX_PATH = os.environ.get('HASH_INDEX_PATH') or 'instance/hash_index.npz'
+    HASH_INDEX_SYNC_INTERVAL = float(os.environ.get('HASH_INDEX_SYNC_INTERVAL', 0))  # 0 = à chaque requête
+    SIMILARITY_TOP_K = int(os.environ.get('SIMILARITY_TOP_K', 10))
+    SIMILARITY_MAX_K = int(os.environ.get('SIMILARITY_MAX_K', 100))
+    SIMILARITY_MATRIX_MAX_IMAGES = int(os.environ.get('SIMILARITY_MATRIX_MAX_IMAGES', 1000))
+    HASH_WORKERS = int(os.environ.get('HASH_WORKERS', 0))  # 0 = nombre de cœurs
+    ANALYSIS_THREADS = int(os.environ.get('ANALYSIS_THREADS', 0))  # 0 = 2 × nombre de cœurs ; les étapes hors délai gardent leur thread
+    ANALYSIS_STAGE_TIMEOUT = float(os.environ.get('ANALYSIS_STAGE_TIMEOUT', 60))  # Secondes, 0 = illimité
+
+    # Ingestion par lots (/api/v2/upload/batch)
+    BATCH_UPLOAD_CHUNK_SIZE = int(os.environ.get('BATCH_UPLOAD_CHUNK_SIZE', 32))
+    BATCH_UPLOAD_MAX_FILES = int(os.environ.get('BATCH_UPLOAD_MAX_FILES', 10000))
+    BATCH_MAX_CONTENT_LENGTH = int(os.environ.get('BATCH_MAX_CONTENT_LENGTH', 2 * 1024 * 1024 * 1024))  # 2GB
+
+    # Cache des résultats d'analyse (clé: SHA-256, étape, version du modèle)
+    RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', 2048))  # Entrées en mémoire, 0 = désactivé
+    RESULT_CACHE_PATH = os.environ.get('RESULT_CACHE_PATH') or 'instance/result_cache.sqlite'
+    RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', 7 * 24 * 3600))  # Secondes
+
+    # Embeddings ResNet50 (similarité profonde), un sous-dossier par version du modèle
+    EMBEDDING_STORE_PATH = os.environ.get('EMBEDDING_STORE_PATH') or 'instance/embeddings'
+    EMBEDDING_DTYPE = os.environ.get('EMBEDDING_DTYPE') or 'float32'
+    ANN_INDEX_PATH = os.environ.get('ANN_INDEX_PATH') or 'instance/ann_index.npz'
+    ANN_NLIST = int(os.environ.get('ANN_NLIST', 1024))
+    ANN_NPROBE = int(os.environ.get('ANN_NPROBE', 16))
+    ANN_PQ_M = int(os.environ.get('ANN_PQ_M', 64))
+
+    # Regroupement des quasi-doublons (administration)
+    CLUSTERING_RADIUS = float(os.environ.get('CLUSTERING_RADIUS', 6))
+    CLUSTERING_CHECKPOINT_DIR = os.environ.get('CLUSTERING_CHECKPOINT_DIR') or 'instance/clustering'
+    CLUSTERING_CHECKPOINT_EVERY = int(os.environ.get('CLUSTERING_CHECKPOINT_EVERY', 5000))
+    CLUSTERING_STALE_AFTER = float(os.environ.get('CLUSTERING_STALE_AFTER', 600))  # Secondes avant reprise d'une tâche interrompue
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')  # Vide = routes d'administration désactivées
+
+    # Analyses asynchrones (/api/v2/jobs)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))  # 0 = workers externes (scripts/job_worker.py)
+    JOB_SPOOL_DIR = os.environ.get('JOB_SPOOL_DIR') or 'instance/jobs'
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 0.5))
+    JOB_STALE_AFTER = float(os.environ.get('JOB_STALE_AFTER', 600))  # Secondes avant reprise d'une tâche abandonnée
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 2))
 
     # Sécurité
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
@@ -42,6 +96,14 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     UPLOAD_FOLDER = 'test_uploads'
+    HASH_INDEX_PATH = None
+    EMBEDDING_STORE_PATH = None
+    ANN_INDEX_PATH = None
+    RESULT_CACHE_PATH = None
+    AI_MODEL_WARMUP = False
+    CLUSTERING_CHECKPOINT_DIR = 'test_uploads/clustering'
+    JOB_WORKERS = 0
+    JOB_SPOOL_DIR = 'test_uploads/jobs'
 
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Rapport précision / latence des exports TFLite comparés aux modèles Keras.
+
+Pour chaque modèle (détection IA, ResNet50) et chaque quantification exportée
+(scripts/create_ai_model.py --export-tflite), sur les mêmes images prétraitées:
+- détection IA: écart de probabilité et accord des décisions (seuil 0,5)
+- ResNet50: similarité cosinus des embeddings et accord du plus proche voisin
+- latence par image (lot de 1) et débit par lot
+
+Exemple:
+    python scripts/benchmark_ai_backends.py --images uploads --output instance/ai_backends.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+# Ajouter le répertoire du projet au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import ai_detection_service_v2 as ai
+from app.services.tflite_backend import QUANTIZATIONS, load_calibration_images, load_tflite_model
+
+
+def latency(model, inputs: np.ndarray, batch_size: int) -> dict:
+    """Latence par image (lot de 1) et débit sur des lots de batch_size."""
+    model.predict(inputs[:1], verbose=0)  # Préchauffage
+    timings = []
+    for array in inputs:
+        start = time.perf_counter()
+        model.predict(array[np.newaxis], verbose=0)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+
+    model.predict(inputs[:batch_size], verbose=0)
+    start = time.perf_counter()
+    for offset in range(0, len(inputs), batch_size):
+        model.predict(inputs[offset:offset + batch_size], verbose=0)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "p50_ms": round(timings[len(timings) // 2], 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(0.95 * len(timings)))], 3),
+        "images_per_second": round(len(inputs) / elapsed, 1)
+    }
+
+
+def compare_detection(reference: np.ndarray, outputs: np.ndarray) -> dict:
+    """Écart des probabilités de génération IA et accord des décisions."""
+    reference, outputs = reference.ravel(), outputs.ravel()
+    difference = np.abs(reference - outputs) * 100
+    return {
+        "mean_abs_diff_points": round(float(difference.mean()), 3),
+        "max_abs_diff_points": round(float(difference.max()), 3),
+        "decision_agreement": round(float(np.mean((reference > 0.5) == (outputs > 0.5))), 4)
+    }
+
+
+def compare_embeddings(reference: np.ndarray, outputs: np.ndarray) -> dict:
+    """Similarité cosinus des embeddings et accord du plus proche voisin parmi les images."""
+    def normalize(vectors):
+        vectors = vectors.reshape(len(vectors), -1)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    reference, outputs = normalize(reference), normalize(outputs)
+    cosine = np.sum(reference * outputs, axis=1)
+    result = {"cosine_mean": round(float(cosine.mean()), 5), "cosine_min": round(float(cosine.min()), 5)}
+    if len(reference) > 1:
+        neighbours = []
+        for vectors in (reference, outputs):
+            scores = vectors @ vectors.T
+            np.fill_diagonal(scores, -np.inf)
+            neighbours.append(scores.argmax(axis=1))
+        result["nearest_neighbour_agreement"] = round(float(np.mean(neighbours[0] == neighbours[1])), 4)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparaison des moteurs Keras et TFLite")
+    parser.add_argument('--images', default='uploads', help="Dossier d'images de test")
+    parser.add_argument('--samples', type=int, default=64, help="Nombre d'images")
+    parser.add_argument('--batch-size', type=int, default=32, help="Taille des lots pour le débit")
+    parser.add_argument('--threads', type=int, default=0, help="Threads TFLite (0 = tous les cœurs)")
+    parser.add_argument('--output', help="Fichier JSON du rapport")
+    args = parser.parse_args()
+
+    if not ai._import_tensorflow():
+        print("❌ TensorFlow est nécessaire pour la référence Keras")
+        return 1
+
+    models = {
+        "ai_detection": (ai._load_ai_model, ai.AI_MODEL_PATH, (128, 128), Image.Resampling.LANCZOS,
+                         lambda batch: batch.astype(np.float32) / 255.0, compare_detection),
+        "resnet50": (ai._load_resnet50, ai.RESNET_TFLITE_BASE, (224, 224), Image.Resampling.NEAREST,
+                     lambda batch: ai._resnet_preprocess(batch.astype(np.float32)), compare_embeddings)
+    }
+
+    report = {}
+    for name, (load, source, size, resample, preprocess, compare) in models.items():
+        keras_model = load()
+        if keras_model is None:
+            print(f"⚠️ {name}: modèle Keras indisponible, ignoré")
+            continue
+        inputs = preprocess(np.stack(load_calibration_images(args.images, size, resample, limit=args.samples)))
+        reference = keras_model.predict(inputs, verbose=0)
+
+        report[name] = {"keras": {"latency": latency(keras_model, inputs, args.batch_size)}}
+        print(f"\n📊 {name} ({len(inputs)} images)")
+        print(f"   keras     {report[name]['keras']['latency']}")
+
+        for quantization in QUANTIZATIONS:
+            tflite_model = load_tflite_model(source, quantization, args.threads)
+            if tflite_model is None:
+                continue
+            entry = {
+                "size_bytes": tflite_model.size_bytes,
+                "accuracy": compare(reference, tflite_model.predict(inputs)),
+                "latency": latency(tflite_model, inputs, args.batch_size)
+            }
+            report[name][f"tflite-{quantization}"] = entry
+            print(f"   {quantization:<9} {entry['latency']}")
+            print(f"   {'':<9} {entry['accuracy']} ({entry['size_bytes'] / 1e6:.1f} Mo)")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Rapport enregistré: {args.output}")
+
+    print("✅ Comparaison terminée")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark rappel / latence de l'index approché IVF (avec ou sans PQ)
+comparé à la recherche exacte par produit matrice-vecteur.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+# Ajouter le répertoire du projet au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ann_index import IVFIndex
+
+
+def build_vectors(size: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Crée des vecteurs synthétiques regroupés (proches d'embeddings CNN réels)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, size)] + 0.6 * rng.normal(size=(size, dim)).astype(np.float32)
+    return np.maximum(vectors, 0)  # Sorties ReLU positives comme ResNet50
+
+
+def exact_topk(vectors: np.ndarray, queries: np.ndarray, k: int) -> tuple:
+    """Top-k exact (cosinus) et latence moyenne par requête."""
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        scores = normalized @ (query / np.linalg.norm(query))
+        top = np.argpartition(-scores, k - 1)[:k]
+        results.append(set(top.tolist()))
+    return results, (time.perf_counter() - start) / len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'index approché des embeddings")
+    parser.add_argument('--size', type=int, default=200_000, help="Nombre de vecteurs")
+    parser.add_argument('--dim', type=int, default=2048, help="Dimension des vecteurs")
+    parser.add_argument('--clusters', type=int, default=500, help="Nombre de groupes synthétiques")
+    parser.add_argument('--nlist', type=int, default=512, help="Nombre de listes inversées")
+    parser.add_argument('--pq-m', type=int, default=64, help="Sous-quantificateurs PQ (0 pour IVF seul)")
+    parser.add_argument('--queries', type=int, default=100, help="Nombre de requêtes")
+    parser.add_argument('--k', type=int, default=10, help="Nombre de voisins")
+    parser.add_argument('--rerank', type=int, default=4,
+                        help="Candidats PQ re-classés exactement par résultat (comme le service)")
+    args = parser.parse_args()
+
+    print(f"🔧 Génération de {args.size:,} vecteurs de dimension {args.dim}...")
+    vectors = build_vectors(args.size, args.dim, args.clusters)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(args.size, args.queries, replace=False)]
+    queries = queries + 0.1 * rng.normal(size=queries.shape).astype(np.float32)
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    truth, exact_latency = exact_topk(vectors, queries, args.k)
+    print(f"🎯 Recherche exacte: {exact_latency * 1000:.1f} ms/requête")
+
+    for pq_m in sorted({0, args.pq_m}):
+        index = IVFIndex(dim=args.dim, nlist=args.nlist, pq_m=pq_m)
+        start = time.perf_counter()
+        index.train(vectors)
+        index.add(range(args.size), vectors)
+        label = f"IVF{args.nlist}" + (f",PQ{pq_m}" if pq_m else ",Flat")
+        print(f"\n🧭 {label}: construit en {time.perf_counter() - start:.1f} s")
+
+        for nprobe in (1, 4, 16, 64):
+            if nprobe > args.nlist:
+                break
+            modes = [("", 1)] + ([(" +re-classement", args.rerank)] if pq_m and args.rerank > 1 else [])
+            for suffix, factor in modes:
+                start = time.perf_counter()
+                results = []
+                for query in queries:
+                    found = [match["id"] for match in index.search(query, args.k * factor, nprobe=nprobe)]
+                    if factor > 1:
+                        # Re-classement exact des candidats (vecteurs du stockage d'embeddings)
+                        scores = normalized[found] @ (query / np.linalg.norm(query))
+                        found = [found[i] for i in np.argsort(-scores)[:args.k]]
+                    results.append(set(found))
+                latency = (time.perf_counter() - start) / len(queries)
+                recall = np.mean([len(truth[i] & found) / args.k for i, found in enumerate(results)])
+                print(f"  nprobe={nprobe:3d}  rappel@{args.k}={recall:.3f}  "
+                      f"{latency * 1000:6.2f} ms/requête  (x{exact_latency / latency:.1f}){suffix}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark du moteur de distance de Hamming vectorisé (XOR + popcount uint64).
+Compare un parcours complet vectorisé avec la boucle Python historique.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+# Ajouter le répertoire du projet au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.hamming import HashMatrix
+
+
+def build_matrix(size: int) -> HashMatrix:
+    """Crée une matrice de hashes pHash/dHash aléatoires."""
+    rng = np.random.default_rng(0)
+    matrix = HashMatrix(('phash', 'dhash'), capacity=size)
+    values = rng.integers(0, 2**63, size=(size, 2), dtype=np.uint64)
+    for image_id in range(size):
+        matrix.add(image_id, {"phash": int(values[image_id, 0]), "dhash": int(values[image_id, 1])})
+    return matrix
+
+
+def python_scan(matrix: HashMatrix, query: dict, max_distance: float) -> int:
+    """Boucle Python bit à bit (comportement historique)."""
+    query_bits = {t: bin(int(query[t], 16))[2:].zfill(64) for t in query}
+    matches = 0
+    for phash, dhash in matrix.values.tolist():
+        stored = {"phash": bin(phash)[2:].zfill(64), "dhash": bin(dhash)[2:].zfill(64)}
+        distance = sum(
+            sum(c1 != c2 for c1, c2 in zip(query_bits[t], stored[t])) for t in query_bits
+        ) / len(query_bits)
+        if distance <= max_distance:
+            matches += 1
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du scan de hashes")
+    parser.add_argument('--size', type=int, default=1_000_000, help="Nombre de hashes")
+    parser.add_argument('--repeat', type=int, default=5, help="Nombre de requêtes")
+    parser.add_argument('--python-sample', type=int, default=20_000,
+                        help="Taille de l'échantillon pour la boucle Python")
+    args = parser.parse_args()
+
+    print(f"🔧 Construction d'une matrice de {args.size:,} hashes...")
+    matrix = build_matrix(args.size)
+    query = {"phash": "c3a5f0e1d2b49687", "dhash": "0f1e2d3c4b5a6978"}
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        matches = matrix.search(query, max_distance=9.6)
+        timings.append(time.perf_counter() - start)
+    print(f"⚡ Scan vectorisé: {np.median(timings) * 1000:.1f} ms (médiane), {len(matches)} résultats")
+
+    sample = build_matrix(args.python_sample)
+    start = time.perf_counter()
+    python_scan(sample, query, 9.6)
+    elapsed = time.perf_counter() - start
+    extrapolated = elapsed * args.size / args.python_sample
+    print(f"🐢 Boucle Python: {elapsed:.2f} s pour {args.python_sample:,} hashes "
+          f"(~{extrapolated:.0f} s extrapolé à {args.size:,})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la latence d'inférence par image: model.predict de Keras comparé
+au tf.function compilé et préchauffé (app.services.compiled_model), pour des
+lots de 1, 8 et 32 images.
+
+Exemples:
+    python scripts/benchmark_inference.py
+    python scripts/benchmark_inference.py --models resnet50 --runs 20 --output instance/inference.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+# Ajouter le répertoire du projet au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import ai_detection_service_v2 as ai
+from app.services.compiled_model import CompiledModel
+
+
+def build_models(names, weights):
+    """Modèles Keras de référence: model.h5 (ou le CNN de create_ai_model.py) et ResNet50."""
+    keras = ai.tf.keras
+    models = {}
+    if 'ai_detection' in names:
+        if os.path.exists(ai.AI_MODEL_PATH):
+            models['ai_detection'] = keras.models.load_model(ai.AI_MODEL_PATH, compile=False)
+        else:
+            print(f"⚠️ {ai.AI_MODEL_PATH} introuvable, CNN de scripts/create_ai_model.py utilisé")
+            layers = keras.layers
+            models['ai_detection'] = keras.Sequential([
+                layers.Input(shape=(128, 128, 3)),
+                layers.Conv2D(32, (3, 3), activation='relu'), layers.MaxPooling2D((2, 2)),
+                layers.Conv2D(64, (3, 3), activation='relu'), layers.MaxPooling2D((2, 2)),
+                layers.Conv2D(128, (3, 3), activation='relu'), layers.MaxPooling2D((2, 2)),
+                layers.Flatten(), layers.Dense(128, activation='relu'), layers.Dense(64, activation='relu'),
+                layers.Dense(1, activation='sigmoid')
+            ])
+    if 'resnet50' in names:
+        models['resnet50'] = ai.ResNet50(weights=weights, include_top=False, pooling="avg")
+    return models
+
+
+def per_image_ms(predict, batch: np.ndarray, runs: int) -> float:
+    """Latence médiane par image (ms) d'un appel sur le lot."""
+    predict(batch)  # Préchauffage (traçage, allocation)
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        predict(batch)
+        timings.append((time.perf_counter() - start) * 1000 / len(batch))
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Keras predict / tf.function compilé")
+    parser.add_argument('--models', nargs='+', default=['ai_detection', 'resnet50'],
+                        choices=['ai_detection', 'resnet50'], help="Modèles mesurés")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32], help="Tailles de lot")
+    parser.add_argument('--runs', type=int, default=10, help="Répétitions par mesure")
+    parser.add_argument('--weights', default='imagenet', help="Poids de ResNet50 (imagenet ou none)")
+    parser.add_argument('--output', help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    if not ai._import_tensorflow():
+        print("❌ TensorFlow n'est pas disponible")
+        return 1
+
+    weights = None if args.weights == 'none' else args.weights
+    report = {}
+    rng = np.random.default_rng(0)
+    for name, model in build_models(args.models, weights).items():
+        compiled = CompiledModel(model)
+        print(f"\n📊 {name} (compilation et préchauffage: {compiled.warmup_seconds}s)")
+        print(f"   {'lot':>4}  {'predict':>12}  {'tf.function':>12}  {'gain':>6}")
+        report[name] = {"warmup_seconds": compiled.warmup_seconds, "batches": {}}
+
+        for batch_size in args.batch_sizes:
+            batch = rng.random((batch_size,) + compiled.input_shape, dtype=np.float32)
+            keras_ms = per_image_ms(lambda b: model.predict(b, verbose=0), batch, args.runs)
+            compiled_ms = per_image_ms(compiled.predict, batch, args.runs)
+            report[name]["batches"][batch_size] = {
+                "predict_ms_per_image": round(keras_ms, 3),
+                "compiled_ms_per_image": round(compiled_ms, 3)
+            }
+            print(f"   {batch_size:>4}  {keras_ms:>9.2f} ms  {compiled_ms:>9.2f} ms  x{keras_ms / compiled_ms:>4.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Résultats enregistrés: {args.output}")
+
+    print("✅ Benchmark terminé")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
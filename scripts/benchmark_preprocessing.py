@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Benchmark du prétraitement des entrées des réseaux: décodage complet puis
+redimensionnement, comparé au décodage JPEG à échelle réduite (app.utils.preprocessing).
+
+Exemples:
+    python scripts/benchmark_preprocessing.py
+    python scripts/benchmark_preprocessing.py --image photo.jpg --runs 10
+"""
+
+import io
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from PIL import Image
+
+# Ajouter le répertoire du projet au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.image_context import ImageContext
+from app.utils.preprocessing import draft_scale, model_input_array
+
+
+def synthetic_jpeg(width: int, height: int) -> bytes:
+    """Photo synthétique (dégradés et bruit) encodée en JPEG."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    pixels = np.stack([127 + 100 * np.sin(x / 97.0), 127 + 90 * np.cos(y / 71.0), 255 * x / width], axis=-1)
+    pixels += rng.normal(0, 6, pixels.shape)
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format='JPEG', quality=92)
+    return buffer.getvalue()
+
+
+def full_decode(data: bytes, size, resample) -> np.ndarray:
+    """Ancien prétraitement: décodage complet, RGB, redimensionnement."""
+    image = Image.open(io.BytesIO(data)).convert('RGB')
+    return np.asarray(image.resize(size, resample), dtype=np.uint8)
+
+
+def timed(function, runs: int) -> float:
+    """Durée médiane en millisecondes."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du décodage JPEG à échelle réduite")
+    parser.add_argument('--image', help="Image JPEG à utiliser (sinon image synthétique)")
+    parser.add_argument('--width', type=int, default=6000, help="Largeur de l'image synthétique")
+    parser.add_argument('--height', type=int, default=4000, help="Hauteur de l'image synthétique")
+    parser.add_argument('--runs', type=int, default=5, help="Répétitions par mesure")
+    args = parser.parse_args()
+
+    if args.image:
+        with open(args.image, 'rb') as f:
+            data = f.read()
+    else:
+        print(f"🔧 Création d'un JPEG synthétique {args.width}x{args.height}...")
+        data = synthetic_jpeg(args.width, args.height)
+    width, height = Image.open(io.BytesIO(data)).size
+
+    for label, size, resample in (("Détection IA", (128, 128), Image.Resampling.LANCZOS),
+                                  ("ResNet50", (224, 224), Image.Resampling.NEAREST)):
+        scale = draft_scale((width, height), size)
+        full_ms = timed(lambda: full_decode(data, size, resample), args.runs)
+        reduced_ms = timed(lambda: model_input_array(ImageContext(data=data), size, resample), args.runs)
+        drift = np.abs(full_decode(data, size, resample).astype(np.int16)
+                       - model_input_array(ImageContext(data=data), size, resample)).mean()
+
+        full_mb = width * height * 3 / 1e6
+        reduced_mb = -(-width // scale) * -(-height // scale) * 3 / 1e6
+        print(f"📊 {label} {size[0]}x{size[1]} (réduction 1/{scale})")
+        print(f"   décodage complet  {full_ms:8.1f} ms   {full_mb:8.1f} Mo RGB")
+        print(f"   décodage réduit   {reduced_ms:8.1f} ms   {reduced_mb:8.1f} Mo RGB")
+        print(f"   gain x{full_ms / reduced_ms:.1f}, écart moyen {drift:.2f}/255")
+
+    print("✅ Benchmark terminé")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
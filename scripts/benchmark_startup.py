@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark du démarrage de l'application.
+
+Chaque mesure est faite dans un interpréteur neuf (imports à froid): délai avant
+la première requête servie (/health/live) et avant que l'application soit prête
+(/health/ready, modèles IA chargés). --eager reproduit le chargement bloquant des
+modèles avant la première requête, pour comparaison.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+# Ajouter le répertoire du projet au path
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+
+def measure(config_name: str, eager: bool, ready_timeout: float) -> dict:
+    """Démarre l'application dans ce processus et mesure les délais (en secondes)."""
+    start = time.perf_counter()
+    from app import create_app
+    from app.api import image_routes_v2
+
+    app = create_app(config_name)
+    created = time.perf_counter()
+    if eager:
+        image_routes_v2.ai_service.ensure_models()
+
+    client = app.test_client()
+    status = client.get('/health/live').status_code
+    first_request = time.perf_counter()
+
+    ready = None
+    while time.perf_counter() - start < ready_timeout:
+        if client.get('/health/ready').status_code == 200:
+            ready = time.perf_counter()
+            break
+        time.sleep(0.05)
+
+    return {
+        "create_app": round(created - start, 3),
+        "first_request": round(first_request - start, 3),
+        "first_status": status,
+        "ready": round(ready - start, 3) if ready is not None else None,
+        "models": image_routes_v2.ai_service.is_available()
+    }
+
+
+def run_child(config_name: str, eager: bool, ready_timeout: float) -> dict:
+    """Lance une mesure dans un nouvel interpréteur."""
+    command = [sys.executable, os.path.abspath(__file__), '--child',
+               '--config', config_name, '--ready-timeout', str(ready_timeout)]
+    if eager:
+        command.append('--eager')
+    env = dict(os.environ, AI_MODEL_WARMUP='true')
+    output = subprocess.run(command, cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du démarrage (time-to-first-request)")
+    parser.add_argument('--config', default='development', help="Configuration de l'application")
+    parser.add_argument('--runs', type=int, default=3, help="Nombre de démarrages par mode")
+    parser.add_argument('--ready-timeout', type=float, default=300, help="Attente maximale de /health/ready (s)")
+    parser.add_argument('--eager', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.config, args.eager, args.ready_timeout)))
+        return
+
+    for label, eager in (("Chargement différé", False), ("Chargement bloquant", True)):
+        print(f"🔧 {label} ({args.runs} démarrages)...")
+        results = [run_child(args.config, eager, args.ready_timeout) for _ in range(args.runs)]
+        for key in ("create_app", "first_request", "ready"):
+            values = sorted(r[key] for r in results if r[key] is not None)
+            if values:
+                print(f"   {key:<14} médiane {values[len(values) // 2]:.3f}s (min {values[0]:.3f}s)")
+        print(f"   modèles: {results[-1]['models']['models_state']}")
+
+    print("✅ Benchmark terminé")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Regroupement hors ligne des quasi-doublons de toute la base d'images.
+
+Exemples:
+    python scripts/cluster_duplicates.py --radius 6
+    python scripts/cluster_duplicates.py --resume
+    python scripts/cluster_duplicates.py --list --min-size 3
+"""
+
+import os
+import sys
+import argparse
+
+# Ajouter le répertoire du projet au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def print_progress(job):
+    """Affiche l'avancement et le débit d'une tâche."""
+    progress = f"{100 * job.processed / job.total:.1f}%" if job.total else "-"
+    print(f"  📊 {job.processed}/{job.total} images ({progress}), "
+          f"{job.pairs} paires, {job.images_per_second} images/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regroupement des quasi-doublons (union-find sur l'index multi-hash)")
+    parser.add_argument('--radius', type=float, default=None,
+                        help="Distance de Hamming moyenne maximale (défaut: CLUSTERING_RADIUS)")
+    parser.add_argument('--resume', nargs='?', type=int, const=0, default=None, metavar='JOB_ID',
+                        help="Reprendre une tâche interrompue (la dernière si aucun identifiant)")
+    parser.add_argument('--checkpoint-every', type=int, default=None,
+                        help="Nombre d'images entre deux sauvegardes de l'état")
+    parser.add_argument('--list', action='store_true',
+                        help="Lister les groupes existants sans relancer le regroupement")
+    parser.add_argument('--min-size', type=int, default=2,
+                        help="Taille minimale des groupes listés")
+    parser.add_argument('--limit', type=int, default=20,
+                        help="Nombre de groupes listés")
+    args = parser.parse_args()
+
+    from app import create_app
+    from app.models.image_models import db
+    from app.models.cluster_models import ClusteringJob
+    from app.services.clustering_service import DuplicateClusteringService
+
+    app = create_app(os.environ.get('FLASK_ENV', 'development'))
+    with app.app_context():
+        db.create_all()
+        service = DuplicateClusteringService(
+            checkpoint_dir=app.config['CLUSTERING_CHECKPOINT_DIR'],
+            checkpoint_every=args.checkpoint_every or app.config['CLUSTERING_CHECKPOINT_EVERY']
+        )
+
+        if not args.list:
+            if args.resume is not None:
+                job = db.session.get(ClusteringJob, args.resume) if args.resume else service.resumable_job()
+                if job is None or job.status == ClusteringJob.STATUS_DONE:
+                    print("❌ Aucune tâche à reprendre")
+                    return 1
+                print(f"🔄 Reprise de la tâche {job.id} (rayon {job.radius}) après l'image {job.cursor}")
+            else:
+                radius = args.radius if args.radius is not None else app.config['CLUSTERING_RADIUS']
+                job = service.create_job(radius)
+                print(f"🚀 Tâche {job.id}: regroupement avec un rayon de {radius} bits")
+
+            try:
+                job = service.run(job.id, progress=print_progress)
+            except Exception as e:
+                print(f"❌ Regroupement interrompu: {str(e)}")
+                print(f"🔄 Reprendre avec: python scripts/cluster_duplicates.py --resume {job.id}")
+                return 1
+
+            print(f"✅ {job.clusters} groupes, {job.clustered_images} images regroupées "
+                  f"({job.images_per_second} images/s)")
+
+        for cluster in service.list_clusters(min_size=args.min_size, limit=args.limit):
+            print(f"  🗂️  Groupe {cluster['cluster_id']} ({cluster['size']} images): {cluster['image_ids']}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,14 +2,23 @@
 """
 Script pour créer un modèle IA compatible pour la détection d'images générées par IA.
 Utilise un modèle pré-entraîné ou crée un modèle simple basé sur des caractéristiques.
+
+--export-tflite exporte model.h5 et ResNet50 en TFLite quantifié (AI_BACKEND=tflite):
+    python scripts/create_ai_model.py --export-tflite
+    python scripts/create_ai_model.py --export-tflite --quantization int8 --calibration-dir uploads
 """
 
 import tensorflow as tf
 from tensorflow import keras
 from tensorflow.keras import layers
 import numpy as np
+import argparse
+import sys
 import os
 
+# Ajouter le répertoire du projet au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 def create_simple_ai_detection_model():
     """
     Crée un modèle simple pour la détection d'images générées par IA.
@@ -133,8 +142,61 @@ def train_and_save_model(model, model_path="model_v2.h5"):
 
     return model
 
+def export_tflite_models(model_path, quantizations, calibration_dir, samples):
+    """
+    Exporte le modèle de détection et ResNet50 en TFLite quantifié.
+
+    La quantification int8 est calibrée sur les images de calibration_dir,
+    prétraitées comme à l'exécution.
+    """
+    from PIL import Image
+    from app.services.tflite_backend import export_tflite, load_calibration_images, tflite_path
+    from app.services.ai_detection_service_v2 import RESNET_TFLITE_BASE
+
+    resnet_preprocess = keras.applications.resnet50.preprocess_input
+    models = [(RESNET_TFLITE_BASE, lambda: keras.applications.ResNet50(
+        weights="imagenet", include_top=False, pooling="avg"
+    ), (224, 224), Image.Resampling.NEAREST, lambda batch: resnet_preprocess(batch.astype(np.float32)))]
+    if os.path.exists(model_path):
+        models.insert(0, (model_path, lambda: keras.models.load_model(model_path, compile=False),
+                          (128, 128), Image.Resampling.LANCZOS, lambda batch: batch.astype(np.float32) / 255.0))
+    else:
+        print(f"⚠️ {model_path} introuvable, seul ResNet50 est exporté")
+
+    for source, load, size, resample, preprocess in models:
+        print(f"\n🔄 Export de {source}...")
+        model = load()
+        images = load_calibration_images(calibration_dir, size, resample, limit=samples)
+
+        def representative():
+            for array in images:
+                yield [preprocess(array[np.newaxis])]
+
+        for quantization in quantizations:
+            path = tflite_path(source, quantization)
+            size_bytes = export_tflite(model, path, quantization, representative)
+            print(f"✅ {path}: {size_bytes / 1e6:.1f} Mo ({quantization}, {len(images)} images de calibration)")
+
+    print("\n🎉 Exports terminés: AI_BACKEND=tflite pour les utiliser")
+    return True
+
 def main():
     """Fonction principale pour créer et sauvegarder le modèle."""
+    parser = argparse.ArgumentParser(description="Création et export des modèles de détection IA")
+    parser.add_argument('--export-tflite', action='store_true',
+                        help="Exporter model.h5 et ResNet50 en TFLite au lieu de créer un modèle")
+    parser.add_argument('--model', default='model.h5', help="Modèle Keras de détection à exporter")
+    parser.add_argument('--quantization', choices=['dynamic', 'int8', 'all'], default='all',
+                        help="Quantification: poids int8 (dynamic) ou entièrement entière (int8)")
+    parser.add_argument('--calibration-dir', default='uploads',
+                        help="Images représentatives pour la calibration int8")
+    parser.add_argument('--samples', type=int, default=100, help="Nombre d'images de calibration")
+    args = parser.parse_args()
+
+    if args.export_tflite:
+        quantizations = ['dynamic', 'int8'] if args.quantization == 'all' else [args.quantization]
+        return export_tflite_models(args.model, quantizations, args.calibration_dir, args.samples)
+
     print("🚀 Création d'un modèle IA pour la détection d'images générées par IA")
     print("=" * 60)
 
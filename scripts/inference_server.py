@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Serveur d'inférence dédié (sidecar) pour les modèles IA.
+
+Un pool fixe de processus workers charge ResNet50 et le modèle de détection IA;
+les processus HTTP (INFERENCE_SERVER_ADDRESS) leur transmettent les tenseurs
+prétraités par mémoire partagée. La mémoire des modèles dépend alors de
+--workers et non du nombre de workers HTTP.
+
+Exemples:
+    python scripts/inference_server.py
+    python scripts/inference_server.py --workers 4 --address /tmp/stegano-inference.sock
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+# Ajouter le répertoire du projet au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    from config.settings import config
+    from app.services.inference_workers import InferenceServer
+    from app.services.ai_detection_service_v2 import inference_models
+
+    settings = config[os.environ.get('FLASK_ENV', 'development')]
+    parser = argparse.ArgumentParser(description="Serveur d'inférence des modèles IA")
+    parser.add_argument('--address', default=settings.INFERENCE_SERVER_ADDRESS or 'instance/inference.sock',
+                        help="Chemin de la socket Unix")
+    parser.add_argument('--workers', type=int, default=settings.INFERENCE_WORKERS,
+                        help="Nombre de processus workers (une copie des modèles chacun)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    models = inference_models(settings.AI_BACKEND, settings.AI_TFLITE_QUANTIZATION, settings.AI_TFLITE_THREADS)
+    server = InferenceServer(args.address, models, workers=args.workers, authkey=settings.SECRET_KEY.encode())
+    print(f"🔄 Chargement des modèles dans {server.workers} workers...")
+    server.start()
+    for name, info in server.models.items():
+        status = "✅" if info["loaded"] else "⚠️"
+        print(f"   {status} {name}: {info['load_seconds']}s, {info['parameters'] or 0} paramètres")
+
+    print(f"🚀 Serveur d'inférence en écoute sur {args.address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("🛑 Arrêt du serveur d'inférence")
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
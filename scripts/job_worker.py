@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Workers dédiés aux analyses asynchrones (/api/v2/jobs).
+
+Permet de dimensionner le calcul indépendamment des processus web
+(lancer l'application avec JOB_WORKERS=0).
+
+Exemples:
+    python scripts/job_worker.py
+    python scripts/job_worker.py --workers 4
+    python scripts/job_worker.py --once
+"""
+
+import os
+import sys
+import argparse
+import multiprocessing
+
+# Ajouter le répertoire du projet au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def start_worker(config_name, max_jobs=None):
+    """Exécute un worker jusqu'à interruption (ou après max_jobs tâches)."""
+    from app import create_app
+    from app.services.job_service import JobService, run_worker, worker_id
+
+    app = create_app(config_name)
+    service = JobService(
+        spool_dir=app.config['JOB_SPOOL_DIR'],
+        stale_after=app.config['JOB_STALE_AFTER'],
+        max_attempts=app.config['JOB_MAX_ATTEMPTS']
+    )
+    print(f"🚀 Worker {worker_id()} en attente de tâches")
+    done = run_worker(app, service, app.config['JOB_POLL_INTERVAL'], max_jobs=max_jobs)
+    print(f"✅ Worker {worker_id()}: {done} tâches exécutées")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workers des analyses asynchrones")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Nombre de processus workers")
+    parser.add_argument('--once', action='store_true',
+                        help="Exécuter une seule tâche puis s'arrêter (un seul worker)")
+    args = parser.parse_args()
+
+    config_name = os.environ.get('FLASK_ENV', 'development')
+
+    if args.once or args.workers <= 1:
+        try:
+            start_worker(config_name, max_jobs=1 if args.once else None)
+        except KeyboardInterrupt:
+            print("🛑 Worker arrêté")
+        return 0
+
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=start_worker, args=(config_name,), name=f"job-worker-{index}")
+        for index in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        print("🛑 Arrêt des workers")
+        for process in processes:
+            process.terminate()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
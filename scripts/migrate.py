@@ -5,10 +5,15 @@ Ce script aide à migrer de l'ancienne structure vers la nouvelle.
 """
 
 import os
+import sys
 import shutil
 import sqlite3
+import argparse
 from datetime import datetime
 
+# Ajouter le répertoire du projet au path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 def backup_existing_data():
     """
     Sauvegarde les données existantes avant la migration.
@@ -98,6 +103,154 @@ def migrate_database():
     except Exception as e:
         print(f"  ❌ Erreur lors de la migration: {str(e)}")
 
+def backfill_image_hashes(batch_size: int = 500):
+    """
+    Remplit la table image_hashes (hashes entiers + sous-chaînes indexées)
+    pour les analyses existantes, par lots.
+
+    Les hashes sont recalculés depuis le fichier image quand il est encore
+    présent ; sinon seul le pHash hexadécimal de ImageAnalysis est converti.
+    """
+    print("🔢 Migration des hashes perceptuels vers des colonnes entières...")
+
+    from app import create_app
+    from app.models.image_models import db
+
+    app = create_app(os.environ.get('FLASK_ENV', 'development'))
+    with app.app_context():
+        db.create_all()
+        migrated = migrate_image_hashes(batch_size)
+        print(f"  ✅ Migration des hashes terminée: {migrated} analyses")
+
+def migrate_image_hashes(batch_size: int = 500) -> int:
+    """
+    Crée les lignes image_hashes manquantes, par lots (contexte d'application requis).
+
+    Args:
+        batch_size: Nombre d'analyses par transaction
+
+    Returns:
+        Nombre d'analyses migrées
+    """
+    from app.models.image_models import ImageAnalysis, db
+    from app.models.hash_models import ImageHash, IndexChange
+    from app.services.steganography_service import SteganographyService
+
+    last_id = 0
+    migrated = 0
+    while True:
+        batch = ImageAnalysis.query.outerjoin(
+            ImageHash, ImageHash.image_id == ImageAnalysis.id
+        ).filter(
+            ImageHash.id.is_(None),
+            ImageAnalysis.id > last_id
+        ).order_by(ImageAnalysis.id).limit(batch_size).all()
+
+        if not batch:
+            break
+
+        for analysis in batch:
+            hashes = {"phash": analysis.perceptual_hash}
+            image_path = getattr(analysis, 'image_path', None) or getattr(analysis, 'file_path', None)
+            if image_path and os.path.exists(image_path):
+                try:
+                    hashes.update(SteganographyService.generate_image_hashes(image_path))
+                except Exception as e:
+                    print(f"  ⚠️  Hashes non recalculés pour l'image {analysis.id}: {e}")
+
+            db.session.add(ImageHash.from_hashes(analysis.id, hashes))
+            IndexChange.record(analysis.id)  # Repris par les workers en cours d'exécution
+
+        db.session.commit()
+        migrated += len(batch)
+        last_id = batch[-1].id
+        print(f"  ✅ {migrated} analyses migrées (dernier id: {last_id})")
+
+    return migrated
+
+def backfill_embeddings(batch_size: int = 500):
+    """
+    Calcule les embeddings ResNet50 des analyses existantes absentes du stockage.
+
+    Chaque image n'est passée qu'une fois dans le réseau ; les recherches
+    profondes se font ensuite sur la matrice stockée.
+    """
+    print("🧠 Calcul des embeddings ResNet50 des images existantes...")
+
+    from app import create_app
+    from app.models.image_models import ImageAnalysis
+    from app.services.ai_detection_service_v2 import AIDetectionService
+    from app.services.embedding_store import embedding_store
+
+    app = create_app(os.environ.get('FLASK_ENV', 'development'))
+    with app.app_context():
+        if not embedding_store.ready:
+            embedding_store.open(app.config.get('EMBEDDING_STORE_PATH'), app.config.get('EMBEDDING_DTYPE'))
+        ai_service = AIDetectionService(embedding_store)
+        if not ai_service.resnet_model:
+            print("  ❌ ResNet50 indisponible, embeddings non calculés")
+            return
+
+        last_id = 0
+        computed = 0
+        while True:
+            batch = ImageAnalysis.query.filter(
+                ImageAnalysis.id > last_id
+            ).order_by(ImageAnalysis.id).limit(batch_size).all()
+
+            if not batch:
+                break
+
+            for analysis in batch:
+                image_path = getattr(analysis, 'image_path', None) or getattr(analysis, 'file_path', None)
+                if analysis.id in embedding_store or not image_path or not os.path.exists(image_path):
+                    continue
+                if ai_service.index_image_embedding(analysis.id, image_path):
+                    computed += 1
+
+            embedding_store.flush()
+            last_id = batch[-1].id
+            print(f"  ✅ {computed} embeddings calculés (dernier id: {last_id})")
+
+        print(f"  ✅ Embeddings terminés: {len(embedding_store)} images indexées")
+
+def build_ann_index():
+    """
+    Entraîne l'index approché IVF-PQ sur les embeddings stockés et le sauvegarde.
+    """
+    print("🧭 Construction de l'index approché des embeddings...")
+
+    from app import create_app
+    from app.services.ai_detection_service_v2 import AIDetectionService
+    from app.services.embedding_store import embedding_store
+    from app.services.ann_index import IVFIndex
+
+    app = create_app(os.environ.get('FLASK_ENV', 'development'))
+    with app.app_context():
+        if not embedding_store.ready:
+            embedding_store.open(app.config.get('EMBEDDING_STORE_PATH'), app.config.get('EMBEDDING_DTYPE'))
+        # Les embeddings sont rangés par version du ResNet50: la charger désigne leur sous-dossier
+        if not AIDetectionService(embedding_store).resnet_model:
+            print("  ❌ ResNet50 indisponible, version des embeddings inconnue")
+            return
+
+        nlist = min(app.config['ANN_NLIST'], len(embedding_store) // 39 or 1)
+        if nlist < 2:
+            print("  ⚠️  Trop peu d'embeddings pour un index approché")
+            return
+
+        index = IVFIndex(
+            dim=embedding_store.dim,
+            nlist=nlist,
+            nprobe=app.config['ANN_NPROBE'],
+            pq_m=app.config['ANN_PQ_M'] if len(embedding_store) >= 256 else 0,
+            snapshot_path=app.config['ANN_INDEX_PATH']
+        )
+        start = datetime.now()
+        indexed = index.build_from_store(embedding_store)
+        print(f"  ✅ Index approché construit: {indexed} vecteurs, {nlist} listes "
+              f"en {(datetime.now() - start).total_seconds():.1f} s")
+
 def setup_environment():
     """
     Configure l'environnement pour la nouvelle structure.
@@ -155,10 +308,13 @@ def main():
         # 3. Base de données
         migrate_database()
 
-        # 4. Environnement
+        # 4. Hashes perceptuels entiers
+        backfill_image_hashes()
+
+        # 5. Environnement
         setup_environment()
 
-        # 5. Nettoyage
+        # 6. Nettoyage
         cleanup_old_files()
 
         print("=" * 50)
@@ -176,4 +332,22 @@ def main():
         print("🔄 Vous pouvez restaurer depuis la sauvegarde si nécessaire")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Migration du projet Stegano-Flask")
+    parser.add_argument('--backfill-hashes', action='store_true',
+                        help="Remplir uniquement la table image_hashes")
+    parser.add_argument('--backfill-embeddings', action='store_true',
+                        help="Calculer uniquement les embeddings ResNet50 manquants")
+    parser.add_argument('--build-ann-index', action='store_true',
+                        help="Construire uniquement l'index approché des embeddings")
+    parser.add_argument('--batch-size', type=int, default=500,
+                        help="Taille des lots pour les migrations par lots")
+    args = parser.parse_args()
+
+    if args.backfill_hashes:
+        backfill_image_hashes(args.batch_size)
+    elif args.backfill_embeddings:
+        backfill_embeddings(args.batch_size)
+    elif args.build_ann_index:
+        build_ann_index()
+    else:
+        main()
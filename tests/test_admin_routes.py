@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+TOKEN = "secret-admin"
+
+class TestAdminRoutes:
+    """Tests pour la protection et le lancement des tâches d'administration."""
+
+    def test_routes_refused_without_configured_token(self, app, client):
+        """Sans ADMIN_TOKEN, les routes d'administration sont désactivées."""
+        app.config['ADMIN_TOKEN'] = None
+        assert client.get('/api/admin/clusters').status_code == 403
+
+        app.config['ADMIN_TOKEN'] = TOKEN
+        assert client.get('/api/admin/clusters', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+        assert client.get('/api/admin/clusters', headers={'X-Admin-Token': TOKEN}).status_code == 200
+
+    def test_resume_refused_while_job_is_running(self, app, client):
+        """Une reprise ne relance pas une tâche en cours ; une tâche interrompue peut être reprise."""
+        from app.api import admin_routes
+        from app.models.image_models import db
+        from app.models.cluster_models import ClusteringJob
+
+        app.config['ADMIN_TOKEN'] = TOKEN
+        job = ClusteringJob(radius=6, status=ClusteringJob.STATUS_RUNNING)
+        db.session.add(job)
+        db.session.commit()
+
+        response = client.post('/api/admin/clustering', json={"resume": True}, headers={'X-Admin-Token': TOKEN})
+        assert response.status_code == 409
+        assert response.get_json()["job"]["id"] == job.id
+
+        # Plus de sauvegarde intermédiaire depuis CLUSTERING_STALE_AFTER: tâche interrompue
+        stale = datetime.utcnow() - timedelta(seconds=app.config['CLUSTERING_STALE_AFTER'] + 60)
+        ClusteringJob.query.filter_by(id=job.id).update({"updated_at": stale})
+        db.session.commit()
+        assert admin_routes.clustering_service.active_job(app.config['CLUSTERING_STALE_AFTER']) is None
+        assert admin_routes.clustering_service.resumable_job().id == job.id
@@ -0,0 +1,87 @@
+import numpy as np
+from app.services.ann_index import IVFIndex
+from app.services.embedding_store import EmbeddingStore
+
+def _clustered_vectors(size=3000, dim=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(40, dim)).astype(np.float32)
+    return centers[rng.integers(0, 40, size)] + 0.3 * rng.normal(size=(size, dim)).astype(np.float32)
+
+class TestIVFIndex:
+    """Tests pour l'index approché des embeddings."""
+
+    def test_full_probe_matches_exact_search(self):
+        """En parcourant toutes les listes, IVF-Flat renvoie le top-k exact."""
+        vectors = _clustered_vectors()
+        index = IVFIndex(dim=32, nlist=16)
+        index.train(vectors)
+        index.add(range(len(vectors)), vectors)
+
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        query = vectors[42]
+        expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:10]
+
+        found = [match["id"] for match in index.search(query, k=10, nprobe=16)]
+        assert found == expected.tolist()
+
+    def test_pq_incremental_add_and_reload(self, tmp_path):
+        """Les vecteurs ajoutés après l'entraînement sont retrouvés, y compris après rechargement."""
+        vectors = _clustered_vectors()
+        index = IVFIndex(dim=32, nlist=8, pq_m=8, pq_bits=6)
+        index.train(vectors[:2000])
+        index.add(range(2000), vectors[:2000])
+        index.add(range(2000, 3000), vectors[2000:])
+        index.remove(2500)
+
+        path = str(tmp_path / "ann.npz")
+        index.save(path)
+        restored = IVFIndex(dim=32)
+        assert restored.load(path) is True
+        assert len(restored) == 2999 and 2500 not in restored
+
+        assert restored.search(vectors[2100], k=1, nprobe=8)[0]["id"] == 2100
+        assert restored.search(vectors[2100], k=5) == index.search(vectors[2100], k=5)
+
+    def test_snapshot_reloaded_only_for_its_model(self, tmp_path):
+        """Une sauvegarde construite pour un modèle n'est pas rechargée pour un autre."""
+        vectors = _clustered_vectors(size=500)
+        store = EmbeddingStore(dim=32)
+        store.use_model("resnet-2/keras")
+        for image_id, vector in enumerate(vectors):
+            store.add(image_id, vector)
+        path = str(tmp_path / "ann.npz")
+        IVFIndex(dim=32, nlist=4, snapshot_path=path).build_from_store(store)
+
+        restored = IVFIndex(dim=32)
+        assert restored.load(path, "resnet-2/tflite-int8/0123abcd") is False
+        assert restored.load(path) is False
+        assert restored.load(path, "resnet-2/keras") is True and len(restored) == 500
+
+        store.use_model("resnet-2/tflite-int8/0123abcd")
+        assert restored.sync_from_store(store) == 0 and len(restored) == 500
+        restored.clear()
+        assert not restored.is_trained and len(restored) == 0
+
+    def test_sync_picks_up_other_processes(self, tmp_path):
+        """Les ajouts et suppressions faits par un autre processus sont repris avant la recherche."""
+        vectors = _clustered_vectors(size=600)
+        store = EmbeddingStore(str(tmp_path), dim=32, capacity=64)
+        store.open()
+        for image_id in range(400):
+            store.add(image_id, vectors[image_id])
+
+        index = IVFIndex(dim=32, nlist=8)
+        assert index.build_from_store(store) == 400
+        assert index.sync_from_store(store) == 0
+
+        # Autre processus: même stockage, ouvert séparément
+        other = EmbeddingStore(str(tmp_path), dim=32)
+        other.open()
+        for image_id in range(400, 600):
+            other.add(image_id, vectors[image_id])
+        assert index.sync_from_store(store) == 200
+        assert index.search(vectors[550], k=1, nprobe=8)[0]["id"] == 550
+
+        other.remove(550)
+        assert index.sync_from_store(store) == 0
+        assert len(index) == 599 and 550 not in index
@@ -0,0 +1,82 @@
+import io
+import json
+import zipfile
+import numpy as np
+from PIL import Image
+from app.services.batch_ingest_service import iter_zip_members
+
+def _png(seed):
+    pixels = np.random.default_rng(seed).integers(0, 255, (40, 40, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def _lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+class TestBatchUpload:
+    """Tests pour l'ingestion par lots."""
+
+    def test_multipart_batch_streams_one_line_per_image(self, client):
+        """Une ligne NDJSON par image (doublons et erreurs compris), puis le résumé."""
+        images = [_png(seed) for seed in range(3)]
+        files = [(io.BytesIO(data), f"image{index}.png") for index, data in enumerate(images)]
+        files += [(io.BytesIO(images[1]), "copy.png"), (io.BytesIO(b"not an image"), "broken.png")]
+
+        response = client.post('/api/v2/upload/batch', data={'files': files},
+                               content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        lines = _lines(response)
+        assert [line["index"] for line in lines[:-1]] == [0, 1, 2, 3, 4]
+        assert all(not lines[index]["duplicate"]["hit"] for index in range(3))
+        assert lines[3]["duplicate"] == {
+            "hit": True, "sha256": lines[1]["duplicate"]["sha256"], "original_image_id": lines[1]["image_id"]
+        }
+        assert lines[3]["analysis"] == lines[1]["analysis"] and "similar_images" in lines[3]
+        assert "error" in lines[4]
+        assert lines[-1]["summary"]["total"] == 5
+        assert lines[-1]["summary"]["analysed"] == 3
+        assert lines[-1]["summary"]["duplicates"] == 1
+        assert lines[-1]["summary"]["errors"] == 1
+
+    def test_zip_body_and_exact_duplicates(self, client):
+        """Une archive envoyée dans le corps est ingérée ; les contenus connus sont réutilisés."""
+        data = _png(7)
+        first = _lines(client.post('/api/v2/upload/batch', data={'files': [(io.BytesIO(data), "a.png")]},
+                                   content_type='multipart/form-data'))
+
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('photos/a.png', data)
+            zf.writestr('__MACOSX/photos/._a.png', b'')
+        lines = _lines(client.post('/api/v2/upload/batch', data=archive.getvalue(),
+                                   content_type='application/zip'))
+
+        assert lines[0]["original_filename"] == 'photos/a.png'
+        assert lines[0]["duplicate"]["original_image_id"] == first[0]["image_id"]
+        assert lines[-1]["summary"]["total"] == 1
+
+        # Même réponse que /api/v2/upload pour ce doublon
+        single = client.post('/api/v2/upload', data={'file': (io.BytesIO(data), "a.png")},
+                             content_type='multipart/form-data').get_json()
+        assert single["duplicate"]["hit"]
+        assert {key: lines[0][key] for key in single} == single
+
+    def test_invalid_requests(self, client):
+        """Archive invalide ou requête vide: erreur 400."""
+        assert client.post('/api/v2/upload/batch', data=b'garbage', content_type='application/zip').status_code == 400
+        assert client.post('/api/v2/upload/batch', data={}, content_type='multipart/form-data').status_code == 400
+
+    def test_zip_members_are_size_limited(self):
+        """Un membre décompressé trop volumineux est signalé sans être chargé."""
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('big.png', b'\0' * 10000)
+            zf.writestr('small.png', b'\0' * 10)
+        with zipfile.ZipFile(archive) as zf:
+            items = list(iter_zip_members(zf, max_size=1000))
+
+        assert "error" in items[0] and "data" not in items[0]
+        assert items[1] == {"filename": 'small.png', "data": b'\0' * 10}
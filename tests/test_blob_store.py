@@ -0,0 +1,67 @@
+import io
+import os
+import hashlib
+import pytest
+from app.models.image_models import db
+from app.models.blob_models import StoredBlob
+from app.services.blob_store import BlobStore
+
+class TestBlobStore:
+    """Tests pour le stockage des fichiers adressé par le contenu."""
+
+    def test_identical_content_is_stored_once_in_shards(self, tmp_path):
+        """Le fichier est nommé par son SHA-256 dans ab/cd/ ; un doublon n'est pas réécrit."""
+        store = BlobStore(str(tmp_path))
+        content = b"\x89PNG" + os.urandom(4096)
+        sha256 = hashlib.sha256(content).hexdigest()
+
+        filename, path, digests = store.put_stream(io.BytesIO(content), '.png')
+        again, same_path, _ = store.put_bytes(content, '.jpg')
+
+        assert filename == again == f"{sha256}.png"
+        assert path == same_path == os.path.join(str(tmp_path), sha256[:2], sha256[2:4], filename)
+        assert digests["md5"] == hashlib.md5(content).hexdigest()
+        assert os.listdir(store.temp_dir) == []
+        assert store.resolve(filename) == os.path.join(sha256[:2], sha256[2:4], filename)
+
+    def test_resolve_rejects_unknown_and_unsafe_names(self, tmp_path):
+        """Les anciens fichiers du dossier plat restent servis ; les autres noms sont refusés."""
+        store = BlobStore(str(tmp_path))
+        (tmp_path / "legacy.png").write_bytes(b"old")
+
+        assert store.resolve("legacy.png") == "legacy.png"
+        assert store.resolve("0" * 64 + ".png") is None
+        assert store.resolve("../legacy.png") is None
+
+    def test_references_keep_blob_until_last_release(self, app, tmp_path):
+        """Le fichier est supprimé avec la dernière référence, ou s'il n'est pas référencé."""
+        store = BlobStore(str(tmp_path))
+        _, path, digests = store.put_bytes(b"shared content", '.png')
+        store.add_reference(path, digests)
+        store.add_reference(path, digests)
+        db.session.commit()
+
+        assert db.session.get(StoredBlob, digests["sha256"]).ref_count == 2
+        assert not store.discard_if_unreferenced(digests["sha256"])
+        assert store.release(digests["sha256"]) == 1
+        db.session.commit()
+        assert not store.discard_if_unreferenced(digests["sha256"]) and os.path.exists(path)
+        assert store.release(digests["sha256"]) == 0
+        db.session.commit()
+        assert store.discard_if_unreferenced(digests["sha256"]) and not os.path.exists(path)
+
+        _, orphan, orphan_digests = store.put_bytes(b"rolled back", '.png')
+        assert store.discard_if_unreferenced(orphan_digests["sha256"])
+        assert not os.path.exists(orphan)
+        assert db.session.get(StoredBlob, orphan_digests["sha256"]) is None
+
+    def test_reference_to_discarded_blob_fails(self, app, tmp_path):
+        """Une référence prise après la suppression du fichier échoue au lieu de pointer dans le vide."""
+        store = BlobStore(str(tmp_path))
+        _, path, digests = store.put_bytes(b"raced content", '.png')
+        assert store.discard_if_unreferenced(digests["sha256"])
+
+        with pytest.raises(FileNotFoundError):
+            store.add_reference(path, digests)
+        db.session.rollback()
+        assert db.session.get(StoredBlob, digests["sha256"]) is None
@@ -0,0 +1,45 @@
+import random
+from app.services.clustering_service import UnionFind
+
+class TestUnionFind:
+    """Tests pour l'union-find du regroupement des quasi-doublons."""
+
+    def test_groups_match_connected_components(self):
+        """Les groupes sont les composantes connexes, de racine minimale."""
+        rng = random.Random(0)
+        edges = [(rng.randrange(200), rng.randrange(200)) for _ in range(150)]
+        union_find = UnionFind()
+        for first, second in edges:
+            union_find.union(first, second)
+
+        # Composantes de référence par parcours en largeur
+        neighbours = {}
+        for first, second in edges:
+            neighbours.setdefault(first, set()).add(second)
+            neighbours.setdefault(second, set()).add(first)
+        expected, seen = {}, set()
+        for start in sorted(neighbours):
+            if start in seen:
+                continue
+            component, frontier = {start}, [start]
+            while frontier:
+                for other in neighbours[frontier.pop()] - component:
+                    component.add(other)
+                    frontier.append(other)
+            seen |= component
+            expected[min(component)] = sorted(component)
+
+        assert union_find.groups() == expected
+
+    def test_save_and_load(self, tmp_path):
+        """L'état sauvegardé permet de reprendre le regroupement."""
+        union_find = UnionFind()
+        union_find.union(5, 3)
+        union_find.union(3, 9)
+        union_find.union(20, 21)
+        path = str(tmp_path / "job_1.npz")
+        union_find.save(path)
+
+        restored = UnionFind.load(path)
+        restored.union(21, 1)
+        assert restored.groups() == {1: [1, 20, 21], 3: [3, 5, 9]}
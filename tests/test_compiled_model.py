@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from app.services.compiled_model import CompiledModel
+
+# TensorFlow est une dépendance optionnelle
+tf = pytest.importorskip("tensorflow")
+
+def small_model():
+    """Petit modèle Keras d'entrée (8, 8, 3)."""
+    return tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(8, 8, 3)),
+        tf.keras.layers.Conv2D(4, (3, 3), activation='relu'),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(1, activation='sigmoid')
+    ])
+
+class TestCompiledModel:
+    """Tests pour l'inférence par tf.function compilé."""
+
+    def test_predictions_match_keras_predict(self):
+        """Mêmes sorties que model.predict, pour toute taille de lot."""
+        model = small_model()
+        compiled = CompiledModel(model)
+        batch = np.random.default_rng(0).random((5, 8, 8, 3), dtype=np.float32)
+
+        assert compiled.input_shape == (8, 8, 3)
+        assert np.allclose(compiled.predict(batch), model.predict(batch, verbose=0), atol=1e-5)
+        assert compiled.predict(batch[:1]).shape == (1, 1)
+
+    def test_graph_is_traced_once_at_load(self):
+        """Le préchauffage trace le graphe; les lots de tailles différentes ne le retracent pas."""
+        compiled = CompiledModel(small_model())
+        for batch_size in (1, 8, 32):
+            compiled.predict(np.zeros((batch_size, 8, 8, 3), dtype=np.float32))
+
+        assert compiled._function.experimental_get_tracing_count() == 1
+        assert compiled.count_params() == compiled.model.count_params()
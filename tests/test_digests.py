@@ -0,0 +1,34 @@
+import io
+import hashlib
+from app.utils.digests import compute_stream_digests, save_stream_with_digests
+
+class TestStreamDigests:
+    """Tests pour les empreintes du flux téléchargé."""
+
+    def test_digests_match_hashlib_and_keep_position(self):
+        """Les empreintes sont celles de hashlib et le flux reste à sa position."""
+        content = b"\x89PNG" + bytes(range(256)) * 5000
+        stream = io.BytesIO(content)
+        stream.seek(10)
+
+        digests = compute_stream_digests(stream, chunk_size=4096)
+
+        assert digests == {
+            "sha256": hashlib.sha256(content).hexdigest(),
+            "md5": hashlib.md5(content).hexdigest(),
+            "size": len(content)
+        }
+        assert stream.tell() == 10
+
+    def test_save_computes_digests_while_writing(self, tmp_path):
+        """L'enregistrement renvoie le chemin et les empreintes, sans relire le fichier."""
+        content = bytes(range(256)) * 3000
+        stream = io.BytesIO(content)
+        stream.seek(100)
+
+        path, digests = save_stream_with_digests(stream, str(tmp_path / "upload.bin"), chunk_size=1000)
+
+        with open(path, 'rb') as f:
+            assert f.read() == content
+        assert digests == compute_stream_digests(io.BytesIO(content))
+        assert stream.tell() == 100
@@ -0,0 +1,90 @@
+import multiprocessing
+import numpy as np
+from app.services.embedding_store import EmbeddingStore
+
+def _vector(image_id):
+    return np.arange(1, 9, dtype=np.float32) + image_id
+
+def _add_embeddings(path, first_id, count):
+    """Processus d'ajout (worker HTTP, tâche ou ingestion par lot)."""
+    store = EmbeddingStore(path, dim=8)
+    store.open()
+    for image_id in range(first_id, first_id + count):
+        store.add(image_id, _vector(image_id))
+    store.flush()
+
+class TestEmbeddingStore:
+    """Tests pour le stockage des embeddings profonds."""
+
+    def test_search_matches_cosine(self):
+        """Le produit matrice-vecteur donne la similarité cosinus et l'ordre attendu."""
+        rng = np.random.default_rng(0)
+        vectors = rng.random((50, 16)).astype(np.float32)
+        store = EmbeddingStore(dim=16, dtype='float32', capacity=4)
+        for image_id, vector in enumerate(vectors):
+            store.add(image_id, vector)
+
+        query = vectors[7] + 0.01
+        expected = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+        results = store.search(query, k=5)
+
+        assert [match["id"] for match in results] == list(np.argsort(-expected)[:5])
+        assert abs(results[0]["similarity"] - expected.max()) < 1e-5
+
+    def test_remove_and_reopen(self, tmp_path):
+        """Les embeddings persistent sur disque et une image retirée n'est plus renvoyée."""
+        rng = np.random.default_rng(1)
+        store = EmbeddingStore(str(tmp_path), dim=8, capacity=2)
+        store.open()
+        for image_id in range(10):
+            store.add(image_id, rng.random(8))
+        store.remove(3)
+        store.flush()
+
+        reopened = EmbeddingStore(str(tmp_path), dim=8)
+        assert reopened.open() == 9
+        assert 3 not in reopened
+        assert np.allclose(reopened.get(5), store.get(5))
+        assert reopened.search(store.get(5), k=1)[0]["id"] == 5
+
+    def test_models_use_separate_directories(self, tmp_path):
+        """Les embeddings d'un autre modèle (moteur, quantification) ne sont jamais mélangés."""
+        store = EmbeddingStore(str(tmp_path), dim=8)
+        store.open()
+        assert store.use_model("resnet-2/keras") is True
+        store.add(1, _vector(1))
+        assert store.use_model("resnet-2/keras") is False
+
+        assert store.use_model("resnet-2/tflite-int8/0123abcd") is True
+        assert len(store) == 0 and 1 not in store
+        assert store.path == str(tmp_path / "resnet-2_tflite-int8_0123abcd")
+        store.use_model("resnet-2/keras")
+        assert 1 in store
+
+        memory = EmbeddingStore(dim=8)
+        memory.add(1, _vector(1))
+        memory.use_model("resnet-2/keras")
+        assert len(memory) == 0
+
+    def test_processes_share_the_store(self, tmp_path):
+        """Des processus concurrents ajoutent sans s'écraser, agrandissements compris."""
+        path = str(tmp_path)
+        EmbeddingStore(path, dim=8, capacity=2).open()
+
+        context = multiprocessing.get_context('spawn')
+        processes = [
+            context.Process(target=_add_embeddings, args=(path, worker * 100, 40))
+            for worker in range(3)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(60)
+            assert process.exitcode == 0
+
+        store = EmbeddingStore(path, dim=8)
+        assert store.open() == 120
+        for worker in range(3):
+            for image_id in range(worker * 100, worker * 100 + 40):
+                expected = _vector(image_id)
+                assert np.allclose(store.get(image_id), expected / np.linalg.norm(expected))
@@ -0,0 +1,63 @@
+import random
+import numpy as np
+from app.utils.hamming import (
+    HashMatrix, popcount64, hamming_distance, hash_similarity, pack_hashes, pairwise_distances
+)
+
+class TestHammingEngine:
+    """Tests pour le moteur XOR + popcount vectorisé."""
+
+    def test_popcount_matches_python(self):
+        """Le popcount vectorisé est identique au comptage Python."""
+        rng = random.Random(0)
+        values = [rng.getrandbits(64) for _ in range(500)] + [0, 2**64 - 1]
+        counts = popcount64(np.array(values, dtype=np.uint64))
+
+        assert [int(c) for c in counts] == [bin(v).count('1') for v in values]
+
+    def test_hash_similarity(self):
+        """Distance et similarité entre deux hashes hexadécimaux."""
+        assert hamming_distance('ffffffffffffffff', '0000000000000000') == 64
+        assert hamming_distance('8000000000000001', '0000000000000000') == 2
+        assert hash_similarity('abcdef0123456789', 'abcdef0123456789') == 1.0
+
+    def test_matrix_search_matches_brute_force(self):
+        """La recherche vectorisée renvoie les mêmes images qu'une boucle Python."""
+        rng = random.Random(1)
+        matrix = HashMatrix(('phash', 'dhash'), capacity=4)
+        entries = {}
+        for image_id in range(300):
+            entries[image_id] = {"phash": rng.getrandbits(64), "dhash": rng.getrandbits(64)}
+            matrix.add(image_id, entries[image_id])
+        for image_id in range(0, 300, 3):
+            matrix.remove(image_id)
+            del entries[image_id]
+
+        query = {"phash": entries[1]["phash"] ^ 0b1011, "dhash": entries[1]["dhash"]}
+        expected = {
+            image_id for image_id, hashes in entries.items()
+            if (bin(hashes["phash"] ^ query["phash"]).count('1')
+                + bin(hashes["dhash"] ^ query["dhash"]).count('1')) / 2 <= 28
+        }
+
+        found = matrix.search(query, max_distance=28)
+        assert {match["id"] for match in found} == expected
+        assert found[0]["id"] == 1
+        assert found[0]["distances"] == {"phash": 3, "dhash": 0}
+
+    def test_pairwise_distances_match_brute_force(self):
+        """La matrice N x N correspond aux distances calculées paire par paire."""
+        rng = random.Random(2)
+        hashes_list = [
+            {"phash": rng.getrandbits(64), "dhash": rng.getrandbits(64) if i % 4 else None}
+            for i in range(40)
+        ]
+        values, present = pack_hashes(hashes_list, ('phash', 'dhash'))
+        distances, mean = pairwise_distances(values, present)
+
+        for i, first in enumerate(hashes_list):
+            for j, second in enumerate(hashes_list):
+                expected = [hamming_distance(first[t], second[t]) for t in ('phash', 'dhash')
+                            if first[t] is not None and second[t] is not None]
+                assert distances[0, i, j] == expected[0]
+                assert mean[i, j] == sum(expected) / len(expected)
@@ -0,0 +1,157 @@
+import pytest
+import random
+from app.services.hash_index import PerceptualHashIndex, hash_to_int
+
+def _brute_force(entries, query, max_distance, hash_types=('phash', 'dhash')):
+    """Recherche exhaustive de référence."""
+    matches = set()
+    for image_id, hashes in entries.items():
+        distances = [
+            bin(hash_to_int(query[t]) ^ hash_to_int(hashes[t])).count('1')
+            for t in hash_types if hashes.get(t) and query.get(t)
+        ]
+        if distances and sum(distances) / len(distances) <= max_distance:
+            matches.add(image_id)
+    return matches
+
+class TestPerceptualHashIndex:
+    """Tests pour l'index multi-hash."""
+
+    def _build(self, count=2000):
+        rng = random.Random(42)
+        ahash_rng = random.Random(7)
+        base = rng.getrandbits(64)
+        entries = {}
+        index = PerceptualHashIndex()
+        for image_id in range(count):
+            if image_id % 4 == 0:
+                flipped = rng.sample(range(64), rng.randint(0, 16))
+                phash = base ^ sum(1 << bit for bit in flipped)
+            else:
+                phash = rng.getrandbits(64)
+            dhash = format(rng.getrandbits(64), '016x') if image_id % 3 else None
+            ahash = phash ^ sum(1 << bit for bit in ahash_rng.sample(range(64), ahash_rng.randint(0, 8)))
+            entries[image_id] = {
+                "phash": format(phash, '016x'), "dhash": dhash,
+                "ahash": format(ahash, '016x') if image_id % 5 else None
+            }
+            index.add(image_id, entries[image_id])
+        return index, entries, format(base, '016x')
+
+    def test_radius_query_matches_brute_force(self):
+        """La requête par rayon renvoie exactement les mêmes images qu'un parcours complet."""
+        index, entries, base = self._build()
+        query = {"phash": base, "dhash": entries[1]["dhash"]}
+
+        for max_distance in (0, 4, 9.6, 14):
+            found = {match["id"] for match in index.query_radius(query, max_distance)}
+            assert found == _brute_force(entries, query, max_distance)
+
+    def test_radius_query_with_requested_hash_types(self):
+        """Les types comparés choisis par l'appelant (aHash compris) passent par les sous-chaînes."""
+        index, entries, base = self._build()
+        hash_types = ('phash', 'dhash', 'ahash')
+        query = {"phash": base, "dhash": entries[1]["dhash"], "ahash": base}
+
+        for max_distance in (0, 4, 9.6, 14):
+            found = {match["id"] for match in index.query_radius(query, max_distance, hash_types=hash_types)}
+            assert found == _brute_force(entries, query, max_distance, hash_types)
+
+    def test_topk_matches_sorted_radius_query(self):
+        """Le top-k renvoie les k meilleures images, départagées par identifiant."""
+        index, entries, base = self._build()
+        query = {"phash": base, "dhash": entries[1]["dhash"]}
+
+        for k, max_distance in ((1, 64), (10, 64), (25, 12), (2000, 20)):
+            expected = sorted(index.query_radius(query, max_distance),
+                              key=lambda match: (match["distance"], match["id"]))[:k]
+            found = index.query_topk(query, k, max_distance)
+            assert [match["id"] for match in found] == [match["id"] for match in expected]
+
+    def test_remove_and_snapshot(self, tmp_path):
+        """Une image retirée n'est plus renvoyée et le snapshot restaure l'index."""
+        index, entries, base = self._build(200)
+        query = {"phash": entries[0]["phash"]}
+
+        index.remove(0)
+        assert 0 not in {match["id"] for match in index.query_radius(query, 0)}
+
+        path = str(tmp_path / "index.npz")
+        index.save(path)
+        restored = PerceptualHashIndex()
+        assert restored.load(path) is True
+        assert len(restored) == len(index)
+        assert restored.query_radius(query, 10) == index.query_radius(query, 10)
+
+    def test_sync_applies_changes_from_other_workers(self, app):
+        """Un worker n'applique que les changements du journal postérieurs à sa dernière synchronisation."""
+        from app.models.image_models import db
+        from app.models.hash_models import ImageHash, IndexChange
+
+        worker = PerceptualHashIndex()
+        worker.ready = True
+
+        # Changements enregistrés par un autre worker
+        db.session.add(ImageHash.from_hashes(1, {"phash": 1, "dhash": 1}))
+        db.session.add(ImageHash.from_hashes(2, {"phash": 2, "dhash": 2}))
+        IndexChange.record(1)
+        IndexChange.record(2)
+        db.session.commit()
+
+        assert worker.sync_from_db() == 2
+        assert worker.get(2) == {"phash": 2, "dhash": 2}
+        assert worker.high_water == IndexChange.latest_id()
+        assert worker.sync_from_db() == 0
+
+        # Mise à jour puis suppression
+        ImageHash.query.filter_by(image_id=1).first().set_hashes({"phash": 7})
+        ImageHash.query.filter_by(image_id=2).delete()
+        IndexChange.record(1)
+        IndexChange.record(2)
+        db.session.commit()
+
+        assert worker.sync_from_db() == 2
+        assert worker.get(1) == {"phash": 7}
+        assert worker.get(2) is None
+
+    def test_warm_up_replays_only_changes_after_snapshot(self, app, tmp_path, monkeypatch):
+        """Au démarrage, le snapshot est complété par le journal postérieur à son point de reprise."""
+        from app.models.image_models import db
+        from app.models.hash_models import ImageHash, IndexChange
+
+        path = str(tmp_path / "index.npz")
+        db.session.add(ImageHash.from_hashes(1, {"phash": 1, "dhash": 1}))
+        IndexChange.record(1)
+        db.session.commit()
+
+        worker = PerceptualHashIndex(snapshot_path=path)
+        worker.ready = True
+        worker.sync_from_db()
+        worker.save(path)
+
+        # Changement validé après le snapshot
+        db.session.add(ImageHash.from_hashes(2, {"phash": 2, "dhash": 2}))
+        IndexChange.record(2)
+        db.session.commit()
+
+        restored = PerceptualHashIndex(snapshot_path=path)
+        monkeypatch.setattr(restored, "rebuild_from_db", lambda: pytest.fail("reconstruction complète"))
+        assert restored.warm_up() == 2
+        assert restored.ready is True
+        assert restored.get(2) == {"phash": 2, "dhash": 2}
+        assert restored.high_water == IndexChange.latest_id()
+
+    def test_refresh_loads_index_on_first_query(self, app):
+        """Un index non chargé au démarrage l'est à la première recherche."""
+        from app.models.image_models import db
+        from app.models.hash_models import ImageHash, IndexChange
+
+        db.session.add(ImageHash.from_hashes(1, {"phash": 1, "dhash": 1}))
+        IndexChange.record(1)
+        db.session.commit()
+
+        index = PerceptualHashIndex()
+        assert index.ready is False
+        index.refresh()
+        assert index.ready is True
+        assert index.high_water == IndexChange.latest_id()
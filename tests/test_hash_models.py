@@ -0,0 +1,91 @@
+import random
+from app.utils.hamming import hash_to_int
+
+HASH_TYPES = ('phash', 'dhash', 'ahash')
+
+def _brute_force(rows, query, max_distance, hash_types):
+    """Distances moyennes de référence sur les types présents des deux côtés."""
+    matches = {}
+    for image_id, hashes in rows.items():
+        distances = [
+            bin(hash_to_int(query[t]) ^ hashes[t]).count('1')
+            for t in hash_types if hashes.get(t) is not None and query.get(t) is not None
+        ]
+        if distances and sum(distances) / len(distances) <= max_distance:
+            matches[image_id] = sum(distances) / len(distances)
+    return matches
+
+class TestImageHashSearch:
+    """Tests pour la recherche par rayon en base (filtre SQL sur les sous-chaînes)."""
+
+    def _seed(self, count=600):
+        from app.models.image_models import db
+        from app.models.hash_models import ImageHash
+
+        rng = random.Random(3)
+        base = rng.getrandbits(64)
+        rows = {}
+        for image_id in range(1, count + 1):
+            hashes = {}
+            for hash_type in HASH_TYPES:
+                if image_id % 7 == 0 and hash_type != 'phash':
+                    continue  # Analyses anciennes: pHash seul (colonnes NULL)
+                if image_id % 3 == 0:
+                    flipped = rng.sample(range(64), rng.randint(0, 24))
+                    hashes[hash_type] = base ^ sum(1 << bit for bit in flipped)
+                else:
+                    hashes[hash_type] = rng.getrandbits(64)
+            rows[image_id] = hashes
+            db.session.add(ImageHash.from_hashes(image_id, hashes))
+        db.session.commit()
+        return rows, base
+
+    def test_search_matches_brute_force(self, app):
+        """Le filtre indexé ne perd aucune image, jusqu'au rayon maximal et au-delà (parcours complet)."""
+        from app.models.hash_models import ImageHash, MAX_SQL_CHUNK_RADIUS, NUM_CHUNKS
+
+        rows, base = self._seed()
+        query = {hash_type: format(base, '016x') for hash_type in HASH_TYPES}
+        radii = (0, 3, 8, 9.6, NUM_CHUNKS * (MAX_SQL_CHUNK_RADIUS + 1) - 0.5, NUM_CHUNKS * (MAX_SQL_CHUNK_RADIUS + 1))
+
+        for hash_types in (('phash', 'dhash'), HASH_TYPES):
+            for max_distance in radii:
+                expected = _brute_force(rows, query, max_distance, hash_types)
+                found = ImageHash.search(query, max_distance, hash_types=hash_types)
+                assert {match["id"]: match["distance"] for match in found} == expected
+                assert [match["distance"] for match in found] == sorted(expected.values())
+
+    def test_candidate_filter_limits(self, app):
+        """Pas de filtre au-delà de MAX_SQL_CHUNK_RADIUS ni pour une requête sans hash comparé."""
+        from app.models.hash_models import ImageHash, MAX_SQL_CHUNK_RADIUS, NUM_CHUNKS
+
+        query = {"phash": "ffffffffffffffff"}
+        assert ImageHash.candidate_filter(query, NUM_CHUNKS * MAX_SQL_CHUNK_RADIUS) is not None
+        assert ImageHash.candidate_filter(query, NUM_CHUNKS * (MAX_SQL_CHUNK_RADIUS + 1)) is None
+        assert ImageHash.candidate_filter(query, -1) is None
+        assert ImageHash.candidate_filter(query, 4, hash_types=('dhash',)) is None
+
+class TestImageHashBackfill:
+    """Tests pour la migration des hashes des analyses existantes."""
+
+    def test_backfill_creates_missing_rows_in_batches(self, app):
+        """Chaque analyse sans ligne image_hashes est migrée une seule fois et journalisée."""
+        from app.models.image_models import ImageAnalysis, db
+        from app.models.hash_models import ImageHash, IndexChange
+        from scripts.migrate import migrate_image_hashes
+
+        phashes = [format(value, '016x') for value in (1, 2 ** 63, 2 ** 64 - 1, 12345, 0xabcdef)]
+        analyses = [ImageAnalysis(filename=f"{i}.png", perceptual_hash=phash) for i, phash in enumerate(phashes)]
+        db.session.add_all(analyses)
+        db.session.commit()
+        db.session.add(ImageHash.from_hashes(analyses[0].id, {"phash": 7}))
+        db.session.commit()
+
+        assert migrate_image_hashes(batch_size=2) == 4
+        assert migrate_image_hashes(batch_size=2) == 0
+
+        stored = {row.image_id: row.to_hashes() for row in ImageHash.query.all()}
+        assert stored[analyses[0].id] == {"phash": 7}
+        for analysis in analyses[1:]:
+            assert stored[analysis.id] == {"phash": hash_to_int(analysis.perceptual_hash)}
+        assert sorted(change.image_id for change in IndexChange.query.all()) == [a.id for a in analyses[1:]]
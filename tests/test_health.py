@@ -0,0 +1,45 @@
+from app.api import image_routes_v2
+from app.services.ai_detection_service_v2 import AIDetectionService
+
+class TestHealth:
+    """Tests pour les sondes de vivacité et de disponibilité."""
+
+    def test_live_does_not_wait_for_models(self, client):
+        """L'application répond avant le chargement des modèles (différé en test)."""
+        assert image_routes_v2.ai_service.models_state in (
+            AIDetectionService.MODELS_PENDING, AIDetectionService.MODELS_UNAVAILABLE
+        )
+        response = client.get('/health/live')
+
+        assert response.status_code == 200
+        assert client.get('/health').get_json()["live"] is True
+
+    def test_ready_follows_model_state(self, client, monkeypatch):
+        """/health/ready répond 503 pendant le chargement, 200 ensuite."""
+        service = image_routes_v2.ai_service
+        monkeypatch.setattr(service, '_models_state', AIDetectionService.MODELS_LOADING)
+        response = client.get('/health/ready')
+        assert response.status_code == 503
+        assert response.get_json()["status"] == "starting"
+        assert client.get('/health').get_json()["ready"] is False
+
+        monkeypatch.setattr(service, '_models_state', AIDetectionService.MODELS_READY)
+        response = client.get('/health/ready')
+        assert response.status_code == 200
+        assert response.get_json()["models"]["models_state"] == AIDetectionService.MODELS_READY
+
+    def test_models_load_once_on_first_use(self, monkeypatch):
+        """Le premier accès à un modèle déclenche un seul chargement."""
+        service = AIDetectionService()
+        calls = []
+
+        def fake_initialize():
+            calls.append(1)
+            service._models_state = AIDetectionService.MODELS_READY
+
+        monkeypatch.setattr(service, '_models_state', AIDetectionService.MODELS_PENDING)
+        monkeypatch.setattr(service, '_initialize_models', fake_initialize)
+
+        service.ai_model
+        service.resnet_model
+        assert calls == [1] and service.is_ready()
@@ -0,0 +1,69 @@
+import io
+import numpy as np
+import cv2
+from PIL import Image
+from app.utils.image_context import ImageContext
+
+def _png_bytes(mode='RGBA', size=(90, 120)):
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 255, (size[1], size[0], 4), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, 'RGBA').convert(mode).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+class TestImageContext:
+    """Tests pour le contexte d'image décodé une seule fois."""
+
+    def test_representations_match_separate_decodes(self, tmp_path):
+        """Les représentations partagées sont identiques aux décodages séparés d'origine."""
+        path = str(tmp_path / "image.png")
+        with open(path, 'wb') as f:
+            f.write(_png_bytes())
+        context = ImageContext.from_path(path)
+
+        assert np.array_equal(context.gray, cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2GRAY))
+        assert np.array_equal(context.bgr, cv2.imread(path))
+        expected = Image.open(path).convert('RGB').resize((128, 128), Image.Resampling.LANCZOS)
+        assert np.array_equal(np.asarray(context.resized((128, 128))), np.asarray(expected))
+        assert context.info == {"width": 90, "height": 120, "format": "PNG", "mode": "RGBA"}
+
+    def test_decodes_once(self, monkeypatch):
+        """L'image n'est ouverte qu'une fois, quel que soit le nombre d'étapes."""
+        calls = []
+        original_open = Image.open
+
+        def counting_open(*args, **kwargs):
+            calls.append(args)
+            return original_open(*args, **kwargs)
+
+        monkeypatch.setattr(Image, 'open', counting_open)
+
+        context = ImageContext(data=_png_bytes('RGB'))
+        context.info, context.rgb, context.gray, context.resized((224, 224), Image.Resampling.NEAREST)
+        assert context.memoize('phash', lambda: 'a') == context.memoize('phash', lambda: 'b') == 'a'
+        assert len(calls) == 1
+
+    def test_of_accepts_streams_and_contexts(self):
+        """ImageContext.of réutilise un contexte et lit un flux sans le déplacer."""
+        data = _png_bytes('L')
+        stream = io.BytesIO(data)
+        context = ImageContext.of(stream)
+
+        assert ImageContext.of(context) is context
+        assert context.data == data and stream.tell() == 0
+        assert context.digests["size"] == len(data)
+
+    def test_in_memory_sources_never_touch_disk(self, monkeypatch):
+        """Les contenus en mémoire (bytes, memoryview) sont analysés sans écriture sur disque."""
+        data = _png_bytes('RGB')
+
+        def no_disk(*args, **kwargs):
+            raise AssertionError("accès disque inattendu")
+
+        monkeypatch.setattr('builtins.open', no_disk)
+
+        for source in (data, bytearray(data), memoryview(data)):
+            context = ImageContext.of(source)
+            assert context.data == data
+            assert context.name == '<mémoire>'
+            assert context.gray.shape == (120, 90)
@@ -0,0 +1,163 @@
+import os
+import time
+import threading
+import pytest
+import numpy as np
+from app.services.inference_workers import SharedTensorRing, InferenceServer, InferenceClient
+from app.services.model_registry import ModelRegistry
+
+class DoublingModel:
+    """Modèle factice: moyenne de chaque entrée multipliée par 2."""
+
+    def predict(self, batch, verbose=0):
+        return batch.reshape(len(batch), -1).mean(axis=1, keepdims=True) * 2
+
+    def count_params(self):
+        return 1
+
+def load_doubling_model():
+    return DoublingModel()
+
+class QuantizedDoublingModel(DoublingModel):
+    """Modèle factice décrit comme un export TFLite int8."""
+
+    def describe(self):
+        return {"backend": "tflite", "quantization": "int8", "fingerprint": "0123abcd"}
+
+def load_quantized_doubling_model():
+    return QuantizedDoublingModel()
+
+class ChannelMeansModel:
+    """Extracteur factice: moyenne de chaque canal, puis sa valeur au carré."""
+
+    def predict(self, batch, verbose=0):
+        means = batch.mean(axis=(1, 2))
+        return np.concatenate([means, means ** 2], axis=1)
+
+    def count_params(self):
+        return 6
+
+def load_channel_means_model():
+    return ChannelMeansModel()
+
+class FragileModel:
+    """Modèle factice: attend sur une entrée positive, arrête le worker sur une entrée négative."""
+
+    def predict(self, batch, verbose=0):
+        if batch.min() < 0:
+            os._exit(1)
+        if batch.max() > 0:
+            time.sleep(1)
+        return batch.reshape(len(batch), -1).mean(axis=1, keepdims=True)
+
+def load_fragile_model():
+    return FragileModel()
+
+def _image_file(path, color):
+    from PIL import Image
+    Image.new('RGB', (64, 64), color=color).save(path)
+    return str(path)
+
+class TestInferenceWorkers:
+    """Tests pour le serveur d'inférence et la mémoire partagée."""
+
+    def test_ring_is_shared_by_name(self):
+        """Un anneau attaché par son nom voit les écritures du créateur."""
+        ring = SharedTensorRing((2, 2), slots=3)
+        attached = SharedTensorRing((2, 2), slots=3, name=ring.name)
+        try:
+            indices = ring.acquire(2)
+            ring.array[indices] = np.ones((2, 2, 2))
+            assert attached.array[indices].sum() == 8
+            ring.release(indices)
+            assert ring.acquire(3) == [2, 0, 1]
+            with pytest.raises(TimeoutError):
+                ring.acquire(1, timeout=0.1)
+        finally:
+            attached.close()
+            ring.close()
+
+    def test_server_serves_batches_through_shared_memory(self, tmp_path):
+        """Les lots sont traités par les workers, découpés selon la taille de l'anneau."""
+        address = str(tmp_path / "inference.sock")
+        server = InferenceServer(address, {"double": (load_doubling_model, (4, 4, 3))}, workers=2, authkey=b"test")
+        server.start()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = InferenceClient(address, authkey=b"test", slots=4, connect_timeout=10)
+        try:
+            registry = ModelRegistry()
+            registry.register("double", lambda: client.model("double"))
+            model = registry.get("double")
+            batch = np.arange(6, dtype=np.float32)[:, None, None, None] * np.ones((6, 4, 4, 3), dtype=np.float32)
+
+            assert model.predict(batch).ravel().tolist() == [0, 2, 4, 6, 8, 10]
+            assert model.predict_one(batch[3]).tolist() == [6]
+            assert registry.stats()["models"]["double"]["parameters"] == 1
+        finally:
+            client.close()
+            server.close()
+
+    def test_service_uses_server_without_tensorflow(self, tmp_path, monkeypatch):
+        """Un processus HTTP sans TensorFlow charge les modèles distants et calcule la similarité."""
+        from app.services import ai_detection_service_v2
+        from app.services.ai_detection_service_v2 import AIDetectionService
+        from app.services.embedding_store import EmbeddingStore
+        from app.services.inference_workers import connect_registry
+
+        monkeypatch.setattr(ai_detection_service_v2, 'TENSORFLOW_AVAILABLE', False)
+
+        address = str(tmp_path / "inference.sock")
+        server = InferenceServer(address, {
+            "resnet50": (load_channel_means_model, (224, 224, 3)),
+            "ai_detection": (load_quantized_doubling_model, (128, 128, 3))
+        }, workers=1, authkey=b"test")
+        server.start()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        registry = ModelRegistry()
+        registry.register("resnet50", lambda: None)
+        registry.register("ai_detection", lambda: None)
+        client = connect_registry(registry, address, authkey=b"test", slots=4, connect_timeout=10)
+        try:
+            service = AIDetectionService(embedding_store=EmbeddingStore(), registry=registry)
+            red = _image_file(tmp_path / "red.png", (200, 30, 30))
+            blue = _image_file(tmp_path / "blue.png", (30, 30, 200))
+
+            assert service.ensure_models()
+            assert service.models_state == AIDetectionService.MODELS_READY
+            # Moteur et quantification décrits par le worker: aucun fichier local lu
+            assert service.model_version == "ai-2/tflite-int8/0123abcd"
+            assert service.embedding_store.model_key == service.embedding_version == "resnet-2/keras"
+            assert service.is_model_loaded()
+            assert service.extract_features(red).shape == (6,)
+            assert abs(service.compute_similarity(red, red) - 1.0) < 1e-6
+            assert service.compute_similarity(red, blue) < 0.99
+            assert "confidence" in service.detect_ai_image(red)
+        finally:
+            client.close()
+            server.close()
+
+    def test_expired_requests_and_dead_workers_free_slots(self, tmp_path, monkeypatch):
+        """Une requête expirée rend ses emplacements à l'arrivée du résultat ; un worker arrêté est relancé."""
+        from app.services import inference_workers
+
+        address = str(tmp_path / "inference.sock")
+        server = InferenceServer(address, {"fragile": (load_fragile_model, (2,))}, workers=1, authkey=b"test")
+        server.start()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = InferenceClient(address, authkey=b"test", slots=2, connect_timeout=10)
+        try:
+            monkeypatch.setattr(inference_workers, 'REQUEST_TIMEOUT', 0.2)
+            with pytest.raises(TimeoutError):
+                client.predict("fragile", np.ones((2, 2)))
+            ring = client.rings["fragile"]
+            ring.release(ring.acquire(2, timeout=5))  # Rendus à l'arrivée du résultat tardif
+
+            monkeypatch.setattr(inference_workers, 'REQUEST_TIMEOUT', 60)
+            started = time.monotonic()
+            with pytest.raises(RuntimeError, match="arrêté"):
+                client.predict("fragile", -np.ones((1, 2)))
+            assert time.monotonic() - started < 30
+            assert client.predict("fragile", np.zeros((2, 2))).ravel().tolist() == [0, 0]
+        finally:
+            client.close()
+            server.close()
@@ -0,0 +1,58 @@
+import os
+from datetime import datetime, timedelta
+from app.models.image_models import db
+from app.models.job_models import AnalysisJob
+from app.services.job_service import JobService
+
+class TestAnalysisJobs:
+    """Tests pour les analyses asynchrones."""
+
+    def test_submit_then_worker_executes(self, app, client, sample_image):
+        """La soumission répond 202 ; un worker exécute l'endpoint et enregistre sa réponse."""
+        response = client.post('/api/v2/jobs', data={
+            'type': 'verify_integrity',
+            'file': (sample_image, 'red.png')
+        }, content_type='multipart/form-data')
+
+        assert response.status_code == 202
+        job_id = response.get_json()["job"]["id"]
+        assert response.headers['Location'].endswith(f"/api/v2/jobs/{job_id}")
+        assert client.get(f"/api/v2/jobs/{job_id}").get_json()["job"]["status"] == AnalysisJob.STATUS_PENDING
+
+        service = JobService(spool_dir=app.config['JOB_SPOOL_DIR'])
+        job = service.claim_next("test-worker")
+        assert job.id == job_id and service.claim_next("other-worker") is None
+        input_path = job.input_path
+        service.execute(app, job)
+
+        data = client.get(f"/api/v2/jobs/{job_id}").get_json()["job"]
+        assert data["status"] == AnalysisJob.STATUS_DONE
+        assert data["http_status"] == 200
+        assert "signatures_match" in data["result"]
+        assert not os.path.exists(input_path)
+
+    def test_invalid_submission(self, client, sample_image):
+        """Type inconnu ou tâche absente: erreurs explicites."""
+        response = client.post('/api/v2/jobs', data={
+            'type': 'unknown',
+            'file': (sample_image, 'red.png')
+        }, content_type='multipart/form-data')
+        assert response.status_code == 400
+        assert client.get('/api/v2/jobs/12345').status_code == 404
+
+    def test_stale_jobs_are_requeued_then_failed(self, app):
+        """Une tâche abandonnée est reprise, puis mise en échec après max_attempts."""
+        service = JobService(spool_dir=app.config['JOB_SPOOL_DIR'], stale_after=60, max_attempts=2)
+        job = AnalysisJob(kind='upload', status=AnalysisJob.STATUS_RUNNING, attempts=1,
+                          started_at=datetime.utcnow() - timedelta(minutes=5))
+        db.session.add(job)
+        db.session.commit()
+
+        assert service.requeue_stale() == 1
+        assert job.status == AnalysisJob.STATUS_PENDING
+
+        claimed = service.claim_next("test-worker")
+        claimed.started_at = datetime.utcnow() - timedelta(minutes=5)
+        db.session.commit()
+        service.requeue_stale()
+        assert claimed.status == AnalysisJob.STATUS_FAILED and claimed.attempts == 2
@@ -0,0 +1,74 @@
+import threading
+import numpy as np
+import pytest
+from app.utils.micro_batcher import MicroBatcher
+from app.services.model_registry import SharedModel
+
+class TestMicroBatcher:
+    """Tests pour le regroupement dynamique des inférences."""
+
+    def test_concurrent_calls_share_batches(self):
+        """Les appels simultanés de plusieurs threads sont servis par un nombre réduit de lots."""
+        sizes = []
+
+        def double(items):
+            sizes.append(len(items))
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=50)
+        barrier = threading.Barrier(16)
+        results = {}
+
+        def worker(value):
+            barrier.wait()
+            results[value] = batcher(value, timeout=5)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+
+        assert results == {i: i * 2 for i in range(16)}
+        assert sum(sizes) == 16 and max(sizes) <= 8 and len(sizes) < 16
+
+    def test_single_call_flushed_after_max_wait(self):
+        """Un appel isolé n'attend pas un lot complet; les statistiques le reflètent."""
+        batcher = MicroBatcher(lambda items: items, max_batch_size=4, max_wait_ms=1)
+
+        assert batcher("seul", timeout=5) == "seul"
+        stats = batcher.stats()
+        assert stats["batches"] == 1 and stats["fill_ratio"] == 0.25
+        assert stats["queue_delay_ms"]["max"] is not None
+        batcher.close()
+
+    def test_batch_error_reaches_every_caller(self):
+        """Une erreur du lot est propagée à chaque appelant."""
+        def fail(items):
+            raise ValueError("modèle indisponible")
+
+        batcher = MicroBatcher(fail, max_batch_size=4, max_wait_ms=20)
+        futures = [batcher.submit(i) for i in range(3)]
+
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(timeout=5)
+        batcher.close()
+        with pytest.raises(RuntimeError):
+            batcher.submit(0)
+
+    def test_shared_model_batches_single_predictions(self):
+        """predict_one passe par un lot du modèle et renvoie la ligne de l'entrée."""
+        class FakeModel:
+            def predict(self, batch, verbose=0):
+                return batch.sum(axis=(1, 2)).reshape(len(batch), 1)
+
+        shared = SharedModel("fake", FakeModel())
+        assert shared.predict_one(np.ones((2, 2))).tolist() == [4.0]
+
+        shared.enable_batching(max_batch_size=4, max_wait_ms=1)
+        assert shared.predict_one(np.full((2, 2), 2.0)).tolist() == [8.0]
+        assert shared.batcher.stats()["items"] == 1
+        shared.enable_batching(max_batch_size=1, max_wait_ms=0)
+        assert shared.batcher is None
@@ -0,0 +1,73 @@
+import time
+import pytest
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.services.model_registry import ModelRegistry
+
+class FakeModel:
+    """Modèle minimal: détecte les prédictions concurrentes."""
+
+    def __init__(self):
+        self.active = 0
+        self.overlaps = 0
+        self.weights = []
+
+    def predict(self, batch):
+        self.active += 1
+        if self.active > 1:
+            self.overlaps += 1
+        time.sleep(0.01)
+        self.active -= 1
+        return [len(batch)]
+
+    def count_params(self):
+        return 0
+
+class TestModelRegistry:
+    """Tests pour le registre des modèles partagés."""
+
+    def test_model_is_loaded_once_under_concurrency(self):
+        """Des demandes simultanées ne déclenchent qu'un chargement et partagent l'instance."""
+        registry = ModelRegistry()
+        loads = []
+
+        def loader():
+            loads.append(threading.current_thread().name)
+            time.sleep(0.05)
+            return FakeModel()
+
+        registry.register('resnet50', loader)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            models = list(executor.map(lambda _: registry.get('resnet50'), range(8)))
+
+        assert len(loads) == 1
+        assert all(model is models[0] for model in models)
+
+    def test_predictions_are_serialized(self):
+        """Les prédictions concurrentes d'un même modèle ne se chevauchent pas."""
+        registry = ModelRegistry()
+        registry.register('ai_detection', FakeModel)
+        shared = registry.get('ai_detection')
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: shared.predict([1, 2]), range(20)))
+
+        assert shared.model.overlaps == 0
+        assert registry.stats()["models"]["ai_detection"]["predictions"] == 20
+
+    def test_failed_or_missing_models(self):
+        """Un échec de chargement est mémorisé ; un modèle non déclaré est une erreur."""
+        registry = ModelRegistry()
+        calls = []
+
+        def broken():
+            calls.append(1)
+            raise OSError("poids introuvables")
+
+        registry.register('broken', broken)
+
+        assert registry.get('broken') is None and registry.get('broken') is None
+        assert calls == [1]
+        assert registry.stats()["models"]["broken"]["error"] == "poids introuvables"
+        with pytest.raises(KeyError):
+            registry.get('unknown')
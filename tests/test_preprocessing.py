@@ -0,0 +1,53 @@
+import io
+import numpy as np
+from PIL import Image
+from app.utils.image_context import ImageContext
+from app.utils.preprocessing import draft_scale, decode_reduced, model_input_array
+
+def photo_bytes(width, height, format='JPEG'):
+    """Image synthétique proche d'une photo (dégradés, formes, bruit)."""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    pixels = np.stack([
+        127 + 100 * np.sin(x / 97.0) * np.cos(y / 53.0),
+        127 + 90 * np.cos((x + y) / 71.0),
+        255 * x / width
+    ], axis=-1)
+    pixels[height // 4:height // 2, width // 3:width // 2] = (230, 40, 40)
+    pixels += rng.normal(0, 6, pixels.shape)
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format=format, quality=92)
+    return buffer.getvalue()
+
+class TestPreprocessing:
+    """Tests pour le décodage JPEG à échelle réduite des entrées des réseaux."""
+
+    def test_smallest_sufficient_scale_is_chosen(self):
+        """La réduction garde l'image décodée au moins aussi grande que l'entrée du réseau."""
+        assert draft_scale((4000, 3000), (128, 128)) == 8
+        assert draft_scale((4000, 3000), (224, 224)) == 8
+        assert draft_scale((700, 500), (224, 224)) == 2
+        assert draft_scale((300, 300), (224, 224)) == 1
+
+        decoded = decode_reduced(photo_bytes(2048, 1536), (128, 128))
+        assert decoded.size == (256, 192) and decoded.mode == 'RGB'
+
+    def test_score_drift_is_bounded(self):
+        """Entrées et score d'un classifieur fixe proches de ceux du décodage complet."""
+        data = photo_bytes(2048, 1536)
+        full = np.asarray(Image.open(io.BytesIO(data)).convert('RGB').resize((128, 128), Image.Resampling.LANCZOS),
+                          dtype=np.float32) / 255.0
+        reduced = model_input_array(ImageContext(data=data), (128, 128)).astype(np.float32) / 255.0
+
+        assert np.abs(full - reduced).mean() < 0.01
+        weights = np.random.default_rng(1).normal(0, 1 / 128, full.shape)
+        score = lambda array: 1 / (1 + np.exp(-np.sum((array - 0.5) * weights)))
+        assert abs(score(full) - score(reduced)) < 0.02
+
+    def test_other_formats_use_shared_full_decode(self):
+        """PNG (pas de DCT) et petits JPEG passent par le décodage complet du contexte."""
+        for data in (photo_bytes(1024, 768, format='PNG'), photo_bytes(200, 150)):
+            context = ImageContext(data=data)
+            array = model_input_array(context, (128, 128))
+            assert array.shape == (128, 128, 3)
+            assert np.array_equal(array, np.asarray(context.resized((128, 128))))
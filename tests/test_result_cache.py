@@ -0,0 +1,114 @@
+import time
+import threading
+import multiprocessing
+from app.services.result_cache import ResultCache
+
+class TestResultCache:
+    """Tests pour le cache des résultats d'analyse adressé par le contenu."""
+
+    def test_memory_tier_is_bounded_lru(self):
+        """Au-delà de max_entries, l'entrée la moins récemment lue est évincée."""
+        cache = ResultCache(max_entries=2)
+        calls = []
+        compute = lambda name: (lambda: calls.append(name) or {"name": name})
+
+        cache.get_or_compute("a", "stage", "v1", compute("a"))
+        cache.get_or_compute("b", "stage", "v1", compute("b"))
+        cache.get_or_compute("a", "stage", "v1", compute("a"))  # a devient la plus récente
+        cache.get_or_compute("c", "stage", "v1", compute("c"))  # évince b
+        cache.get_or_compute("a", "stage", "v1", compute("a"))
+        cache.get_or_compute("b", "stage", "v1", compute("b"))
+
+        assert calls == ["a", "b", "c", "b"]
+        assert cache.stats()["memory_entries"] == 2
+
+    def test_version_change_invalidates_entries(self):
+        """Un nouveau modèle (nouvelle version) ne relit jamais les anciens résultats."""
+        cache = ResultCache()
+        cache.get_or_compute("digest", "ai_detection", "ai-1/aaaa", lambda: {"confidence": 10.0})
+
+        result = cache.get_or_compute("digest", "ai_detection", "ai-1/bbbb", lambda: {"confidence": 90.0})
+
+        assert result == {"confidence": 90.0}
+
+    def test_errors_are_cached_only_on_request(self):
+        """Les résultats en erreur sont recalculés, sauf avec cache_errors."""
+        cache = ResultCache()
+        calls = []
+        failing = lambda: calls.append(1) or {"error": "Modèle indisponible"}
+
+        cache.get_or_compute("d", "ai_detection", "v1", failing)
+        cache.get_or_compute("d", "ai_detection", "v1", failing)
+        cache.get_or_compute("d", "steganography", "v1", failing, cache_errors=True)
+        cache.get_or_compute("d", "steganography", "v1", failing, cache_errors=True)
+
+        assert len(calls) == 3
+
+    def test_exceptions_are_never_cached(self):
+        """Un calcul qui lève une exception est refait à l'appel suivant, même avec cache_errors."""
+        cache = ResultCache()
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise OSError("lecture interrompue")
+            return {"error": "Impossible to detect message."}
+
+        for _ in range(3):
+            try:
+                cache.get_or_compute("d", "steganography", "v1", flaky, cache_errors=True)
+            except OSError:
+                pass
+
+        assert len(calls) == 2
+
+    def test_disk_tier_connection_per_thread_and_process(self, tmp_path):
+        """Chaque thread et chaque processus enfant (fork) ouvre sa propre connexion SQLite."""
+        path = str(tmp_path / "cache.sqlite")
+        cache = ResultCache(max_entries=0, path=path, ttl=60)
+        cache.put(("parent", "hashes", "v1"), {"phash": "ff"})
+
+        connections = []
+        thread = threading.Thread(target=lambda: connections.append(cache._connection()))
+        thread.start()
+        thread.join()
+        assert connections[0] is not cache._connection()
+
+        def child():
+            cache.put(("child", "hashes", "v1"), {"phash": "00"})
+            assert cache.get_or_compute("parent", "hashes", "v1", lambda: None) == {"phash": "ff"}
+
+        process = multiprocessing.get_context('fork').Process(target=child)
+        process.start()
+        process.join(30)
+
+        assert process.exitcode == 0
+        assert cache.get_or_compute("child", "hashes", "v1", lambda: None) == {"phash": "00"}
+
+    def test_disk_tier_is_shared_and_expires(self, tmp_path):
+        """Le niveau SQLite survit au processus et respecte la durée de vie."""
+        path = str(tmp_path / "cache.sqlite")
+        ResultCache(path=path, ttl=60).get_or_compute("d", "hashes", "v1", lambda: {"phash": "ff"})
+
+        other = ResultCache(max_entries=0, path=path, ttl=60)
+        assert other.get_or_compute("d", "hashes", "v1", lambda: {"phash": "00"}) == {"phash": "ff"}
+
+        expired = ResultCache(path=str(tmp_path / "expired.sqlite"), ttl=0.01)
+        expired.put(("d", "hashes", "v1"), {"phash": "ff"})
+        expired.configure(max_entries=0, path=expired.path, ttl=0.01)  # Vide le niveau mémoire
+        time.sleep(0.05)
+        assert expired.get_or_compute("d", "hashes", "v1", lambda: {"phash": "00"}) == {"phash": "00"}
+
+    def test_stats_report_hit_ratio_per_stage(self):
+        """Les statistiques donnent le taux de succès de chaque étape."""
+        cache = ResultCache()
+        for _ in range(4):
+            cache.get_or_compute("d", "steganography", "v1", lambda: {"message": "x"})
+        cache.get_or_compute("d", "hashes", "v1", lambda: {"phash": "ff"})
+
+        stages = cache.stats()["stages"]
+
+        assert stages["steganography"]["hit_ratio"] == 0.75
+        assert stages["steganography"]["memory_hits"] == 3
+        assert stages["hashes"]["hit_ratio"] == 0.0
@@ -0,0 +1,41 @@
+import io
+import numpy as np
+from PIL import Image
+
+def _png(seed):
+    pixels = np.random.default_rng(seed).integers(0, 255, (40, 40, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+class TestSimilarityMatrix:
+    """Tests pour la matrice de similarité d'un lot d'images."""
+
+    def test_uploaded_files_matrix(self, client):
+        """Les fichiers envoyés sont comparés deux à deux ; la copie forme une paire identique."""
+        images = [_png(seed) for seed in range(3)]
+        files = [(io.BytesIO(data), f"image{index}.png") for index, data in enumerate(images)]
+        files.append((io.BytesIO(images[0]), "copy.png"))
+
+        response = client.post('/api/images/similarity/matrix', data={'files': files, 'threshold': '0.9'},
+                               content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        result = response.get_json()
+        assert result["labels"] == ["image0.png", "image1.png", "image2.png", "copy.png"]
+        assert result["matrix"]["average"][0][3] == 100
+        assert {"i": 0, "j": 3} in [{"i": pair["i"], "j": pair["j"]} for pair in result["pairs"]]
+
+    def test_invalid_threshold_is_rejected(self, client):
+        """Un seuil non numérique ou hors de [0, 1] est une erreur de la requête."""
+        for threshold in ("abc", [1], 2):
+            response = client.post('/api/images/similarity/matrix',
+                                   json={"image_ids": [1, 2], "threshold": threshold})
+            assert response.status_code == 400
+
+    def test_invalid_image_ids_are_rejected(self, client):
+        """image_ids doit être une liste d'entiers (pas une chaîne JSON, un nombre ou un objet)."""
+        for image_ids in ("1,2", 5, {"a": 1}, [1, "x"], [1, 2.5], [True, 2]):
+            response = client.post('/api/images/similarity/matrix', json={"image_ids": image_ids})
+            assert response.status_code == 400
+        assert client.post('/api/images/similarity/matrix', json=[1, 2]).status_code == 400
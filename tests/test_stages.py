@@ -0,0 +1,73 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.exceptions import StageTimeoutError
+from app.utils.stages import StageGraph
+
+class TestStageGraph:
+    """Tests pour l'exécution concurrente des étapes d'analyse."""
+
+    def test_independent_stages_run_concurrently(self):
+        """La durée totale est celle de la plus longue étape, pas leur somme."""
+        graph = StageGraph(executor=ThreadPoolExecutor(max_workers=4))
+        for name in ('a', 'b', 'c', 'd'):
+            graph.add(name, lambda: time.sleep(0.2) or threading.current_thread().name)
+
+        report = graph.run()
+
+        assert report.elapsed < 0.5
+        assert len(set(report.results.values())) == 4
+        assert not report.errors
+
+    def test_dependencies_receive_results(self):
+        """Une étape démarre après ses dépendances et reçoit leurs résultats dans l'ordre."""
+        graph = StageGraph()
+        graph.add('hashes', lambda: {"phash": "ff"})
+        graph.add('size', lambda: 3)
+        graph.add('similar', lambda hashes, size: [hashes["phash"]] * size, after=('hashes', 'size'))
+
+        assert graph.run().results['similar'] == ["ff", "ff", "ff"]
+
+    def test_errors_and_timeouts_are_isolated(self):
+        """Un échec ou un dépassement de délai n'affecte que l'étape et ses dépendantes."""
+        def fail():
+            raise ValueError("boom")
+
+        graph = StageGraph(timeout=5)
+        graph.add('broken', fail)
+        graph.add('after_broken', lambda value: value, after=('broken',))
+        graph.add('slow', lambda: time.sleep(1), timeout=0.1, on_error=lambda e: None)
+        graph.add('ok', lambda: "ok")
+
+        report = graph.run()
+
+        assert report.elapsed < 0.8
+        assert report.results['ok'] == "ok"
+        assert report.results['broken'] == {"error": "boom"}
+        assert 'broken' in str(report.errors['after_broken'])
+        assert report.results['slow'] is None
+        assert isinstance(report.errors['slow'], StageTimeoutError)
+        assert report.succeeded('ok') and not report.succeeded('slow')
+
+    def test_timeout_counts_from_stage_start(self):
+        """Une étape en attente d'un thread libre n'est pas hors délai ; une étape abandonnée est comptée."""
+        from app.utils.stages import abandoned_stages
+
+        # Étapes abandonnées par les tests précédents (pool partagé): attendre leur fin
+        deadline = time.monotonic() + 2
+        while abandoned_stages() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        before = abandoned_stages()
+
+        graph = StageGraph(timeout=0.3, executor=ThreadPoolExecutor(max_workers=1))
+        graph.add('first', lambda: time.sleep(0.2) or 1)
+        graph.add('second', lambda: time.sleep(0.2) or 2)
+        graph.add('slow', lambda first, second: time.sleep(0.6), after=('first', 'second'))
+
+        report = graph.run()
+
+        assert report.results['first'] == 1 and report.results['second'] == 2
+        assert isinstance(report.errors['slow'], StageTimeoutError)
+        assert abandoned_stages() == before + 1
+        time.sleep(0.5)
+        assert abandoned_stages() == before
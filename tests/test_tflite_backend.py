@@ -0,0 +1,40 @@
+import numpy as np
+from PIL import Image
+from app.services.tflite_backend import tflite_path, quantize, dequantize, load_calibration_images
+from app.services.ai_detection_service_v2 import configure_backend
+from app.services.model_registry import ModelRegistry
+
+class TestTFLiteBackend:
+    """Tests pour l'exécution des modèles par TensorFlow Lite."""
+
+    def test_export_names_follow_source_and_quantization(self):
+        """model.h5 est exporté en model.<quantification>.tflite."""
+        assert tflite_path("model.h5", "int8") == "model.int8.tflite"
+        assert tflite_path("resnet50", "dynamic") == "resnet50.dynamic.tflite"
+
+    def test_integer_tensors_are_quantized_and_dequantized(self):
+        """Les entrées float32 sont converties avec l'échelle du tenseur entier, et inversement."""
+        detail = {"dtype": np.int8, "quantization": (1 / 255.0, -128)}
+        values = np.array([0.0, 0.5, 1.0, 2.0], dtype=np.float32)
+
+        quantized = quantize(values, detail)
+        assert quantized.dtype == np.int8 and quantized[-1] == 127
+        assert np.allclose(dequantize(quantized, detail)[:3], values[:3], atol=1 / 255.0)
+        assert quantize(values, {"dtype": np.float32}) is values
+
+    def test_calibration_uses_folder_images(self, tmp_path):
+        """Les images du dossier sont redimensionnées; sans image, des images aléatoires."""
+        Image.new('RGB', (300, 200), color='red').save(tmp_path / "a.png")
+        (tmp_path / "notes.txt").write_text("ignoré")
+
+        arrays = load_calibration_images(str(tmp_path), (128, 128), Image.Resampling.LANCZOS, limit=10)
+        assert len(arrays) == 1 and arrays[0].shape == (128, 128, 3) and arrays[0][0, 0, 0] == 255
+        assert len(load_calibration_images(None, (32, 32), Image.Resampling.NEAREST, limit=3)) == 3
+
+    def test_backend_selection_replaces_registry_loaders(self):
+        """Le moteur choisi est transmis aux fonctions de chargement du registre."""
+        registry = ModelRegistry()
+        configure_backend(registry, 'tflite', quantization='int8', threads=2)
+
+        assert registry.names() == ['ai_detection', 'resnet50']
+        assert registry._loaders['resnet50'].keywords == {'backend': 'tflite', 'quantization': 'int8', 'threads': 2}
@@ -0,0 +1,101 @@
+import io
+import os
+import numpy as np
+from PIL import Image
+
+def _png(seed):
+    pixels = np.random.default_rng(seed).integers(0, 255, (40, 40, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+class _BrokenChangeLog:
+    """Journal index_changes en échec (base indisponible en cours de transaction)."""
+
+    @staticmethod
+    def record(image_id):
+        raise RuntimeError("journal indisponible")
+
+class TestUploadAndAnalyze:
+    """Tests pour l'enregistrement d'une analyse téléchargée."""
+
+    def test_upload_writes_analysis_and_index_rows_together(self, client):
+        """L'analyse, ses hashes, le journal et l'empreinte sont enregistrés et l'image indexée."""
+        from app.models.hash_models import ImageHash, ImageDigest, IndexChange
+        from app.services.hash_index import perceptual_hash_index
+
+        response = client.post('/api/v2/upload', data={'file': (io.BytesIO(_png(1)), "a.png")},
+                               content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        image_id = response.get_json()["image_id"]
+        assert image_id is not None
+        assert ImageHash.query.filter_by(image_id=image_id).count() == 1
+        assert IndexChange.query.filter_by(image_id=image_id).count() == 1
+        assert ImageDigest.query.filter_by(image_id=image_id).count() == 1
+        assert perceptual_hash_index.get(image_id) is not None
+
+    def test_v1_upload_indexes_all_hashes(self, client):
+        """L'upload v1 indexe le pHash et le dHash, comme l'upload v2."""
+        from app.models.hash_models import ImageHash
+        from app.services.hash_index import perceptual_hash_index
+
+        response = client.post('/api/images/upload', data={'file': (io.BytesIO(_png(4)), "d.png")},
+                               content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        image_id = response.get_json()["data"]["id"]
+        row = ImageHash.query.filter_by(image_id=image_id).one()
+        assert row.phash is not None and row.dhash is not None
+        assert set(perceptual_hash_index.get(image_id)) >= {"phash", "dhash"}
+
+    def test_v1_failed_write_leaves_nothing(self, client, monkeypatch):
+        """En v1 aussi, un échec du journal annule l'analyse et ses hashes."""
+        from app.services import image_service
+        from app.models.image_models import ImageAnalysis
+        from app.models.hash_models import ImageHash
+
+        monkeypatch.setattr(image_service, "IndexChange", _BrokenChangeLog)
+        response = client.post('/api/images/upload', data={'file': (io.BytesIO(_png(5)), "e.png")},
+                               content_type='multipart/form-data')
+
+        assert response.status_code == 500
+        assert ImageAnalysis.query.count() == 0
+        assert ImageHash.query.count() == 0
+
+    def test_failed_write_leaves_nothing(self, client, monkeypatch):
+        """Un échec en cours d'enregistrement annule toute la transaction."""
+        from app.api import image_routes_v2
+        from app.models.image_models import ImageAnalysis
+        from app.models.hash_models import ImageHash, ImageDigest
+
+        monkeypatch.setattr(image_routes_v2, "IndexChange", _BrokenChangeLog)
+        response = client.post('/api/v2/upload', data={'file': (io.BytesIO(_png(2)), "b.png")},
+                               content_type='multipart/form-data')
+
+        assert response.status_code == 200
+        assert response.get_json()["image_id"] is None
+        assert ImageAnalysis.query.count() == 0
+        assert ImageHash.query.count() == 0
+        assert ImageDigest.query.count() == 0
+
+    def test_delete_releases_stored_file(self, client):
+        """La suppression d'une analyse retire ses lignes d'index et son fichier non référencé."""
+        from app.models.image_models import ImageAnalysis
+        from app.models.hash_models import ImageHash, ImageDigest
+        from app.models.blob_models import StoredBlob
+        from app.services.hash_index import perceptual_hash_index
+
+        result = client.post('/api/v2/upload', data={'file': (io.BytesIO(_png(3)), "c.png")},
+                             content_type='multipart/form-data').get_json()
+        image_id = result["image_id"]
+
+        response = client.delete(f'/api/v2/images/{image_id}')
+
+        assert response.status_code == 200 and response.get_json()["file_deleted"]
+        assert ImageAnalysis.query.count() == 0
+        assert ImageHash.query.count() == 0 and ImageDigest.query.count() == 0
+        assert StoredBlob.query.count() == 0
+        assert perceptual_hash_index.get(image_id) is None
+        assert not os.path.exists(result["image_path"])
+        assert client.delete(f'/api/v2/images/{image_id}').status_code == 404